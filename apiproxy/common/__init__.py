@@ -2,5 +2,19 @@
 # -*- coding: utf-8 -*-
 
 from .utils import Utils
+from .session import HttpSession
+from .retry import Retrier
+from .ratelimit import RateLimiter
+from .ttwid import TtwidCache
+from .cookiepool import CookiePool
+from .mirrors import MirrorSelector
+from .bandwidth import BandwidthLimiter
 
 utils = Utils()
+session = HttpSession()
+retrier = Retrier()
+ratelimiter = RateLimiter()
+ttwid = TtwidCache()
+cookiepool = CookiePool()
+mirrors = MirrorSelector()
+bandwidth = BandwidthLimiter()
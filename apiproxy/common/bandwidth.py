@@ -0,0 +1,158 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+import time
+import asyncio
+import threading
+import weakref
+from collections import deque
+from typing import Dict, List, Optional
+
+MB = 1024 * 1024
+
+
+class ByteBucket(object):
+    """按字节计的令牌桶, rate 为 0 表示不限速
+
+    每次下载一块数据后调用 reserve(字节数), 令牌不够时记为欠账, 返回需要等待的秒数,
+    由调用方在锁外等待(线程中 time.sleep, 协程中 asyncio.sleep)。
+    所以单块数据可以大于 burst, 长时间的平均速度仍然是 rate。
+    同时统计最近 window 秒内实际下载的字节数, 用于比较实际速度和允许的速度。
+    """
+
+    def __init__(self, rate=0, burst=None, window=5):
+        self._lock = threading.Lock()
+        self.window = window
+        # 实际下载量: [(整数秒, 字节数), ...]
+        self._history = deque()
+        self.bytes = 0
+        # 因为限速累计等待的时间(秒)
+        self.throttled = 0.0
+        self.set_rate(rate, burst)
+
+    def set_rate(self, rate, burst=None) -> None:
+        """修改速度上限(字节/秒), 可以在下载过程中调用; burst 默认为 0.1 秒的数据量"""
+        with self._lock:
+            self.rate = max(0.0, float(rate or 0))
+            self.burst = max(64 * 1024, int(burst or self.rate / 10))
+            self.tokens = float(self.burst)
+            self.last = time.monotonic()
+
+    def reserve(self, size: int) -> float:
+        """取 size 字节的令牌, 返回需要等待的秒数"""
+        now = time.monotonic()
+        with self._lock:
+            self.bytes += size
+            second = int(now)
+            if self._history and self._history[-1][0] == second:
+                self._history[-1][1] += size
+            else:
+                self._history.append([second, size])
+                while self._history[0][0] <= second - self.window:
+                    self._history.popleft()
+
+            if not self.rate:
+                return 0.0
+            self.tokens = min(self.burst, self.tokens + (now - self.last) * self.rate)
+            self.last = now
+            self.tokens -= size
+            delay = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            self.throttled += delay
+            return delay
+
+    def achieved(self) -> float:
+        """最近 window 秒的平均速度(字节/秒)"""
+        now = time.monotonic()
+        # 最近 window 个整数秒, 当前这一秒只过去了一部分
+        start = int(now) - self.window + 1
+        with self._lock:
+            recent = sum(size for second, size in self._history if second >= start)
+        return recent / (now - start)
+
+    def stats(self) -> dict:
+        achieved = self.achieved()
+        return {
+            "allowed": round(self.rate / MB, 3),
+            "achieved": round(achieved / MB, 3),
+            # 实际速度占允许速度的比例, 不限速时为 None
+            "utilization": round(achieved / self.rate, 3) if self.rate else None,
+            "bytes": self.bytes,
+            "throttled": round(self.throttled, 3),
+        }
+
+
+class BandwidthLimiter(object):
+    """下载带宽限制
+
+    一个全局令牌桶限制本进程所有下载的合计速度, 每个下载任务(一个 Download)另有自己的
+    令牌桶; 每下载一块数据同时从两个桶中取令牌, 按等待时间较长的一个等待。
+    所有工作线程和协程共用这些桶, 速度上限可以在下载过程中修改(Web 接口 /api/bandwidth)。
+    速度的单位为 MB/s, 0 表示不限制。
+    """
+
+    def __init__(self, total=0, job=0):
+        self.total = ByteBucket(float(total or 0) * MB)
+        # 新任务的默认速度上限(字节/秒)
+        self.job_rate = float(job or 0) * MB
+        # 正在进行的任务, 任务结束(Download 被回收)后自动移除
+        self._jobs = weakref.WeakSet()
+        self._lock = threading.Lock()
+
+    def load(self, config: Optional[dict]) -> None:
+        """从配置加载, 格式: {total: MB/s, job: MB/s}"""
+        if not config:
+            return
+        if "total" in config:
+            self.set_total(config["total"])
+        if "job" in config:
+            self.set_job(config["job"])
+
+    def set_total(self, speed) -> None:
+        self.total.set_rate(float(speed or 0) * MB)
+
+    def set_job(self, speed) -> None:
+        """修改单个任务的速度上限, 同时作用于正在进行的任务"""
+        with self._lock:
+            self.job_rate = float(speed or 0) * MB
+            jobs = list(self._jobs)
+        for bucket in jobs:
+            bucket.set_rate(self.job_rate)
+
+    def job(self, speed=None) -> ByteBucket:
+        """为一个下载任务创建令牌桶, speed 为空时使用默认的单任务上限"""
+        bucket = ByteBucket(self.job_rate if speed is None else float(speed or 0) * MB)
+        with self._lock:
+            self._jobs.add(bucket)
+        return bucket
+
+    def _delay(self, size: int, job: Optional[ByteBucket]) -> float:
+        delay = self.total.reserve(size)
+        if job is not None:
+            delay = max(delay, job.reserve(size))
+        return delay
+
+    def consume(self, size: int, job: Optional[ByteBucket] = None) -> None:
+        """下载了 size 字节, 超出速度上限时在当前线程中等待"""
+        delay = self._delay(size, job)
+        if delay > 0:
+            time.sleep(delay)
+
+    async def consume_async(self, size: int, job: Optional[ByteBucket] = None) -> None:
+        """consume 的协程版本, 等待时不阻塞事件循环"""
+        delay = self._delay(size, job)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            jobs: List[ByteBucket] = list(self._jobs)
+        return {
+            "total": self.total.stats(),
+            "job": round(self.job_rate / MB, 3),
+            "jobs": [bucket.stats() for bucket in jobs],
+        }
+
+
+if __name__ == "__main__":
+    pass
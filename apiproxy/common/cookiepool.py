@@ -0,0 +1,180 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Union
+
+logger = logging.getLogger("douyin_downloader")
+
+
+class Credential(object):
+    """一组身份(Cookie)及其健康状态"""
+    __slots__ = ("name", "cookie", "score", "leases", "requests", "failures", "expired_hits",
+                 "cooldown_until", "retired")
+
+    def __init__(self, name: str, cookie: str):
+        self.name = name
+        self.cookie = cookie
+        # 健康分 0~1, 正常返回时回升, 失败时下降
+        self.score = 1.0
+        # 当前正在使用这组身份的请求数
+        self.leases = 0
+        self.requests = 0
+        self.failures = 0
+        # 连续 token 过期的次数, 正常返回后清零
+        self.expired_hits = 0
+        self.cooldown_until = 0.0
+        # 已淘汰, 不再分配
+        self.retired = False
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "score": round(self.score, 3),
+            "leases": self.leases,
+            "requests": self.requests,
+            "failures": self.failures,
+            "expired_hits": self.expired_hits,
+            "cooling": self.cooldown_until > time.time(),
+            "retired": self.retired,
+        }
+
+
+class CookiePool(object):
+    """多组 Cookie 轮换使用
+
+    每次 API 请求通过 lease() 租用一组身份: 在未淘汰、不在冷却中的身份里选择
+    健康分最高、当前租用数最少的一组, 多个线程的请求因此分散到不同身份上。
+    健康分低于 min_score 的身份只在没有其它身份可用时使用, 正常返回后分数回升。
+    retrier 根据响应调用 report():
+    - 正常返回: 健康分回升, 连续过期次数清零
+    - HTTP 429/5xx、空数据: 健康分下降(只影响选择顺序, 限流和服务器错误是暂时的, 不淘汰)
+    - token 过期(只返回 status_code): 健康分大幅下降并冷却 cooldown 秒,
+      连续 max_expired 次过期时淘汰
+    没有配置身份时 lease() 得到 None, 请求继续使用 douyin_headers 中的 Cookie。
+    """
+
+    def __init__(self, min_score=0.2, max_expired=3, cooldown=60.0):
+        self.min_score = float(min_score)
+        self.max_expired = max(1, int(max_expired))
+        self.cooldown = float(cooldown)
+        self.credentials: List[Credential] = []
+        self._lock = threading.Lock()
+        # 选择时轮转的起点, 分数和租用数都相同时依次使用
+        self._next = 0
+
+    def __len__(self):
+        return len(self.credentials)
+
+    def load(self, config: Union[list, dict, None]) -> None:
+        """从配置加载
+
+        格式: [cookie, ...] 或 {cookies: [cookie, ...], min_score, max_expired, cooldown},
+        cookie 为 "name1=value1; name2=value2" 字符串、{name: value} 字典,
+        或 {name: 名称, cookie: 字符串或字典}; 空列表表示不使用 Cookie 池
+        """
+        if config is None:
+            return
+        if isinstance(config, dict):
+            for key in ("min_score", "cooldown"):
+                if key in config:
+                    setattr(self, key, float(config[key]))
+            if "max_expired" in config:
+                self.max_expired = max(1, int(config["max_expired"]))
+            config = config.get("cookies") or []
+
+        credentials = []
+        for i, item in enumerate(config):
+            name = f"cookie{i + 1}"
+            if isinstance(item, dict) and "cookie" in item:
+                name = str(item.get("name") or name)
+                item = item["cookie"]
+            if isinstance(item, dict):
+                item = "; ".join(f"{k}={v}" for k, v in item.items())
+            if item:
+                credentials.append(Credential(name, str(item)))
+        with self._lock:
+            self.credentials = credentials
+            self._next = 0
+
+    def _available(self) -> List[Credential]:
+        now = time.time()
+        alive = [c for c in self.credentials if not c.retired]
+        ready = [c for c in alive if c.cooldown_until <= now]
+        # 健康分过低的身份排在后面, 其它身份都不可用时仍然使用
+        healthy = [c for c in ready if c.score >= self.min_score]
+        # 全部在冷却时使用最快结束冷却的一组, 不让请求卡住
+        return healthy or ready or sorted(alive, key=lambda c: c.cooldown_until)[:1]
+
+    def acquire(self) -> Optional[Credential]:
+        """租用一组身份, 没有可用身份时返回 None; 用完后必须调用 release()"""
+        with self._lock:
+            candidates = self._available()
+            if not candidates:
+                return None
+            # 从轮转起点开始比较, 条件相同时依次使用各组身份
+            start = self._next % len(candidates)
+            ordered = candidates[start:] + candidates[:start]
+            credential = min(ordered, key=lambda c: (c.leases, -round(c.score, 1)))
+            self._next += 1
+            credential.leases += 1
+            credential.requests += 1
+            return credential
+
+    def release(self, credential: Optional[Credential]) -> None:
+        if credential is None:
+            return
+        with self._lock:
+            credential.leases -= 1
+
+    @contextmanager
+    def lease(self):
+        """with cookiepool.lease() as credential: ... credential 可能为 None"""
+        credential = self.acquire()
+        try:
+            yield credential
+        finally:
+            self.release(credential)
+
+    @staticmethod
+    def apply(headers: Optional[dict], credential: Optional[Credential]) -> Optional[dict]:
+        """返回使用这组身份的请求头, credential 为 None 时原样返回"""
+        if credential is None:
+            return headers
+        # 只取其它键, 不触发默认 Cookie 的计算
+        result = {key: headers[key] for key in (headers or {}).keys() if key != "Cookie"}
+        result["Cookie"] = credential.cookie
+        return result
+
+    def report(self, credential: Optional[Credential], ok: bool, token_expired: bool = False) -> None:
+        """根据一次响应更新健康分"""
+        if credential is None:
+            return
+        with self._lock:
+            if ok:
+                credential.score += (1.0 - credential.score) * 0.2
+                credential.expired_hits = 0
+                return
+            credential.failures += 1
+            if token_expired:
+                credential.score *= 0.3
+                credential.expired_hits += 1
+                credential.cooldown_until = time.time() + self.cooldown
+            else:
+                credential.score *= 0.7
+            if not credential.retired and credential.expired_hits >= self.max_expired:
+                credential.retired = True
+                logger.warning(f"[{credential.name}] Cookie 已失效, 不再使用"
+                               f"(健康分 {credential.score:.2f}, 连续过期 {credential.expired_hits} 次)")
+
+    def stats(self) -> List[Dict]:
+        with self._lock:
+            return [credential.to_dict() for credential in self.credentials]
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+from typing import Callable, Dict
+
+
+class LazyHeaders(dict):
+    """部分值在读取时才计算的请求头
+
+    dynamic 中的键每次读取时调用对应的函数取值(例如 Cookie 中的 ttwid),
+    创建时不会调用, import 时不访问网络。显式赋值后就是普通的值, 不再计算。
+    requests、aiohttp 以及 {**headers} 展开读取时得到的都是计算后的值。
+    """
+
+    def __init__(self, headers: dict, **dynamic: Callable[[], str]):
+        super().__init__(headers)
+        self._dynamic: Dict[str, Callable[[], str]] = dynamic
+
+    def snapshot(self) -> dict:
+        """计算所有的值, 返回普通字典"""
+        data = dict(super().items())
+        for key, factory in self._dynamic.items():
+            if key not in data:
+                data[key] = factory()
+        return data
+
+    def __getitem__(self, key):
+        if not super().__contains__(key) and key in self._dynamic:
+            return self._dynamic[key]()
+        return super().__getitem__(key)
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    def __contains__(self, key):
+        return super().__contains__(key) or key in self._dynamic
+
+    def __delitem__(self, key):
+        self._dynamic.pop(key, None)
+        if super().__contains__(key):
+            super().__delitem__(key)
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def keys(self):
+        # 只列出键, 不计算值
+        return list(super().keys()) + [key for key in self._dynamic if not dict.__contains__(self, key)]
+
+    def items(self):
+        return self.snapshot().items()
+
+    def values(self):
+        return self.snapshot().values()
+
+    def copy(self) -> dict:
+        return self.snapshot()
+
+    def __repr__(self):
+        return repr(self.snapshot())
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+import threading
+from typing import Dict, Iterable, List, Optional
+from urllib.parse import urlparse
+
+
+class HostStats(object):
+    """一个 CDN 主机的统计, 延迟、速度和失败率都是指数滑动平均"""
+    __slots__ = ("latency", "rate", "error", "samples")
+
+    def __init__(self):
+        # 首字节时间(秒)
+        self.latency: Optional[float] = None
+        # 下载速度(字节/秒)
+        self.rate: Optional[float] = None
+        # 失败率 0~1
+        self.error = 0.0
+        self.samples = 0
+
+    def to_dict(self) -> dict:
+        return {
+            "latency": None if self.latency is None else round(self.latency, 3),
+            "rate": None if self.rate is None else round(self.rate),
+            "error": round(self.error, 3),
+            "samples": self.samples,
+        }
+
+
+class MirrorSelector(object):
+    """媒体地址的镜像选择
+
+    抖音返回的 url_list 中是同一个文件在不同 CDN 主机上的地址。按主机记录首字节时间、
+    下载速度和失败率, 下载时按预计耗时从短到长排列这些地址, 后面的文件优先使用最快的主机;
+    一个地址失败或首字节太慢时, 下载器换下一个地址。
+    """
+
+    def __init__(self, alpha=0.3, expected_size=1024 * 1024, error_penalty=4.0):
+        # 滑动平均中新样本的权重
+        self.alpha = alpha
+        # 估算耗时使用的文件大小
+        self.expected_size = expected_size
+        # 失败率对预计耗时的放大倍数
+        self.error_penalty = error_penalty
+        self._hosts: Dict[str, HostStats] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def host(url: str) -> str:
+        return urlparse(url).netloc
+
+    def _stats(self, url: str) -> HostStats:
+        host = self.host(url)
+        stats = self._hosts.get(host)
+        if stats is None:
+            stats = self._hosts[host] = HostStats()
+        return stats
+
+    def _average(self, old: Optional[float], value: float) -> float:
+        return value if old is None else old + (value - old) * self.alpha
+
+    def record(self, url: str, ok: bool, latency: Optional[float] = None, size: int = 0,
+               elapsed: float = 0.0) -> None:
+        """记录一次请求的结果; latency 为首字节时间, size/elapsed 为下载的数据量和耗时"""
+        with self._lock:
+            stats = self._stats(url)
+            stats.samples += 1
+            stats.error = self._average(stats.error, 0.0 if ok else 1.0)
+            if latency is not None:
+                stats.latency = self._average(stats.latency, latency)
+            # 数据太少时速度主要取决于延迟, 不计入
+            if size >= 64 * 1024 and elapsed > 0:
+                stats.rate = self._average(stats.rate, size / elapsed)
+
+    def score(self, url: str) -> Optional[float]:
+        """预计耗时(秒), 没有统计时为 None"""
+        stats = self._hosts.get(self.host(url))
+        if stats is None or stats.samples == 0:
+            return None
+        if stats.latency is None:
+            # 只有失败记录
+            return float("inf")
+        estimate = stats.latency
+        if stats.rate:
+            estimate += self.expected_size / stats.rate
+        return estimate * (1.0 + self.error_penalty * stats.error)
+
+    def order(self, urls: Iterable[str]) -> List[str]:
+        """去掉空地址和重复地址, 按预计耗时排序
+
+        没有统计的主机排在有统计的主机之后、全部失败的主机之前, 相同时保持原来的顺序
+        """
+        unique = list(dict.fromkeys(url for url in urls if url))
+        with self._lock:
+            scores = {url: self.score(url) for url in unique}
+        known = [s for s in scores.values() if s is not None and s != float("inf")]
+        # 没有统计的主机按已知主机中最慢的估算, 相同时先用已经证明可用的主机
+        unknown = max(known) if known else 0.0
+        return sorted(unique, key=lambda url: (unknown, 1) if scores[url] is None else (scores[url], 0))
+
+    def unknown(self, urls: Iterable[str]) -> List[str]:
+        """还没有统计的地址"""
+        with self._lock:
+            return [url for url in urls if self.host(url) not in self._hosts]
+
+    def stats(self) -> Dict[str, dict]:
+        with self._lock:
+            return {host: stats.to_dict() for host, stats in self._hosts.items()}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._hosts.clear()
+
+
+if __name__ == "__main__":
+    pass
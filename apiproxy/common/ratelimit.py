@@ -0,0 +1,203 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+import os
+import json
+import time
+import logging
+import tempfile
+import threading
+from typing import Callable, Dict, Optional
+from urllib.parse import urlparse
+
+try:
+    import fcntl
+except ImportError:
+    # Windows 下没有 fcntl, 只在进程内限速
+    fcntl = None
+
+logger = logging.getLogger("douyin_downloader")
+
+
+class RateLimitTimeout(Exception):
+    """在 max_wait 秒内等不到令牌"""
+
+    def __init__(self, wait: float):
+        super().__init__(f"需要等待 {wait:.1f}s 才有令牌")
+        self.wait = wait
+
+
+class Bucket(object):
+    """令牌桶参数: 每秒 rate 个令牌, 最多积攒 burst 个, rate 为 0 表示不限速"""
+
+    def __init__(self, rate=1.0, burst=1):
+        self.rate = float(rate or 0)
+        self.burst = max(1, int(burst or 1))
+
+
+class RateLimiter(object):
+    """按接口和主机限速的令牌桶
+
+    每次请求同时从接口桶(Urls 中的属性名, 如 USER_POST)和主机桶
+    (如 www.douyin.com)中各取一个令牌, 没有令牌时等待。
+
+    令牌桶用 GCRA 实现, 每个桶只需要保存 "理论到达时间" 和减速倍数两个数,
+    默认保存在临时目录下的一个 JSON 文件中并用文件锁保护, 同一台机器上的
+    多个进程(例如同时下载多个主页)共享同一组令牌桶。
+
+    自适应: 接口返回 token 过期、空数据或 429 时把该接口和主机的请求间隔
+    翻倍(最多 max_slowdown 倍), 之后每次正常返回逐步恢复。
+    """
+
+    def __init__(self, endpoint: Optional[Bucket] = None, host: Optional[Bucket] = None,
+                 shared=True, path: Optional[str] = None, max_slowdown=16.0, recovery=0.8):
+        # 接口和主机的默认令牌桶
+        self.endpoint_default = endpoint or Bucket(rate=1.0, burst=2)
+        self.host_default = host or Bucket(rate=2.0, burst=4)
+        # 单独设置的令牌桶, 键为接口名或主机名
+        self.overrides: Dict[str, Bucket] = {}
+        self.shared = shared and fcntl is not None
+        self.path = path or os.path.join(tempfile.gettempdir(), "douyin_downloader_ratelimit.json")
+        self.max_slowdown = max_slowdown
+        self.recovery = recovery
+        self._lock = threading.Lock()
+        # 不共享(或共享文件不可用)时使用的进程内状态
+        self._local: Dict[str, list] = {}
+        self._waited: Dict[str, float] = {}
+
+    def bucket(self, key: str, is_host: bool) -> Bucket:
+        # 使用 Cookie 池时接口的键为 "接口名@身份", 配置按接口名查找
+        name = key.split("@", 1)[0]
+        return self.overrides.get(key) or self.overrides.get(name) or (
+            self.host_default if is_host else self.endpoint_default)
+
+    def load(self, config: Optional[dict]) -> None:
+        """从配置加载, 格式: {shared: true, default: {...}, host: {...}, USER_POST: {...}, www.douyin.com: {...}}"""
+        if not config:
+            return
+        for key, options in config.items():
+            if key == "shared":
+                self.shared = bool(options) and fcntl is not None
+            elif key == "path":
+                self.path = options
+            elif not isinstance(options, dict):
+                continue
+            elif key == "default":
+                self.endpoint_default = Bucket(**options)
+            elif key == "host":
+                self.host_default = Bucket(**options)
+            else:
+                self.overrides[key] = Bucket(**options)
+
+    def _update(self, fn: Callable[[dict], object]):
+        """在锁内读取并修改限速状态 {key: [理论到达时间, 减速倍数]}"""
+        with self._lock:
+            if not self.shared:
+                return fn(self._local)
+            try:
+                with open(self.path, "a+") as f:
+                    fcntl.flock(f, fcntl.LOCK_EX)
+                    try:
+                        f.seek(0)
+                        try:
+                            state = json.loads(f.read() or "{}")
+                        except ValueError:
+                            state = {}
+                        result = fn(state)
+                        f.seek(0)
+                        f.truncate()
+                        f.write(json.dumps(state))
+                        f.flush()
+                    finally:
+                        fcntl.flock(f, fcntl.LOCK_UN)
+                return result
+            except OSError as e:
+                logger.warning(f"限速状态文件不可用, 改为进程内限速: {str(e)}")
+                self.shared = False
+                return fn(self._local)
+
+    def _keys(self, endpoint: str, url: str):
+        keys = [(endpoint, False)]
+        host = urlparse(url).hostname
+        if host:
+            keys.append((host, True))
+        # 不限速的桶不参与计算
+        return [(key, self.bucket(key, is_host)) for key, is_host in keys
+                if self.bucket(key, is_host).rate > 0]
+
+    def acquire(self, endpoint: str, url: str, max_wait: Optional[float] = None) -> float:
+        """为一次请求预约令牌并等待, 返回等待的秒数
+
+        需要等待的时间超过 max_wait 秒时不预约令牌, 立即抛出 RateLimitTimeout
+        """
+        keys = self._keys(endpoint, url)
+        if not keys:
+            return 0.0
+
+        def reserve(state):
+            now = time.time()
+            # 所有桶都有令牌的最早时间
+            start = now
+            for key, bucket in keys:
+                tat, factor = state.get(key, (now, 1.0))
+                interval = factor / bucket.rate
+                start = max(start, tat - (bucket.burst - 1) * interval)
+            if max_wait is not None and start - now > max_wait:
+                return start - now
+            for key, bucket in keys:
+                tat, factor = state.get(key, (now, 1.0))
+                state[key] = [max(tat, start) + factor / bucket.rate, factor]
+            return start - now
+
+        wait = self._update(reserve)
+        if max_wait is not None and wait > max_wait:
+            raise RateLimitTimeout(wait)
+        if wait > 0:
+            with self._lock:
+                self._waited[endpoint] = self._waited.get(endpoint, 0.0) + wait
+            time.sleep(wait)
+        return max(0.0, wait)
+
+    def feedback(self, endpoint: str, url: str, throttled: bool) -> None:
+        """根据响应调整请求间隔: throttled 为 True 时减速, 否则逐步恢复"""
+        keys = self._keys(endpoint, url)
+        if not keys:
+            return
+
+        def adjust(state):
+            now = time.time()
+            for key, bucket in keys:
+                tat, factor = state.get(key, (now, 1.0))
+                if throttled:
+                    factor = min(self.max_slowdown, factor * 2)
+                else:
+                    factor = max(1.0, factor * self.recovery)
+                state[key] = [tat, factor]
+
+        self._update(adjust)
+        if throttled:
+            logger.warning(f"[{endpoint}] 接口疑似限流, 降低请求频率")
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """每个桶当前的减速倍数和实际速率, 以及本进程在每个接口上累计等待的秒数"""
+        state = self._update(lambda state: {key: list(value) for key, value in state.items()})
+        result = {}
+        for key, (tat, factor) in state.items():
+            bucket = self.bucket(key, "." in key)
+            result[key] = {
+                "slowdown": round(factor, 2),
+                "rate": round(bucket.rate / factor, 3) if bucket.rate else 0,
+                "waited": round(self._waited.get(key, 0.0), 2),
+            }
+        return result
+
+    def reset(self) -> None:
+        """清空限速状态(包括共享文件)"""
+        self._update(lambda state: state.clear())
+        with self._lock:
+            self._waited.clear()
+
+
+if __name__ == "__main__":
+    pass
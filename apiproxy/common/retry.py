@@ -0,0 +1,219 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+import json
+import time
+import random
+import logging
+import threading
+from typing import Callable, Dict, Optional, Union
+
+import requests
+
+logger = logging.getLogger("douyin_downloader")
+
+
+class RetryableError(Exception):
+    """可以重试的请求错误"""
+    pass
+
+
+class RetryPolicy(object):
+    """重试与退避策略
+
+    - 指数退避 + 全抖动(full jitter): 第 n 次重试前等待 uniform(0, min(max_delay, base_delay * 2^n))
+    - 重试预算: 最多 max_attempts 次请求, 且总耗时不超过 deadline 秒(每次请求的超时为剩下的时间)
+    - 等待限速令牌的时间不计入 deadline, 每次最多等待 max_wait 秒, 超过时按失败重试
+    - 按状态码决策: 429 和 5xx 重试(优先使用 Retry-After), 其它 4xx 直接放弃;
+      网络异常、空响应、无法解析的 JSON 也会重试
+    """
+
+    def __init__(self, max_attempts=5, base_delay=0.5, max_delay=8.0, deadline=10.0,
+                 retry_statuses=(429, 500, 502, 503, 504), max_wait=30.0):
+        self.max_attempts = max(1, int(max_attempts))
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        # 单次调用允许的最长时间(秒), 等同于原来的 Douyin.timeout
+        self.deadline = deadline
+        self.retry_statuses = frozenset(retry_statuses)
+        # 每次请求等待限速令牌的最长时间(秒), None 表示一直等待
+        self.max_wait = max_wait
+
+    def replace(self, **kwargs) -> "RetryPolicy":
+        """复制一份策略并覆盖部分参数"""
+        options = dict(
+            max_attempts=self.max_attempts,
+            base_delay=self.base_delay,
+            max_delay=self.max_delay,
+            deadline=self.deadline,
+            retry_statuses=self.retry_statuses,
+            max_wait=self.max_wait,
+        )
+        options.update(kwargs)
+        return RetryPolicy(**options)
+
+    def backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """第 attempt 次(从 0 开始)失败后的等待时间"""
+        if retry_after is not None:
+            return min(self.max_delay, max(0.0, retry_after))
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def should_retry_status(self, status_code: int) -> bool:
+        return status_code in self.retry_statuses
+
+
+class Retrier(object):
+    """所有 API 接口共用的带重试请求入口
+
+    按接口名(Urls 中的属性名, 如 USER_POST)选择重试策略, 并统计每个接口的
+    调用次数和实际请求次数, 用来观察重试放大倍数(attempts / calls)。
+    """
+
+    def __init__(self, default: Optional[RetryPolicy] = None):
+        self.default = default or RetryPolicy()
+        # 接口名 -> RetryPolicy
+        self.overrides: Dict[str, RetryPolicy] = {}
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    def policy(self, endpoint: str) -> RetryPolicy:
+        return self.overrides.get(endpoint, self.default)
+
+    def configure(self, endpoint: Optional[str] = None, **kwargs) -> None:
+        """修改默认策略(endpoint 为空)或某个接口的策略"""
+        if endpoint is None or endpoint == "default":
+            self.default = self.default.replace(**kwargs)
+        else:
+            self.overrides[endpoint] = self.policy(endpoint).replace(**kwargs)
+
+    def load(self, config: Optional[dict]) -> None:
+        """从配置加载策略, 格式: {default: {...}, USER_POST: {...}}"""
+        if not config:
+            return
+        # 先处理默认策略, 接口覆盖在默认策略的基础上修改
+        if config.get("default"):
+            self.configure(None, **config["default"])
+        for endpoint, options in config.items():
+            if endpoint != "default" and options:
+                self.configure(endpoint, **options)
+
+    def _count(self, endpoint: str, key: str) -> None:
+        with self._lock:
+            stats = self._stats.setdefault(endpoint, {"calls": 0, "attempts": 0, "retries": 0, "failures": 0})
+            stats[key] += 1
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """每个接口的调用统计, amplification 为平均每次调用发出的请求数"""
+        with self._lock:
+            result = {}
+            for endpoint, stats in self._stats.items():
+                item = dict(stats)
+                item["amplification"] = round(stats["attempts"] / stats["calls"], 2) if stats["calls"] else 0
+                result[endpoint] = item
+            return result
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self._stats.clear()
+
+    def request_json(self, endpoint: str, url: Union[str, Callable[[], str]], headers: Optional[dict] = None,
+                     accept: Optional[Callable[[dict], bool]] = None,
+                     policy: Optional[RetryPolicy] = None) -> Optional[dict]:
+        """GET 请求 JSON 接口, 按策略重试
+
+        Args:
+            endpoint: 接口名, 用于选择策略和统计
+            url: 请求地址; 传入函数时每次尝试都重新生成(重新计算 X-Bogus)
+            headers: 请求头
+            accept: 判断返回数据是否可用, 返回 False 时重试
+            policy: 本次调用使用的策略, 默认按 endpoint 选择
+        Returns:
+            解析后的 JSON, 重试预算用完或遇到不可重试的错误时返回 None
+        """
+        from apiproxy.common import session, ratelimiter, cookiepool
+        from apiproxy.common.ratelimit import RateLimitTimeout
+
+        policy = policy or self.policy(endpoint)
+        start = time.time()
+        # 等待限速令牌的时间, 不计入 deadline
+        waited = 0.0
+        self._count(endpoint, "calls")
+
+        for attempt in range(policy.max_attempts):
+            self._count(endpoint, "attempts")
+            retry_after = None
+            request_url = url() if callable(url) else url
+            # 配置了 Cookie 池时每次尝试租用一组身份, 接口限速按身份分开计算
+            credential = cookiepool.acquire()
+            limit_key = endpoint if credential is None else f"{endpoint}@{credential.name}"
+            try:
+                acquired = time.time()
+                ratelimiter.acquire(limit_key, request_url, max_wait=policy.max_wait)
+                waited += time.time() - acquired
+                # 每次尝试只用剩下的预算, 一次卡住的请求不会超出 deadline
+                timeout = max(0.1, policy.deadline - (time.time() - start - waited))
+                res = session.get(request_url, headers=cookiepool.apply(headers, credential), timeout=timeout)
+
+                if res.status_code >= 400:
+                    if res.status_code == 429:
+                        ratelimiter.feedback(limit_key, request_url, throttled=True)
+                    if res.status_code == 429 or res.status_code >= 500:
+                        cookiepool.report(credential, ok=False)
+                    if not policy.should_retry_status(res.status_code):
+                        logger.warning(f"[{endpoint}] HTTP {res.status_code}, 不重试")
+                        break
+                    retry_after = self._retry_after(res)
+                    raise RetryableError(f"HTTP {res.status_code}")
+
+                if not res.content:
+                    ratelimiter.feedback(limit_key, request_url, throttled=True)
+                    cookiepool.report(credential, ok=False)
+                    raise RetryableError("空响应")
+
+                datadict = json.loads(res.text)
+                if not datadict or not isinstance(datadict, dict):
+                    ratelimiter.feedback(limit_key, request_url, throttled=True)
+                    cookiepool.report(credential, ok=False)
+                    raise RetryableError("空数据")
+                token_expired = self.is_token_expired(datadict)
+                ratelimiter.feedback(limit_key, request_url, throttled=token_expired)
+                cookiepool.report(credential, ok=not token_expired, token_expired=token_expired)
+                # 只有 status_code 的返回说明 token 过期或被风控; 使用 Cookie 池时换一组身份重试,
+                # 否则由调用方提示, 不重试
+                if token_expired and credential is not None:
+                    raise RetryableError(f"[{credential.name}] token 过期")
+                if accept is not None and not accept(datadict):
+                    raise RetryableError(f"status_code={datadict.get('status_code')}")
+                return datadict
+
+            except (RetryableError, RateLimitTimeout, requests.RequestException, ValueError) as e:
+                delay = policy.backoff(attempt, retry_after)
+                elapsed = time.time() - start - waited
+                if attempt + 1 >= policy.max_attempts or elapsed + delay > policy.deadline:
+                    logger.warning(f"[{endpoint}] 请求失败: {str(e)}, 已尝试 {attempt + 1} 次, 耗时 {elapsed:.1f}s")
+                    break
+                logger.debug(f"[{endpoint}] 请求失败: {str(e)}, {delay:.2f}s 后重试")
+                self._count(endpoint, "retries")
+                time.sleep(delay)
+            finally:
+                cookiepool.release(credential)
+
+        self._count(endpoint, "failures")
+        return None
+
+    @staticmethod
+    def is_token_expired(datadict: dict) -> bool:
+        """与 Douyin._check_token_expired 的判断一致"""
+        return datadict.get("status_code") == 0 and len(datadict) == 1
+
+    @staticmethod
+    def _retry_after(res) -> Optional[float]:
+        try:
+            return float(res.headers.get("Retry-After"))
+        except (TypeError, ValueError):
+            return None
+
+
+if __name__ == "__main__":
+    pass
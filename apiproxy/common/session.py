@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+import threading
+from http.cookiejar import DefaultCookiePolicy
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class HttpSession(object):
+    """进程内共享的 HTTP 连接池
+
+    API 客户端和下载器共用同一个 requests.Session, 每个主机各有一个
+    keep-alive 连接池, 避免每次请求都重新进行 TCP/TLS 握手。
+    连接池由 urllib3 管理, 可以在多个工作线程中同时使用。
+    """
+
+    def __init__(self, pool_connections=16, pool_maxsize=10, timeout=30):
+        # 缓存连接池的主机数量
+        self.pool_connections = pool_connections
+        # 每个主机最多保持的连接数, 一般与下载线程数一致
+        self.pool_maxsize = pool_maxsize
+        # 未指定 timeout 时使用的默认超时
+        self.timeout = timeout
+        self._session = None
+        self._lock = threading.Lock()
+
+    @property
+    def session(self) -> requests.Session:
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    self._session = self._create_session()
+        return self._session
+
+    def _create_session(self) -> requests.Session:
+        session = requests.Session()
+        # 不保存服务器下发的 cookie, 与直接调用 requests.get 的行为一致,
+        # Cookie 统一由请求头 douyin_headers 决定
+        session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+        self._mount_adapters(session)
+        return session
+
+    def _mount_adapters(self, session: requests.Session) -> None:
+        for prefix in ("https://", "http://"):
+            session.mount(prefix, HTTPAdapter(pool_connections=self.pool_connections,
+                                              pool_maxsize=self.pool_maxsize))
+
+    def configure(self, pool_maxsize=None, pool_connections=None, timeout=None) -> None:
+        """根据下载并发数调整连接池大小"""
+        with self._lock:
+            changed = False
+            if pool_maxsize is not None and pool_maxsize != self.pool_maxsize:
+                self.pool_maxsize = max(1, int(pool_maxsize))
+                changed = True
+            if pool_connections is not None and pool_connections != self.pool_connections:
+                self.pool_connections = max(1, int(pool_connections))
+                changed = True
+            if timeout is not None:
+                self.timeout = timeout
+            # 已创建的会话直接换上新的连接池, 旧连接池中的连接由 GC 关闭
+            if changed and self._session is not None:
+                self._mount_adapters(self._session)
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        kwargs.setdefault("timeout", self.timeout)
+        return self.session.request(method, url, **kwargs)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def head(self, url: str, **kwargs) -> requests.Response:
+        kwargs.setdefault("allow_redirects", False)
+        return self.request("HEAD", url, **kwargs)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+
+
+if __name__ == "__main__":
+    pass
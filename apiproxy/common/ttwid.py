@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+import os
+import json
+import time
+import logging
+import tempfile
+import threading
+from typing import Callable, Optional
+
+from .utils import Utils
+
+logger = logging.getLogger("douyin_downloader")
+
+
+class TtwidCache(object):
+    """ttwid 的延迟获取和磁盘缓存
+
+    - import 时不访问网络, 第一次使用时才获取
+    - 获取结果和时间保存在临时目录下的 JSON 文件中, 之后的运行和其它进程在 max_age 内直接使用
+    - 超过 refresh_after 后继续使用当前的值, 同时在后台线程中刷新
+    - 没有可用的值时同步请求一次(有超时), 失败后 retry_after 秒内不再同步请求, 返回空字符串
+    """
+
+    def __init__(self, path: Optional[str] = None, max_age=7 * 86400, refresh_after=86400, timeout=5.0,
+                 retry_after=60.0, fetch: Optional[Callable[[float], Optional[str]]] = None):
+        self.path = path or os.path.join(tempfile.gettempdir(), "douyin_downloader_ttwid.json")
+        self.max_age = float(max_age)
+        self.refresh_after = float(refresh_after)
+        self.timeout = float(timeout)
+        self.retry_after = float(retry_after)
+        # fetch(timeout) -> ttwid, 默认请求 ttwid.bytedance.com
+        self._fetch = fetch or (lambda timeout: Utils().getttwid(timeout=timeout))
+        self._lock = threading.Lock()
+        self._value = ""
+        self._fetched_at = 0.0
+        self._loaded = False
+        self._refreshing = False
+        # 同步获取失败后, 在这个时间之前不再同步请求
+        self._retry_at = 0.0
+
+    def _load(self) -> None:
+        """从磁盘读取缓存, 只在第一次使用时读取"""
+        self._loaded = True
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("ttwid"):
+                self._value = str(data["ttwid"])
+                self._fetched_at = float(data.get("fetched_at", 0))
+        except (OSError, ValueError, AttributeError):
+            pass
+
+    def _save(self) -> None:
+        # 先写临时文件再替换, 其它进程不会读到写了一半的文件
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"ttwid": self._value, "fetched_at": self._fetched_at}, f)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            logger.warning(f"保存 ttwid 缓存失败: {self.path}, 错误: {str(e)}")
+
+    def _update(self) -> bool:
+        """请求新的 ttwid 并保存, 返回是否成功"""
+        try:
+            value = self._fetch(self.timeout)
+        except Exception as e:
+            logger.warning(f"获取 ttwid 失败: {str(e)}")
+            value = None
+        with self._lock:
+            if not value:
+                self._retry_at = time.time() + self.retry_after
+                return False
+            self._value = value
+            self._fetched_at = time.time()
+            self._save()
+            return True
+
+    def _refresh_in_background(self) -> None:
+        """在调用方持有锁时调用"""
+        if self._refreshing or time.time() < self._retry_at:
+            return
+        self._refreshing = True
+
+        def refresh():
+            try:
+                self._update()
+            finally:
+                self._refreshing = False
+
+        threading.Thread(target=refresh, name="douyin-ttwid-refresh", daemon=True).start()
+
+    def get(self) -> str:
+        """返回 ttwid, 获取失败且没有缓存时为空字符串"""
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            age = time.time() - self._fetched_at
+            if self._value and age < self.max_age:
+                if age >= self.refresh_after:
+                    self._refresh_in_background()
+                return self._value
+            if time.time() < self._retry_at:
+                # 刚刚失败过, 有旧值就先用旧值
+                return self._value
+
+        # 没有可用的值: 同步请求一次, 失败时退回到过期的旧值
+        self._update()
+        with self._lock:
+            return self._value
+
+
+if __name__ == "__main__":
+    pass
@@ -12,11 +12,13 @@ import base64
 import time
 
 import apiproxy
+from .xbogus import XBogusSigner
 
 
 class Utils(object):
     def __init__(self):
-        pass
+        # UA -> 签名器, 通常只有 apiproxy.ua 一个
+        self._signers = {}
 
     def replaceStr(self, filenamestr: str):
         """
@@ -62,20 +64,31 @@ class Utils(object):
         return random_str
 
     # https://www.52pojie.cn/thread-1589242-1-1.html
-    def getttwid(self):
+    def getttwid(self, timeout=None):
         url = 'https://ttwid.bytedance.com/ttwid/union/register/'
         data = '{"region":"cn","aid":1768,"needFid":false,"service":"www.ixigua.com","migrate_info":{"ticket":"","source":"node"},"cbUrlProtocol":"https","union":true}'
-        res = requests.post(url=url, data=data)
+        res = requests.post(url=url, data=data, timeout=timeout)
 
         for i, j in res.cookies.items():
             return j
 
+    def signer(self, ua=apiproxy.ua) -> XBogusSigner:
+        """获取 UA 对应的签名器, 第一次使用时创建"""
+        signer = self._signers.get(ua)
+        if signer is None:
+            signer = self._signers.setdefault(ua, XBogusSigner(ua))
+        return signer
+
     def getXbogus(self, payload, form='', ua=apiproxy.ua):
-        xbogus = self.get_xbogus(payload, ua, form)
+        xbogus = self.signer(ua).sign(payload, form)
         params = payload + "&X-Bogus=" + xbogus
         return params
 
     def get_xbogus(self, payload, ua, form):
+        """原始的逐字符实现, 每次都重新计算 UA 盐值和两轮 RC4
+
+        请求使用 getXbogus(XBogusSigner), 这里保留作为对照, 见 test/benchmark_xbogus.py
+        """
         short_str = "Dkdpgh4ZKsQB80/Mfvw36XI1R25-WUAlEi7NLboqYTOPuzmFjJnryx9HVGcaStCe="
         arr2 = self.get_arr2(payload, ua, form)
 
@@ -2,11 +2,19 @@
 # -*- coding: utf-8 -*-
 
 import apiproxy
-from apiproxy.common import utils
+from apiproxy.common import utils, ttwid
+from apiproxy.common.headers import LazyHeaders
 
-douyin_headers = {
+# msToken 在进程内固定, ttwid 在第一次发送请求时才获取(见 TtwidCache), import 时不访问网络
+_msToken = utils.generate_random_str(107)
+
+
+def _cookie():
+    return f"msToken={_msToken}; ttwid={ttwid.get()}; odin_tt=324fb4ea4a89c0c05827e18a1ed9cf9bf8a17f7705fcc793fec935b637867e2a5a9b8168c885554d029919117a18ba69; passport_csrf_token=f61602fc63757ae0e4fd9d6bdcee4810;"
+
+
+douyin_headers = LazyHeaders({
     'User-Agent': apiproxy.ua,
     'referer': 'https://www.douyin.com/',
     'accept-encoding': None,
-    'Cookie': f"msToken={utils.generate_random_str(107)}; ttwid={utils.getttwid()}; odin_tt=324fb4ea4a89c0c05827e18a1ed9cf9bf8a17f7705fcc793fec935b637867e2a5a9b8168c885554d029919117a18ba69; passport_csrf_token=f61602fc63757ae0e4fd9d6bdcee4810;"
-}
+}, Cookie=_cookie)
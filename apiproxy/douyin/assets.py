@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+import os
+import shutil
+import sqlite3
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+
+logger = logging.getLogger("douyin_downloader")
+
+# 下载目录中资源库的默认目录名, 文件列表中不显示
+ASSET_DIR = ".assets"
+
+
+class AssetStore(object):
+    """重复资源(头像、音乐、封面)的内容寻址存储
+
+    同一个作者的头像、同一首热门音乐会出现在很多作品中。每个文件按内容的 SHA-256
+    只保存一份(<root>/objects/ab/abcd....jpeg), 作品目录中的文件是指向它的硬链接;
+    同时按接口中的 uri 记录对应的内容, 之后遇到相同 uri 的资源直接链接, 不再访问网络。
+    不能创建硬链接(跨文件系统等)时改用符号链接, 都不行时复制。
+
+    索引保存在 <root>/index.db, 可以在多个线程中使用。
+    """
+
+    # 同一个 uri 的下载互斥, 按 uri 的哈希分到固定数量的锁上
+    LOCKS = 64
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self.objects = self.root / "objects"
+        self.objects.mkdir(parents=True, exist_ok=True)
+
+        self.conn = sqlite3.connect(str(self.root / "index.db"), isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL;")
+        self.conn.execute("PRAGMA synchronous=NORMAL;")
+        self.conn.execute("create table if not exists t_asset("
+                          "uri text primary key, digest text not null, suffix text not null, size integer not null);")
+        self._lock = threading.Lock()
+        self._uri_locks = [threading.Lock() for _ in range(self.LOCKS)]
+        # 复用(没有访问网络)、新下载、下载后发现内容重复的文件数和节省的字节数
+        self._stats = {"reused": 0, "stored": 0, "deduplicated": 0, "saved_bytes": 0}
+
+    def uri_lock(self, uri: str) -> threading.Lock:
+        """同一个 uri 同时只下载一次, 其它线程等待后直接复用"""
+        return self._uri_locks[hash(uri) % self.LOCKS]
+
+    def object_path(self, digest: str, suffix: str) -> Path:
+        return self.objects / digest[:2] / f"{digest}{suffix}"
+
+    def lookup(self, uri: str) -> Optional[Path]:
+        """uri 对应的已保存文件, 没有记录或文件已被删除时返回 None"""
+        if not uri:
+            return None
+        with self._lock:
+            row = self.conn.execute("select digest, suffix, size from t_asset where uri=?;", (uri,)).fetchone()
+        if row is None:
+            return None
+        path = self.object_path(row[0], row[1])
+        try:
+            if path.stat().st_size == row[2]:
+                return path
+        except OSError:
+            pass
+        return None
+
+    def place(self, uri: str, target: Path) -> bool:
+        """把 uri 对应的已保存文件链接到 target, 没有记录时返回 False"""
+        source = self.lookup(uri)
+        if source is None:
+            return False
+        try:
+            self._link(source, Path(target))
+        except OSError as e:
+            logger.warning(f"链接资源失败: {target}, 错误: {str(e)}")
+            return False
+        with self._lock:
+            self._stats["reused"] += 1
+            self._stats["saved_bytes"] += source.stat().st_size
+        return True
+
+    def add(self, uri: Optional[str], path: Path) -> None:
+        """登记刚下载完成的文件
+
+        内容已经保存过时把 path 换成指向已有文件的链接, 否则把 path 加入存储
+        """
+        path = Path(path)
+        digest = self._digest(path)
+        size = path.stat().st_size
+        obj = self.object_path(digest, path.suffix)
+        try:
+            if obj.exists():
+                self._link(obj, path)
+                with self._lock:
+                    self._stats["deduplicated"] += 1
+                    self._stats["saved_bytes"] += size
+            else:
+                obj.parent.mkdir(exist_ok=True)
+                self._store(path, obj)
+                with self._lock:
+                    self._stats["stored"] += 1
+        except OSError as e:
+            logger.warning(f"保存资源失败: {path}, 错误: {str(e)}")
+            return
+        if uri:
+            with self._lock:
+                self.conn.execute("insert or replace into t_asset(uri, digest, suffix, size) values(?, ?, ?, ?);",
+                                  (uri, digest, path.suffix, size))
+
+    @staticmethod
+    def _digest(path: Path) -> str:
+        sha = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                sha.update(chunk)
+        return sha.hexdigest()
+
+    @staticmethod
+    def _store(path: Path, obj: Path) -> None:
+        """把下载的文件加入存储, 存储中的文件不能是指向作品目录的链接"""
+        tmp = obj.with_name(f"{obj.name}.{threading.get_ident()}.tmp")
+        try:
+            os.link(path, tmp)
+        except OSError:
+            shutil.copyfile(path, tmp)
+        os.replace(tmp, obj)
+
+    @staticmethod
+    def _link(source: Path, target: Path) -> None:
+        """让 target 指向 source: 硬链接, 不行时符号链接, 再不行时复制; 先建临时文件再替换"""
+        tmp = target.with_name(f"{target.name}.{threading.get_ident()}.tmp")
+        try:
+            os.link(source, tmp)
+        except OSError:
+            try:
+                os.symlink(os.path.abspath(source), tmp)
+            except OSError:
+                shutil.copyfile(source, tmp)
+        os.replace(tmp, target)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._stats)
+
+    def close(self) -> None:
+        with self._lock:
+            self.conn.close()
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,248 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+import asyncio
+import time
+import random
+import logging
+from pathlib import Path
+from typing import AsyncIterator, Iterable, List, Optional, Union
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+from apiproxy.common import mirrors, bandwidth
+from apiproxy.douyin import douyin_headers
+from apiproxy.douyin.assets import AssetStore
+from apiproxy.douyin.download import Download, _JobTracker
+from apiproxy.douyin.partial import PartialDownload, is_complete
+
+logger = logging.getLogger("douyin_downloader")
+
+
+class AsyncDownload(Download):
+    """基于 asyncio + aiohttp 的下载引擎
+
+    与 Download 使用相同的 userDownload(awemeList, savePath) / pageDownload 接口。
+    大量小文件(图集、头像、封面)的下载受单次请求延迟限制而不是带宽,
+    协程可以同时挂起成百上千个请求, 不需要为每个连接占用一个线程。
+    """
+
+    def __init__(self, thread=5, music=True, cover=True, avatar=True, resjson=True, folderstyle=True,
+                 prefetch=2, segments=4, segment_threshold=20, mirror_timeout=5, mirror_race=0, limit_per_host=8,
+                 quality=None, asset_dir=None, headless=False):
+        if aiohttp is None:
+            raise ImportError("aiohttp 未安装，异步下载功能不可用")
+        super().__init__(thread=thread, music=music, cover=cover, avatar=avatar,
+                         resjson=resjson, folderstyle=folderstyle, prefetch=prefetch,
+                         segments=segments, segment_threshold=segment_threshold,
+                         mirror_timeout=mirror_timeout, mirror_race=mirror_race, quality=quality,
+                         asset_dir=asset_dir, headless=headless)
+        # 单个主机同时打开的连接数, 0 表示不限制
+        self.limit_per_host = max(0, int(limit_per_host or 0))
+        # 收到的数据合并到这么多字节后在线程中写入一次
+        self.write_buffer = 256 * 1024
+
+    def _run_jobs(self, awemeList: Iterable[dict], save_path: Path, tracker: _JobTracker) -> None:
+        """在新的事件循环中执行所有媒体任务, 结果记录在 tracker 中"""
+        asyncio.run(self._run_jobs_async(awemeList, save_path, tracker))
+
+    async def _iter_awemes(self, awemeList: Iterable[dict]) -> AsyncIterator[dict]:
+        """逐个取出作品; 生成器在线程中取值, 翻页请求不阻塞正在进行的下载"""
+        if isinstance(awemeList, (list, tuple)):
+            for aweme in awemeList:
+                yield aweme
+            return
+        it = iter(awemeList)
+        end = object()
+        while True:
+            aweme = await asyncio.to_thread(next, it, end)
+            if aweme is end:
+                return
+            yield aweme
+
+    async def _run_jobs_async(self, awemeList: Iterable[dict], save_path: Path, tracker: _JobTracker) -> None:
+        # aiohttp 不接受值为 None 的请求头
+        headers = {k: v for k, v in douyin_headers.items() if v is not None}
+        connector = aiohttp.TCPConnector(limit=self.thread, limit_per_host=self.limit_per_host)
+        timeout = aiohttp.ClientTimeout(total=None, sock_connect=self.timeout, sock_read=self.timeout)
+        # 限制同时进行的任务数, 避免一次打开过多文件
+        semaphore = asyncio.Semaphore(self.thread)
+        # 同一个资源 uri 同时只下载一次, 与 AssetStore.uri_lock 相同按哈希分到固定数量的锁上
+        self._asset_locks = [asyncio.Lock() for _ in range(AssetStore.LOCKS)]
+
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout, headers=headers) as client:
+            async def run(index, job):
+                async with semaphore:
+                    try:
+                        ok = await self._run_media_job_async(client, *job)
+                    except Exception as e:
+                        logger.error(f"下载任务异常: {job[2]}, 错误: {str(e)}")
+                        ok = False
+                tracker.job_done(index, job, ok)
+
+            pending = set()
+            index = 0
+            async for aweme in self._iter_awemes(awemeList):
+                # 准备目录和任务在事件循环中进行, tracker 只在这一个线程中使用
+                for work, jobs in self._iter_jobs((aweme,), save_path, tracker, start=index):
+                    pending.update(asyncio.ensure_future(run(work, job)) for job in jobs)
+                index += 1
+                # 未完成的任务过多时先等待, 不再继续取作品
+                while len(pending) > self.max_pending:
+                    _, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            if pending:
+                await asyncio.gather(*pending)
+
+    async def _run_media_job_async(self, client, urls: List[str], path: Path, desc: str, required: bool,
+                                   asset: Optional[str] = None) -> bool:
+        """异步执行单个媒体下载任务"""
+        if await asyncio.to_thread(is_complete, path):
+            self.console.print(f"[cyan]⏭️  跳过已存在: {desc}[/]")
+            return True
+
+        if asset and self.assets is not None:
+            ok = await self._download_asset_async(client, urls, path, desc, asset)
+        else:
+            ok = await self.download_with_resume_async(client, urls, path, desc)
+        if ok:
+            self.board.file_saved(path)
+        if not ok and not required:
+            self.console.print(f"[yellow]⚠️  下载失败: {desc}[/]")
+        return ok
+
+    async def _download_asset_async(self, client, urls: List[str], path: Path, desc: str, asset: str) -> bool:
+        """下载资源库中的资源, 相同 uri 只下载一次; 查询、链接和计算哈希在线程中进行"""
+        async with self._asset_locks[hash(asset) % AssetStore.LOCKS]:
+            if await asyncio.to_thread(self.assets.place, asset, path):
+                self.console.print(f"[cyan]🔗 复用已下载: {desc}[/]")
+                return True
+            ok = await self.download_with_resume_async(client, urls, path, desc)
+            if ok:
+                await asyncio.to_thread(self.assets.add, asset, path)
+            return ok
+
+    async def download_with_resume_async(self, client, url: Union[str, List[str]], filepath: Path, desc: str,
+                                         segmented: bool = True) -> bool:
+        """支持断点续传的异步下载, 按块写入 <文件名>.part, 核对大小后改名
+
+        镜像地址的选择和切换与 Download.download_with_resume 相同;
+        大文件的分段下载使用 Download 的多线程实现, 在线程中执行, 不阻塞事件循环;
+        读写文件和 .part.json 记录也在线程中进行, 磁盘较慢时不影响其它连接
+        """
+        # 镜像测速使用线程中的同步请求
+        urls = await asyncio.to_thread(self._mirror_order, url) if self.race_bytes > 0 else self._mirror_order(url)
+        if not urls:
+            return False
+        segmented = segmented and self.segmented.segments > 1
+        partial = await asyncio.to_thread(PartialDownload.load, filepath)
+        if partial is not None and partial.segmented:
+            ok = await asyncio.to_thread(self._download_segmented, urls[0], desc, partial) if segmented else None
+            if ok is not None:
+                return ok
+            await asyncio.to_thread(partial.discard)
+            partial, segmented = None, False
+
+        segmented_state = None
+        attempts = self._mirror_attempts(urls)
+        for attempt in range(attempts):
+            progress = None
+            url = urls[attempt % len(urls)]
+            # 每次重试都重新计算已下载的大小, 上一次中断的部分不会重复下载
+            offset = await asyncio.to_thread(partial.part_size) if partial is not None else 0
+            headers = self._range_headers(partial, offset, segmented)
+            timeout = aiohttp.ClientTimeout(total=None, sock_connect=self.timeout,
+                                            sock_read=self._mirror_timeout(urls, attempt))
+            start, latency, written = time.time(), None, 0
+
+            try:
+                async with client.get(url, headers=headers, timeout=timeout) as response:
+                    latency = time.time() - start
+                    # 已下载的部分可能就是完整文件
+                    if response.status == 416 and offset > 0:
+                        if await asyncio.to_thread(partial.finish):
+                            return True
+                        await asyncio.to_thread(partial.discard)
+                        raise Exception("HTTP 416")
+                    if response.status not in (200, 206):
+                        raise Exception(f"HTTP {response.status}")
+
+                    # 大文件: 关闭这个连接, 改为分段下载
+                    if segmented:
+                        size = self._segmented_size(response.status, response.headers.get('content-range'), offset)
+                        if size is not None:
+                            mirrors.record(url, True, latency)
+                            segmented_state = self.segmented.start(filepath, url, size, response.headers)
+                            break
+
+                    # 服务器忽略 Range 或文件已变化返回 200 时, 从头重新写入
+                    partial, offset = await asyncio.to_thread(self._open_partial, url, filepath, partial, offset,
+                                                              response.status, response.headers)
+
+                    progress = self.board.start_file(desc, partial.size, offset)
+                    written = await self._write_body(response, partial.part, offset > 0, progress)
+
+                elapsed = time.time() - start - latency
+                # 只有完整的传输记为成功
+                if not await asyncio.to_thread(partial.finish):
+                    raise Exception(f"文件不完整: {partial.part_size()}/{partial.size}")
+                mirrors.record(url, True, latency, written, elapsed)
+                self.board.finish_file(progress)
+                return True
+
+            except Exception as e:
+                if progress is not None:
+                    self.board.finish_file(progress)
+                mirrors.record(url, False, latency)
+                logger.warning(f"下载失败 (尝试 {attempt + 1}/{attempts}, {mirrors.host(url)}): {str(e)}")
+                if attempt == attempts - 1:
+                    return False
+                # 指数退避, 加入随机抖动避免大量协程同时重试; 第一轮直接换下一个镜像
+                delay = self._mirror_backoff(urls, attempt)
+                if delay:
+                    await asyncio.sleep(delay + random.uniform(0, 1))
+
+        if segmented_state is not None:
+            ok = await asyncio.to_thread(self._download_segmented, segmented_state.url, desc, segmented_state)
+            if ok is None:
+                return await self.download_with_resume_async(client, urls, filepath, desc, segmented=False)
+            return ok
+        return False
+
+    async def _write_body(self, response, path: Path, append: bool, progress) -> int:
+        """把响应内容写入 path, 返回收到的字节数
+
+        打开、写入和关闭文件都在线程中进行, 小块数据合并到 write_buffer 字节后再写入
+        """
+        f = await asyncio.to_thread(open, path, 'ab' if append else 'wb')
+        buffered, pending, written = [], 0, 0
+        try:
+            async for chunk in response.content.iter_chunked(self.chunk_size):
+                buffered.append(chunk)
+                pending += len(chunk)
+                progress.advance(len(chunk))
+                await bandwidth.consume_async(len(chunk), self.bandwidth)
+                if pending >= self.write_buffer:
+                    data, buffered = b"".join(buffered), []
+                    written += pending
+                    pending = 0
+                    await asyncio.to_thread(f.write, data)
+        finally:
+            # 中断时也写入已收到的数据, 下一次尝试从这里继续
+            await asyncio.to_thread(self._close_part, f, b"".join(buffered))
+        return written + pending
+
+    @staticmethod
+    def _close_part(f, data: bytes) -> None:
+        try:
+            if data:
+                f.write(data)
+        finally:
+            f.close()
+
+
+if __name__ == "__main__":
+    pass
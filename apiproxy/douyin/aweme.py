@@ -0,0 +1,355 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+import time
+import asyncio
+from typing import AsyncIterator, Iterator, List, Optional, Tuple
+
+from apiproxy.douyin.quality import bit_rate_ladder
+
+# 图片、封面等通用结构
+_IMAGE = {"height": "", "uri": "", "url_list": [], "width": ""}
+
+# 图集中每张图片的默认字段, 接口返回的其它字段追加在后面
+_PIC = {"height": "", "mask_url_list": "", "uri": "", "url_list": [], "width": ""}
+
+
+def _first(raw):
+    """原来的json是[{}] 而我们的是 {}"""
+    return raw[0] if isinstance(raw, list) and raw else None
+
+
+def _avatar(raw, out):
+    """将小头像放大"""
+    thumb = out["avatar_thumb"]
+    try:
+        return {
+            "height": thumb["height"],
+            "uri": thumb["uri"].replace("100x100", "1080x1080"),
+            "url_list": [url.replace("100x100", "1080x1080") for url in thumb["url_list"]],
+            "width": thumb["width"],
+        }
+    except (AttributeError, TypeError):
+        return {"height": "", "uri": "", "url_list": [], "width": ""}
+
+
+def _play_addr(raw, out):
+    """根据 bit_rate 获取最高清晰度的视频地址"""
+    addr = {"uri": "", "url_list": []}
+    try:
+        play_addr = raw["bit_rate"][0]["play_addr"]
+        addr["uri"] = play_addr["uri"]
+        addr["url_list"] = list(play_addr["url_list"])
+    except (KeyError, IndexError, TypeError):
+        pass
+    return addr
+
+
+def _bit_rate(raw, out):
+    """保留所有清晰度, 下载时由 QualityPolicy 选择"""
+    return bit_rate_ladder(raw)
+
+
+# 作者信息
+_AUTHOR = {
+    "avatar_thumb": _IMAGE,
+    # 依赖 avatar_thumb, 必须排在它后面
+    "avatar": _avatar,
+    "cover_url": (_first, _IMAGE),
+    # 喜欢的作品数
+    "favoriting_count": "",
+    # 粉丝数
+    "follower_count": "",
+    # 关注数
+    "following_count": "",
+    # 昵称
+    "nickname": "",
+    # 是否允许下载
+    "prevent_download": "",
+    # 用户 url id
+    "sec_uid": "",
+    # 是否私密账号
+    "secret": "",
+    # 短id
+    "short_id": "",
+    # 签名
+    "signature": "",
+    # 总获赞数
+    "total_favorited": "",
+    # 用户id
+    "uid": "",
+    # 用户自定义唯一id 抖音号
+    "unique_id": "",
+    # 年龄
+    "user_age": "",
+}
+
+# 音乐信息
+_MUSIC = {
+    "cover_hd": _IMAGE,
+    "cover_large": _IMAGE,
+    "cover_medium": _IMAGE,
+    "cover_thumb": _IMAGE,
+    # 音乐作者抖音号
+    "owner_handle": "",
+    # 音乐作者id
+    "owner_id": "",
+    # 音乐作者昵称
+    "owner_nickname": "",
+    "play_url": {"height": "", "uri": "", "url_key": "", "url_list": [], "width": ""},
+    # 音乐名字
+    "title": "",
+}
+
+# 视频信息
+_VIDEO = {
+    "play_addr": _play_addr,
+    # 所有清晰度(分辨率、码率、编码、大小和地址)
+    "bit_rate": _bit_rate,
+    "cover_original_scale": _IMAGE,
+    "dynamic_cover": _IMAGE,
+    "origin_cover": _IMAGE,
+    "cover": _IMAGE,
+}
+
+# mix信息
+_MIX_INFO = {
+    # 与原来的 Result.dataConvert 一致: 接口中的 cover_url 是 {} 而不是 [{}], 结果为空
+    "cover_url": (_first, _IMAGE),
+    "ids": "",
+    "is_serial_mix": "",
+    "mix_id": "",
+    "mix_name": "",
+    "mix_pic_type": "",
+    "mix_type": "",
+    "statis": {"current_episode": "", "updated_to_episode": ""},
+}
+
+# 作品信息统计
+_STATISTICS = {
+    "admire_count": "",
+    "collect_count": "",
+    "comment_count": "",
+    "digg_count": "",
+    "play_count": "",
+    "share_count": "",
+}
+
+
+class _Fields(object):
+    """预编译的字段映射
+
+    模板中每个键对应一种处理方式:
+    - "" 或 []: 直接取接口中的值, 没有时使用空值
+    - dict: 子结构, 递归转换
+    - 函数 fn(raw, out): 由函数计算, 可以使用已经转换好的字段
+    - (fn, 子结构): 先用 fn 从接口值中取出子结构的数据, 再递归转换
+    """
+    __slots__ = ("steps",)
+
+    # 处理方式
+    VALUE, EMPTY_LIST, NESTED, COMPUTED, PICKED = range(5)
+
+    def __init__(self, template: dict):
+        self.steps: List[Tuple[str, int, object]] = []
+        for key, spec in template.items():
+            if isinstance(spec, dict):
+                self.steps.append((key, self.NESTED, _Fields(spec)))
+            elif isinstance(spec, tuple):
+                self.steps.append((key, self.PICKED, (spec[0], _Fields(spec[1]))))
+            elif callable(spec):
+                self.steps.append((key, self.COMPUTED, spec))
+            elif isinstance(spec, list):
+                self.steps.append((key, self.EMPTY_LIST, None))
+            else:
+                self.steps.append((key, self.VALUE, None))
+
+    def convert(self, raw) -> dict:
+        # raw 不是字典(None 或缺失)时所有字段都为空值
+        if not isinstance(raw, dict):
+            raw = {}
+        out = {}
+        for key, kind, arg in self.steps:
+            if kind == self.VALUE:
+                out[key] = raw.get(key, "")
+            elif kind == self.EMPTY_LIST:
+                out[key] = raw[key] if key in raw else []
+            elif kind == self.NESTED:
+                out[key] = arg.convert(raw.get(key))
+            elif kind == self.PICKED:
+                pick, fields = arg
+                out[key] = fields.convert(pick(raw.get(key)))
+            else:
+                out[key] = arg(raw, out)
+        return out
+
+
+_AUTHOR_FIELDS = _Fields(_AUTHOR)
+_MUSIC_FIELDS = _Fields(_MUSIC)
+_VIDEO_FIELDS = _Fields(_VIDEO)
+_MIX_INFO_FIELDS = _Fields(_MIX_INFO)
+_STATISTICS_FIELDS = _Fields(_STATISTICS)
+
+
+class Aweme(object):
+    """精简后的作品数据
+
+    每个作品单独创建, 没有共享的可变状态, 可以在多个线程中同时转换。
+    to_dict() 的结果与原来 Result.dataConvert 生成的 awemeDict 相同,
+    Download 保存的 _result.json 内容不变。
+    """
+    __slots__ = ("create_time", "awemeType", "aweme_id", "author", "desc", "images",
+                 "music", "mix_info", "video", "statistics")
+
+    def __init__(self, create_time="", awemeType="", aweme_id="", author=None, desc="", images=None,
+                 music=None, mix_info=None, video=None, statistics=None):
+        # 作品创建时间
+        self.create_time = create_time
+        # awemeType=0 视频, awemeType=1 图集, awemeType=2 直播
+        self.awemeType = awemeType
+        # 作品 id
+        self.aweme_id = aweme_id
+        # 作者信息
+        self.author = author if author is not None else _AUTHOR_FIELDS.convert(None)
+        # 作品描述
+        self.desc = desc
+        # 图片
+        self.images = images if images is not None else []
+        # 音乐
+        self.music = music if music is not None else _MUSIC_FIELDS.convert(None)
+        # 合集
+        self.mix_info = mix_info if mix_info is not None else _MIX_INFO_FIELDS.convert(None)
+        # 视频
+        self.video = video if video is not None else _VIDEO_FIELDS.convert(None)
+        # 作品信息统计
+        self.statistics = statistics if statistics is not None else _STATISTICS_FIELDS.convert(None)
+
+    @classmethod
+    def from_raw(cls, raw: dict, awemeType: Optional[int] = None) -> "Aweme":
+        """从接口返回的作品数据转换
+
+        Args:
+            raw: 接口中的单个作品(aweme_detail 或 aweme_list 中的一项)
+            awemeType: 0 视频, 1 图集; 为空时根据 images 字段判断
+        """
+        if awemeType is None:
+            awemeType = 1 if raw.get("images") is not None else 0
+
+        try:
+            create_time = time.strftime("%Y-%m-%d %H.%M.%S", time.localtime(raw["create_time"]))
+        except (KeyError, TypeError, ValueError, OverflowError, OSError):
+            create_time = ""
+
+        images = []
+        if awemeType == 1 and isinstance(raw.get("images"), list):
+            for image in raw["images"]:
+                pic = dict(_PIC)
+                pic["url_list"] = []
+                pic.update(image)
+                images.append(pic)
+
+        return cls(
+            create_time=create_time,
+            awemeType=awemeType,
+            aweme_id=raw.get("aweme_id", ""),
+            author=_AUTHOR_FIELDS.convert(raw.get("author")),
+            desc=raw.get("desc", ""),
+            images=images,
+            music=_MUSIC_FIELDS.convert(raw.get("music")),
+            mix_info=_MIX_INFO_FIELDS.convert(raw.get("mix_info")),
+            # 图集不保留视频信息
+            video=_VIDEO_FIELDS.convert(raw.get("video") if awemeType == 0 else None),
+            statistics=_STATISTICS_FIELDS.convert(raw.get("statistics")),
+        )
+
+    def to_dict(self) -> dict:
+        return {
+            "create_time": self.create_time,
+            "awemeType": self.awemeType,
+            "aweme_id": self.aweme_id,
+            "author": self.author,
+            "desc": self.desc,
+            "images": self.images,
+            "music": self.music,
+            "mix_info": self.mix_info,
+            "video": self.video,
+            "statistics": self.statistics,
+        }
+
+
+def convert_aweme(raw: dict, awemeType: Optional[int] = None) -> dict:
+    """把接口中的单个作品转换成下载使用的字典"""
+    return Aweme.from_raw(raw, awemeType).to_dict()
+
+
+class AwemePage(object):
+    """列表接口(主页、喜欢、合集、音乐)返回的一页作品
+
+    cursor 为请求这一页时使用的游标, next_cursor 为下一页的游标。
+    扫描中断后, 把最后一个未处理完的页的 cursor(或已处理完的页的 next_cursor)
+    传给 Douyin.iter* 的 cursor 参数即可从这一页继续。
+    """
+    __slots__ = ("awemes", "cursor", "next_cursor", "has_more")
+
+    def __init__(self, cursor=0, next_cursor=0, has_more=False, awemes=None):
+        # 转换后的作品(已按时间范围、增量记录过滤)
+        self.awemes: List[dict] = awemes if awemes is not None else []
+        self.cursor = cursor
+        self.next_cursor = next_cursor
+        # 接口是否还有下一页
+        self.has_more = has_more
+
+    def __len__(self):
+        return len(self.awemes)
+
+    def __iter__(self):
+        return iter(self.awemes)
+
+
+async def aiter_pages(pages: Iterator[AwemePage]) -> AsyncIterator[AwemePage]:
+    """把 Douyin.iter* 返回的生成器包装成异步迭代器
+
+    每一页的请求在线程池中执行, 不阻塞事件循环中正在进行的下载
+    """
+    end = object()
+    while True:
+        page = await asyncio.to_thread(next, pages, end)
+        if page is end:
+            return
+        yield page
+
+
+def new_live_dict() -> dict:
+    """直播信息, 每次请求单独创建"""
+    return {
+        # awemeType=0 视频, awemeType=1 图集, awemeType=2 直播
+        "awemeType": "",
+        # 是否在播
+        "status": "",
+        # 直播标题
+        "title": "",
+        # 直播cover
+        "cover": "",
+        # 头像
+        "avatar": "",
+        # 观看人数
+        "user_count": "",
+        # 昵称
+        "nickname": "",
+        # sec_uid
+        "sec_uid": "",
+        # 直播间观看状态
+        "display_long": "",
+        # 推流
+        "flv_pull_url": "",
+        # 分区
+        "partition": "",
+        "sub_partition": "",
+        # 最清晰的地址
+        "flv_pull_url0": "",
+    }
+
+
+if __name__ == '__main__':
+    pass
@@ -0,0 +1,511 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+import os
+import json
+import time
+import queue
+import base64
+import sqlite3
+import logging
+import threading
+from pathlib import Path
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+try:
+    # 可选: 监视下载目录中其它程序造成的变化(Linux 上使用 inotify)
+    from watchdog.observers import Observer
+except ImportError:
+    Observer = None
+
+from apiproxy.douyin.assets import ASSET_DIR
+
+logger = logging.getLogger("douyin_downloader")
+
+# 不加入文件列表的目录(缩略图缓存、资源库)和文件类型(作品数据、下载中的临时文件)
+EXCLUDED_DIRS = {"temp", ASSET_DIR}
+EXCLUDED_SUFFIXES = {".json", ".txt", ".log", ".part", ".tmp"}
+
+FILE_TYPES = {
+    "video": {".mp4", ".avi", ".mov", ".mkv", ".flv", ".webm"},
+    "audio": {".mp3", ".wav", ".aac", ".flac", ".m4a"},
+    "image": {".jpg", ".jpeg", ".png", ".gif", ".bmp", ".webp"},
+}
+
+# 排序方式 -> (列, 是否倒序)
+SORTS = {
+    "date-desc": ("mtime", True),
+    "date-asc": ("mtime", False),
+    "name-asc": ("name", False),
+    "name-desc": ("name", True),
+    "size-desc": ("size", True),
+    "size-asc": ("size", False),
+}
+
+
+def file_type(name: str) -> str:
+    suffix = os.path.splitext(name)[1].lower()
+    for kind, suffixes in FILE_TYPES.items():
+        if suffix in suffixes:
+            return kind
+    return "other"
+
+
+def is_listed(relative: str) -> bool:
+    """relative(相对下载目录, / 分隔)是否显示在文件列表中"""
+    parts = relative.split("/")
+    if any(part in EXCLUDED_DIRS for part in parts[:-1]):
+        return False
+    return os.path.splitext(parts[-1])[1].lower() not in EXCLUDED_SUFFIXES
+
+
+def _encode_cursor(value, path: str) -> str:
+    raw = json.dumps([value, path], ensure_ascii=False).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def _decode_cursor(cursor: str) -> Tuple[object, str]:
+    try:
+        value, path = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except Exception:
+        raise ValueError(f"无效的游标: {cursor}")
+    return value, path
+
+
+class FileCatalog(object):
+    """下载目录的文件索引
+
+    文件列表接口不再每次遍历下载目录, 而是查询保存在 <root>/temp/catalog.db 中的索引:
+    路径、大小、修改时间、类型、来源(第一级目录, 即用户/合集/音乐目录)、所在作品目录
+    和缩略图状态。分页使用游标(上一页最后一个文件的排序值和路径), 翻到后面的页也只读取一页的数据。
+
+    sync() 增量更新索引: 每个目录记录修改时间, 目录没有变化时(下载的文件都是先写 .part
+    再改名, 增删文件都会改变目录的修改时间)不再读取其中文件的属性, 只继续检查子目录。
+    同步在单独的连接中进行, 不阻塞查询。
+
+    下载过程中不需要同步: 下载器每保存一个文件调用一次 notify(), 由一个写入线程合并写入;
+    安装了 watchdog 时 watch() 监视下载目录, 其它程序增删的文件也会更新到索引中。
+    文件总数 total 随之增减, 读取时不查询数据库。
+    """
+
+    SCHEMA = (
+        "create table if not exists t_file("
+        "path text primary key, dir text not null, name text not null, source text not null, "
+        "type text not null, size integer not null, mtime real not null, thumb integer not null default 0);",
+        "create table if not exists t_dir(path text primary key, mtime integer not null);",
+        "create index if not exists idx_file_dir on t_file(dir);",
+        "create index if not exists idx_file_mtime on t_file(mtime, path);",
+        "create index if not exists idx_file_name on t_file(name, path);",
+        "create index if not exists idx_file_size on t_file(size, path);",
+        "create index if not exists idx_file_type on t_file(type, mtime, path);",
+        "create index if not exists idx_file_source on t_file(source, mtime, path);",
+    )
+
+    # 同步时每个事务写入的目录数
+    BATCH = 500
+    # 数据库版本(PRAGMA user_version); 1: 缩略图缓存改为以路径和修改时间为键, 图片也有缩略图
+    VERSION = 1
+
+    def __init__(self, root, db_path=None, thumbnail: Optional[Callable[[str, float], bool]] = None):
+        self.root = Path(root).resolve()
+        if db_path is None:
+            db_path = self.root / "temp" / "catalog.db"
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        # 新加入或已变化的视频和图片是否已有缩略图: thumbnail(相对路径, 修改时间)
+        self.thumbnail = thumbnail
+
+        # 同步(写)和查询(读)各用一个连接, WAL 模式下互不阻塞
+        self.conn = sqlite3.connect(str(db_path), isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL;")
+        self.conn.execute("PRAGMA synchronous=NORMAL;")
+        for sql in self.SCHEMA:
+            self.conn.execute(sql)
+        if self.conn.execute("PRAGMA user_version;").fetchone()[0] < self.VERSION:
+            # 旧版本记录的缩略图状态对应旧的缓存文件, 重新生成
+            self.conn.execute("update t_file set thumb=0;")
+            self.conn.execute(f"PRAGMA user_version={self.VERSION};")
+        self.reader = sqlite3.connect(str(db_path), isolation_level=None, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._read_lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        # 至少完成过一次同步
+        self.synced = False
+        self.last_sync: Dict[str, object] = {}
+        # 文件总数, 同步后重新统计, 之后随文件事件增减
+        self.total = self.conn.execute("select count(*) from t_file;").fetchone()[0]
+        # 文件事件: (是否删除, 相对路径), 由写入线程处理
+        self._events = queue.Queue()
+        self._writer: Optional[threading.Thread] = None
+        self._observer = None
+
+    # ---------- 同步 ----------
+
+    @property
+    def syncing(self) -> bool:
+        return self._sync_lock.locked()
+
+    def sync(self, full=False) -> Dict[str, object]:
+        """增量更新索引, full 为 True 时重新读取所有文件的属性
+
+        同一时间只进行一次同步, 返回新增、更新、删除的文件数和检查的目录数
+        """
+        with self._sync_lock:
+            start = time.time()
+            stats = {"added": 0, "updated": 0, "removed": 0, "dirs": 0, "scanned_dirs": 0}
+            with self._lock:
+                known_dirs = dict(self.conn.execute("select path, mtime from t_dir;").fetchall())
+            seen = set()
+            if self.root.exists():
+                self._walk("", known_dirs, seen, stats, full)
+            # 已经不存在的目录
+            gone = [path for path in known_dirs if path not in seen]
+            if gone:
+                with self._lock:
+                    self.conn.execute("BEGIN;")
+                    for path in gone:
+                        stats["removed"] += self.conn.execute("delete from t_file where dir=?;", (path,)).rowcount
+                        self.conn.execute("delete from t_dir where path=?;", (path,))
+                    self.conn.execute("COMMIT;")
+            with self._lock:
+                self.total = self.conn.execute("select count(*) from t_file;").fetchone()[0]
+            stats["dirs"] = len(seen)
+            stats["elapsed"] = round(time.time() - start, 3)
+            self.synced = True
+            self.last_sync = stats
+            logger.debug(f"文件索引同步完成: {stats}")
+            return stats
+
+    def sync_async(self, full=False) -> bool:
+        """在后台线程中同步, 已经在同步时返回 False"""
+        if self.syncing or (self._thread is not None and self._thread.is_alive()):
+            return False
+
+        def run():
+            try:
+                self.sync(full)
+            except Exception as e:
+                logger.error(f"文件索引同步失败: {str(e)}")
+
+        self._thread = threading.Thread(target=run, name="catalog-sync", daemon=True)
+        self._thread.start()
+        return True
+
+    def _walk(self, relative: str, known_dirs: Dict[str, int], seen: set, stats: dict, full: bool) -> None:
+        """检查一个目录, 再依次检查子目录(不用递归, 目录层数不受限制)
+
+        变化的写入按 BATCH 个目录合并到一个事务中
+        """
+        batch = []
+        pending = [relative]
+        while pending:
+            relative = pending.pop()
+            directory = self.root / relative if relative else self.root
+            try:
+                mtime = directory.stat().st_mtime_ns
+                entries = list(os.scandir(directory))
+            except OSError as e:
+                logger.debug(f"读取目录失败: {directory}, 错误: {str(e)}")
+                continue
+            seen.add(relative)
+            files = []
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if entry.name not in EXCLUDED_DIRS:
+                            pending.append(f"{relative}/{entry.name}" if relative else entry.name)
+                    elif entry.is_file():
+                        files.append(entry)
+                except OSError:
+                    continue
+            if not full and known_dirs.get(relative) == mtime:
+                continue
+            stats["scanned_dirs"] += 1
+            batch.append(self._diff_dir(relative, mtime, files, stats))
+            if len(batch) >= self.BATCH:
+                self._write(batch)
+                batch = []
+        self._write(batch)
+
+    def _diff_dir(self, relative: str, mtime: int, entries: List[os.DirEntry], stats: dict) -> tuple:
+        """比较目录中的文件和索引, 返回 (目录, 修改时间, 新增或变化的行, 删除的路径)"""
+        rows = {}
+        for entry in entries:
+            path = f"{relative}/{entry.name}" if relative else entry.name
+            if not is_listed(path):
+                continue
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            rows[path] = (stat.st_size, stat.st_mtime)
+        with self._lock:
+            known = {path: (size, file_mtime) for path, size, file_mtime in
+                     self.conn.execute("select path, size, mtime from t_file where dir=?;", (relative,))}
+        changed = [(path, size, file_mtime) for path, (size, file_mtime) in rows.items()
+                   if known.get(path) != (size, file_mtime)]
+        removed = [path for path in known if path not in rows]
+        stats["added"] += sum(1 for path, _, _ in changed if path not in known)
+        stats["updated"] += sum(1 for path, _, _ in changed if path in known)
+        stats["removed"] += len(removed)
+        return relative, mtime, [self._row(path, size, file_mtime) for path, size, file_mtime in changed], removed
+
+    def _write(self, batch: List[tuple]) -> None:
+        if not batch:
+            return
+        with self._lock:
+            self.conn.execute("BEGIN;")
+            try:
+                for relative, mtime, values, removed in batch:
+                    self.conn.executemany("insert or replace into t_file(path, dir, name, source, type, size, mtime, "
+                                          "thumb) values(?, ?, ?, ?, ?, ?, ?, ?);", values)
+                    self.conn.executemany("delete from t_file where path=?;", [(path,) for path in removed])
+                    self.conn.execute("insert or replace into t_dir(path, mtime) values(?, ?);", (relative, mtime))
+                self.conn.execute("COMMIT;")
+            except BaseException:
+                self.conn.execute("ROLLBACK;")
+                raise
+
+    def _row(self, path: str, size: int, mtime: float) -> tuple:
+        directory, _, name = path.rpartition("/")
+        source = path.split("/", 1)[0] if directory else ""
+        kind = file_type(name)
+        thumb = 0
+        if kind in ("video", "image") and self.thumbnail is not None:
+            try:
+                thumb = int(bool(self.thumbnail(path, mtime)))
+            except Exception:
+                thumb = 0
+        return path, directory, name, source, kind, size, mtime, thumb
+
+    # ---------- 文件事件 ----------
+
+    def _relative(self, path: Union[str, Path]) -> Optional[str]:
+        """下载目录中的相对路径(/ 分隔), 不在下载目录中时返回 None"""
+        path = Path(path)
+        if not path.is_absolute():
+            path = self.root / path
+        try:
+            return path.relative_to(self.root).as_posix()
+        except ValueError:
+            try:
+                return path.resolve().relative_to(self.root).as_posix()
+            except (OSError, ValueError):
+                return None
+
+    def notify(self, path: Union[str, Path], removed=False) -> None:
+        """文件已保存(removed 为 True 时: 已删除), 可以在任何线程中调用, 不等待写入"""
+        relative = self._relative(path)
+        if relative is None or relative == "." or not is_listed(relative):
+            return
+        if self._writer is None or not self._writer.is_alive():
+            with self._lock:
+                if self._writer is None or not self._writer.is_alive():
+                    self._writer = threading.Thread(target=self._write_events, name="catalog-events", daemon=True)
+                    self._writer.start()
+        self._events.put((removed, relative))
+
+    def flush(self) -> None:
+        """等待已经收到的文件事件全部写入"""
+        if self._writer is not None:
+            self._events.join()
+
+    def _write_events(self) -> None:
+        while True:
+            event = self._events.get()
+            if event is None:
+                self._events.task_done()
+                return
+            # 合并这期间收到的其它事件, 一个事务写入
+            events = [event]
+            while len(events) < self.BATCH:
+                try:
+                    event = self._events.get_nowait()
+                except queue.Empty:
+                    break
+                if event is None:
+                    self._events.put(None)
+                    self._events.task_done()
+                    break
+                events.append(event)
+            try:
+                self._apply(events)
+            except Exception as e:
+                logger.error(f"更新文件索引失败: {str(e)}")
+            finally:
+                for _ in events:
+                    self._events.task_done()
+
+    def _apply(self, events: List[Tuple[bool, str]]) -> None:
+        # 同一个文件只按最后一个事件处理
+        latest = dict((relative, removed) for removed, relative in events)
+        rows, removed = [], []
+        for relative, is_removed in latest.items():
+            try:
+                stat = None if is_removed else (self.root / relative).stat()
+            except OSError:
+                stat = None
+            if stat is None:
+                removed.append(relative)
+            else:
+                rows.append(self._row(relative, stat.st_size, stat.st_mtime))
+        with self._lock:
+            self.conn.execute("BEGIN;")
+            try:
+                delta = 0
+                for row in rows:
+                    if not self.conn.execute("update t_file set size=?, mtime=?, thumb=? where path=?;",
+                                             (row[5], row[6], row[7], row[0])).rowcount:
+                        self.conn.execute("insert into t_file(path, dir, name, source, type, size, mtime, thumb) "
+                                          "values(?, ?, ?, ?, ?, ?, ?, ?);", row)
+                        delta += 1
+                for relative in removed:
+                    delta -= self.conn.execute("delete from t_file where path=?;", (relative,)).rowcount
+                self.conn.execute("COMMIT;")
+            except BaseException:
+                self.conn.execute("ROLLBACK;")
+                raise
+            self.total += delta
+
+    def watch(self) -> bool:
+        """监视下载目录中的变化, 没有安装 watchdog 时返回 False"""
+        if Observer is None:
+            return False
+        if self._observer is None:
+            self._observer = Observer()
+            self._observer.schedule(_WatchHandler(self), str(self.root), recursive=True)
+            self._observer.daemon = True
+            self._observer.start()
+        return True
+
+    @property
+    def watching(self) -> bool:
+        return self._observer is not None
+
+    def set_thumbnail(self, relative: str, ready=True) -> None:
+        """缩略图生成后更新状态"""
+        with self._lock:
+            self.conn.execute("update t_file set thumb=? where path=?;", (int(ready), relative.replace("\\", "/")))
+
+    # ---------- 查询 ----------
+
+    @staticmethod
+    def _where(type: Optional[str], source: Optional[str], q: Optional[str]) -> Tuple[List[str], List[object]]:
+        clauses, params = [], []
+        if type:
+            clauses.append("type=?")
+            params.append(type)
+        if source:
+            clauses.append("source=?")
+            params.append(source)
+        if q:
+            clauses.append("name like ? escape '\\'")
+            params.append("%" + q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%")
+        return clauses, params
+
+    def query(self, limit=50, cursor=None, offset=0, sort="date-desc", type=None, source=None,
+              q=None) -> Tuple[List[dict], Optional[str]]:
+        """查询一页文件, 返回 (文件列表, 下一页的游标); 没有下一页时游标为 None
+
+        有游标时从游标之后开始, 否则跳过 offset 个文件(直接跳到某一页); limit 为 None 时返回所有文件
+        """
+        if sort not in SORTS:
+            raise ValueError(f"不支持的排序方式: {sort}")
+        column, desc = SORTS[sort]
+        clauses, params = self._where(type, source, q)
+        if cursor:
+            value, path = _decode_cursor(cursor)
+            clauses.append(f"({column}, path) {'<' if desc else '>'} (?, ?)")
+            params.extend([value, path])
+        order = "desc" if desc else "asc"
+        sql = (f"select path, name, source, dir, type, size, mtime, thumb from t_file"
+               f"{' where ' + ' and '.join(clauses) if clauses else ''}"
+               f" order by {column} {order}, path {order} limit ?")
+        # 多取一个, 判断是否还有下一页
+        params.append(-1 if limit is None else int(limit) + 1)
+        if not cursor and offset:
+            sql += " offset ?"
+            params.append(int(offset))
+        with self._read_lock:
+            rows = self.reader.execute(sql + ";", params).fetchall()
+
+        next_cursor = None
+        if limit is not None and len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]
+            next_cursor = _encode_cursor({"mtime": last[6], "name": last[1], "size": last[5]}[column], last[0])
+        files = [{
+            "name": name,
+            "path": path,
+            "size": size,
+            "modified": datetime.fromtimestamp(mtime).isoformat(),
+            "type": kind,
+            "source": source_dir,
+            "folder": directory,
+            "thumbnail": "ready" if thumb else None,
+        } for path, name, source_dir, directory, kind, size, mtime, thumb in rows]
+        return files, next_cursor
+
+    def count(self, type=None, source=None, q=None) -> int:
+        clauses, params = self._where(type, source, q)
+        sql = f"select count(*) from t_file{' where ' + ' and '.join(clauses) if clauses else ''};"
+        with self._read_lock:
+            return self.reader.execute(sql, params).fetchone()[0]
+
+    def summary(self) -> Dict[str, object]:
+        """各类型的文件数和所有来源"""
+        with self._read_lock:
+            counts = dict(self.reader.execute("select type, count(*) from t_file group by type;").fetchall())
+            sources = [row[0] for row in self.reader.execute(
+                "select distinct source from t_file where source != '' order by source;")]
+        stats = {kind: counts.get(kind, 0) for kind in ("video", "image", "audio", "other")}
+        stats["total"] = sum(counts.values())
+        return {"stats": stats, "sources": sources}
+
+    def missing_thumbnails(self, type: str = "video") -> List[str]:
+        """还没有缩略图的视频或图片"""
+        with self._read_lock:
+            return [row[0] for row in self.reader.execute("select path from t_file where type=? and thumb=0;",
+                                                          (type,))]
+
+    def close(self) -> None:
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+            self._observer = None
+        if self._writer is not None and self._writer.is_alive():
+            self._events.put(None)
+            self._writer.join()
+        if self._thread is not None:
+            self._thread.join()
+        self.conn.close()
+        self.reader.close()
+
+
+class _WatchHandler(object):
+    """把 watchdog 的文件系统事件转为 FileCatalog 的文件事件
+
+    目录被移动或删除时无法知道其中有哪些文件, 在后台增量同步一次
+    """
+
+    def __init__(self, catalog: FileCatalog):
+        self.catalog = catalog
+
+    def dispatch(self, event) -> None:
+        if event.is_directory:
+            if event.event_type in ("moved", "deleted"):
+                self.catalog.sync_async()
+            return
+        if event.event_type == "moved":
+            self.catalog.notify(event.src_path, removed=True)
+            self.catalog.notify(event.dest_path)
+        elif event.event_type == "deleted":
+            self.catalog.notify(event.src_path, removed=True)
+        elif event.event_type in ("created", "modified", "closed"):
+            self.catalog.notify(event.src_path)
+
+
+if __name__ == "__main__":
+    pass
@@ -2,62 +2,193 @@
 # -*- coding: utf-8 -*-
 
 
+import os
 import sqlite3
 import json
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Set, Tuple
 
 
 class DataBase(object):
-    def __init__(self):
-        import os
-        # 获取当前文件所在目录
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        # 从apiproxy/douyin目录回到项目根目录，然后进入settings目录
-        project_root = os.path.dirname(os.path.dirname(os.path.dirname(current_dir)))
-        db_path = os.path.join(project_root, 'settings', 'data.db')
-        
+    """增量下载使用的本地数据库(默认 settings/data.db)
+
+    - WAL 日志模式 + synchronous=NORMAL, 提交时不再每次 fsync
+    - 查询走 (sec_uid, aweme_id) 等联合索引
+    - 在 transaction() 中的插入合并为一个事务, 一页数据只提交一次
+    - 用 PRAGMA user_version 记录表结构版本, 打开旧数据库时自动迁移
+    - 增量模式用 split_seen()/insert_many() 按页批量判断和写入, 每个账号
+      (合集、音乐)第一次查询时把已记录的作品 id 读入内存, 之后只查内存
+    """
+
+    # 当前表结构版本, 新增迁移时加一并实现对应的 _migrate_v{n}
+    SCHEMA_VERSION = 2
+
+    # 增量记录的类型 -> (表名, 范围字段)
+    SEEN_TABLES = {
+        "post": ("t_user_post", ("sec_uid",)),
+        "like": ("t_user_like", ("sec_uid",)),
+        "mix": ("t_mix", ("sec_uid", "mix_id")),
+        "music": ("t_music", ("music_id",)),
+    }
+
+    def __init__(self, db_path=None):
+        if db_path is None:
+            # 获取当前文件所在目录
+            current_dir = os.path.dirname(os.path.abspath(__file__))
+            # 从apiproxy/douyin目录回到项目根目录，然后进入settings目录
+            project_root = os.path.dirname(os.path.dirname(os.path.dirname(current_dir)))
+            db_path = os.path.join(project_root, 'settings', 'data.db')
+
         # 确保settings目录存在
-        os.makedirs(os.path.dirname(db_path), exist_ok=True)
-        
-        self.conn = sqlite3.connect(db_path)
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+
+        # isolation_level=None: 由 transaction() 显式控制事务, 其它语句自动提交
+        self.conn = sqlite3.connect(db_path, isolation_level=None, check_same_thread=False)
         self.cursor = self.conn.cursor()
+        self._lock = threading.RLock()
+        # transaction() 的嵌套层数, 只有最外层负责提交
+        self._depth = 0
+        # (类型, 范围) -> 已记录的 aweme_id(字符串)
+        self._seen: Dict[Tuple[str, tuple], Set[str]] = {}
+
+        self.cursor.execute("PRAGMA journal_mode=WAL;")
+        self.cursor.execute("PRAGMA synchronous=NORMAL;")
+        self.migrate()
+
+    @contextmanager
+    def transaction(self):
+        """把多次插入合并成一个事务, 正常退出时提交, 出现异常时回滚"""
+        with self._lock:
+            if self._depth == 0:
+                self.cursor.execute("BEGIN;")
+            self._depth += 1
+            try:
+                yield self
+            except BaseException:
+                self._depth -= 1
+                if self._depth == 0:
+                    self.cursor.execute("ROLLBACK;")
+                raise
+            else:
+                self._depth -= 1
+                if self._depth == 0:
+                    self.cursor.execute("COMMIT;")
+
+    def schema_version(self) -> int:
+        return self.cursor.execute("PRAGMA user_version;").fetchone()[0]
+
+    def migrate(self):
+        """依次执行未完成的迁移, 每个版本一个事务"""
+        version = self.schema_version()
+        while version < self.SCHEMA_VERSION:
+            version += 1
+            with self.transaction():
+                getattr(self, f"_migrate_v{version}")()
+                self.cursor.execute(f"PRAGMA user_version={version};")
+
+    def _migrate_v1(self):
+        """原始表结构, 旧版本创建的数据库也是这个结构"""
         self.create_user_post_table()
         self.create_user_like_table()
         self.create_mix_table()
         self.create_music_table()
 
+    def _migrate_v2(self):
+        """增加联合索引; t_mix 先去掉重复记录再建唯一索引"""
+        self.cursor.execute("""DELETE FROM t_mix WHERE id NOT IN (
+                                   SELECT MIN(id) FROM t_mix GROUP BY sec_uid, mix_id, aweme_id);""")
+        self.cursor.execute("""CREATE INDEX IF NOT EXISTS idx_user_post_sec_uid_aweme_id
+                                   ON t_user_post (sec_uid, aweme_id);""")
+        self.cursor.execute("""CREATE INDEX IF NOT EXISTS idx_user_like_sec_uid_aweme_id
+                                   ON t_user_like (sec_uid, aweme_id);""")
+        self.cursor.execute("""CREATE UNIQUE INDEX IF NOT EXISTS idx_mix_sec_uid_mix_id_aweme_id
+                                   ON t_mix (sec_uid, mix_id, aweme_id);""")
+        self.cursor.execute("""CREATE INDEX IF NOT EXISTS idx_music_music_id_aweme_id
+                                   ON t_music (music_id, aweme_id);""")
+
+    def _seen_ids(self, kind: str, scope: tuple) -> Set[str]:
+        """某个范围内已记录的作品 id, 第一次访问时从数据库读取"""
+        key = (kind, scope)
+        if key not in self._seen:
+            table, columns = self.SEEN_TABLES[kind]
+            where = " and ".join(f"{column}=?" for column in columns)
+            rows = self.cursor.execute(f"select aweme_id from {table} where {where};", scope)
+            self._seen[key] = {str(row[0]) for row in rows}
+        return self._seen[key]
+
+    def _remember(self, kind: str, scope: tuple, aweme_ids: Iterable) -> None:
+        # 只更新已经读入内存的范围, 未读入的范围下次访问时会从数据库读取
+        with self._lock:
+            seen = self._seen.get((kind, scope))
+            if seen is not None:
+                seen.update(str(aweme_id) for aweme_id in aweme_ids)
+
+    def split_seen(self, kind: str, scope, aweme_ids: Iterable) -> Tuple[Set, List]:
+        """把一页作品 id 分为 (已记录的集合, 未记录的列表)
+
+        Args:
+            kind: post | like | mix | music
+            scope: post/like 为 sec_uid, mix 为 (sec_uid, mix_id), music 为 music_id
+            aweme_ids: 一页作品的 id
+        """
+        scope = scope if isinstance(scope, tuple) else (scope,)
+        with self._lock:
+            known = self._seen_ids(kind, scope)
+            seen, unseen = set(), []
+            for aweme_id in aweme_ids:
+                if str(aweme_id) in known:
+                    seen.add(aweme_id)
+                else:
+                    unseen.append(aweme_id)
+            return seen, unseen
+
+    def insert_many(self, kind: str, scope, awemes: List[dict]) -> None:
+        """在一个事务中批量写入一页新作品"""
+        if not awemes:
+            return
+        scope = scope if isinstance(scope, tuple) else (scope,)
+        table, columns = self.SEEN_TABLES[kind]
+        sql = (f"insert or ignore into {table} ({', '.join(columns)}, aweme_id, rawdata) "
+               f"values({', '.join('?' * (len(columns) + 2))});")
+        rows = [scope + (aweme["aweme_id"], json.dumps(aweme)) for aweme in awemes]
+        with self.transaction():
+            self.cursor.executemany(sql, rows)
+            self._remember(kind, scope, (aweme["aweme_id"] for aweme in awemes))
+
+    def _fetchone(self, sql, params):
+        try:
+            with self._lock:
+                self.cursor.execute(sql, params)
+                return self.cursor.fetchone()
+        except Exception as e:
+            pass
+
+    def _insert(self, sql, params):
+        # 在 transaction() 中时随事务一起提交, 否则自动提交
+        try:
+            with self._lock:
+                self.cursor.execute(sql, params)
+        except Exception as e:
+            pass
+
     def create_user_post_table(self):
         sql = """CREATE TABLE if not exists t_user_post (
                         id integer primary key autoincrement,
                         sec_uid varchar(200),
-                        aweme_id integer unique, 
+                        aweme_id integer unique,
                         rawdata json
                     );"""
-
-        try:
-            self.cursor.execute(sql)
-            self.conn.commit()
-        except Exception as e:
-            pass
+        self.cursor.execute(sql)
 
     def get_user_post(self, sec_uid: str, aweme_id: int):
         sql = """select id, sec_uid, aweme_id, rawdata from t_user_post where sec_uid=? and aweme_id=?;"""
-
-        try:
-            self.cursor.execute(sql, (sec_uid, aweme_id))
-            self.conn.commit()
-            res = self.cursor.fetchone()
-            return res
-        except Exception as e:
-            pass
+        return self._fetchone(sql, (sec_uid, aweme_id))
 
     def insert_user_post(self, sec_uid: str, aweme_id: int, data: dict):
-        insertsql = """insert into t_user_post (sec_uid, aweme_id, rawdata) values(?,?,?);"""
-
-        try:
-            self.cursor.execute(insertsql, (sec_uid, aweme_id, json.dumps(data)))
-            self.conn.commit()
-        except Exception as e:
-            pass
+        insertsql = """insert or ignore into t_user_post (sec_uid, aweme_id, rawdata) values(?,?,?);"""
+        self._insert(insertsql, (sec_uid, aweme_id, json.dumps(data)))
+        self._remember("post", (sec_uid,), (aweme_id,))
 
     def create_user_like_table(self):
         sql = """CREATE TABLE if not exists t_user_like (
@@ -66,32 +197,16 @@ class DataBase(object):
                         aweme_id integer unique,
                         rawdata json
                     );"""
-
-        try:
-            self.cursor.execute(sql)
-            self.conn.commit()
-        except Exception as e:
-            pass
+        self.cursor.execute(sql)
 
     def get_user_like(self, sec_uid: str, aweme_id: int):
         sql = """select id, sec_uid, aweme_id, rawdata from t_user_like where sec_uid=? and aweme_id=?;"""
-
-        try:
-            self.cursor.execute(sql, (sec_uid, aweme_id))
-            self.conn.commit()
-            res = self.cursor.fetchone()
-            return res
-        except Exception as e:
-            pass
+        return self._fetchone(sql, (sec_uid, aweme_id))
 
     def insert_user_like(self, sec_uid: str, aweme_id: int, data: dict):
-        insertsql = """insert into t_user_like (sec_uid, aweme_id, rawdata) values(?,?,?);"""
-
-        try:
-            self.cursor.execute(insertsql, (sec_uid, aweme_id, json.dumps(data)))
-            self.conn.commit()
-        except Exception as e:
-            pass
+        insertsql = """insert or ignore into t_user_like (sec_uid, aweme_id, rawdata) values(?,?,?);"""
+        self._insert(insertsql, (sec_uid, aweme_id, json.dumps(data)))
+        self._remember("like", (sec_uid,), (aweme_id,))
 
     def create_mix_table(self):
         sql = """CREATE TABLE if not exists t_mix (
@@ -101,32 +216,16 @@ class DataBase(object):
                         aweme_id integer,
                         rawdata json
                     );"""
-
-        try:
-            self.cursor.execute(sql)
-            self.conn.commit()
-        except Exception as e:
-            pass
+        self.cursor.execute(sql)
 
     def get_mix(self, sec_uid: str, mix_id: str, aweme_id: int):
         sql = """select id, sec_uid, mix_id, aweme_id, rawdata from t_mix where sec_uid=? and  mix_id=? and aweme_id=?;"""
-
-        try:
-            self.cursor.execute(sql, (sec_uid, mix_id, aweme_id))
-            self.conn.commit()
-            res = self.cursor.fetchone()
-            return res
-        except Exception as e:
-            pass
+        return self._fetchone(sql, (sec_uid, mix_id, aweme_id))
 
     def insert_mix(self, sec_uid: str, mix_id: str, aweme_id: int, data: dict):
-        insertsql = """insert into t_mix (sec_uid, mix_id, aweme_id, rawdata) values(?,?,?,?);"""
-
-        try:
-            self.cursor.execute(insertsql, (sec_uid, mix_id, aweme_id, json.dumps(data)))
-            self.conn.commit()
-        except Exception as e:
-            pass
+        insertsql = """insert or ignore into t_mix (sec_uid, mix_id, aweme_id, rawdata) values(?,?,?,?);"""
+        self._insert(insertsql, (sec_uid, mix_id, aweme_id, json.dumps(data)))
+        self._remember("mix", (sec_uid, mix_id), (aweme_id,))
 
     def create_music_table(self):
         sql = """CREATE TABLE if not exists t_music (
@@ -135,32 +234,20 @@ class DataBase(object):
                         aweme_id integer unique,
                         rawdata json
                     );"""
-
-        try:
-            self.cursor.execute(sql)
-            self.conn.commit()
-        except Exception as e:
-            pass
+        self.cursor.execute(sql)
 
     def get_music(self, music_id: str, aweme_id: int):
         sql = """select id, music_id, aweme_id, rawdata from t_music where music_id=? and aweme_id=?;"""
-
-        try:
-            self.cursor.execute(sql, (music_id, aweme_id))
-            self.conn.commit()
-            res = self.cursor.fetchone()
-            return res
-        except Exception as e:
-            pass
+        return self._fetchone(sql, (music_id, aweme_id))
 
     def insert_music(self, music_id: str, aweme_id: int, data: dict):
-        insertsql = """insert into t_music (music_id, aweme_id, rawdata) values(?,?,?);"""
+        insertsql = """insert or ignore into t_music (music_id, aweme_id, rawdata) values(?,?,?);"""
+        self._insert(insertsql, (music_id, aweme_id, json.dumps(data)))
+        self._remember("music", (music_id,), (aweme_id,))
 
-        try:
-            self.cursor.execute(insertsql, (music_id, aweme_id, json.dumps(data)))
-            self.conn.commit()
-        except Exception as e:
-            pass
+    def close(self):
+        with self._lock:
+            self.conn.close()
 
 
 if __name__ == '__main__':
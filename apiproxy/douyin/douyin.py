@@ -3,21 +3,18 @@
 
 
 import re
-import requests
 import json
 import time
-import copy
-# from tenacity import retry, stop_after_attempt, wait_exponential
-from typing import Tuple, Optional
-from requests.exceptions import RequestException
+from contextlib import contextmanager
+from typing import Iterator, Tuple, Optional
 from rich.progress import Progress, SpinnerColumn, TextColumn, BarColumn, TaskProgressColumn, TimeRemainingColumn
 from rich.console import Console
 
 from apiproxy.douyin import douyin_headers
 from apiproxy.douyin.urls import Urls
-from apiproxy.douyin.result import Result
+from apiproxy.douyin.aweme import AwemePage, convert_aweme, new_live_dict
 from apiproxy.douyin.database import DataBase
-from apiproxy.common import utils
+from apiproxy.common import utils, session, retrier
 import sys
 import os
 # 添加项目根目录到系统路径，确保可以正确导入utils模块
@@ -36,14 +33,28 @@ class Douyin(object):
 
     def __init__(self, database=False):
         self.urls = Urls()
-        self.result = Result()
         self.database = database
         if database:
             self.db = DataBase()
-        # 用于设置重复请求某个接口的最大时间
-        self.timeout = 10
         self.console = Console()  # 也可以在实例中创建console
 
+    @contextmanager
+    def _page_seen(self, kind: str, scope, aweme_list: list):
+        """增量检查: 一次查出本页已记录的作品, 返回 (已记录的 id 集合, 待写入的新作品列表)
+
+        退出时(包括中途 return)把待写入列表中的作品在一个事务中写入数据库;
+        未启用数据库时已记录集合为空, 也不会写入
+        """
+        fresh = []
+        if not self.database:
+            yield set(), fresh
+            return
+        seen, _ = self.db.split_seen(kind, scope, [aweme['aweme_id'] for aweme in aweme_list])
+        try:
+            yield seen, fresh
+        finally:
+            self.db.insert_many(kind, scope, fresh)
+
     # 从分享链接中提取网址
     def getShareLink(self, string):
         # findall() 查找匹配正则表达式的字符串
@@ -62,7 +73,7 @@ class Douyin(object):
         key_type = None
 
         try:
-            r = requests.get(url=url, headers=douyin_headers)
+            r = session.get(url=url, headers=douyin_headers)
         except Exception as e:
             print('[  错误  ]:输入链接有误！\r')
             return key_type, key
@@ -109,7 +120,7 @@ class Douyin(object):
             key1 = re.findall('reflow/(\d+)?', urlstr)[0]
             url = self.urls.LIVE2 + utils.getXbogus(
                 f'live_id=1&room_id={key1}&app_id=1128')
-            res = requests.get(url, headers=douyin_headers)
+            res = session.get(url, headers=douyin_headers)
             resjson = json.loads(res.text)
             key = resjson['data']['room']['owner']['web_rid']
             key_type = "live"
@@ -123,97 +134,51 @@ class Douyin(object):
 
         return key_type, key
 
-    # 暂时注释掉装饰器
-    # @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
     def getAwemeInfo(self, aweme_id: str) -> dict:
         """获取作品信息（带重试机制）"""
-        retries = 3
-        for attempt in range(retries):
-            try:
-                logger.info(f'[  提示  ]:正在请求的作品 id = {aweme_id}')
-                if aweme_id is None:
-                    return {}
-
-                start = time.time()  # 开始时间
-                while True:
-                    # 接口不稳定, 有时服务器不返回数据, 需要重新获取
-                    try:
-                        # 单作品接口返回 'aweme_detail'
-                        # 主页作品接口返回 'aweme_list'->['aweme_detail']
-                        jx_url = self.urls.POST_DETAIL + utils.getXbogus(
-                            f'aweme_id={aweme_id}&device_platform=webapp&aid=6383')
-
-                        raw = requests.get(url=jx_url, headers=douyin_headers).text
-                        datadict = json.loads(raw)
-                        if datadict is not None and datadict["status_code"] == 0:
-                            # 检查token是否过期
-                            if self._check_token_expired(datadict):
-                                return {}
-                            break
-                    except Exception as e:
-                        end = time.time()  # 结束时间
-                        if end - start > self.timeout:
-                            logger.warning(f"重复请求该接口{self.timeout}s, 仍然未获取到数据")
-                            return {}
-
-
-                # 清空self.awemeDict
-                self.result.clearDict(self.result.awemeDict)
-
-                # 默认为视频
-                awemeType = 0
-                try:
-                    # datadict['aweme_detail']["images"] 不为 None 说明是图集
-                    if datadict['aweme_detail']["images"] is not None:
-                        awemeType = 1
-                except Exception as e:
-                    logger.warning("接口中未找到 images")
-
-                # 转换成我们自己的格式
-                self.result.dataConvert(awemeType, self.result.awemeDict, datadict['aweme_detail'])
-
-                return self.result.awemeDict
-            except RequestException as e:
-                logger.warning(f"请求失败（尝试 {attempt+1}/{retries}）: {str(e)}")
-                time.sleep(2 ** attempt)
-            except KeyError as e:
-                logger.error(f"响应数据格式异常: {str(e)}")
-                break
-        return {}
+        logger.info(f'[  提示  ]:正在请求的作品 id = {aweme_id}')
+        if aweme_id is None:
+            return {}
+
+        # 单作品接口返回 'aweme_detail'
+        # 主页作品接口返回 'aweme_list'->['aweme_detail']
+        datadict = retrier.request_json(
+            "POST_DETAIL",
+            lambda: self.urls.POST_DETAIL + utils.getXbogus(
+                f'aweme_id={aweme_id}&device_platform=webapp&aid=6383'),
+            headers=douyin_headers,
+            accept=lambda d: d.get("status_code") == 0)
+        if datadict is None:
+            logger.warning("重复请求该接口, 仍然未获取到数据")
+            return {}
+
+        # 检查token是否过期
+        if self._check_token_expired(datadict):
+            return {}
 
-    # 传入 url 支持 https://www.iesdouyin.com 与 https://v.douyin.com
-    # mode : post | like 模式选择 like为用户点赞 post为用户发布
-    def getUserInfo(self, sec_uid, mode="post", count=35, number=0, increase=False, start_time="", end_time=""):
-        """获取用户信息
-        Args:
-            sec_uid: 用户ID
-            mode: 模式(post:发布/like:点赞)
-            count: 每页数量
-            number: 限制下载数量(0表示无限制)
-            increase: 是否增量更新
-            start_time: 开始时间，格式：YYYY-MM-DD
-            end_time: 结束时间，格式：YYYY-MM-DD
-        """
-        if sec_uid is None:
-            return None
+        try:
+            # images 不为 None 说明是图集, 转换成我们自己的格式
+            return convert_aweme(datadict['aweme_detail'])
+        except KeyError as e:
+            logger.error(f"响应数据格式异常: {str(e)}")
+        return {}
 
-        # 处理时间范围
+    def _time_range(self, start_time="", end_time=""):
+        """处理时间范围, 返回 (开始日期, 结束日期)"""
         if end_time == "now":
             end_time = time.strftime("%Y-%m-%d")
-        
+
         if not start_time:
             start_time = "1970-01-01"
         if not end_time:
             end_time = "2099-12-31"
 
         self.console.print(f"[cyan]🕒 时间范围: {start_time} 至 {end_time}[/]")
-        
-        max_cursor = 0
-        awemeList = []
-        total_fetched = 0
-        filtered_count = 0
-        
-        with Progress(
+        return start_time, end_time
+
+    def _fetch_progress(self) -> Progress:
+        """获取作品列表时显示的进度条"""
+        return Progress(
             SpinnerColumn(),
             TextColumn("[progress.description]{task.description}"),
             BarColumn(),
@@ -221,136 +186,169 @@ class Douyin(object):
             TimeRemainingColumn(),
             console=self.console,
             transient=True
-        ) as progress:
-            fetch_task = progress.add_task(
-                f"[cyan]📥 正在获取{mode}作品列表...", 
-                total=None  # 总数未知，使用无限进度条
-            )
-            
-            while True:
-                try:
-                    # 构建请求URL
-                    if mode == "post":
-                        url = self.urls.USER_POST + utils.getXbogus(
-                            f'sec_user_id={sec_uid}&count={count}&max_cursor={max_cursor}&device_platform=webapp&aid=6383')
-                    elif mode == "like":
-                        url = self.urls.USER_FAVORITE_A + utils.getXbogus(
-                            f'sec_user_id={sec_uid}&count={count}&max_cursor={max_cursor}&device_platform=webapp&aid=6383')
+        )
+
+    # 传入 url 支持 https://www.iesdouyin.com 与 https://v.douyin.com
+    # mode : post | like 模式选择 like为用户点赞 post为用户发布
+    def iterUserInfo(self, sec_uid, mode="post", count=35, number=0, increase=False, start_time="", end_time="",
+                     cursor=0) -> Iterator[AwemePage]:
+        """按页获取用户发布/点赞的作品, 每请求一页就产出一个 AwemePage
+
+        参数同 getUserInfo; cursor 为开始的 max_cursor, 用于从中断的位置继续。
+        生成器是惰性的, 调用方处理完一页(例如提交下载)后才会请求下一页。
+        """
+        if sec_uid is None:
+            return
+        if mode == "post":
+            endpoint = "USER_POST"
+        elif mode == "like":
+            endpoint = "USER_FAVORITE_A"
+        else:
+            self.console.print("[red]❌ 模式选择错误，仅支持post、like[/]")
+            return
+
+        start_time, end_time = self._time_range(start_time, end_time)
+
+        max_cursor = cursor
+        total_fetched = 0
+        total_yielded = 0
+
+        while True:
+            # 达到限制数量或增量更新完成时为 True
+            stop = False
+            try:
+                # 构建请求URL
+                url = getattr(self.urls, endpoint) + utils.getXbogus(
+                    f'sec_user_id={sec_uid}&count={count}&max_cursor={max_cursor}&device_platform=webapp&aid=6383')
+
+                # 调试信息：打印请求URL
+                if total_fetched == 0:  # 只在第一次请求时打印
+                    self.console.print(f"[cyan]🔍 调试信息:[/]")
+                    self.console.print(f"[cyan]   请求URL: {url}[/]")
+                    self.console.print(f"[cyan]   Cookie长度: {len(douyin_headers.get('Cookie', ''))}[/]")
+
+                # 发送请求
+                datadict = retrier.request_json(endpoint, url, headers=douyin_headers)
+
+                # 处理返回数据
+                if not datadict or datadict.get("status_code") != 0:
+                    status_msg = datadict.get('status_msg', '未知错误') if datadict else '未获取到数据'
+                    self.console.print(f"[red]❌ API请求失败: {status_msg}[/]")
+                    return
+
+                # 检查是否有aweme_list
+                if "aweme_list" not in datadict:
+                    # 检查是否是token过期的情况
+                    if self._check_token_expired(datadict):
+                        self.console.print(f"[yellow]📋 返回数据: {datadict}[/]")
                     else:
-                        self.console.print("[red]❌ 模式选择错误，仅支持post、like[/]")
-                        return None
-
-                    # 发送请求
-                    res = requests.get(url=url, headers=douyin_headers)
-                    datadict = json.loads(res.text)
-                    
-                    # 调试信息：打印请求URL和响应状态
-                    if total_fetched == 0:  # 只在第一次请求时打印
-                        self.console.print(f"[cyan]🔍 调试信息:[/]")
-                        self.console.print(f"[cyan]   请求URL: {url}[/]")
-                        self.console.print(f"[cyan]   响应状态: {res.status_code}[/]")
-                        self.console.print(f"[cyan]   Cookie长度: {len(douyin_headers.get('Cookie', ''))}[/]")
-                    
-                    # 处理返回数据
-                    if not datadict or datadict.get("status_code") != 0:
-                        self.console.print(f"[red]❌ API请求失败: {datadict.get('status_msg', '未知错误')}[/]")
-                        break
-                    
-                    # 检查是否有aweme_list
-                    if "aweme_list" not in datadict:
-                        # 检查是否是token过期的情况
-                        if self._check_token_expired(datadict):
-                            self.console.print(f"[yellow]📋 返回数据: {datadict}[/]")
-                        else:
-                            self.console.print(f"[red]❌ API返回数据格式异常，缺少aweme_list字段[/]")
-                            self.console.print(f"[yellow]📋 返回数据: {datadict}[/]")
-                        break
-                    
-                    # 检查aweme_list是否为空
-                    if not datadict["aweme_list"]:
-                        self.console.print(f"[yellow]⚠️  该用户没有更多作品了[/]")
-                        break
-                        
-                    current_count = len(datadict["aweme_list"])
-                    total_fetched += current_count
-                    
-                    # 更新进度显示
-                    progress.update(
-                        fetch_task, 
-                        description=f"[cyan]📥 已获取: {total_fetched}个作品"
-                    )
-
-                    # 在处理作品时添加时间过滤
+                        self.console.print(f"[red]❌ API返回数据格式异常，缺少aweme_list字段[/]")
+                        self.console.print(f"[yellow]📋 返回数据: {datadict}[/]")
+                    return
+
+                # 检查aweme_list是否为空
+                if not datadict["aweme_list"]:
+                    self.console.print(f"[yellow]⚠️  该用户没有更多作品了[/]")
+                    return
+
+                total_fetched += len(datadict["aweme_list"])
+                page = AwemePage(max_cursor, datadict.get("max_cursor", 0), bool(datadict.get("has_more", False)))
+
+                # 在处理作品时添加时间过滤
+                # 一页数据批量检查和写入
+                with self._page_seen(mode, sec_uid, datadict["aweme_list"]) as (seen, fresh):
                     for aweme in datadict["aweme_list"]:
                         create_time = time.strftime(
-                            "%Y-%m-%d", 
+                            "%Y-%m-%d",
                             time.localtime(int(aweme.get("create_time", 0)))
                         )
-                        
+
                         # 时间过滤
                         if not (start_time <= create_time <= end_time):
-                            filtered_count += 1
                             continue
 
                         # 数量限制检查
-                        if number > 0 and len(awemeList) >= number:
+                        if number > 0 and total_yielded + len(page) >= number:
                             self.console.print(f"[green]✅ 已达到限制数量: {number}[/]")
-                            return awemeList
-                            
+                            stop = True
+                            break
+
                         # 增量更新检查
                         if self.database:
-                            if mode == "post":
-                                if self.db.get_user_post(sec_uid=sec_uid, aweme_id=aweme['aweme_id']):
-                                    if increase and aweme['is_top'] == 0:
-                                        self.console.print("[green]✅ 增量更新完成[/]")
-                                        return awemeList
-                                else:
-                                    self.db.insert_user_post(sec_uid=sec_uid, aweme_id=aweme['aweme_id'], data=aweme)
-                            elif mode == "like":
-                                if self.db.get_user_like(sec_uid=sec_uid, aweme_id=aweme['aweme_id']):
-                                    if increase and aweme['is_top'] == 0:
-                                        self.console.print("[green]✅ 增量更新完成[/]")
-                                        return awemeList
+                            if aweme['aweme_id'] in seen:
+                                if increase and aweme['is_top'] == 0:
+                                    self.console.print("[green]✅ 增量更新完成[/]")
+                                    stop = True
+                                    break
                             else:
-                                self.console.print("[red]❌ 模式选择错误，仅支持post、like[/]")
-                                return None
+                                fresh.append(aweme)
 
                         # 转换数据格式
                         aweme_data = self._convert_aweme_data(aweme)
                         if aweme_data:
-                            awemeList.append(aweme_data)
+                            page.awemes.append(aweme_data)
 
-                    # 检查是否还有更多数据
-                    if not datadict.get("has_more", False):
-                        self.console.print(f"[green]✅ 已获取全部作品: {total_fetched}个[/]")
-                        break
-                    
-                    # 更新游标
-                    max_cursor = datadict.get("max_cursor", 0)
-                    
-                    # 添加延迟避免请求过快
-                    time.sleep(1)
-                    
-                except Exception as e:
-                    self.console.print(f"[red]❌ 获取作品列表出错: {str(e)}[/]")
-                    break
+            except Exception as e:
+                self.console.print(f"[red]❌ 获取作品列表出错: {str(e)}[/]")
+                return
+
+            # 本页已写入数据库, 交给调用方处理
+            total_yielded += len(page)
+            yield page
+
+            if stop:
+                return
+
+            # 检查是否还有更多数据
+            if not page.has_more:
+                self.console.print(f"[green]✅ 已获取全部作品: {total_fetched}个[/]")
+                return
+
+            # 更新游标, 翻页频率由 ratelimiter 控制
+            max_cursor = page.next_cursor
+
+    def getUserInfo(self, sec_uid, mode="post", count=35, number=0, increase=False, start_time="", end_time=""):
+        """获取用户信息
+        Args:
+            sec_uid: 用户ID
+            mode: 模式(post:发布/like:点赞)
+            count: 每页数量
+            number: 限制下载数量(0表示无限制)
+            increase: 是否增量更新
+            start_time: 开始时间，格式：YYYY-MM-DD
+            end_time: 结束时间，格式：YYYY-MM-DD
+        """
+        if sec_uid is None:
+            return None
+        if mode not in ("post", "like"):
+            self.console.print("[red]❌ 模式选择错误，仅支持post、like[/]")
+            return None
+
+        awemeList = []
+        with self._fetch_progress() as progress:
+            fetch_task = progress.add_task(
+                f"[cyan]📥 正在获取{mode}作品列表...",
+                total=None  # 总数未知，使用无限进度条
+            )
+            for page in self.iterUserInfo(sec_uid, mode, count, number, increase, start_time, end_time):
+                awemeList.extend(page.awemes)
+                # 更新进度显示
+                progress.update(fetch_task, description=f"[cyan]📥 已获取: {len(awemeList)}个作品")
 
         return awemeList
 
     def _convert_aweme_data(self, aweme):
         """转换作品数据格式"""
         try:
-            self.result.clearDict(self.result.awemeDict)
             aweme_type = 1 if aweme.get("images") else 0
-            self.result.dataConvert(aweme_type, self.result.awemeDict, aweme)
-            return copy.deepcopy(self.result.awemeDict)
+            return convert_aweme(aweme, aweme_type)
         except Exception as e:
             logger.error(f"数据转换错误: {str(e)}")
             return None
     
     def _check_token_expired(self, datadict):
         """检查token是否过期"""
-        if datadict.get("status_code") == 0 and len(datadict) == 1:
+        if retrier.is_token_expired(datadict):
             self.console.print(f"[red]❌ Token已过期！[/]")
             self.console.print(f"[yellow]💡 解决方案:[/]")
             self.console.print(f"[yellow]   1. 打开浏览器访问 https://www.douyin.com[/]")
@@ -365,136 +363,108 @@ class Douyin(object):
     def getLiveInfo(self, web_rid: str):
         print('[  提示  ]:正在请求的直播间 id = %s\r\n' % web_rid)
 
-        start = time.time()  # 开始时间
-        while True:
-            # 接口不稳定, 有时服务器不返回数据, 需要重新获取
-            try:
-                live_api = self.urls.LIVE + utils.getXbogus(
-                    f'aid=6383&device_platform=web&web_rid={web_rid}')
+        # 接口不稳定, 有时服务器不返回数据, 需要重新获取
+        live_json = retrier.request_json(
+            "LIVE",
+            lambda: self.urls.LIVE + utils.getXbogus(f'aid=6383&device_platform=web&web_rid={web_rid}'),
+            headers=douyin_headers,
+            accept=lambda d: d.get("status_code") == 0)
+        if live_json is None:
+            print("[  提示  ]:重复请求该接口, 仍然未获取到数据")
+            return {}
 
-                response = requests.get(live_api, headers=douyin_headers)
-                live_json = json.loads(response.text)
-                if live_json != {} and live_json['status_code'] == 0:
-                    break
-            except Exception as e:
-                end = time.time()  # 结束时间
-                if end - start > self.timeout:
-                    print("[  提示  ]:重复请求该接口" + str(self.timeout) + "s, 仍然未获取到数据")
-                    return {}
-
-        # 清空字典
-        self.result.clearDict(self.result.liveDict)
+        liveDict = new_live_dict()
 
         # 类型
-        self.result.liveDict["awemeType"] = 2
+        liveDict["awemeType"] = 2
         # 是否在播
-        self.result.liveDict["status"] = live_json['data']['data'][0]['status']
+        liveDict["status"] = live_json['data']['data'][0]['status']
 
-        if self.result.liveDict["status"] == 4:
+        if liveDict["status"] == 4:
             print('[   📺   ]:当前直播已结束，正在退出')
-            return self.result.liveDict
+            return liveDict
 
         # 直播标题
-        self.result.liveDict["title"] = live_json['data']['data'][0]['title']
+        liveDict["title"] = live_json['data']['data'][0]['title']
 
         # 直播cover
-        self.result.liveDict["cover"] = live_json['data']['data'][0]['cover']['url_list'][0]
+        liveDict["cover"] = live_json['data']['data'][0]['cover']['url_list'][0]
 
         # 头像
-        self.result.liveDict["avatar"] = live_json['data']['data'][0]['owner']['avatar_thumb']['url_list'][0].replace(
+        liveDict["avatar"] = live_json['data']['data'][0]['owner']['avatar_thumb']['url_list'][0].replace(
             "100x100", "1080x1080")
 
         # 观看人数
-        self.result.liveDict["user_count"] = live_json['data']['data'][0]['user_count_str']
+        liveDict["user_count"] = live_json['data']['data'][0]['user_count_str']
 
         # 昵称
-        self.result.liveDict["nickname"] = live_json['data']['data'][0]['owner']['nickname']
+        liveDict["nickname"] = live_json['data']['data'][0]['owner']['nickname']
 
         # sec_uid
-        self.result.liveDict["sec_uid"] = live_json['data']['data'][0]['owner']['sec_uid']
+        liveDict["sec_uid"] = live_json['data']['data'][0]['owner']['sec_uid']
 
         # 直播间观看状态
-        self.result.liveDict["display_long"] = live_json['data']['data'][0]['room_view_stats']['display_long']
+        liveDict["display_long"] = live_json['data']['data'][0]['room_view_stats']['display_long']
 
         # 推流
-        self.result.liveDict["flv_pull_url"] = live_json['data']['data'][0]['stream_url']['flv_pull_url']
+        liveDict["flv_pull_url"] = live_json['data']['data'][0]['stream_url']['flv_pull_url']
 
         try:
             # 分区
-            self.result.liveDict["partition"] = live_json['data']['partition_road_map']['partition']['title']
-            self.result.liveDict["sub_partition"] = \
+            liveDict["partition"] = live_json['data']['partition_road_map']['partition']['title']
+            liveDict["sub_partition"] = \
                 live_json['data']['partition_road_map']['sub_partition']['partition']['title']
         except Exception as e:
-            self.result.liveDict["partition"] = '无'
-            self.result.liveDict["sub_partition"] = '无'
+            liveDict["partition"] = '无'
+            liveDict["sub_partition"] = '无'
 
         info = '[   💻   ]:直播间：%s  当前%s  主播：%s 分区：%s-%s\r' % (
-            self.result.liveDict["title"], self.result.liveDict["display_long"], self.result.liveDict["nickname"],
-            self.result.liveDict["partition"], self.result.liveDict["sub_partition"])
+            liveDict["title"], liveDict["display_long"], liveDict["nickname"],
+            liveDict["partition"], liveDict["sub_partition"])
         print(info)
 
         flv = []
         print('[   🎦   ]:直播间清晰度')
-        for i, f in enumerate(self.result.liveDict["flv_pull_url"].keys()):
+        for i, f in enumerate(liveDict["flv_pull_url"].keys()):
             print('[   %s   ]: %s' % (i, f))
             flv.append(f)
 
         rate = int(input('[   🎬   ]输入数字选择推流清晰度：'))
 
-        self.result.liveDict["flv_pull_url0"] = self.result.liveDict["flv_pull_url"][flv[rate]]
+        liveDict["flv_pull_url0"] = liveDict["flv_pull_url"][flv[rate]]
 
         # 显示清晰度列表
-        print('[   %s   ]:%s' % (flv[rate], self.result.liveDict["flv_pull_url"][flv[rate]]))
+        print('[   %s   ]:%s' % (flv[rate], liveDict["flv_pull_url"][flv[rate]]))
         print('[   📺   ]:复制链接使用下载工具下载')
-        return self.result.liveDict
+        return liveDict
 
-    def getMixInfo(self, mix_id, count=35, number=0, increase=False, sec_uid="", start_time="", end_time=""):
-        """获取合集信息"""
+    def iterMixInfo(self, mix_id, count=35, number=0, increase=False, sec_uid="", start_time="", end_time="",
+                    cursor=0) -> Iterator[AwemePage]:
+        """按页获取合集中的作品, 参数同 getMixInfo; cursor 为开始的游标"""
         if mix_id is None:
-            return None
-
-        # 处理时间范围
-        if end_time == "now":
-            end_time = time.strftime("%Y-%m-%d")
-        
-        if not start_time:
-            start_time = "1970-01-01"
-        if not end_time:
-            end_time = "2099-12-31"
+            return
 
-        self.console.print(f"[cyan]🕒 时间范围: {start_time} 至 {end_time}[/]")
+        start_time, end_time = self._time_range(start_time, end_time)
 
-        cursor = 0
-        awemeList = []
-        total_fetched = 0
+        total_yielded = 0
         filtered_count = 0
 
-        with Progress(
-            SpinnerColumn(),
-            TextColumn("[progress.description]{task.description}"),
-            BarColumn(),
-            TaskProgressColumn(),
-            TimeRemainingColumn(),
-            console=self.console,
-            transient=True
-        ) as progress:
-            fetch_task = progress.add_task(
-                "[cyan]📥 正在获取合集作品...",
-                total=None
-            )
+        while True:  # 外层循环
+            stop = False
+            try:
+                url = self.urls.USER_MIX + utils.getXbogus(
+                    f'mix_id={mix_id}&cursor={cursor}&count={count}&device_platform=webapp&aid=6383')
 
-            while True:  # 外层循环
-                try:
-                    url = self.urls.USER_MIX + utils.getXbogus(
-                        f'mix_id={mix_id}&cursor={cursor}&count={count}&device_platform=webapp&aid=6383')
+                datadict = retrier.request_json("USER_MIX", url, headers=douyin_headers)
 
-                    res = requests.get(url=url, headers=douyin_headers)
-                    datadict = json.loads(res.text)
+                if not datadict:
+                    self.console.print("[red]❌ 获取数据失败[/]")
+                    break
 
-                    if not datadict:
-                        self.console.print("[red]❌ 获取数据失败[/]")
-                        break
+                page = AwemePage(cursor, datadict.get("cursor", 0), bool(datadict.get("has_more")))
 
+                # 一页数据批量检查和写入
+                with self._page_seen("mix", (sec_uid, mix_id), datadict["aweme_list"]) as (seen, fresh):
                     for aweme in datadict["aweme_list"]:
                         create_time = time.strftime(
                             "%Y-%m-%d",
@@ -507,39 +477,60 @@ class Douyin(object):
                             continue
 
                         # 数量限制检查
-                        if number > 0 and len(awemeList) >= number:
-                            return awemeList  # 使用return替代break
+                        if number > 0 and total_yielded + len(page) >= number:
+                            stop = True
+                            break
 
                         # 增量更新检查
                         if self.database:
-                            if self.db.get_mix(sec_uid=sec_uid, mix_id=mix_id, aweme_id=aweme['aweme_id']):
+                            if aweme['aweme_id'] in seen:
                                 if increase and aweme['is_top'] == 0:
-                                    return awemeList  # 使用return替代break
+                                    stop = True
+                                    break
                             else:
-                                self.db.insert_mix(sec_uid=sec_uid, mix_id=mix_id, aweme_id=aweme['aweme_id'], data=aweme)
+                                fresh.append(aweme)
 
                         # 转换数据
                         aweme_data = self._convert_aweme_data(aweme)
                         if aweme_data:
-                            awemeList.append(aweme_data)
+                            page.awemes.append(aweme_data)
 
-                    # 检查是否还有更多数据
-                    if not datadict.get("has_more"):
-                        self.console.print(f"[green]✅ 已获取全部作品[/]")
-                        break
+            except Exception as e:
+                self.console.print(f"[red]❌ 获取作品列表出错: {str(e)}[/]")
+                break
 
-                    # 更新游标
-                    cursor = datadict.get("cursor", 0)
-                    total_fetched += len(datadict["aweme_list"])
-                    progress.update(fetch_task, description=f"[cyan]📥 已获取: {total_fetched}个作品")
+            total_yielded += len(page)
+            yield page
 
-                except Exception as e:
-                    self.console.print(f"[red]❌ 获取作品列表出错: {str(e)}[/]")
-                    break
+            if stop:
+                break
+
+            # 检查是否还有更多数据
+            if not page.has_more:
+                self.console.print(f"[green]✅ 已获取全部作品[/]")
+                break
+
+            # 更新游标
+            cursor = page.next_cursor
 
         if filtered_count > 0:
             self.console.print(f"[yellow]⚠️  已过滤 {filtered_count} 个不在时间范围内的作品[/]")
 
+    def getMixInfo(self, mix_id, count=35, number=0, increase=False, sec_uid="", start_time="", end_time=""):
+        """获取合集信息"""
+        if mix_id is None:
+            return None
+
+        awemeList = []
+        with self._fetch_progress() as progress:
+            fetch_task = progress.add_task(
+                "[cyan]📥 正在获取合集作品...",
+                total=None
+            )
+            for page in self.iterMixInfo(mix_id, count, number, increase, sec_uid, start_time, end_time):
+                awemeList.extend(page.awemes)
+                progress.update(fetch_task, description=f"[cyan]📥 已获取: {len(awemeList)}个作品")
+
         return awemeList
 
     def getUserAllMixInfo(self, sec_uid, count=35, number=0):
@@ -561,25 +552,17 @@ class Douyin(object):
             times = times + 1
             print("[  提示  ]:正在对 [合集列表] 进行第 " + str(times) + " 次请求...\r")
 
-            start = time.time()  # 开始时间
-            while True:
-                # 接口不稳定, 有时服务器不返回数据, 需要重新获取
-                try:
-                    url = self.urls.USER_MIX_LIST + utils.getXbogus(
-                        f'sec_user_id={sec_uid}&count={count}&cursor={cursor}&device_platform=webapp&aid=6383')
-
-                    res = requests.get(url=url, headers=douyin_headers)
-                    datadict = json.loads(res.text)
-                    print('[  提示  ]:本次请求返回 ' + str(len(datadict["mix_infos"])) + ' 条数据\r')
-
-                    if datadict is not None and datadict["status_code"] == 0:
-                        break
-                except Exception as e:
-                    end = time.time()  # 结束时间
-                    if end - start > self.timeout:
-                        print("[  提示  ]:重复请求该接口" + str(self.timeout) + "s, 仍然未获取到数据")
-                        return mixIdNameDict
-
+            # 接口不稳定, 有时服务器不返回数据, 需要重新获取
+            datadict = retrier.request_json(
+                "USER_MIX_LIST",
+                lambda: self.urls.USER_MIX_LIST + utils.getXbogus(
+                    f'sec_user_id={sec_uid}&count={count}&cursor={cursor}&device_platform=webapp&aid=6383'),
+                headers=douyin_headers,
+                accept=lambda d: d.get("status_code") == 0 and "mix_infos" in d)
+            if datadict is None:
+                print("[  提示  ]:重复请求该接口, 仍然未获取到数据")
+                return mixIdNameDict
+            print('[  提示  ]:本次请求返回 ' + str(len(datadict["mix_infos"])) + ' 条数据\r')
 
             for mix in datadict["mix_infos"]:
                 mixIdNameDict[mix["mix_id"]] = mix["mix_name"]
@@ -603,17 +586,16 @@ class Douyin(object):
 
         return mixIdNameDict
 
-    def getMusicInfo(self, music_id: str, count=35, number=0, increase=False):
+    def iterMusicInfo(self, music_id: str, count=35, number=0, increase=False, cursor=0) -> Iterator[AwemePage]:
+        """按页获取音乐集合下的作品, 参数同 getMusicInfo; cursor 为开始的游标"""
         print('[  提示  ]:正在请求的音乐集合 id = %s\r\n' % music_id)
         if music_id is None:
-            return None
+            return
         if number <= 0:
             numflag = False
         else:
             numflag = True
 
-        cursor = 0
-        awemeList = []
         increaseflag = False
         numberis0 = False
 
@@ -624,120 +606,104 @@ class Douyin(object):
             times = times + 1
             print("[  提示  ]:正在对 [音乐集合] 进行第 " + str(times) + " 次请求...\r")
 
-            start = time.time()  # 开始时间
-            while True:
-                # 接口不稳定, 有时服务器不返回数据, 需要重新获取
-                try:
-                    url = self.urls.MUSIC + utils.getXbogus(
-                        f'music_id={music_id}&cursor={cursor}&count={count}&device_platform=webapp&aid=6383')
-
-                    res = requests.get(url=url, headers=douyin_headers)
-                    datadict = json.loads(res.text)
-                    print('[  提示  ]:本次请求返回 ' + str(len(datadict["aweme_list"])) + ' 条数据\r')
-
-                    if datadict is not None and datadict["status_code"] == 0:
-                        break
-                except Exception as e:
-                    end = time.time()  # 结束时间
-                    if end - start > self.timeout:
-                        print("[  提示  ]:重复请求该接口" + str(self.timeout) + "s, 仍然未获取到数据")
-                        return awemeList
-
+            # 接口不稳定, 有时服务器不返回数据, 需要重新获取
+            datadict = retrier.request_json(
+                "MUSIC",
+                lambda: self.urls.MUSIC + utils.getXbogus(
+                    f'music_id={music_id}&cursor={cursor}&count={count}&device_platform=webapp&aid=6383'),
+                headers=douyin_headers,
+                accept=lambda d: d.get("status_code") == 0 and "aweme_list" in d)
+            if datadict is None:
+                print("[  提示  ]:重复请求该接口, 仍然未获取到数据")
+                return
+            print('[  提示  ]:本次请求返回 ' + str(len(datadict["aweme_list"])) + ' 条数据\r')
+
+            page = AwemePage(cursor, datadict["cursor"],
+                             not (datadict["has_more"] == 0 or datadict["has_more"] == False))
+
+            # 一页数据批量检查和写入
+            with self._page_seen("music", music_id, datadict["aweme_list"]) as (seen, fresh):
+                for aweme in datadict["aweme_list"]:
+                    if self.database:
+                        # 退出条件
+                        if increase is False and numflag and numberis0:
+                            break
+                        if increase and numflag and numberis0 and increaseflag:
+                            break
+                        # 增量更新, 找到非置顶的最新的作品发布时间
+                        if aweme['aweme_id'] in seen:
+                            if increase and aweme['is_top'] == 0:
+                                increaseflag = True
+                        else:
+                            fresh.append(aweme)
 
-            for aweme in datadict["aweme_list"]:
-                if self.database:
-                    # 退出条件
-                    if increase is False and numflag and numberis0:
-                        break
-                    if increase and numflag and numberis0 and increaseflag:
-                        break
-                    # 增量更新, 找到非置顶的最新的作品发布时间
-                    if self.db.get_music(music_id=music_id, aweme_id=aweme['aweme_id']) is not None:
-                        if increase and aweme['is_top'] == 0:
-                            increaseflag = True
+                        # 退出条件
+                        if increase and numflag is False and increaseflag:
+                            break
+                        if increase and numflag and numberis0 and increaseflag:
+                            break
                     else:
-                        self.db.insert_music(music_id=music_id, aweme_id=aweme['aweme_id'], data=aweme)
-
-                    # 退出条件
-                    if increase and numflag is False and increaseflag:
-                        break
-                    if increase and numflag and numberis0 and increaseflag:
-                        break
-                else:
-                    if numflag and numberis0:
-                        break
-
-                if numflag:
-                    number -= 1
-                    if number == 0:
-                        numberis0 = True
-
-                # 清空self.awemeDict
-                self.result.clearDict(self.result.awemeDict)
+                        if numflag and numberis0:
+                            break
 
-                # 默认为视频
-                awemeType = 0
-                try:
-                    if aweme["images"] is not None:
-                        awemeType = 1
-                except Exception as e:
-                    print("[  警告  ]:接口中未找到 images\r")
+                    if numflag:
+                        number -= 1
+                        if number == 0:
+                            numberis0 = True
 
-                # 转换成我们自己的格式
-                self.result.dataConvert(awemeType, self.result.awemeDict, aweme)
+                    # 转换成我们自己的格式, images 不为 None 说明是图集
+                    page.awemes.append(convert_aweme(aweme))
 
-                if self.result.awemeDict is not None and self.result.awemeDict != {}:
-                    awemeList.append(copy.deepcopy(self.result.awemeDict))
+            yield page
 
             if self.database:
                 if increase and numflag is False and increaseflag:
                     print("\r\n[  提示  ]: [音乐集合] 下作品增量更新数据获取完成...\r\n")
-                    break
+                    return
                 elif increase is False and numflag and numberis0:
                     print("\r\n[  提示  ]: [音乐集合] 下指定数量作品数据获取完成...\r\n")
-                    break
+                    return
                 elif increase and numflag and numberis0 and increaseflag:
                     print("\r\n[  提示  ]: [音乐集合] 下指定数量作品数据获取完成, 增量更新数据获取完成...\r\n")
-                    break
+                    return
             else:
                 if numflag and numberis0:
                     print("\r\n[  提示  ]: [音乐集合] 下指定数量作品数据获取完成...\r\n")
-                    break
+                    return
 
             # 更新 cursor
-            cursor = datadict["cursor"]
+            cursor = page.next_cursor
 
             # 退出条件
-            if datadict["has_more"] == 0 or datadict["has_more"] == False:
+            if not page.has_more:
                 print("\r\n[  提示  ]:[音乐集合] 下所有作品数据获取完成...\r\n")
-                break
+                return
             else:
                 print("\r\n[  提示  ]:[音乐集合] 第 " + str(times) + " 次请求成功...\r\n")
 
+    def getMusicInfo(self, music_id: str, count=35, number=0, increase=False):
+        if music_id is None:
+            return None
+        awemeList = []
+        for page in self.iterMusicInfo(music_id, count, number, increase):
+            awemeList.extend(page.awemes)
         return awemeList
 
     def getUserDetailInfo(self, sec_uid):
         if sec_uid is None:
             return None
 
-        datadict = {}
-        start = time.time()  # 开始时间
-        while True:
-            # 接口不稳定, 有时服务器不返回数据, 需要重新获取
-            try:
-                url = self.urls.USER_DETAIL + utils.getXbogus(
-                        f'sec_user_id={sec_uid}&device_platform=webapp&aid=6383')
-
-                res = requests.get(url=url, headers=douyin_headers)
-                datadict = json.loads(res.text)
-
-                if datadict is not None and datadict["status_code"] == 0:
-                    return datadict
-            except Exception as e:
-                end = time.time()  # 结束时间
-                if end - start > self.timeout:
-                    print("[  提示  ]:重复请求该接口" + str(self.timeout) + "s, 仍然未获取到数据")
-                    return datadict
+        # 接口不稳定, 有时服务器不返回数据, 需要重新获取
+        datadict = retrier.request_json(
+            "USER_DETAIL",
+            lambda: self.urls.USER_DETAIL + utils.getXbogus(
+                f'sec_user_id={sec_uid}&device_platform=webapp&aid=6383'),
+            headers=douyin_headers,
+            accept=lambda d: d.get("status_code") == 0)
+        if datadict is None:
+            print("[  提示  ]:重复请求该接口, 仍然未获取到数据")
+            return {}
+        return datadict
 
 
 if __name__ == "__main__":
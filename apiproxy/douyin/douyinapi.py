@@ -3,22 +3,16 @@
 
 
 import re
-import requests
 import json
-import time
-import copy
 
 from apiproxy.douyin import douyin_headers
 from apiproxy.douyin.urls import Urls
-from apiproxy.douyin.result import Result
-from apiproxy.common import utils
+from apiproxy.douyin.aweme import convert_aweme, new_live_dict
+from apiproxy.common import utils, session, retrier
 
 class DouyinApi(object):
     def __init__(self):
         self.urls = Urls()
-        self.result = Result()
-        # 用于设置重复请求某个接口的最大时间
-        self.timeout = 10
 
     # 从分享链接中提取网址
     def getShareLink(self, string):
@@ -32,7 +26,7 @@ class DouyinApi(object):
         key_type = None
 
         try:
-            r = requests.get(url=url, headers=douyin_headers)
+            r = session.get(url=url, headers=douyin_headers)
         except Exception as e:
             print('[  错误  ]:输入链接有误！\r')
             return key_type, key
@@ -79,7 +73,7 @@ class DouyinApi(object):
             key1 = re.findall('reflow/(\d+)?', urlstr)[0]
             url = self.urls.LIVE2 + utils.getXbogus(
                 f'live_id=1&room_id={key1}&app_id=1128')
-            res = requests.get(url, headers=douyin_headers)
+            res = session.get(url, headers=douyin_headers)
             resjson = json.loads(res.text)
             key = resjson['data']['room']['owner']['web_rid']
             key_type = "live"
@@ -96,36 +90,17 @@ class DouyinApi(object):
     def getAwemeInfoApi(self, aweme_id):
         if aweme_id is None:
             return None
-        start = time.time()  # 开始时间
-        while True:
-            try:
-                jx_url = self.urls.POST_DETAIL + utils.getXbogus(
-                    f'aweme_id={aweme_id}&device_platform=webapp&aid=6383')
-
-                raw = requests.get(url=jx_url, headers=douyin_headers).text
-                datadict = json.loads(raw)
-                if datadict is not None and datadict["status_code"] == 0:
-                    break
-            except Exception as e:
-                end = time.time()  # 结束时间
-                if end - start > self.timeout:
-                    return None
-
-        # 清空self.awemeDict
-        self.result.clearDict(self.result.awemeDict)
-
-        # 默认为视频
-        awemeType = 0
-        try:
-            if datadict['aweme_detail']["images"] is not None:
-                awemeType = 1
-        except Exception as e:
-            pass
-
-        # 转换成我们自己的格式
-        self.result.dataConvert(awemeType, self.result.awemeDict, datadict['aweme_detail'])
+        datadict = retrier.request_json(
+            "POST_DETAIL",
+            lambda: self.urls.POST_DETAIL + utils.getXbogus(
+                f'aweme_id={aweme_id}&device_platform=webapp&aid=6383'),
+            headers=douyin_headers,
+            accept=lambda d: d.get("status_code") == 0 and "aweme_detail" in d)
+        if datadict is None:
+            return None
 
-        return self.result.awemeDict, datadict
+        # 转换成我们自己的格式, images 不为 None 说明是图集
+        return convert_aweme(datadict['aweme_detail']), datadict
 
     def getUserInfoApi(self, sec_uid, mode="post", count=35, max_cursor=0):
         if sec_uid is None:
@@ -133,116 +108,89 @@ class DouyinApi(object):
 
         awemeList = []
 
-        start = time.time()  # 开始时间
-        while True:
-            try:
-                if mode == "post":
-                    url = self.urls.USER_POST + utils.getXbogus(
-                        f'sec_user_id={sec_uid}&count={count}&max_cursor={max_cursor}&device_platform=webapp&aid=6383')
-                elif mode == "like":
-                    url = self.urls.USER_FAVORITE_A + utils.getXbogus(
-                        f'sec_user_id={sec_uid}&count={count}&max_cursor={max_cursor}&device_platform=webapp&aid=6383')
-                else:
-                    return None
-
-                res = requests.get(url=url, headers=douyin_headers)
-                datadict = json.loads(res.text)
-                if datadict is not None and datadict["status_code"] == 0:
-                    break
-            except Exception as e:
-                end = time.time()  # 结束时间
-                if end - start > self.timeout:
-                    return None
-
-        for aweme in datadict["aweme_list"]:
-            # 清空self.awemeDict
-            self.result.clearDict(self.result.awemeDict)
-
-            # 默认为视频
-            awemeType = 0
-            try:
-                if aweme["images"] is not None:
-                    awemeType = 1
-            except Exception as e:
-                pass
+        if mode == "post":
+            endpoint = "USER_POST"
+        elif mode == "like":
+            endpoint = "USER_FAVORITE_A"
+        else:
+            return None
 
-            # 转换成我们自己的格式
-            self.result.dataConvert(awemeType, self.result.awemeDict, aweme)
+        datadict = retrier.request_json(
+            endpoint,
+            lambda: getattr(self.urls, endpoint) + utils.getXbogus(
+                f'sec_user_id={sec_uid}&count={count}&max_cursor={max_cursor}&device_platform=webapp&aid=6383'),
+            headers=douyin_headers,
+            accept=lambda d: d.get("status_code") == 0 and "aweme_list" in d)
+        if datadict is None:
+            return None
 
-            if self.result.awemeDict is not None and self.result.awemeDict != {}:
-                awemeList.append(copy.deepcopy(self.result.awemeDict))
+        for aweme in datadict["aweme_list"]:
+            # 转换成我们自己的格式, images 不为 None 说明是图集
+            awemeList.append(convert_aweme(aweme))
 
         return awemeList, datadict, datadict["max_cursor"], datadict["has_more"]
 
     def getLiveInfoApi(self, web_rid: str):
-        start = time.time()  # 开始时间
-        while True:
-            try:
-                live_api = self.urls.LIVE + utils.getXbogus(
-                    f'aid=6383&device_platform=web&web_rid={web_rid}')
-
-                response = requests.get(live_api, headers=douyin_headers)
-                live_json = json.loads(response.text)
-                if live_json != {} and live_json['status_code'] == 0:
-                    break
-            except Exception as e:
-                end = time.time()  # 结束时间
-                if end - start > self.timeout:
-                    return None
-
-        # 清空字典
-        self.result.clearDict(self.result.liveDict)
+        live_json = retrier.request_json(
+            "LIVE",
+            lambda: self.urls.LIVE + utils.getXbogus(f'aid=6383&device_platform=web&web_rid={web_rid}'),
+            headers=douyin_headers,
+            accept=lambda d: d.get("status_code") == 0)
+        if live_json is None:
+            return None
+
+        liveDict = new_live_dict()
 
         # 类型
-        self.result.liveDict["awemeType"] = 2
+        liveDict["awemeType"] = 2
         # 是否在播
-        self.result.liveDict["status"] = live_json['data']['data'][0]['status']
+        liveDict["status"] = live_json['data']['data'][0]['status']
 
-        if self.result.liveDict["status"] == 4:
-            return self.result.liveDict, live_json
+        if liveDict["status"] == 4:
+            return liveDict, live_json
 
         # 直播标题
-        self.result.liveDict["title"] = live_json['data']['data'][0]['title']
+        liveDict["title"] = live_json['data']['data'][0]['title']
 
         # 直播cover
-        self.result.liveDict["cover"] = live_json['data']['data'][0]['cover']['url_list'][0]
+        liveDict["cover"] = live_json['data']['data'][0]['cover']['url_list'][0]
 
         # 头像
-        self.result.liveDict["avatar"] = live_json['data']['data'][0]['owner']['avatar_thumb']['url_list'][0].replace(
+        liveDict["avatar"] = live_json['data']['data'][0]['owner']['avatar_thumb']['url_list'][0].replace(
             "100x100", "1080x1080")
 
         # 观看人数
-        self.result.liveDict["user_count"] = live_json['data']['data'][0]['user_count_str']
+        liveDict["user_count"] = live_json['data']['data'][0]['user_count_str']
 
         # 昵称
-        self.result.liveDict["nickname"] = live_json['data']['data'][0]['owner']['nickname']
+        liveDict["nickname"] = live_json['data']['data'][0]['owner']['nickname']
 
         # sec_uid
-        self.result.liveDict["sec_uid"] = live_json['data']['data'][0]['owner']['sec_uid']
+        liveDict["sec_uid"] = live_json['data']['data'][0]['owner']['sec_uid']
 
         # 直播间观看状态
-        self.result.liveDict["display_long"] = live_json['data']['data'][0]['room_view_stats']['display_long']
+        liveDict["display_long"] = live_json['data']['data'][0]['room_view_stats']['display_long']
 
         # 推流
-        self.result.liveDict["flv_pull_url"] = live_json['data']['data'][0]['stream_url']['flv_pull_url']
+        liveDict["flv_pull_url"] = live_json['data']['data'][0]['stream_url']['flv_pull_url']
 
         try:
             # 分区
-            self.result.liveDict["partition"] = live_json['data']['partition_road_map']['partition']['title']
-            self.result.liveDict["sub_partition"] = \
+            liveDict["partition"] = live_json['data']['partition_road_map']['partition']['title']
+            liveDict["sub_partition"] = \
                 live_json['data']['partition_road_map']['sub_partition']['partition']['title']
         except Exception as e:
-            self.result.liveDict["partition"] = '无'
-            self.result.liveDict["sub_partition"] = '无'
+            liveDict["partition"] = '无'
+            liveDict["sub_partition"] = '无'
 
         flv = []
 
-        for i, f in enumerate(self.result.liveDict["flv_pull_url"].keys()):
+        for i, f in enumerate(liveDict["flv_pull_url"].keys()):
             flv.append(f)
 
-        self.result.liveDict["flv_pull_url0"] = self.result.liveDict["flv_pull_url"][flv[0]]
+        liveDict["flv_pull_url0"] = liveDict["flv_pull_url"][flv[0]]
 
-        return self.result.liveDict, live_json
+        return liveDict, live_json
 
     def getMixInfoApi(self, mix_id: str, count=35, cursor=0):
         if mix_id is None:
@@ -250,39 +198,19 @@ class DouyinApi(object):
 
         awemeList = []
 
-        start = time.time()  # 开始时间
-        while True:
-            try:
-                url = self.urls.USER_MIX + utils.getXbogus(
-                    f'mix_id={mix_id}&cursor={cursor}&count={count}&device_platform=webapp&aid=6383')
-
-                res = requests.get(url=url, headers=douyin_headers)
-                datadict = json.loads(res.text)
-                if datadict is not None:
-                    break
-            except Exception as e:
-                end = time.time()  # 结束时间
-                if end - start > self.timeout:
-                    return None
+        datadict = retrier.request_json(
+            "USER_MIX",
+            lambda: self.urls.USER_MIX + utils.getXbogus(
+                f'mix_id={mix_id}&cursor={cursor}&count={count}&device_platform=webapp&aid=6383'),
+            headers=douyin_headers,
+            accept=lambda d: "aweme_list" in d)
+        if datadict is None:
+            return None
 
         for aweme in datadict["aweme_list"]:
 
-            # 清空self.awemeDict
-            self.result.clearDict(self.result.awemeDict)
-
-            # 默认为视频
-            awemeType = 0
-            try:
-                if aweme["images"] is not None:
-                    awemeType = 1
-            except Exception as e:
-                pass
-
-            # 转换成我们自己的格式
-            self.result.dataConvert(awemeType, self.result.awemeDict, aweme)
-
-            if self.result.awemeDict is not None and self.result.awemeDict != {}:
-                awemeList.append(copy.deepcopy(self.result.awemeDict))
+            # 转换成我们自己的格式, images 不为 None 说明是图集
+            awemeList.append(convert_aweme(aweme))
 
         return awemeList, datadict, datadict["cursor"], datadict["has_more"]
 
@@ -293,20 +221,14 @@ class DouyinApi(object):
 
         mixIdlist = []
 
-        start = time.time()  # 开始时间
-        while True:
-            try:
-                url = self.urls.USER_MIX_LIST + utils.getXbogus(
-                    f'sec_user_id={sec_uid}&count={count}&cursor={cursor}&device_platform=webapp&aid=6383')
-
-                res = requests.get(url=url, headers=douyin_headers)
-                datadict = json.loads(res.text)
-                if datadict is not None and datadict["status_code"] == 0:
-                    break
-            except Exception as e:
-                end = time.time()  # 结束时间
-                if end - start > self.timeout:
-                    return None
+        datadict = retrier.request_json(
+            "USER_MIX_LIST",
+            lambda: self.urls.USER_MIX_LIST + utils.getXbogus(
+                f'sec_user_id={sec_uid}&count={count}&cursor={cursor}&device_platform=webapp&aid=6383'),
+            headers=douyin_headers,
+            accept=lambda d: d.get("status_code") == 0 and "mix_infos" in d)
+        if datadict is None:
+            return None
 
         for mix in datadict["mix_infos"]:
             mixIdNameDict = {}
@@ -321,38 +243,18 @@ class DouyinApi(object):
 
         awemeList = []
 
-        start = time.time()  # 开始时间
-        while True:
-            try:
-                url = self.urls.MUSIC + utils.getXbogus(
-                    f'music_id={music_id}&cursor={cursor}&count={count}&device_platform=webapp&aid=6383')
-
-                res = requests.get(url=url, headers=douyin_headers)
-                datadict = json.loads(res.text)
-                if datadict is not None and datadict["status_code"] == 0:
-                    break
-            except Exception as e:
-                end = time.time()  # 结束时间
-                if end - start > self.timeout:
-                    return None
+        datadict = retrier.request_json(
+            "MUSIC",
+            lambda: self.urls.MUSIC + utils.getXbogus(
+                f'music_id={music_id}&cursor={cursor}&count={count}&device_platform=webapp&aid=6383'),
+            headers=douyin_headers,
+            accept=lambda d: d.get("status_code") == 0 and "aweme_list" in d)
+        if datadict is None:
+            return None
 
         for aweme in datadict["aweme_list"]:
-            # 清空self.awemeDict
-            self.result.clearDict(self.result.awemeDict)
-
-            # 默认为视频
-            awemeType = 0
-            try:
-                if aweme["images"] is not None:
-                    awemeType = 1
-            except Exception as e:
-                pass
-
-            # 转换成我们自己的格式
-            self.result.dataConvert(awemeType, self.result.awemeDict, aweme)
-
-            if self.result.awemeDict is not None and self.result.awemeDict != {}:
-                awemeList.append(copy.deepcopy(self.result.awemeDict))
+            # 转换成我们自己的格式, images 不为 None 说明是图集
+            awemeList.append(convert_aweme(aweme))
 
         return awemeList, datadict, datadict["cursor"], datadict["has_more"]
 
@@ -360,22 +262,13 @@ class DouyinApi(object):
         if sec_uid is None:
             return None
 
-        start = time.time()  # 开始时间
-        while True:
-            # 接口不稳定, 有时服务器不返回数据, 需要重新获取
-            try:
-                url = self.urls.USER_DETAIL + utils.getXbogus(
-                        f'sec_user_id={sec_uid}&device_platform=webapp&aid=6383')
-
-                res = requests.get(url=url, headers=douyin_headers)
-                datadict = json.loads(res.text)
-
-                if datadict is not None and datadict["status_code"] == 0:
-                    return datadict
-            except Exception as e:
-                end = time.time()  # 结束时间
-                if end - start > self.timeout:
-                    return None
+        # 接口不稳定, 有时服务器不返回数据, 需要重新获取
+        return retrier.request_json(
+            "USER_DETAIL",
+            lambda: self.urls.USER_DETAIL + utils.getXbogus(
+                f'sec_user_id={sec_uid}&device_platform=webapp&aid=6383'),
+            headers=douyin_headers,
+            accept=lambda d: d.get("status_code") == 0)
 
 
 
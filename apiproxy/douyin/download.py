@@ -2,13 +2,13 @@
 # -*- coding: utf-8 -*-
 
 
-import os
 import json
 import time
-import requests
+import queue
+from contextlib import contextmanager
 from tqdm import tqdm
-from concurrent.futures import ThreadPoolExecutor, wait, ALL_COMPLETED
-from typing import List, Optional
+from concurrent.futures import ThreadPoolExecutor, wait, ALL_COMPLETED, as_completed
+from typing import Dict, Iterable, List, Optional, Tuple, Union
 from pathlib import Path
 # import asyncio  # 暂时注释掉
 # import aiohttp  # 暂时注释掉
@@ -20,14 +20,80 @@ from rich.text import Text
 from rich import print as rprint
 
 from apiproxy.douyin import douyin_headers
-from apiproxy.common import utils
+from apiproxy.douyin.pipeline import PagePipeline, PipelineStats
+from apiproxy.douyin.assets import AssetStore
+from apiproxy.douyin.partial import PartialDownload, is_complete
+from apiproxy.douyin.progress import ProgressBoard, RichView
+from apiproxy.douyin.quality import QualityPolicy
+from apiproxy.douyin.segmented import SegmentedDownloader, RangeNotSupported, parse_content_range
+from apiproxy.common import utils, session, mirrors, bandwidth
 
 logger = logging.getLogger("douyin_downloader")
 console = Console()
 
+class _JobTracker(object):
+    """汇总每个作品的媒体任务结果, 记入 ProgressBoard 的作品计数
+
+    只在一个线程(或一个事件循环)中调用, 计数不加锁
+    """
+
+    def __init__(self, board: ProgressBoard, console: Console):
+        self.board = board
+        self.console = console
+        self.total = 0
+        self.success = 0
+        self.failed = 0
+        # 作品序号 -> [未完成任务数, 必需文件是否失败]
+        self._remaining: Dict[int, list] = {}
+
+    def discovered(self) -> None:
+        """获取到一个新作品"""
+        self.total += 1
+        self.board.works_total += 1
+
+    def add_work(self, index: int, jobs: list) -> bool:
+        """登记一个作品, 没有任务的作品直接算作成功, 返回是否需要执行任务"""
+        if not jobs:
+            self._finish(False)
+            return False
+        self._remaining[index] = [len(jobs), False]
+        return True
+
+    def work_failed(self, error: str) -> None:
+        self.console.print(f"[red]❌ 下载失败: {error}[/]")
+        self._finish(True)
+
+    def job_done(self, index: int, job: tuple, ok: bool) -> None:
+        urls, _, desc, required, _ = job
+        state = self._remaining[index]
+        state[0] -= 1
+        if required and not ok:
+            if not state[1]:
+                self.console.print(f"[red]❌ 下载失败: {desc} URL={urls[0][:50]}...[/]")
+            state[1] = True
+        if state[0] == 0:
+            del self._remaining[index]
+            self._finish(state[1])
+
+    def _finish(self, failed: bool) -> None:
+        if failed:
+            self.failed += 1
+            self.board.failed += 1
+        else:
+            self.success += 1
+            self.board.success += 1
+
+
 class Download(object):
-    def __init__(self, thread=5, music=True, cover=True, avatar=True, resjson=True, folderstyle=True):
-        self.thread = thread
+    def __init__(self, thread=5, music=True, cover=True, avatar=True, resjson=True, folderstyle=True, prefetch=2,
+                 segments=4, segment_threshold=20, mirror_timeout=5, mirror_race=0, quality=None,
+                 asset_dir=None, headless=False):
+        # 同时进行的媒体下载数量(作品之间及作品内的视频/图片/音乐/封面/头像共用)
+        self.thread = max(1, int(thread or 1))
+        # 已提交但未完成的媒体任务上限, 超过时先等待下载完成再取下一个作品
+        self.max_pending = self.thread * 4
+        # pageDownload 时后台预先获取的列表页数
+        self.prefetch = max(1, int(prefetch or 1))
         self.music = music
         self.cover = cover
         self.avatar = avatar
@@ -40,76 +106,176 @@ class Download(object):
             BarColumn(),
             TaskProgressColumn(),
             TimeRemainingColumn(),
-            transient=True  # 添加这个参数，进度条完成后自动消失
+            transient=True,  # 添加这个参数，进度条完成后自动消失
+            # 只由 ProgressBoard 的采样线程刷新, 下载线程不直接操作进度条
+            auto_refresh=False
         )
+        # 下载线程只累加计数, 由采样线程按固定间隔显示; headless 时不显示进度条(服务器上运行)
+        self.board = ProgressBoard()
+        self.headless = headless
         self.retry_times = 3
         self.chunk_size = 8192
         self.timeout = 30
+        # 有其它镜像地址可换时, 首字节超过这个时间(秒)就换下一个, 0 表示不换
+        self.first_byte_timeout = float(mirror_timeout or 0)
+        # 大于 0 时, 遇到没有统计的 CDN 主机先同时请求各镜像的前 mirror_race KB 比较速度
+        self.race_bytes = int(float(mirror_race or 0) * 1024)
+        # 视频清晰度选择, 默认使用 play_addr(最高清晰度)
+        self.quality = QualityPolicy.from_config(quality)
+        # 头像、音乐、封面按内容只保存一份, 作品目录中为链接; 为空时不使用
+        self.assets = AssetStore(asset_dir) if asset_dir else None
+        # 这个下载任务的带宽令牌桶, 与全局令牌桶一起限制下载速度(bandwidth.job 配置)
+        self.bandwidth = bandwidth.job()
+        # 大于 segment_threshold MB 且支持 Range 的文件分成 segments 段同时下载
+        self.segmented = SegmentedDownloader(segments=segments,
+                                             threshold=int(float(segment_threshold or 0) * 1024 * 1024),
+                                             timeout=self.timeout, retry_times=self.retry_times)
+        # 每个主机的连接池大小与同时打开的连接数一致, 工作线程之间复用 keep-alive 连接
+        session.configure(pool_maxsize=self.thread * self.segmented.segments)
+
+    def _download_media(self, urls: List[str], path: Path, desc: str, asset: Optional[str] = None) -> bool:
+        """通用下载方法，处理所有类型的媒体下载, urls 为同一个文件的镜像地址
 
-    def _download_media(self, url: str, path: Path, desc: str) -> bool:
-        """通用下载方法，处理所有类型的媒体下载"""
-        if path.exists():
+        asset 为资源的 uri, 设置了资源库时相同 uri 的文件只下载一次
+        """
+        # 目标文件只在核对大小后才出现, 存在即完整
+        if is_complete(path):
             self.console.print(f"[cyan]⏭️  跳过已存在: {desc}[/]")
             return True
+
+        if asset and self.assets is not None:
+            # 其它线程正在下载同一个资源时等它完成, 然后直接链接
+            with self.assets.uri_lock(asset):
+                if self.assets.place(asset, path):
+                    self.console.print(f"[cyan]🔗 复用已下载: {desc}[/]")
+                    self.board.file_saved(path)
+                    return True
+                ok = self.download_with_resume(urls, path, desc)
+                if ok:
+                    self.assets.add(asset, path)
+                    self.board.file_saved(path)
+                return ok
             
         # 使用新的断点续传下载方法替换原有的下载逻辑
-        return self.download_with_resume(url, path, desc)
+        ok = self.download_with_resume(urls, path, desc)
+        if ok:
+            self.board.file_saved(path)
+        return ok
+
+    @staticmethod
+    def _url_list(media: Optional[dict]) -> List[str]:
+        """媒体的所有镜像地址"""
+        return [url for url in (media or {}).get("url_list") or [] if url]
+
+    @staticmethod
+    def _asset_key(kind: str, media: Optional[dict]) -> Optional[str]:
+        """资源库中的 uri, 接口没有给出 uri 时为空"""
+        uri = (media or {}).get("uri")
+        return f"{kind}:{uri}" if uri else None
+
+    def _select_rendition(self, aweme: dict) -> Optional[dict]:
+        """按清晰度策略选择视频地址, 没有选择时使用 play_addr"""
+        video = aweme.get("video") or {}
+        rendition = self.quality.select(video.get("bit_rate"))
+        if rendition is None:
+            return video.get("play_addr")
+        logger.debug(f"作品 {aweme.get('aweme_id')} 选择清晰度 {rendition['gear_name']}: "
+                     f"{rendition['width']}x{rendition['height']} {rendition['codec']} "
+                     f"{rendition['bit_rate'] // 1000}kbps {rendition['data_size'] // 1024}KB")
+        return rendition
+
+    def _build_media_jobs(self, aweme: dict, path: Path, name: str,
+                          desc: str) -> List[Tuple[List[str], Path, str, bool, Optional[str]]]:
+        """收集作品需要下载的媒体文件
+
+        Returns:
+            [(镜像地址列表, 保存路径, 描述, 是否必需, 资源 uri), ...] 视频和图集为必需,
+            音乐/封面/头像失败只给出警告; 音乐/封面/头像带有资源 uri, 相同的资源只下载一次
+        """
+        jobs = []
+
+        # 视频或图集
+        if aweme["awemeType"] == 0:  # 视频
+            video_urls = self._url_list(self._select_rendition(aweme))
+            if not video_urls:
+                raise Exception("无法获取视频URL")
+            jobs.append((video_urls, path / f"{name}_video.mp4", f"[视频]{desc}", True, None))
+
+        elif aweme["awemeType"] == 1:  # 图集
+            images = aweme.get("images", [])
+            if not images:
+                raise Exception("图集数据为空")
+
+            for i, image in enumerate(images):
+                image_urls = self._url_list(image)
+                if not image_urls:
+                    raise Exception(f"无法获取图片{i+1}的URL")
+                jobs.append((image_urls, path / f"{name}_image_{i}.jpeg", f"[图集{i+1}]{desc}", True, None))
+
+        # 音乐
+        if self.music:
+            play_url = aweme.get("music", {}).get("play_url")
+            music_urls = self._url_list(play_url)
+            if music_urls:
+                music_name = utils.replaceStr(aweme["music"]["title"])
+                jobs.append((music_urls, path / f"{name}_music_{music_name}.mp3", f"[音乐]{desc}", False,
+                             self._asset_key("music", play_url)))
+
+        # 封面
+        if self.cover and aweme["awemeType"] == 0:
+            cover = aweme.get("video", {}).get("cover")
+            cover_urls = self._url_list(cover)
+            if cover_urls:
+                jobs.append((cover_urls, path / f"{name}_cover.jpeg", f"[封面]{desc}", False,
+                             self._asset_key("cover", cover)))
+
+        # 头像
+        if self.avatar:
+            avatar = aweme.get("author", {}).get("avatar")
+            avatar_urls = self._url_list(avatar)
+            if avatar_urls:
+                jobs.append((avatar_urls, path / f"{name}_avatar.jpeg", f"[头像]{desc}", False,
+                             self._asset_key("avatar", avatar)))
+
+        return jobs
+
+    def _run_media_job(self, urls: List[str], path: Path, desc: str, required: bool,
+                       asset: Optional[str] = None) -> bool:
+        """执行单个媒体下载任务, 可在工作线程中调用"""
+        try:
+            ok = self._download_media(urls, path, desc, asset)
+        except Exception as e:
+            logger.warning(f"下载异常: {desc}, 错误: {str(e)}")
+            ok = False
+        if not ok and not required:
+            self.console.print(f"[yellow]⚠️  下载失败: {desc}[/]")
+        return ok
 
     def _download_media_files(self, aweme: dict, path: Path, name: str, desc: str) -> None:
         """下载所有媒体文件"""
         try:
-            # 下载视频或图集
-            if aweme["awemeType"] == 0:  # 视频
-                video_path = path / f"{name}_video.mp4"
-                video_url = aweme.get("video", {}).get("play_addr", {}).get("url_list", [None])[0]
-                if video_url:
-                    if not self._download_media(video_url, video_path, f"[视频]{desc}"):
-                        raise Exception(f"视频下载失败: URL={video_url[:50]}...")
-                else:
-                    raise Exception("无法获取视频URL")
-                    
-            elif aweme["awemeType"] == 1:  # 图集
-                images = aweme.get("images", [])
-                if not images:
-                    raise Exception("图集数据为空")
-                    
-                for i, image in enumerate(images):
-                    image_url = image.get("url_list", [None])[0]
-                    if image_url:
-                        image_path = path / f"{name}_image_{i}.jpeg"
-                        if not self._download_media(image_url, image_path, f"[图集{i+1}]{desc}"):
-                            raise Exception(f"图片{i+1}下载失败: URL={image_url[:50]}...")
-                    else:
-                        raise Exception(f"无法获取图片{i+1}的URL")
-
-            # 下载音乐
-            if self.music:
-                music_url = aweme.get("music", {}).get("play_url", {}).get("url_list", [None])[0]
-                if music_url:
-                    music_name = utils.replaceStr(aweme["music"]["title"])
-                    music_path = path / f"{name}_music_{music_name}.mp3"
-                    if not self._download_media(music_url, music_path, f"[音乐]{desc}"):
-                        self.console.print(f"[yellow]⚠️  音乐下载失败: {desc}[/]")
-
-            # 下载封面
-            if self.cover and aweme["awemeType"] == 0:
-                cover_url = aweme.get("video", {}).get("cover", {}).get("url_list", [None])[0]
-                if cover_url:
-                    cover_path = path / f"{name}_cover.jpeg"
-                    if not self._download_media(cover_url, cover_path, f"[封面]{desc}"):
-                        self.console.print(f"[yellow]⚠️  封面下载失败: {desc}[/]")
-
-            # 下载头像
-            if self.avatar:
-                avatar_url = aweme.get("author", {}).get("avatar", {}).get("url_list", [None])[0]
-                if avatar_url:
-                    avatar_path = path / f"{name}_avatar.jpeg"
-                    if not self._download_media(avatar_url, avatar_path, f"[头像]{desc}"):
-                        self.console.print(f"[yellow]⚠️  头像下载失败: {desc}[/]")
-                    
+            for urls, file_path, file_desc, required, asset in self._build_media_jobs(aweme, path, name, desc):
+                if not self._run_media_job(urls, file_path, file_desc, required, asset) and required:
+                    raise Exception(f"{file_desc}下载失败: URL={urls[0][:50]}...")
         except Exception as e:
             raise Exception(f"下载失败: {str(e)}")
 
+    def _prepare_aweme(self, awemeDict: dict, savePath: Path) -> Tuple[Path, str]:
+        """创建作品目录并保存JSON, 返回 (作品目录, 文件名前缀)"""
+        save_path = Path(savePath)
+        save_path.mkdir(parents=True, exist_ok=True)
+
+        # 构建文件名
+        file_name = f"{awemeDict['create_time']}_{utils.replaceStr(awemeDict['desc'])}"
+        aweme_path = save_path / file_name if self.folderstyle else save_path
+        aweme_path.mkdir(exist_ok=True)
+
+        # 保存JSON数据
+        if self.resjson:
+            self._save_json(aweme_path / f"{file_name}_result.json", awemeDict)
+
+        return aweme_path, file_name
+
     def awemeDownload(self, awemeDict: dict, savePath: Path) -> None:
         """下载单个作品的所有内容"""
         if not awemeDict:
@@ -117,18 +283,7 @@ class Download(object):
             return
             
         try:
-            # 创建保存目录
-            save_path = Path(savePath)
-            save_path.mkdir(parents=True, exist_ok=True)
-            
-            # 构建文件名
-            file_name = f"{awemeDict['create_time']}_{utils.replaceStr(awemeDict['desc'])}"
-            aweme_path = save_path / file_name if self.folderstyle else save_path
-            aweme_path.mkdir(exist_ok=True)
-            
-            # 保存JSON数据
-            if self.resjson:
-                self._save_json(aweme_path / f"{file_name}_result.json", awemeDict)
+            aweme_path, file_name = self._prepare_aweme(awemeDict, savePath)
                 
             # 下载媒体文件
             desc = file_name[:30]
@@ -145,8 +300,15 @@ class Download(object):
         except Exception as e:
             logger.error(f"保存JSON失败: {path}, 错误: {str(e)}")
 
-    def userDownload(self, awemeList: List[dict], savePath: Path):
-        if not awemeList:
+    def userDownload(self, awemeList: Iterable[dict], savePath: Path):
+        """下载作品列表
+
+        awemeList 可以是列表, 也可以是生成器(例如 Douyin.iter* 的结果展开),
+        生成器时边获取边下载: 拿到一个作品就提交它的媒体任务, 不等待后续页面
+        """
+        # 列表在开始前就知道总数, 生成器只能在结束后统计
+        streaming = not isinstance(awemeList, (list, tuple))
+        if not streaming and not awemeList:
             self.console.print("[yellow]⚠️  没有找到可下载的内容[/]")
             return
 
@@ -154,14 +316,13 @@ class Download(object):
         save_path.mkdir(parents=True, exist_ok=True)
 
         start_time = time.time()
-        total_count = len(awemeList)
-        success_count = 0
+        start_bytes = self.board.transferred()
         
         # 显示下载信息面板
         self.console.print(Panel(
             Text.assemble(
                 ("下载配置\n", "bold cyan"),
-                (f"总数: {total_count} 个作品\n", "cyan"),
+                ("总数: 边获取边下载\n" if streaming else f"总数: {len(awemeList)} 个作品\n", "cyan"),
                 (f"线程: {self.thread}\n", "cyan"),
                 (f"保存路径: {save_path}\n", "cyan"),
             ),
@@ -169,96 +330,330 @@ class Download(object):
             border_style="cyan"
         ))
 
-        with self.progress:
-            download_task = self.progress.add_task(
-                "[cyan]📥 批量下载进度", 
-                total=total_count
-            )
-            
-            for aweme in awemeList:
-                try:
-                    self.awemeDownload(awemeDict=aweme, savePath=save_path)
-                    success_count += 1
-                    self.progress.update(download_task, advance=1)
-                except Exception as e:
-                    self.console.print(f"[red]❌ 下载失败: {str(e)}[/]")
+        with self._rendering(streaming, None if streaming else len(awemeList)):
+            tracker = _JobTracker(self.board, self.console)
+            self._run_jobs(awemeList, save_path, tracker)
+            success_count, failed_count, total_count = tracker.success, tracker.failed, tracker.total
+        logger.debug(f"CDN 主机统计: {mirrors.stats()}")
+        if self.assets is not None:
+            logger.debug(f"资源库统计: {self.assets.stats()}")
+
+        if total_count == 0:
+            self.console.print("[yellow]⚠️  没有找到可下载的内容[/]")
+            return
 
         # 显示下载完成统计
         end_time = time.time()
         duration = end_time - start_time
         minutes = int(duration // 60)
         seconds = int(duration % 60)
+        transferred = self.board.transferred() - start_bytes
         
         self.console.print(Panel(
             Text.assemble(
                 ("下载完成\n", "bold green"),
                 (f"成功: {success_count}/{total_count}\n", "green"),
+                (f"失败: {failed_count}\n", "green"),
                 (f"用时: {minutes}分{seconds}秒\n", "green"),
+                (f"下载量: {transferred / 1024 / 1024:.1f}MB, 平均 {transferred / max(duration, 0.001) / 1024 / 1024:.2f}MB/s\n",
+                 "green"),
                 (f"保存位置: {save_path}\n", "green"),
             ),
             title="下载统计",
             border_style="green"
         ))
 
-    def download_with_resume(self, url: str, filepath: Path, desc: str) -> bool:
-        """支持断点续传的下载方法"""
-        file_size = filepath.stat().st_size if filepath.exists() else 0
-        headers = {'Range': f'bytes={file_size}-'} if file_size > 0 else {}
-        
-        for attempt in range(self.retry_times):
+    @contextmanager
+    def _rendering(self, streaming: bool, total: Optional[int]):
+        """下载期间显示进度条; headless 时只为其它监听者(如 Web 的下载状态)采样"""
+        if self.headless:
+            with self.board.sampling():
+                yield
+            return
+        with self.progress:
+            view = RichView(self.progress, self.board, streaming, total)
+            self.board.listen(view)
             try:
-                response = requests.get(url, headers={**douyin_headers, **headers}, 
-                                     stream=True, timeout=self.timeout)
-                
-                if response.status_code not in (200, 206):
-                    raise Exception(f"HTTP {response.status_code}")
-                    
-                total_size = int(response.headers.get('content-length', 0)) + file_size
-                mode = 'ab' if file_size > 0 else 'wb'
-                
-                # 使用现有的进度条，而不是创建新的
-                task = self.progress.add_task(f"[cyan]⬇️  {desc}", total=total_size)
-                self.progress.update(task, completed=file_size)  # 更新断点续传的进度
-                
-                with open(filepath, mode) as f:
+                with self.board.sampling():
+                    yield
+            finally:
+                self.board.unlisten(view)
+                view.close()
+
+    def pageDownload(self, pages: Iterable, savePath: Path) -> PipelineStats:
+        """边翻页边下载 Douyin.iter* 产出的 AwemePage, 返回各阶段耗时
+
+        后台线程提前获取 self.prefetch 页, 下一页的请求与当前页的下载同时进行
+        """
+        pipeline = PagePipeline(pages, self.prefetch)
+        self.userDownload(pipeline, savePath)
+        if pipeline.stats.pages:
+            self.console.print(Panel(pipeline.stats.summary(), title="阶段耗时", border_style="cyan"))
+        logger.debug(f"阶段耗时: {pipeline.stats.to_dict()}")
+        return pipeline.stats
+
+    def _iter_jobs(self, awemeList: Iterable[dict], save_path: Path, tracker: "_JobTracker", start: int = 0):
+        """逐个准备作品目录, 产出 (作品序号, 媒体任务列表), 序号从 start 开始"""
+        for index, aweme in enumerate(awemeList, start):
+            tracker.discovered()
+            try:
+                aweme_path, file_name = self._prepare_aweme(aweme, save_path)
+                jobs = self._build_media_jobs(aweme, aweme_path, file_name, file_name[:30])
+            except Exception as e:
+                tracker.work_failed(str(e))
+                continue
+            if tracker.add_work(index, jobs):
+                yield index, jobs
+
+    def _run_jobs(self, awemeList: Iterable[dict], save_path: Path, tracker: "_JobTracker") -> None:
+        """执行所有作品的媒体任务, 结果记录在 tracker 中"""
+        # 完成的任务由工作线程放入队列, 结果统一在当前线程汇总, 计数无需加锁
+        done = queue.Queue()
+        future_owner = {}
+
+        def collect(limit: int) -> None:
+            """汇总已完成的任务; 未完成的任务超过 limit 个时等待"""
+            while future_owner:
+                try:
+                    future = done.get(block=len(future_owner) > limit)
+                except queue.Empty:
+                    return
+                index, job = future_owner.pop(future)
+                try:
+                    ok = future.result()
+                except Exception as e:
+                    logger.error(f"下载任务异常: {job[2]}, 错误: {str(e)}")
+                    ok = False
+                tracker.job_done(index, job, ok)
+
+        # 所有作品的媒体文件放进同一个线程池, 同时下载的数量由 self.thread 限制
+        with ThreadPoolExecutor(max_workers=self.thread) as executor:
+            # awemeList 为生成器时, 取下一个作品可能要请求下一页, 期间已提交的任务继续下载
+            for index, jobs in self._iter_jobs(awemeList, save_path, tracker):
+                for job in jobs:
+                    future = executor.submit(self._run_media_job, *job)
+                    future_owner[future] = (index, job)
+                    future.add_done_callback(done.put)
+                # 汇总已经完成的任务, 进度条随下载推进; 任务过多时等待, 不再继续取作品
+                collect(self.max_pending)
+            collect(0)
+
+    def _segmented_size(self, status: int, content_range: Optional[str], offset: int) -> Optional[int]:
+        """从头下载且服务器支持 Range 时, 返回需要分段下载的文件大小, 否则返回 None"""
+        if offset > 0 or status != 206:
+            return None
+        content_range = parse_content_range(content_range)
+        if content_range is None or content_range[0] != 0 or not self.segmented.enabled_for(content_range[2]):
+            return None
+        return content_range[2]
+
+    def _download_segmented(self, url: str, desc: str, state: PartialDownload) -> Optional[bool]:
+        """分段下载, 返回是否成功; 服务器不支持 Range 时返回 None, 由调用方改为单连接下载"""
+        progress = self.board.start_file(desc, state.size, state.completed_bytes())
+        try:
+            return self.segmented.download(state, url, headers=douyin_headers, on_progress=progress.advance,
+                                           throttle=self._throttle)
+        except RangeNotSupported as e:
+            logger.info(f"不支持分段下载, 改为单连接: {desc}, {str(e)}")
+            return None
+        except Exception as e:
+            logger.warning(f"分段下载失败: {desc}, 错误: {str(e)}")
+            return False
+        finally:
+            self.board.finish_file(progress)
+
+    def _throttle(self, size: int) -> None:
+        """下载 size 字节后按全局和任务的带宽上限等待"""
+        bandwidth.consume(size, self.bandwidth)
+
+    @staticmethod
+    def _range_headers(partial: Optional[PartialDownload], offset: int, segmented: bool) -> dict:
+        """续传时从 offset 开始, 文件变化时由 If-Range 让服务器返回完整文件;
+        从头下载时也带上 Range, 根据响应判断是否支持分段下载, 不需要额外的探测请求"""
+        if offset > 0:
+            return {'Range': f'bytes={offset}-', **partial.if_range()}
+        return {'Range': 'bytes=0-'} if segmented else {}
+
+    @staticmethod
+    def _open_partial(url: str, filepath: Path, partial: Optional[PartialDownload], offset: int,
+                      status: int, response_headers) -> Tuple[PartialDownload, int]:
+        """根据响应确定 .part 的写入位置, 返回 (记录, 起始位置)
+
+        续传得到 206 且位置一致时接着写; 得到 200(服务器忽略 Range 或文件已变化)时丢弃旧数据从头写
+        """
+        content_range = parse_content_range(response_headers.get('content-range'))
+        if status == 206:
+            if content_range is None or content_range[0] != offset:
+                raise Exception(f"Content-Range 不符: {response_headers.get('content-range')}")
+            size = content_range[2]
+            if offset > 0:
+                if partial.size is not None and size not in (None, partial.size):
+                    partial.discard()
+                    raise Exception(f"文件大小已变化: {partial.size} -> {size}")
+                return partial, offset
+        else:
+            length = response_headers.get('content-length')
+            size = int(length) if length else None
+
+        if partial is not None:
+            partial.discard()
+        # 先写记录再写数据, 中断后总能找到记录
+        partial = PartialDownload.from_headers(filepath, url, size, response_headers)
+        partial.save()
+        return partial, 0
+
+    def _mirror_order(self, url: Union[str, List[str]]) -> List[str]:
+        """按 CDN 主机的统计排列镜像地址; 开启 race_bytes 时先让没有统计的主机比一次速度"""
+        urls = mirrors.order([url] if isinstance(url, str) else url)
+        if self.race_bytes > 0 and len(urls) > 1 and mirrors.unknown(urls):
+            self._race_mirrors(urls)
+            urls = mirrors.order(urls)
+        return urls
+
+    def _race_mirrors(self, urls: List[str]) -> None:
+        """同时请求每个镜像的前 race_bytes 字节, 结果记入主机统计
+
+        第一个镜像成功后就返回, 其余的请求在后台完成后再记入统计
+        """
+        def fetch(url):
+            start = time.time()
+            latency = None
+            try:
+                headers = {**douyin_headers, 'Range': f'bytes=0-{self.race_bytes - 1}'}
+                timeout = (self.timeout, self.first_byte_timeout or self.timeout)
+                with session.get(url, headers=headers, stream=True, timeout=timeout) as response:
+                    latency = time.time() - start
+                    if response.status_code not in (200, 206):
+                        raise Exception(f"HTTP {response.status_code}")
+                    size = 0
                     for chunk in response.iter_content(chunk_size=self.chunk_size):
-                        if chunk:
-                            size = f.write(chunk)
-                            self.progress.update(task, advance=size)
-                            
-                # 下载完成后移除任务
-                self.progress.remove_task(task)
+                        size += len(chunk)
+                        if size >= self.race_bytes:
+                            break
+                mirrors.record(url, True, latency, size, time.time() - start - latency)
                 return True
-                
             except Exception as e:
-                logger.warning(f"下载失败 (尝试 {attempt + 1}/{self.retry_times}): {str(e)}")
-                if attempt == self.retry_times - 1:
-                    return False
-                time.sleep(2 ** attempt)  # 指数退避
-        return False
+                logger.debug(f"镜像测速失败: {mirrors.host(url)}, 错误: {str(e)}")
+                mirrors.record(url, False, latency)
+                return False
 
+        executor = ThreadPoolExecutor(max_workers=len(urls))
+        try:
+            for future in as_completed([executor.submit(fetch, url) for url in urls]):
+                if future.result():
+                    return
+        finally:
+            executor.shutdown(wait=False)
 
-class DownloadManager:
-    def __init__(self, max_workers=3):
-        self.executor = ThreadPoolExecutor(max_workers=max_workers)
-    
-    def download_with_resume(self, url, filepath, callback=None):
-        # 检查是否存在部分下载的文件
-        file_size = os.path.getsize(filepath) if os.path.exists(filepath) else 0
-        
-        headers = {'Range': f'bytes={file_size}-'}
-        
-        response = requests.get(url, headers=headers, stream=True)
-        total_size = int(response.headers.get('content-length', 0))
-        
-        mode = 'ab' if file_size > 0 else 'wb'
-        
-        with open(filepath, mode) as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                if chunk:
-                    f.write(chunk)
-                    if callback:
-                        callback(len(chunk))
+    def _mirror_attempts(self, urls: List[str]) -> int:
+        """总尝试次数: 先把每个镜像各试一次, 之后再重试 retry_times - 1 次"""
+        return len(urls) + self.retry_times - 1
+
+    def _mirror_timeout(self, urls: List[str], attempt: int) -> float:
+        """读取超时: 第一轮还有其它镜像可换时, 首字节(或中途停顿)超过 first_byte_timeout 就换下一个"""
+        if attempt < len(urls) - 1 and self.first_byte_timeout:
+            return min(self.first_byte_timeout, self.timeout)
+        return self.timeout
+
+    @staticmethod
+    def _mirror_backoff(urls: List[str], attempt: int) -> float:
+        """失败后的等待时间: 第一轮立即换下一个镜像, 之后指数退避"""
+        if attempt < len(urls) - 1:
+            return 0.0
+        return 2 ** (attempt - len(urls) + 1)
+
+    def download_with_resume(self, url: Union[str, List[str]], filepath: Path, desc: str,
+                             segmented: bool = True) -> bool:
+        """支持断点续传的下载方法
+
+        url 可以是同一个文件的多个镜像地址, 按 CDN 主机的统计从快到慢使用, 一个地址失败或
+        首字节太慢时换下一个, 已下载的部分在新的地址上继续。
+        数据先写入 <文件名>.part, 核对大小后再改名为目标文件, 中断后根据 .part.json 中的记录续传。
+        segmented 为 True 时, 大文件按 self.segmented 的设置分段下载
+        """
+        urls = self._mirror_order(url)
+        if not urls:
+            return False
+        segmented = segmented and self.segmented.segments > 1
+        partial = PartialDownload.load(filepath)
+        if partial is not None and partial.segmented:
+            # 上次中断的分段下载只下载未完成的分段
+            ok = self._download_segmented(urls[0], desc, partial) if segmented else None
+            if ok is not None:
+                return ok
+            partial.discard()
+            partial, segmented = None, False
+
+        segmented_state = None
+        attempts = self._mirror_attempts(urls)
+        for attempt in range(attempts):
+            progress = None
+            url = urls[attempt % len(urls)]
+            # 每次重试都重新计算已下载的大小, 上一次中断的部分不会重复下载
+            offset = partial.part_size() if partial is not None else 0
+            headers = self._range_headers(partial, offset, segmented)
+            start, latency, written = time.time(), None, 0
+            try:
+                # 使用共享连接池, 出错时 with 会关闭响应, 避免连接泄漏
+                with session.get(url, headers={**douyin_headers, **headers}, stream=True,
+                                 timeout=(self.timeout, self._mirror_timeout(urls, attempt))) as response:
+                    latency = time.time() - start
+
+                    # 已下载的部分可能就是完整文件
+                    if response.status_code == 416 and offset > 0:
+                        if partial.finish():
+                            return True
+                        partial.discard()
+                        raise Exception("HTTP 416")
+                    if response.status_code not in (200, 206):
+                        raise Exception(f"HTTP {response.status_code}")
+
+                    # 大文件: 关闭这个连接, 改为分段下载
+                    if segmented:
+                        size = self._segmented_size(response.status_code, response.headers.get('content-range'),
+                                                    offset)
+                        if size is not None:
+                            mirrors.record(url, True, latency)
+                            segmented_state = self.segmented.start(filepath, url, size, response.headers)
+                            break
+
+                    partial, offset = self._open_partial(url, filepath, partial, offset,
+                                                         response.status_code, response.headers)
+
+                    # 只累加计数, 由采样线程显示; 断点续传时从已下载的大小开始
+                    progress = self.board.start_file(desc, partial.size, offset)
+
+                    with open(partial.part, 'ab' if offset > 0 else 'wb') as f:
+                        for chunk in response.iter_content(chunk_size=self.chunk_size):
+                            if chunk:
+                                size = f.write(chunk)
+                                written += size
+                                progress.advance(size)
+                                self._throttle(size)
+
+                elapsed = time.time() - start - latency
+                # 核对大小后改名, 不完整时保留 .part, 下一次尝试继续; 只有完整的传输记为成功
+                if not partial.finish():
+                    raise Exception(f"文件不完整: {partial.part_size()}/{partial.size}")
+                mirrors.record(url, True, latency, written, elapsed)
+                self.board.finish_file(progress)
+                return True
+
+            except Exception as e:
+                if progress is not None:
+                    self.board.finish_file(progress)
+                mirrors.record(url, False, latency)
+                logger.warning(f"下载失败 (尝试 {attempt + 1}/{attempts}, {mirrors.host(url)}): {str(e)}")
+                if attempt == attempts - 1:
+                    return False
+                delay = self._mirror_backoff(urls, attempt)
+                if delay:
+                    time.sleep(delay)  # 指数退避
+
+        if segmented_state is not None:
+            ok = self._download_segmented(segmented_state.url, desc, segmented_state)
+            return self.download_with_resume(urls, filepath, desc, segmented=False) if ok is None else ok
+        return False
 
 
 if __name__ == "__main__":
@@ -0,0 +1,152 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+import os
+import json
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+
+def part_path(target: Path) -> Path:
+    """下载中的临时文件"""
+    return target.with_name(target.name + ".part")
+
+
+def meta_path(target: Path) -> Path:
+    """临时文件的记录"""
+    return target.with_name(target.name + ".part.json")
+
+
+def is_complete(target: Path) -> bool:
+    """目标文件是否已经下载完成
+
+    下载过程只写 .part, 核对大小后才改名为目标文件, 所以目标文件存在就是完整的,
+    只需要一次 stat, 不访问网络。空文件(旧版本中断时留下的)视为未完成。
+    """
+    try:
+        return target.stat().st_size > 0
+    except OSError:
+        return False
+
+
+class PartialDownload(object):
+    """一个未完成的下载: <文件名>.part 和记录 <文件名>.part.json
+
+    记录中保存地址、文件大小、ETag/Last-Modified, 分段下载时还有分段和已完成的分段。
+    续传时用 If-Range 带上 ETag 或 Last-Modified, 文件在服务器上变化时服务器返回 200,
+    从头重新下载, 不会把新旧内容拼在一起。每次修改都先写临时文件再替换, 中断时不会损坏记录。
+    """
+
+    def __init__(self, target: Path, url: str, size: Optional[int] = None, etag: Optional[str] = None,
+                 last_modified: Optional[str] = None, ranges: Optional[List[Tuple[int, int]]] = None,
+                 done=None):
+        self.target = Path(target)
+        self.url = url
+        # 文件大小, 服务器没有给出时为 None
+        self.size = size
+        self.etag = etag
+        self.last_modified = last_modified
+        # 分段下载的分段 [(起始, 结束), ...], 单连接下载时为空
+        self.ranges = ranges or []
+        self.done = set(done or ())
+        self._lock = threading.Lock()
+
+    @property
+    def part(self) -> Path:
+        return part_path(self.target)
+
+    @property
+    def meta(self) -> Path:
+        return meta_path(self.target)
+
+    @property
+    def segmented(self) -> bool:
+        return bool(self.ranges)
+
+    @classmethod
+    def load(cls, target: Path) -> Optional["PartialDownload"]:
+        """读取上次中断的下载, 没有 .part、记录不存在或损坏时返回 None"""
+        target = Path(target)
+        if not part_path(target).exists():
+            return None
+        try:
+            with open(meta_path(target), "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return cls(target, data["url"], data.get("size"), data.get("etag"), data.get("last_modified"),
+                       [tuple(r) for r in data.get("ranges") or []], data.get("done"))
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    @classmethod
+    def from_headers(cls, target: Path, url: str, size: Optional[int], headers) -> "PartialDownload":
+        """根据响应头创建记录"""
+        return cls(target, url, size, etag=headers.get("etag"), last_modified=headers.get("last-modified"))
+
+    def if_range(self) -> Dict[str, str]:
+        """续传请求的 If-Range 请求头, 没有 ETag/Last-Modified 时为空"""
+        # 弱 ETag 不能用于 If-Range
+        if self.etag and not self.etag.startswith("W/"):
+            return {"If-Range": self.etag}
+        if self.last_modified:
+            return {"If-Range": self.last_modified}
+        return {}
+
+    def part_size(self) -> int:
+        try:
+            return self.part.stat().st_size
+        except OSError:
+            return 0
+
+    def pending(self) -> List[int]:
+        return [i for i in range(len(self.ranges)) if i not in self.done]
+
+    def completed_bytes(self) -> int:
+        if not self.segmented:
+            return self.part_size()
+        return sum(self.ranges[i][1] - self.ranges[i][0] + 1 for i in self.done)
+
+    def mark_done(self, index: int) -> None:
+        with self._lock:
+            self.done.add(index)
+            self.save()
+
+    def save(self) -> None:
+        tmp = self.meta.with_name(self.meta.name + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"url": self.url, "size": self.size, "etag": self.etag, "last_modified": self.last_modified,
+                       "ranges": self.ranges, "done": sorted(self.done)}, f)
+        os.replace(tmp, self.meta)
+
+    def discard(self) -> None:
+        """删除临时文件和记录"""
+        for path in (self.part, self.meta):
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+
+    def finish(self) -> bool:
+        """核对 .part 的大小, 一致时改名为目标文件并删除记录
+
+        大小不一致时返回 False: 比预期小的保留下来继续续传, 比预期大的删除
+        """
+        # 分段下载的文件预先分配了大小, 还要检查所有分段都已完成
+        if self.pending():
+            return False
+        size = self.part_size()
+        if self.size is not None and size != self.size:
+            if size > self.size:
+                self.discard()
+            return False
+        os.replace(self.part, self.target)
+        try:
+            self.meta.unlink()
+        except FileNotFoundError:
+            pass
+        return True
+
+
+if __name__ == "__main__":
+    pass
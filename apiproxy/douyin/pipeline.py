@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+import time
+import queue
+import threading
+from typing import Iterable, Iterator
+
+from apiproxy.douyin.aweme import AwemePage
+
+# 获取线程结束的标记
+_END = object()
+
+
+class PipelineStats(object):
+    """流水线各阶段的耗时(秒)"""
+    __slots__ = ("pages", "awemes", "fetch", "fetch_blocked", "download_wait", "elapsed")
+
+    def __init__(self):
+        self.pages = 0
+        self.awemes = 0
+        # 获取线程请求列表页的时间
+        self.fetch = 0.0
+        # 队列已满, 获取线程等待下载腾出位置的时间
+        self.fetch_blocked = 0.0
+        # 队列为空, 下载等待下一页的时间
+        self.download_wait = 0.0
+        # 从开始到结束的总时间
+        self.elapsed = 0.0
+
+    def bottleneck(self) -> str:
+        """下载等列表的时间多说明列表是瓶颈, 反之是下载"""
+        return "获取列表" if self.download_wait > self.fetch_blocked else "下载"
+
+    def summary(self) -> str:
+        return (f"列表: {self.pages} 页 / {self.awemes} 个作品, 请求耗时 {self.fetch:.2f} 秒\n"
+                f"列表等待下载: {self.fetch_blocked:.2f} 秒\n"
+                f"下载等待列表: {self.download_wait:.2f} 秒\n"
+                f"总耗时: {self.elapsed:.2f} 秒, 瓶颈: {self.bottleneck()}")
+
+    def to_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class PagePipeline(object):
+    """获取列表和下载同时进行的流水线
+
+    后台线程沿着 cursor 依次请求列表页(Douyin.iter* 的结果), 放入有界队列;
+    迭代 PagePipeline 逐个得到作品, 交给 Download.userDownload 下载。
+    队列最多缓存 prefetch 页, 下载跟不上时获取线程阻塞, 内存占用不随作品总数增长。
+    """
+
+    def __init__(self, pages: Iterable[AwemePage], prefetch: int = 2):
+        self.pages = iter(pages)
+        self.prefetch = max(1, int(prefetch or 1))
+        self.stats = PipelineStats()
+        self._queue = queue.Queue(maxsize=self.prefetch)
+        self._stop = threading.Event()
+        self._thread = None
+        self._error = None
+        self._started = 0.0
+
+    def _put(self, item) -> bool:
+        """放入队列, 下载端已经停止时返回 False"""
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _produce(self) -> None:
+        try:
+            while not self._stop.is_set():
+                start = time.perf_counter()
+                page = next(self.pages, None)
+                self.stats.fetch += time.perf_counter() - start
+                if page is None:
+                    break
+                self.stats.pages += 1
+                self.stats.awemes += len(page)
+
+                start = time.perf_counter()
+                if not self._put(page):
+                    break
+                self.stats.fetch_blocked += time.perf_counter() - start
+        except Exception as e:
+            self._error = e
+        finally:
+            # 生成器只能在执行它的线程中关闭
+            close = getattr(self.pages, "close", None)
+            if close is not None:
+                close()
+            self._put(_END)
+
+    def start(self) -> "PagePipeline":
+        if self._thread is None:
+            self._started = time.perf_counter()
+            self._thread = threading.Thread(target=self._produce, name="douyin-page-prefetch", daemon=True)
+            self._thread.start()
+        return self
+
+    def __iter__(self) -> Iterator[dict]:
+        self.start()
+        try:
+            while True:
+                start = time.perf_counter()
+                page = self._queue.get()
+                self.stats.download_wait += time.perf_counter() - start
+                if page is _END:
+                    break
+                yield from page.awemes
+            if self._error is not None:
+                raise self._error
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        """停止获取线程并等待它退出"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self.stats.elapsed = time.perf_counter() - self._started
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,236 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+import time
+import logging
+import itertools
+import threading
+from pathlib import Path
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+from rich.progress import Progress
+
+logger = logging.getLogger("douyin_downloader")
+
+
+def _sum(counters: Dict[int, int]) -> int:
+    # list() 在 CPython 中一次完成, 其它线程同时加入新的键也不会出错
+    return sum(list(counters.values()))
+
+
+class FileProgress(object):
+    """一个正在下载的文件的进度
+
+    每个线程只修改自己的计数(以线程 id 为键), 不需要加锁;
+    分段下载时多个连接的线程同时调用 advance 也不会丢失计数。
+    """
+    __slots__ = ("id", "desc", "total", "base", "_counters")
+
+    def __init__(self, id: int, desc: str, total: Optional[int], completed: int = 0):
+        self.id = id
+        self.desc = desc
+        self.total = total
+        # 开始时已经完成的字节数(续传)
+        self.base = completed
+        self._counters: Dict[int, int] = {}
+
+    def advance(self, size: int) -> None:
+        """下载了 size 字节, 分段重试时为负数"""
+        key = threading.get_ident()
+        self._counters[key] = self._counters.get(key, 0) + size
+
+    @property
+    def transferred(self) -> int:
+        """这一次实际下载的字节数"""
+        return _sum(self._counters)
+
+    @property
+    def completed(self) -> int:
+        return self.base + self.transferred
+
+
+class ProgressBoard(object):
+    """下载进度汇总
+
+    下载线程(或协程)只累加计数: 每个文件一个 FileProgress, 作品的完成数由
+    _JobTracker 在汇总线程中修改, 都不加锁。一个采样线程按固定间隔读取这些计数,
+    计算速度后交给监听者(rich 进度条、Web 的 download_status 等)。
+    没有监听者时不启动采样线程, 服务器上运行时没有任何绘制开销。
+    """
+
+    def __init__(self, interval=0.25):
+        # 采样间隔(秒)
+        self.interval = interval
+        self._files: Dict[int, FileProgress] = {}
+        # next() 在 CPython 中是原子操作, 多个线程同时取也不会重复
+        self._ids = itertools.count(1)
+        # 已结束的文件下载的字节数, 键为线程 id
+        self._finished: Dict[int, int] = {}
+        # 新保存的文件数, 键为线程 id; 以及文件保存后的回调(如更新 Web 的文件索引)
+        self._saved: Dict[int, int] = {}
+        self._file_listeners: List[Callable[[Path], None]] = []
+        # 作品数, 只在汇总线程中修改
+        self.works_total = 0
+        self.success = 0
+        self.failed = 0
+        self.speed = 0.0
+        self._sample = (time.monotonic(), 0)
+        self._listeners: List[Callable[[dict], None]] = []
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start_file(self, desc: str, total: Optional[int], completed: int = 0) -> FileProgress:
+        progress = FileProgress(next(self._ids), desc, total, completed)
+        self._files[progress.id] = progress
+        return progress
+
+    def finish_file(self, progress: FileProgress) -> None:
+        if self._files.pop(progress.id, None) is not None:
+            key = threading.get_ident()
+            self._finished[key] = self._finished.get(key, 0) + progress.transferred
+
+    def file_saved(self, path: Path) -> None:
+        """一个文件已保存到最终位置(下载完成或从资源库链接), 在下载线程中调用
+
+        跳过的已存在文件不算; 回调在下载线程中执行, 应当很快返回
+        """
+        key = threading.get_ident()
+        self._saved[key] = self._saved.get(key, 0) + 1
+        for listener in list(self._file_listeners):
+            try:
+                listener(path)
+            except Exception as e:
+                logger.debug(f"文件保存回调出错: {str(e)}")
+
+    def on_file(self, listener: Callable[[Path], None]) -> None:
+        self._file_listeners.append(listener)
+
+    def off_file(self, listener: Callable[[Path], None]) -> None:
+        if listener in self._file_listeners:
+            self._file_listeners.remove(listener)
+
+    @property
+    def files_saved(self) -> int:
+        return _sum(self._saved)
+
+    @property
+    def works_done(self) -> int:
+        return self.success + self.failed
+
+    def transferred(self) -> int:
+        """已下载的字节数(包括正在下载的文件)"""
+        files = list(self._files.values())
+        return _sum(self._finished) + sum(progress.transferred for progress in files)
+
+    def snapshot(self) -> dict:
+        """当前进度, 速度由采样线程计算"""
+        files = list(self._files.values())
+        return {
+            "works_total": self.works_total,
+            "works_done": self.works_done,
+            "success": self.success,
+            "failed": self.failed,
+            "bytes": self.transferred(),
+            "files_saved": self.files_saved,
+            "speed": round(self.speed),
+            "files": [{"id": progress.id, "desc": progress.desc, "completed": progress.completed,
+                       "total": progress.total} for progress in files],
+        }
+
+    def listen(self, listener: Callable[[dict], None]) -> None:
+        self._listeners.append(listener)
+
+    def unlisten(self, listener: Callable[[dict], None]) -> None:
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def sample(self) -> dict:
+        """计算速度并通知所有监听者"""
+        now = time.monotonic()
+        snapshot = self.snapshot()
+        last_time, last_bytes = self._sample
+        if now > last_time:
+            rate = max(0.0, (snapshot["bytes"] - last_bytes) / (now - last_time))
+            # 平滑速度, 避免每次采样跳动
+            self.speed = rate if not self.speed else self.speed * 0.7 + rate * 0.3
+            snapshot["speed"] = round(self.speed)
+        self._sample = (now, snapshot["bytes"])
+        for listener in list(self._listeners):
+            try:
+                listener(snapshot)
+            except Exception as e:
+                logger.debug(f"进度监听出错: {str(e)}")
+        return snapshot
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    @contextmanager
+    def sampling(self):
+        """在这个范围内按 interval 采样; 没有监听者时什么也不做"""
+        if not self._listeners or self._thread is not None:
+            yield self
+            return
+        self._stop.clear()
+        self._sample = (time.monotonic(), self.transferred())
+        self._thread = threading.Thread(target=self._run, name="progress-sampler", daemon=True)
+        self._thread.start()
+        try:
+            yield self
+        finally:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+            # 结束时再通知一次, 监听者拿到最终结果
+            self.sample()
+
+
+class RichView(object):
+    """把 ProgressBoard 的采样结果显示在 rich 进度条中
+
+    只在采样线程中调用, 进度条需要以 auto_refresh=False 创建, 每次采样刷新一次
+    """
+
+    def __init__(self, progress: Progress, board: ProgressBoard, streaming: bool = False,
+                 total: Optional[int] = None):
+        self.progress = progress
+        self.streaming = streaming
+        # 只显示这一批作品的进度, board 中的作品数是 Download 的累计值
+        self.base_total = board.works_total
+        self.base_done = board.works_done
+        self.task = progress.add_task("[cyan]📥 批量下载进度", total=total)
+        # 文件 id -> rich 任务
+        self._tasks: Dict[int, int] = {}
+
+    def __call__(self, snapshot: dict) -> None:
+        done = snapshot["works_done"] - self.base_done
+        if self.streaming:
+            self.progress.update(self.task, total=snapshot["works_total"] - self.base_total, completed=done)
+        else:
+            self.progress.update(self.task, completed=done)
+
+        active = set()
+        for file in snapshot["files"]:
+            active.add(file["id"])
+            task = self._tasks.get(file["id"])
+            if task is None:
+                self._tasks[file["id"]] = self.progress.add_task(f"[cyan]⬇️  {file['desc']}", total=file["total"],
+                                                                  completed=file["completed"])
+            else:
+                self.progress.update(task, completed=file["completed"])
+        for file_id in [file_id for file_id in self._tasks if file_id not in active]:
+            self.progress.remove_task(self._tasks.pop(file_id))
+        self.progress.refresh()
+
+    def close(self) -> None:
+        for task in self._tasks.values():
+            self.progress.remove_task(task)
+        self._tasks.clear()
+        self.progress.remove_task(self.task)
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+import logging
+from typing import List, Optional
+
+logger = logging.getLogger("douyin_downloader")
+
+# 接口中表示 H.265 编码的字段, bytevc1 是字节跳动的 H.265 实现
+_H265_FLAGS = ("is_h265", "is_bytevc1")
+
+
+def _number(value) -> int:
+    try:
+        return int(value or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+def bit_rate_ladder(video) -> List[dict]:
+    """把接口中 video.bit_rate 的各个清晰度转换成下载使用的列表, 保持接口中的顺序
+
+    每一项: {gear_name, quality_type, bit_rate, codec, width, height, fps, data_size, uri, url_list}
+    codec 为 h265 或 h264; 接口没有给出 data_size 时按码率和时长估算
+    """
+    if not isinstance(video, dict) or not isinstance(video.get("bit_rate"), list):
+        return []
+    duration = _number(video.get("duration"))
+    ladder = []
+    for item in video["bit_rate"]:
+        if not isinstance(item, dict):
+            continue
+        play_addr = item.get("play_addr") if isinstance(item.get("play_addr"), dict) else {}
+        bit_rate = _number(item.get("bit_rate"))
+        data_size = _number(play_addr.get("data_size"))
+        if not data_size and bit_rate and duration:
+            # bit_rate 为 bit/s, duration 为毫秒
+            data_size = bit_rate * duration // 8000
+        ladder.append({
+            "gear_name": item.get("gear_name", ""),
+            "quality_type": item.get("quality_type", ""),
+            "bit_rate": bit_rate,
+            "codec": "h265" if any(_number(item.get(flag)) for flag in _H265_FLAGS) else "h264",
+            "width": _number(play_addr.get("width")),
+            "height": _number(play_addr.get("height")),
+            "fps": _number(item.get("FPS")),
+            "data_size": data_size,
+            "uri": play_addr.get("uri", ""),
+            "url_list": list(play_addr.get("url_list") or []),
+        })
+    return ladder
+
+
+class QualityPolicy(object):
+    """从 bit_rate 中选择下载的清晰度
+
+    strategy:
+    - best: 满足限制条件的最高清晰度(分辨率相同时码率高的优先)
+    - smallest: 满足限制条件、且分辨率不低于 min_height 的最小文件
+    max_height / max_size / max_bitrate 为上限, 0 表示不限制; 没有清晰度满足上限时使用最小的文件。
+    prefer_h265 为 True 时, 有 H.265 的清晰度满足条件就只在 H.265 中选择(同样画质文件更小)。
+    所有选项都为默认值时不做选择, 仍使用 play_addr(bit_rate 中的第一项)。
+    """
+
+    STRATEGIES = ("best", "smallest")
+
+    def __init__(self, strategy="best", max_height=0, min_height=0, max_size=0, max_bitrate=0, prefer_h265=False):
+        self.strategy = strategy if strategy in self.STRATEGIES else "best"
+        # 分辨率按视频的短边(竖屏为宽)计算, 与 1080p/720p 的叫法一致
+        self.max_height = max(0, _number(max_height))
+        self.min_height = max(0, _number(min_height))
+        # 文件大小上限(字节)
+        self.max_size = max(0, _number(max_size))
+        # 码率上限(bit/s)
+        self.max_bitrate = max(0, _number(max_bitrate))
+        self.prefer_h265 = bool(prefer_h265)
+
+    @classmethod
+    def from_config(cls, config: Optional[dict]) -> "QualityPolicy":
+        """配置格式: {strategy, max_height, min_height, max_size(MB), max_bitrate(kbps), prefer_h265}"""
+        if isinstance(config, cls):
+            return config
+        config = config or {}
+        try:
+            max_size = int(float(config.get("max_size") or 0) * 1024 * 1024)
+            max_bitrate = int(float(config.get("max_bitrate") or 0) * 1000)
+        except (TypeError, ValueError):
+            logger.warning(f"清晰度配置格式错误: {config}")
+            max_size = max_bitrate = 0
+        return cls(strategy=config.get("strategy", "best"),
+                   max_height=config.get("max_height", 0),
+                   min_height=config.get("min_height", 0),
+                   max_size=max_size,
+                   max_bitrate=max_bitrate,
+                   prefer_h265=config.get("prefer_h265", False))
+
+    @property
+    def active(self) -> bool:
+        return (self.strategy != "best" or self.prefer_h265
+                or any((self.max_height, self.min_height, self.max_size, self.max_bitrate)))
+
+    @staticmethod
+    def resolution(rendition: dict) -> int:
+        """视频的短边, 宽高未知时为 0"""
+        sides = [side for side in (rendition.get("width"), rendition.get("height")) if side]
+        return min(sides) if sides else 0
+
+    def _allowed(self, rendition: dict) -> bool:
+        # 未知的分辨率、大小、码率不参与对应的限制
+        resolution = self.resolution(rendition)
+        if self.max_height and resolution > self.max_height:
+            return False
+        if self.max_size and rendition["data_size"] > self.max_size:
+            return False
+        if self.max_bitrate and rendition["bit_rate"] > self.max_bitrate:
+            return False
+        return True
+
+    @staticmethod
+    def _size(rendition: dict):
+        # 没有大小时按码率比较
+        return rendition["data_size"] or float("inf"), rendition["bit_rate"]
+
+    def select(self, ladder: Optional[List[dict]]) -> Optional[dict]:
+        """返回选中的清晰度, 不需要选择或没有可用的清晰度时返回 None"""
+        if not self.active:
+            return None
+        ladder = [rendition for rendition in ladder or [] if rendition.get("url_list")]
+        if not ladder:
+            return None
+
+        candidates = [rendition for rendition in ladder if self._allowed(rendition)]
+        if not candidates:
+            # 都超出上限时下载最小的文件, 而不是放弃这个作品
+            return min(ladder, key=self._size)
+        if self.prefer_h265:
+            candidates = [rendition for rendition in candidates if rendition["codec"] == "h265"] or candidates
+
+        if self.strategy == "smallest":
+            enough = [rendition for rendition in candidates if self.resolution(rendition) >= self.min_height]
+            if enough:
+                return min(enough, key=self._size)
+            # 都达不到 min_height 时退回到最接近的清晰度
+        return max(candidates, key=lambda rendition: (self.resolution(rendition), rendition["bit_rate"]))
+
+
+if __name__ == "__main__":
+    pass
@@ -7,6 +7,11 @@ import copy
 
 
 class Result(object):
+    """原来的作品转换方式(共享一个可变的 awemeDict, 不可重入)
+
+    已由 apiproxy.douyin.aweme.Aweme 代替, 保留用于核对转换结果(test/benchmark_aweme.py)
+    """
+
     def __init__(self):
         # 作者信息
         self.authorDict = {
@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+import re
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple
+
+from apiproxy.common import session
+from apiproxy.douyin.partial import PartialDownload
+
+logger = logging.getLogger("douyin_downloader")
+
+_CONTENT_RANGE = re.compile(r"bytes\s+(\d+)-(\d+)/(\d+|\*)")
+
+
+class RangeNotSupported(Exception):
+    """服务器忽略 Range(返回 200 或 Content-Range 不符), 需要改为单连接下载"""
+
+
+def parse_content_range(value: Optional[str]) -> Optional[Tuple[int, int, Optional[int]]]:
+    """解析 "bytes 0-99/1000", 返回 (起始, 结束, 总大小), 总大小未知时为 None"""
+    match = _CONTENT_RANGE.match(value or "")
+    if not match:
+        return None
+    start, end, total = match.groups()
+    return int(start), int(end), None if total == "*" else int(total)
+
+
+class SegmentedDownloader(object):
+    """大文件多连接分段下载
+
+    文件按字节范围分成若干段, 每段一个连接同时下载, 写入预先分配大小的
+    <文件名>.part(稀疏文件), 全部完成并核对大小后再改名为目标文件。
+    分段和已完成的分段记录在 PartialDownload 中, 中断后只下载未完成的分段。
+    单个 CDN 连接的速度有限, 多个连接可以叠加带宽。
+    服务器不支持 Range 时抛出 RangeNotSupported, 由调用方改为单连接下载。
+    """
+
+    def __init__(self, segments=4, threshold=20 * 1024 * 1024, min_segment=2 * 1024 * 1024,
+                 chunk_size=256 * 1024, timeout=30, retry_times=3):
+        # 每个文件同时使用的连接数, 小于 2 时不分段
+        self.segments = max(1, int(segments or 1))
+        # 大于等于这个大小(字节)的文件才分段下载
+        self.threshold = max(0, int(threshold or 0))
+        # 每段的最小大小, 文件不够大时减少分段数
+        self.min_segment = max(1, int(min_segment))
+        self.chunk_size = chunk_size
+        self.timeout = timeout
+        self.retry_times = retry_times
+
+    def enabled_for(self, size: Optional[int]) -> bool:
+        return self.segments > 1 and bool(size) and size >= max(self.threshold, self.min_segment * 2)
+
+    def split(self, size: int) -> List[Tuple[int, int]]:
+        """把 [0, size) 分成若干段, 返回 [(起始, 结束), ...], 结束位置包含在内"""
+        count = max(1, min(self.segments, size // self.min_segment))
+        step = -(-size // count)
+        return [(start, min(start + step, size) - 1) for start in range(0, size, step)]
+
+    def start(self, path: Path, url: str, size: int, response_headers=None) -> PartialDownload:
+        """开始一个新的分段下载, response_headers 中的 ETag/Last-Modified 用于续传时校验"""
+        state = PartialDownload.from_headers(path, url, size, response_headers or {})
+        state.ranges = self.split(size)
+        # 预先分配文件大小, 各段直接写入自己的位置
+        with open(state.part, "wb") as f:
+            f.truncate(size)
+        state.save()
+        return state
+
+    def download(self, state: PartialDownload, url: str, headers: Optional[dict] = None,
+                 on_progress: Optional[Callable[[int], None]] = None,
+                 throttle: Optional[Callable[[int], None]] = None) -> bool:
+        """下载 state 中未完成的分段, 全部完成后改名为目标文件
+
+        on_progress(字节数) 在各个连接的线程中调用, 分段重试时以负数退回进度,
+        续传时已完成的分段(state.completed_bytes())不再报告;
+        throttle(字节数) 在每块数据写入后调用, 用于限速。
+        服务器不支持 Range 或文件已变化时删除临时文件并抛出 RangeNotSupported。
+        """
+        path = state.target
+        # 地址中的签名会过期, 续传时使用新的地址
+        state.url = url
+        headers = {**(headers or {}), **state.if_range()}
+
+        pending = state.pending()
+        if pending:
+            with ThreadPoolExecutor(max_workers=min(self.segments, len(pending))) as executor:
+                futures = [executor.submit(self._fetch_segment, state, i, headers, on_progress, throttle)
+                           for i in pending]
+                errors = []
+                for future in futures:
+                    try:
+                        future.result()
+                    except Exception as e:
+                        errors.append(e)
+            for e in errors:
+                if isinstance(e, RangeNotSupported):
+                    state.discard()
+                    raise e
+            if errors:
+                logger.warning(f"分段下载未完成, 下次继续: {path.name}, 错误: {str(errors[0])}")
+                return False
+
+        if not state.finish():
+            logger.warning(f"分段下载大小不符: {path.name}, {state.part_size()} != {state.size}")
+            state.discard()
+            return False
+        return True
+
+    def _fetch_segment(self, state: PartialDownload, index: int, headers: Optional[dict],
+                       on_progress: Optional[Callable[[int], None]],
+                       throttle: Optional[Callable[[int], None]] = None) -> None:
+        start, end = state.ranges[index]
+        for attempt in range(self.retry_times):
+            written = 0
+            try:
+                with session.get(state.url, headers={**(headers or {}), "Range": f"bytes={start}-{end}"},
+                                 stream=True, timeout=self.timeout) as response:
+                    if response.status_code == 200:
+                        raise RangeNotSupported(f"服务器忽略 Range 或文件已变化: bytes={start}-{end}")
+                    if response.status_code != 206:
+                        raise Exception(f"HTTP {response.status_code}")
+                    content_range = parse_content_range(response.headers.get("content-range"))
+                    if (content_range is None or content_range[0] != start
+                            or content_range[2] not in (None, state.size)):
+                        raise RangeNotSupported(f"Content-Range 不符: {response.headers.get('content-range')}")
+
+                    with open(state.part, "r+b") as f:
+                        f.seek(start)
+                        for chunk in response.iter_content(chunk_size=self.chunk_size):
+                            if chunk:
+                                chunk = chunk[:end - start + 1 - written]
+                                written += f.write(chunk)
+                                if on_progress:
+                                    on_progress(len(chunk))
+                                if throttle:
+                                    throttle(len(chunk))
+                                if written > end - start:
+                                    break
+
+                if written != end - start + 1:
+                    raise Exception(f"分段 {index} 不完整: {written}/{end - start + 1}")
+                state.mark_done(index)
+                return
+            except RangeNotSupported:
+                raise
+            except Exception as e:
+                # 这一段从头重新下载, 进度条退回
+                if on_progress and written:
+                    on_progress(-written)
+                logger.debug(f"分段 {index} 下载失败 (尝试 {attempt + 1}/{self.retry_times}): {str(e)}")
+                if attempt == self.retry_times - 1:
+                    raise
+                time.sleep(2 ** attempt)
+
+
+if __name__ == "__main__":
+    pass
@@ -10,16 +10,19 @@ import logging
 import threading
 import subprocess
 import queue
+import itertools
+from collections import deque
 from datetime import datetime
 from pathlib import Path
 from flask import Flask, render_template, request, jsonify, send_file
 from flask_cors import CORS
+from werkzeug.exceptions import HTTPException
+from werkzeug.http import is_resource_modified
 from PIL import Image
-import io
 import mimetypes
 import hashlib
 import tempfile
-import re # Added for video preview API
+import uuid
 import time # Added for retry logic
 
 # 配置日志
@@ -135,6 +138,27 @@ class ConfigManager:
                 "music": False
             },
             "thread": 5,
+            "engine": "thread",
+            "limit_per_host": 8,
+            "prefetch": 2,
+            "segments": 4,
+            "segment_threshold": 20,
+            "mirror_timeout": 5,
+            "mirror_race": 0,
+            "quality": {
+                "strategy": "best",
+                "max_height": 0,
+                "min_height": 0,
+                "max_size": 0,
+                "max_bitrate": 0,
+                "prefer_h265": False
+            },
+            "dedup": True,
+            "asset_dir": "",
+            "bandwidth": {
+                "total": 0,
+                "job": 0
+            },
             "cookies": {}
         }
 
@@ -153,28 +177,51 @@ download_status = {
     "failed_files": 0,
     "total_works": 0,
     "start_time": None,
-    "estimated_time": None
+    "estimated_time": None,
+    # 下载器的进度采样: 作品数、已下载字节数、速度(字节/秒)、正在下载的文件数
+    "transfer": None
 }
 
-# 视频缩略图管理类
+# 视频和图片缩略图管理类
 class VideoThumbnailManager:
-    def __init__(self, download_path='./Downloaded/'):
+    # 缩略图尺寸
+    THUMBNAIL_SIZE = (200, 150)
+    IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp')
+    # 任务优先级, 数值小的先处理
+    PRIORITY_VIEW = 0     # 用户正在浏览的文件
+    PRIORITY_BATCH = 10   # 下载完成后批量补齐
+    PRIORITY_NAMES = {PRIORITY_VIEW: 'view', PRIORITY_BATCH: 'batch'}
+
+    def __init__(self, download_path='./Downloaded/', workers=None):
         # 确保使用绝对路径
         self.download_path = Path(download_path).resolve()
         self.cache_dir = self.download_path / 'temp' / 'thumbnails'
         self.cache_dir.mkdir(parents=True, exist_ok=True)
         self.ffmpeg_command = 'ffmpeg'  # 默认ffmpeg命令
         self.ffmpeg_available = self._check_ffmpeg()
-        self.generation_queue = queue.Queue()
-        self.is_generating = False
+        # 生成线程数, 每个线程同一时间运行一个 ffmpeg 进程(或解码一张图片)
+        self.workers = workers or max(2, min(4, os.cpu_count() or 1))
+        # 任务队列: (优先级, 序号, 文件路径, 加入时间)
+        self.generation_queue = queue.PriorityQueue()
+        # 排队中的文件 -> 有效的任务(优先级, 序号); 队列中同一文件的其它任务已取消或已被替代
+        self._pending = {}
+        # 正在生成的文件 -> ffmpeg 进程(图片或还没有启动时为 None)
+        self._running = {}
+        # 已取消的正在生成的文件
+        self._cancelled = set()
+        self._task_lock = threading.Lock()
+        self._seq = itertools.count()
+        self.stats = {"completed": 0, "failed": 0, "cancelled": 0, "deduplicated": 0}
+        # 最近完成的任务: (优先级, 排队时间, 生成时间), 单位秒
+        self._latencies = deque(maxlen=500)
         
         logger.info(f"视频缩略图缓存目录: {self.cache_dir}")
         if self.ffmpeg_available:
             logger.info("✓ ffmpeg 可用，支持视频缩略图生成")
-            # 启动后台生成线程
-            self.start_background_generator()
         else:
             logger.warning("⚠ ffmpeg 不可用，视频缩略图功能将不可用")
+        # 图片缩略图不需要 ffmpeg, 总是启动生成线程
+        self.start_background_generator()
     
     def _check_ffmpeg(self):
         """检查ffmpeg是否可用"""
@@ -209,80 +256,178 @@ class VideoThumbnailManager:
     
     def start_background_generator(self):
         """启动后台缩略图生成线程"""
-        if not self.ffmpeg_available:
-            return
-            
         def background_generator():
             while True:
+                priority, seq, file_path, queued_at = self.generation_queue.get()
+                if file_path is None:  # 停止信号
+                    break
+                with self._task_lock:
+                    if self._pending.get(file_path) != (priority, seq):
+                        # 已取消或已被优先级更高的任务替代
+                        continue
+                    del self._pending[file_path]
+                    self._running[file_path] = None
+                started = time.monotonic()
                 try:
-                    # 从队列中获取视频路径
-                    video_path = self.generation_queue.get(timeout=1)
-                    if video_path is None:  # 停止信号
-                        break
-                    
-                    self._generate_thumbnail_sync(video_path)
-                    self.generation_queue.task_done()
-                    
-                except queue.Empty:
-                    continue
+                    success = self._generate_thumbnail_sync(file_path)
                 except Exception as e:
                     logger.error(f"后台缩略图生成出错: {e}")
+                    success = False
+                finished = time.monotonic()
+                with self._task_lock:
+                    self._running.pop(file_path, None)
+                    if file_path in self._cancelled:
+                        self._cancelled.discard(file_path)
+                    elif success:
+                        self.stats["completed"] += 1
+                        self._latencies.append((priority, started - queued_at, finished - started))
+                    else:
+                        self.stats["failed"] += 1
         
-        self.generator_thread = threading.Thread(target=background_generator, daemon=True)
-        self.generator_thread.start()
-        logger.info("后台缩略图生成线程已启动")
+        self.generator_threads = [threading.Thread(target=background_generator, name=f"thumbnail-{n}", daemon=True)
+                                  for n in range(self.workers)]
+        for thread in self.generator_threads:
+            thread.start()
+        logger.info(f"后台缩略图生成线程已启动: {self.workers} 个")
     
-    def get_thumbnail_path(self, video_path):
-        """获取视频缩略图缓存路径"""
-        # 使用视频路径的MD5作为缓存文件名
-        video_hash = hashlib.md5(video_path.encode()).hexdigest()
-        return self.cache_dir / f"{video_hash}.jpg"
+    def stop_background_generator(self):
+        """停止生成线程, 排队中的任务不再处理"""
+        self.cancel()
+        for _ in self.generator_threads:
+            self.generation_queue.put((float('inf'), next(self._seq), None, 0))
+        for thread in self.generator_threads:
+            thread.join()
+    
+    @staticmethod
+    def thumbnail_key(file_path, mtime):
+        """缩略图缓存的键: 文件路径和修改时间(毫秒)的MD5, 文件修改后对应新的缓存文件"""
+        key = f"{file_path.replace(chr(92), '/')}:{int(mtime * 1000)}"
+        return hashlib.md5(key.encode()).hexdigest()
+
+    def get_thumbnail_path(self, file_path, mtime=None):
+        """获取视频或图片缩略图缓存路径, 不传修改时间时读取文件属性"""
+        if mtime is None:
+            mtime = (self.download_path / file_path).stat().st_mtime
+        return self.cache_dir / f"{self.thumbnail_key(file_path, mtime)}.jpg"
     
-    def request_thumbnail_generation(self, video_path):
-        """请求生成缩略图（异步）"""
-        if not self.ffmpeg_available:
+    def request_thumbnail_generation(self, file_path, priority=PRIORITY_VIEW):
+        """请求生成缩略图（异步）
+
+        同一文件已在排队或正在生成时不重复加入; 已在排队但优先级较低时(如批量补齐中的文件
+        被用户浏览到)提高优先级
+        """
+        is_image = Path(file_path).suffix.lower() in self.IMAGE_EXTENSIONS
+        if not is_image and not self.ffmpeg_available:
             return False
         
         try:
-            video_full_path = self.download_path / video_path
-            if not video_full_path.exists():
-                logger.error(f"视频文件不存在: {video_full_path}")
+            full_path = self.download_path / file_path
+            if not full_path.exists():
+                logger.error(f"文件不存在: {full_path}")
                 return False
             
-            thumbnail_path = self.get_thumbnail_path(video_path)
-            
-            # 如果缩略图已存在且较新，不需要重新生成
+            # 缓存以修改时间为键, 已存在时就是当前版本的缩略图
+            thumbnail_path = self.get_thumbnail_path(file_path)
             if thumbnail_path.exists():
-                video_mtime = video_full_path.stat().st_mtime
-                thumb_mtime = thumbnail_path.stat().st_mtime
-                if thumb_mtime > video_mtime:
-                    logger.debug(f"缩略图已存在且较新: {thumbnail_path}")
-                    return True
+                logger.debug(f"缩略图已存在: {thumbnail_path}")
+                return True
             
-            # 添加到生成队列
-            self.generation_queue.put(video_path)
-            logger.info(f"已添加到缩略图生成队列: {video_path}")
+            with self._task_lock:
+                current = self._pending.get(file_path)
+                if file_path in self._running or (current is not None and current[0] <= priority):
+                    self.stats["deduplicated"] += 1
+                    return True
+                seq = next(self._seq)
+                self._pending[file_path] = (priority, seq)
+                self.generation_queue.put((priority, seq, file_path, time.monotonic()))
+            logger.debug(f"已添加到缩略图生成队列: {file_path}")
             return True
             
         except Exception as e:
             logger.error(f"请求缩略图生成失败: {e}")
             return False
     
-    def request_batch_thumbnail_generation(self, video_paths):
-        """批量请求生成缩略图（异步）"""
-        if not self.ffmpeg_available:
-            return 0
-        
+    def request_batch_thumbnail_generation(self, file_paths, priority=PRIORITY_BATCH):
+        """批量请求生成缩略图（异步）, 默认排在用户浏览的文件之后"""
         success_count = 0
-        for video_path in video_paths:
-            if self.request_thumbnail_generation(video_path):
+        for file_path in file_paths:
+            if self.request_thumbnail_generation(file_path, priority):
                 success_count += 1
         
-        logger.info(f"批量缩略图生成请求完成: {success_count}/{len(video_paths)} 个视频已加入队列")
+        logger.info(f"批量缩略图生成请求完成: {success_count}/{len(file_paths)} 个文件已加入队列")
         return success_count
     
+    def cancel(self, paths=None, priority=None):
+        """取消缩略图任务, 返回取消的数量
+
+        paths 为 None 时取消所有排队的任务(可以只取消某个优先级的任务);
+        指定文件时还会结束这些文件正在运行的 ffmpeg 进程
+        """
+        with self._task_lock:
+            targets = [path for path, (task_priority, _) in self._pending.items()
+                       if (paths is None or path in paths) and (priority is None or task_priority == priority)]
+            for path in targets:
+                del self._pending[path]
+            processes = []
+            if paths is not None:
+                for path in paths:
+                    if path in self._running and path not in self._cancelled:
+                        self._cancelled.add(path)
+                        targets.append(path)
+                        if self._running[path] is not None:
+                            processes.append(self._running[path])
+            self.stats["cancelled"] += len(targets)
+        for process in processes:
+            try:
+                process.kill()
+            except OSError:
+                pass
+        if targets:
+            logger.info(f"已取消 {len(targets)} 个缩略图任务")
+        return len(targets)
+    
+    def get_metrics(self):
+        """队列长度、正在生成的数量、累计结果和最近完成的任务的延迟(毫秒)"""
+        with self._task_lock:
+            queued = {name: 0 for name in self.PRIORITY_NAMES.values()}
+            for task_priority, _ in self._pending.values():
+                name = self.PRIORITY_NAMES.get(task_priority, str(task_priority))
+                queued[name] = queued.get(name, 0) + 1
+            running = len(self._running)
+            latencies = list(self._latencies)
+            stats = dict(self.stats)
+
+        def percentile(values, fraction):
+            return round(values[min(len(values) - 1, int(len(values) * fraction))] * 1000, 1) if values else None
+
+        latency = {}
+        for task_priority, name in self.PRIORITY_NAMES.items():
+            waits = sorted(wait for p, wait, _ in latencies if p == task_priority)
+            durations = sorted(duration for p, _, duration in latencies if p == task_priority)
+            latency[name] = {
+                "count": len(waits),
+                "wait_p50": percentile(waits, 0.5),
+                "wait_p95": percentile(waits, 0.95),
+                "generate_p50": percentile(durations, 0.5),
+                "generate_p95": percentile(durations, 0.95),
+            }
+        return {
+            "workers": self.workers,
+            "ffmpeg_available": self.ffmpeg_available,
+            "queue_depth": sum(queued.values()),
+            "queued": queued,
+            "running": running,
+            **stats,
+            "latency_ms": latency,
+        }
+    
     def _generate_thumbnail_sync(self, video_path):
         """同步生成缩略图（在后台线程中调用）"""
+        if Path(video_path).suffix.lower() in self.IMAGE_EXTENSIONS:
+            thumbnail_path = self.get_thumbnail_path(video_path)
+            if not thumbnail_path.exists():
+                self._generate_image_thumbnail(video_path, thumbnail_path)
+            return True
         try:
             video_full_path = self.download_path / video_path
             thumbnail_path = self.get_thumbnail_path(video_path)
@@ -308,13 +453,19 @@ class VideoThumbnailManager:
                 ]
                 
                 logger.debug(f"执行ffmpeg命令: {' '.join(cmd)}")
-                result = self._execute_ffmpeg_safe(cmd)
+                result = self._run_ffmpeg(cmd, video_path)
                 
                 if result and result.returncode == 0 and os.path.exists(temp_thumb_path):
                     # 移动到缓存目录
                     shutil.move(temp_thumb_path, thumbnail_path)
                     logger.info(f"视频缩略图生成成功: {thumbnail_path}")
+                    catalog = file_catalogs.get(self.download_path)
+                    if catalog is not None:
+                        catalog.set_thumbnail(video_path)
                     return True
+                elif video_path in self._cancelled:
+                    logger.info(f"已取消生成视频缩略图: {video_path}")
+                    return False
                 else:
                     logger.error(f"ffmpeg执行失败: {result.stderr if result else '未知错误'}")
                     return False
@@ -341,6 +492,23 @@ class VideoThumbnailManager:
             logger.error(f"处理视频缩略图失败: {e}")
             return False
     
+    def _run_ffmpeg(self, cmd, file_path, timeout=30):
+        """运行生成缩略图的 ffmpeg, 进程记录在 _running 中, 取消时结束进程"""
+        process = subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        with self._task_lock:
+            cancelled = file_path in self._cancelled
+            if file_path in self._running:
+                self._running[file_path] = process
+        if cancelled:
+            process.kill()
+        try:
+            _, stderr = process.communicate(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.communicate()
+            raise
+        return subprocess.CompletedProcess(cmd, process.returncode, '', stderr.decode('utf-8', errors='ignore'))
+    
     def get_thumbnail_status(self, video_path):
         """获取缩略图状态"""
         try:
@@ -348,22 +516,64 @@ class VideoThumbnailManager:
             if not video_full_path.exists():
                 return "file_not_found"
             
-            thumbnail_path = self.get_thumbnail_path(video_path)
-            
-            if thumbnail_path.exists():
-                video_mtime = video_full_path.stat().st_mtime
-                thumb_mtime = thumbnail_path.stat().st_mtime
-                if thumb_mtime > video_mtime:
-                    return "ready"
-                else:
-                    return "outdated"
-            else:
-                return "not_generated"
+            if self.get_thumbnail_path(video_path).exists():
+                return "ready"
+            with self._task_lock:
+                if video_path in self._running:
+                    return "generating"
+                if video_path in self._pending:
+                    return "queued"
+            return "not_generated"
                 
         except Exception as e:
             logger.error(f"获取缩略图状态失败: {e}")
             return "error"
     
+    def is_thumbnail_ready(self, file_path, mtime):
+        """当前版本的缩略图已生成, 文件索引同步时调用(文件的修改时间已知)"""
+        return self.get_thumbnail_path(file_path, mtime).exists()
+
+    def get_image_thumbnail(self, image_path):
+        """图片缩略图的缓存路径, 还没有时生成(在请求中同步生成, 之后直接读取缓存)"""
+        thumbnail_path = self.get_thumbnail_path(image_path)
+        if not thumbnail_path.exists():
+            self._generate_image_thumbnail(image_path, thumbnail_path)
+        return thumbnail_path
+
+    def generate_image_thumbnails(self, image_paths):
+        """批量生成还没有缓存的图片缩略图, 返回生成的数量"""
+        generated = 0
+        for image_path in image_paths:
+            try:
+                thumbnail_path = self.get_thumbnail_path(image_path)
+                if not thumbnail_path.exists():
+                    self._generate_image_thumbnail(image_path, thumbnail_path)
+                    generated += 1
+            except Exception as e:
+                logger.error(f"生成图片缩略图失败: {image_path} - {e}")
+        return generated
+
+    def _generate_image_thumbnail(self, image_path, thumbnail_path):
+        """生成图片缩略图, 先写临时文件再改名, 同时读取的请求不会读到不完整的文件"""
+        width, height = self.THUMBNAIL_SIZE
+        with Image.open(self.download_path / image_path) as img:
+            # JPEG 用 draft 模式在解码时直接缩小到 1/2、1/4 或 1/8, 不解码全部像素
+            img.draft('RGB', (width * 2, height * 2))
+            if img.mode not in ('RGB', 'L'):
+                img = img.convert('RGB')
+            img.thumbnail(self.THUMBNAIL_SIZE, Image.Resampling.LANCZOS)
+            fd, temp_thumb_path = tempfile.mkstemp(suffix='.jpg', dir=self.cache_dir)
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    img.save(f, 'JPEG', quality=85)
+                os.replace(temp_thumb_path, thumbnail_path)
+            except Exception:
+                os.unlink(temp_thumb_path)
+                raise
+        catalog = file_catalogs.get(self.download_path)
+        if catalog is not None:
+            catalog.set_thumbnail(image_path)
+
     def cleanup_old_thumbnails(self, max_age_days=30):
         """清理旧的缩略图缓存"""
         try:
@@ -412,8 +622,29 @@ class VideoThumbnailManager:
             logger.error(f"ffmpeg执行失败: {e}")
             return None
 
-# 初始化缩略图管理器
-thumbnail_manager = VideoThumbnailManager()
+# 初始化缩略图管理器(缓存在配置的下载目录中)
+thumbnail_manager = VideoThumbnailManager(config_manager.config.get('path', './Downloaded/'))
+
+# 下载目录 -> 文件索引(下载目录可以在配置中修改)
+file_catalogs = {}
+file_catalog_lock = threading.Lock()
+
+def get_file_catalog(download_path=None):
+    """下载目录的文件索引, 第一次使用时在后台建立"""
+    from apiproxy.douyin.catalog import FileCatalog
+
+    if download_path is None:
+        download_path = Path(config_manager.config.get('path', './Downloaded/')).resolve()
+    with file_catalog_lock:
+        catalog = file_catalogs.get(download_path)
+        if catalog is None:
+            catalog = FileCatalog(download_path, thumbnail=thumbnail_manager.is_thumbnail_ready)
+            file_catalogs[download_path] = catalog
+            catalog.sync_async()
+            # 安装了 watchdog 时监视其它程序造成的变化, 否则只在刷新时同步
+            if catalog.watch():
+                logger.info(f"正在监视下载目录: {download_path}")
+    return catalog
 
 def get_user_info_from_link(link):
     """从链接中获取用户信息"""
@@ -590,6 +821,7 @@ def start_download():
         download_status["total_works"] = total_works  # 设置总作品数量
         download_status["start_time"] = time.time()
         download_status["estimated_time"] = None
+        download_status["transfer"] = None
         
         logger.info(f"初始化下载状态: 总链接数={len(links)}, 总作品数={total_works}")
         
@@ -609,6 +841,24 @@ def get_download_status():
     """获取下载状态"""
     return jsonify(download_status)
 
+@app.route('/api/bandwidth', methods=['GET'])
+def get_bandwidth():
+    """获取带宽上限和实际下载速度(MB/s)"""
+    from apiproxy.common import bandwidth
+    return jsonify(bandwidth.stats())
+
+@app.route('/api/bandwidth', methods=['POST'])
+def update_bandwidth():
+    """修改带宽上限, 立即作用于正在进行的下载; 格式: {total: MB/s, job: MB/s}"""
+    try:
+        from apiproxy.common import bandwidth
+        data = request.get_json() or {}
+        bandwidth.load({key: float(data[key] or 0) for key in ("total", "job") if key in data})
+        logger.info(f"修改带宽上限: {data}")
+        return jsonify({"success": True, **bandwidth.stats()})
+    except (TypeError, ValueError) as e:
+        return jsonify({"success": False, "message": f"带宽上限格式错误: {str(e)}"}), 400
+
 @app.route('/api/download/stop', methods=['POST'])
 def stop_download():
     """停止下载"""
@@ -680,6 +930,22 @@ def run_download(data):
             DouYinCommand.configModel["folderstyle"] = config.get('folderstyle', False)
             DouYinCommand.configModel["mode"] = config.get('mode', ['post'])
             DouYinCommand.configModel["thread"] = config.get('thread', 5)
+            DouYinCommand.configModel["engine"] = config.get('engine', 'thread')
+            DouYinCommand.configModel["limit_per_host"] = config.get('limit_per_host', 8)
+            DouYinCommand.configModel["prefetch"] = config.get('prefetch', 2)
+            DouYinCommand.configModel["segments"] = config.get('segments', 4)
+            DouYinCommand.configModel["segment_threshold"] = config.get('segment_threshold', 20)
+            DouYinCommand.configModel["mirror_timeout"] = config.get('mirror_timeout', 5)
+            DouYinCommand.configModel["mirror_race"] = config.get('mirror_race', 0)
+            DouYinCommand.configModel["quality"] = config.get('quality') or {}
+            DouYinCommand.configModel["dedup"] = config.get('dedup', True)
+            DouYinCommand.configModel["asset_dir"] = config.get('asset_dir') or ""
+            DouYinCommand.configModel["bandwidth"] = config.get('bandwidth') or {}
+            # Web 服务中没有终端, 不绘制进度条
+            DouYinCommand.configModel["headless"] = config.get('headless', True)
+            DouYinCommand.configModel["retry"] = config.get('retry') or {}
+            DouYinCommand.configModel["rate_limit"] = config.get('rate_limit') or {}
+            DouYinCommand.configModel["cookie_pool"] = config.get('cookie_pool') or []
             DouYinCommand.configModel["database"] = config.get('database', True)
             
             # 更新数量限制
@@ -719,10 +985,6 @@ def run_download(data):
         download_status["progress"] = 10
         
         try:
-            # 启动状态更新线程
-            status_update_thread = threading.Thread(target=update_download_status_periodically, daemon=True)
-            status_update_thread.start()
-            
             # 直接调用下载逻辑，而不是通过main函数
             execute_download_logic(DouYinCommand)
             
@@ -766,26 +1028,24 @@ def execute_download_logic(douyin_module):
         os.makedirs(douyin_module.configModel["path"], exist_ok=True)
         logger.info(f"数据保存路径 {douyin_module.configModel['path']}")
 
-        # 记录初始文件数量
+        # 下载器每保存一个文件发出一次事件, 更新文件索引和已下载文件数, 不再遍历下载目录
         download_path = Path(douyin_module.configModel["path"]).resolve()
-        initial_file_count = 0
-        if download_path.exists():
-            initial_file_count = count_downloaded_files(download_path)
-        logger.info(f"下载前文件数量: {initial_file_count}")
+        catalog = get_file_catalog(download_path)
+
+        # 重试策略和接口限速
+        from apiproxy.common import retrier, ratelimiter, cookiepool, bandwidth
+        retrier.load(douyin_module.configModel["retry"])
+        ratelimiter.load(douyin_module.configModel["rate_limit"])
+        cookiepool.load(douyin_module.configModel.get("cookie_pool"))
+        bandwidth.load(douyin_module.configModel.get("bandwidth"))
 
         # 初始化下载器
         from apiproxy.douyin.douyin import Douyin
-        from apiproxy.douyin.download import Download
         
         dy = Douyin(database=douyin_module.configModel["database"])
-        dl = Download(
-            thread=douyin_module.configModel["thread"],
-            music=douyin_module.configModel["music"],
-            cover=douyin_module.configModel["cover"],
-            avatar=douyin_module.configModel["avatar"],
-            resjson=douyin_module.configModel["json"],
-            folderstyle=douyin_module.configModel["folderstyle"]
-        )
+        dl = douyin_module.create_downloader(douyin_module.configModel)
+        dl.board.listen(update_transfer_status)
+        dl.board.on_file(catalog.notify)
 
         # 处理每个链接
         total_links = len(douyin_module.configModel["link"])
@@ -806,51 +1066,33 @@ def execute_download_logic(douyin_module):
             # 更新完成的链接数
             download_status["completed_links"] = i + 1
             
-            # 实时更新增量文件数量
-            if download_path.exists():
-                current_file_count = count_downloaded_files(download_path)
-                new_files = current_file_count - initial_file_count
-                download_status["downloaded_files"] = new_files
-                download_status["current_task"] = f"已下载 {new_files} 个文件"
-                logger.info(f"链接 {i+1} 处理完成，新增文件数: {new_files}")
-            
-            # 短暂延迟，让状态更新线程有机会运行
-            time.sleep(0.5)
+            # 新增文件数(下载器的计数)
+            new_files = dl.board.files_saved
+            download_status["downloaded_files"] = new_files
+            download_status["current_task"] = f"已下载 {new_files} 个文件"
+            logger.info(f"链接 {i+1} 处理完成，新增文件数: {new_files}")
 
         # 下载完成后的最终状态更新
         if download_path.exists():
-            current_file_count = count_downloaded_files(download_path)
-            final_new_files = current_file_count - initial_file_count
+            final_new_files = dl.board.files_saved
             download_status["downloaded_files"] = final_new_files
             download_status["current_task"] = f"✓ 下载完成，共下载 {final_new_files} 个文件"
             logger.info(f"下载完成，最终新增文件数: {final_new_files}")
+            dl.board.off_file(catalog.notify)
+            catalog.flush()
             
             # 下载完成后异步生成缩略图（不阻塞）
             def generate_thumbnails_async():
                 try:
                     logger.info("开始自动生成缩略图...")
                     
-                    # 获取所有视频文件
-                    video_extensions = {'.mp4', '.avi', '.mov', '.mkv', '.flv', '.webm'}
-                    video_files_to_process = []
-                    
-                    for item in download_path.rglob('*'):
-                        if item.is_file() and item.suffix.lower() in video_extensions:
-                            # 排除temp文件夹中的文件
-                            if 'temp' not in item.parts:
-                                # 获取相对路径
-                                relative_path = str(item.relative_to(download_path))
-                                # 检查缩略图状态
-                                status = thumbnail_manager.get_thumbnail_status(relative_path)
-                                if status in ["not_generated", "outdated"]:
-                                    video_files_to_process.append(relative_path)
-                    
-                    if video_files_to_process:
-                        # 使用批量方法请求缩略图生成
-                        success_count = thumbnail_manager.request_batch_thumbnail_generation(video_files_to_process)
-                        logger.info(f"已为 {success_count} 个视频文件请求缩略图生成")
+                    # 从文件索引中找出还没有缩略图的视频和图片, 排在用户正在浏览的文件之后
+                    files_to_process = catalog.missing_thumbnails("video") + catalog.missing_thumbnails("image")
+                    if files_to_process:
+                        success_count = thumbnail_manager.request_batch_thumbnail_generation(files_to_process)
+                        logger.info(f"已为 {success_count} 个文件请求缩略图生成")
                     else:
-                        logger.info("没有需要生成缩略图的视频文件")
+                        logger.info("没有需要生成缩略图的文件")
                         
                 except Exception as e:
                     logger.error(f"自动生成缩略图失败: {e}")
@@ -864,100 +1106,82 @@ def execute_download_logic(douyin_module):
         logger.error(f"执行下载逻辑失败: {e}")
         raise
 
-def update_download_status_periodically():
-    """定期更新下载状态"""
-    try:
-        # 记录初始文件数量
-        initial_file_count = 0
-        download_path = Path(config_manager.config.get('path', './Downloaded/')).resolve()
-        if download_path.exists():
-            initial_file_count = count_downloaded_files(download_path)
-        
-        logger.info(f"初始文件数量: {initial_file_count}")
-        
-        while download_status["running"]:
-            try:
-                # 检查下载目录中的文件数量
-                if download_path.exists():
-                    # 统计当前文件数量
-                    current_file_count = count_downloaded_files(download_path)
-                    
-                    # 计算新增文件数量（增量）
-                    new_files = current_file_count - initial_file_count
-                    
-                    # 更新下载状态 - 只记录新增的文件数量
-                    download_status["downloaded_files"] = new_files
-                    download_status["current_task"] = f"已下载 {new_files} 个文件"
-                    
-                    logger.debug(f"定期更新：当前文件数: {current_file_count}, 初始文件数: {initial_file_count}, 新增文件数: {new_files}")
-                
-                time.sleep(2)  # 每2秒更新一次
-                
-            except Exception as e:
-                logger.error(f"定期状态更新出错: {e}")
-                time.sleep(5)
-                
-    except Exception as e:
-        logger.error(f"启动定期状态更新失败: {e}")
-
-def count_downloaded_files(download_path):
-    """统计下载目录中的文件数量"""
-    try:
-        count = 0
-        # 定义要排除的文件类型，与get_downloaded_files保持一致
-        excluded_extensions = {'.json', '.txt', '.log'}
-        
-        for item in download_path.rglob('*'):
-            if item.is_file():
-                # 排除temp文件夹中的文件
-                if 'temp' in item.parts:
-                    continue
-                
-                # 排除JSON等非目标文件类型
-                if item.suffix.lower() in excluded_extensions:
-                    continue
-                    
-                count += 1
-        return count
-    except Exception as e:
-        logger.error(f"统计文件数量失败: {e}")
-        return 0
+def update_transfer_status(snapshot):
+    """下载器的进度采样线程按固定间隔调用, 不在下载线程中"""
+    download_status["transfer"] = {
+        "works_total": snapshot["works_total"],
+        "works_done": snapshot["works_done"],
+        "failed": snapshot["failed"],
+        "bytes": snapshot["bytes"],
+        "speed": snapshot["speed"],
+        "active_files": len(snapshot["files"]),
+    }
+    # 新保存的文件数, 由下载器在文件保存时计数
+    if snapshot["files_saved"] != download_status["downloaded_files"]:
+        download_status["downloaded_files"] = snapshot["files_saved"]
+        download_status["current_task"] = f"已下载 {snapshot['files_saved']} 个文件"
 
 @app.route('/api/files', methods=['GET'])
 def get_downloaded_files():
-    """获取已下载的文件列表"""
+    """分页查询已下载的文件(查询文件索引, 不遍历下载目录)
+
+    参数: limit 每页数量(默认 50), cursor 上一页返回的 next_cursor, 或 offset 跳过的文件数,
+    sort 排序(date-desc/date-asc/name-asc/name-desc/size-desc/size-asc),
+    type 类型(video/image/audio/other), source 来源目录, q 文件名搜索, refresh=1 在后台重新读取所有文件的属性
+    第一页(没有 cursor 和 offset)同时返回各类型的文件数和所有来源;
+    没有任何参数时按原来的格式返回所有文件的列表
+    """
     try:
         download_path = Path(config_manager.config.get('path', './Downloaded/')).resolve()
         if not download_path.exists():
             logger.info("下载目录不存在")
-            return jsonify([])
-        
-        # 定义要排除的文件类型
-        excluded_extensions = {'.json', '.txt', '.log'}
-        
-        files = []
-        for item in download_path.rglob('*'):
-            if item.is_file():
-                # 排除temp文件夹中的文件
-                if 'temp' in item.parts:
-                    continue
-                
-                # 排除JSON等非目标文件类型
-                if item.suffix.lower() in excluded_extensions:
-                    continue
-                    
-                files.append({
-                    'name': item.name,
-                    'path': str(item.relative_to(download_path)),
-                    'size': item.stat().st_size,
-                    'modified': datetime.fromtimestamp(item.stat().st_mtime).isoformat()
-                })
-        
-        logger.info(f"获取到 {len(files)} 个文件（已排除temp文件夹和非目标文件类型）")
-        return jsonify(files)
+            return jsonify({"files": [], "next_cursor": None, "total": 0, "indexing": False} if request.args else [])
+
+        catalog = get_file_catalog(download_path)
+        if not request.args:
+            # 原来的调用方每次都需要完整、最新的列表: 先增量同步(只重新读取有变化的目录),
+            # 第一次时等待建立索引, 正在后台同步时等它结束
+            catalog.sync()
+            files, _ = catalog.query(limit=None)
+            logger.info(f"获取到 {len(files)} 个文件")
+            return jsonify(files)
+        if request.args.get('refresh') == '1':
+            # 原地覆盖的文件不改变目录的修改时间, 刷新时重新读取所有文件的属性
+            catalog.sync_async(full=True)
+
+        limit = max(1, min(int(request.args.get('limit', 50)), 500))
+        offset = max(0, int(request.args.get('offset', 0)))
+        cursor = request.args.get('cursor') or None
+        # 前端的"全部"选项
+        filters = {key: request.args.get(key) for key in ('type', 'source', 'q')}
+        filters = {key: value for key, value in filters.items() if value and value != 'all'}
+
+        files, next_cursor = catalog.query(limit=limit, cursor=cursor, offset=offset,
+                                           sort=request.args.get('sort', 'date-desc'), **filters)
+        result = {
+            "files": files,
+            "next_cursor": next_cursor,
+            "total": catalog.count(**filters) if filters else catalog.total,
+            # 正在同步索引(第一次建立索引时列表还不完整)
+            "indexing": catalog.syncing,
+        }
+        if not cursor and not offset:
+            result.update(catalog.summary())
+        return jsonify(result)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         logger.error(f"获取文件列表失败: {e}")
-        return jsonify([])
+        return jsonify({"files": [], "next_cursor": None, "total": 0, "indexing": False} if request.args else [])
+
+@app.route('/api/files/count', methods=['GET'])
+def get_file_count():
+    """已下载的文件数(文件索引中的计数, 不查询数据库)"""
+    download_path = Path(config_manager.config.get('path', './Downloaded/')).resolve()
+    if not download_path.exists():
+        return jsonify({"total": 0, "indexing": False})
+    catalog = get_file_catalog(download_path)
+    return jsonify({"total": catalog.total, "indexing": catalog.syncing})
 
 @app.route('/api/logs', methods=['GET'])
 def get_logs():
@@ -976,6 +1200,22 @@ def get_logs():
         logger.error(f"获取日志失败: {e}")
         return jsonify([])
 
+# 带版本参数 v(文件的修改时间)请求的缩略图缓存一年
+THUMBNAIL_MAX_AGE = 365 * 24 * 3600
+
+def send_thumbnail(thumbnail_path):
+    """发送缓存的缩略图
+
+    缓存文件名(路径和修改时间的哈希)作为强 ETag; 请求带 v 参数时文件修改后地址也会变化,
+    可以长期缓存, 否则每次用 ETag 验证(返回 304)
+    """
+    versioned = bool(request.args.get('v'))
+    response = send_file(thumbnail_path, mimetype='image/jpeg', conditional=True, etag=thumbnail_path.stem,
+                         max_age=THUMBNAIL_MAX_AGE if versioned else 0)
+    if versioned:
+        response.cache_control.immutable = True
+    return response
+
 @app.route('/api/file/thumbnail', methods=['GET'])
 def get_file_thumbnail():
     """获取文件缩略图"""
@@ -985,7 +1225,7 @@ def get_file_thumbnail():
             logger.error("缩略图API: 文件路径为空")
             return jsonify({"error": "文件路径不能为空"}), 400
         
-        logger.info(f"缩略图API: 开始处理请求，路径: {file_path}")
+        logger.debug(f"缩略图API: 开始处理请求，路径: {file_path}")
         
         # 构建完整文件路径
         download_path = Path(config_manager.config.get('path', './Downloaded/')).resolve()
@@ -993,9 +1233,9 @@ def get_file_thumbnail():
         file_path = file_path.replace('\\', '/')
         full_path = download_path / file_path
         
-        logger.info(f"缩略图API: 下载路径: {download_path}")
-        logger.info(f"缩略图API: 原始文件路径: {file_path}")
-        logger.info(f"缩略图API: 完整文件路径: {full_path}")
+        logger.debug(f"缩略图API: 下载路径: {download_path}")
+        logger.debug(f"缩略图API: 原始文件路径: {file_path}")
+        logger.debug(f"缩略图API: 完整文件路径: {full_path}")
         
         if not full_path.exists():
             logger.error(f"缩略图API: 文件不存在: {full_path}")
@@ -1006,24 +1246,11 @@ def get_file_thumbnail():
         
         # 处理图片文件
         if file_ext in ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp']:
-            logger.info("缩略图API: 处理图片文件")
+            logger.debug("缩略图API: 处理图片文件")
             try:
-                with Image.open(full_path) as img:
-                    # 转换为RGB模式（处理RGBA等）
-                    if img.mode in ('RGBA', 'LA', 'P'):
-                        img = img.convert('RGB')
-                    
-                    # 计算缩略图尺寸
-                    max_size = (200, 150)
-                    img.thumbnail(max_size, Image.Resampling.LANCZOS)
-                    
-                    # 保存到内存
-                    img_io = io.BytesIO()
-                    img.save(img_io, 'JPEG', quality=85)
-                    img_io.seek(0)
-                    
-                    logger.info(f"缩略图API: 生成图片缩略图成功: {file_path}")
-                    return send_file(img_io, mimetype='image/jpeg')
+                thumbnail_path = thumbnail_manager.get_image_thumbnail(file_path)
+                logger.debug(f"缩略图API: 返回图片缩略图: {thumbnail_path}")
+                return send_thumbnail(thumbnail_path)
                     
             except Exception as e:
                 logger.error(f"缩略图API: 生成图片缩略图失败: {e}")
@@ -1041,10 +1268,10 @@ def get_file_thumbnail():
                     # 缩略图已存在，直接返回
                     thumbnail_path = thumbnail_manager.get_thumbnail_path(file_path)
                     logger.info(f"缩略图API: 返回现有视频缩略图: {thumbnail_path}")
-                    return send_file(thumbnail_path, mimetype='image/jpeg')
+                    return send_thumbnail(thumbnail_path)
                 
-                elif status in ["not_generated", "outdated"]:
-                    # 请求后台生成缩略图
+                elif status in ["not_generated", "queued", "generating"]:
+                    # 请求后台生成缩略图(已在队列中时提高优先级, 不会重复生成)
                     if thumbnail_manager.request_thumbnail_generation(file_path):
                         logger.info(f"缩略图API: 已请求后台生成视频缩略图: {file_path}")
                         # 返回默认图标或占位符
@@ -1083,7 +1310,7 @@ def get_thumbnail_status():
         # 检查文件类型
         file_ext = Path(file_path).suffix.lower()
         
-        if file_ext in ['.mp4', '.avi', '.mov', '.mkv', '.flv', '.webm']:
+        if file_ext in ['.mp4', '.avi', '.mov', '.mkv', '.flv', '.webm'] + list(thumbnail_manager.IMAGE_EXTENSIONS):
             status = thumbnail_manager.get_thumbnail_status(file_path)
             return jsonify({
                 "status": status,
@@ -1099,6 +1326,33 @@ def get_thumbnail_status():
         logger.error(f"获取缩略图状态失败: {e}")
         return jsonify({"error": "获取缩略图状态失败"}), 500
 
+@app.route('/api/file/thumbnail/metrics', methods=['GET'])
+def get_thumbnail_metrics():
+    """缩略图生成队列的长度、正在生成的数量和延迟"""
+    return jsonify(thumbnail_manager.get_metrics())
+
+@app.route('/api/file/thumbnail/cancel', methods=['POST'])
+def cancel_thumbnails():
+    """取消缩略图任务: paths 指定文件, 或 scope 为 batch(批量补齐)/all"""
+    try:
+        data = request.get_json(silent=True) or {}
+        paths = data.get('paths')
+        scope = data.get('scope', 'all')
+        if paths is not None:
+            if not isinstance(paths, list):
+                return jsonify({"success": False, "message": "paths 必须是列表"}), 400
+            cancelled = thumbnail_manager.cancel(paths=[str(path).replace('\\', '/') for path in paths])
+        elif scope == 'batch':
+            cancelled = thumbnail_manager.cancel(priority=thumbnail_manager.PRIORITY_BATCH)
+        elif scope == 'all':
+            cancelled = thumbnail_manager.cancel()
+        else:
+            return jsonify({"success": False, "message": f"未知的范围: {scope}"}), 400
+        return jsonify({"success": True, "cancelled": cancelled})
+    except Exception as e:
+        logger.error(f"取消缩略图任务失败: {e}")
+        return jsonify({"success": False, "message": "取消缩略图任务失败"}), 500
+
 @app.route('/api/file/preview', methods=['GET'])
 def preview_file():
     """预览文件（视频或图片）"""
@@ -1163,26 +1417,7 @@ def preview_file():
         # 对于视频文件，支持范围请求（Range requests）
         if file_ext in ['.mp4', '.avi', '.mov', '.mkv', '.flv', '.webm']:
             logger.info("预览API: 处理视频文件")
-            response = send_file(
-                full_path, 
-                mimetype=mime_type,
-                as_attachment=False,
-                conditional=True  # 启用条件请求支持
-            )
-            
-            # 添加必要的响应头以确保视频正确播放
-            response.headers['Accept-Ranges'] = 'bytes'
-            response.headers['Cache-Control'] = 'public, max-age=3600'
-            response.headers['Content-Disposition'] = 'inline'
-            response.headers['Access-Control-Allow-Origin'] = '*'
-            response.headers['Access-Control-Allow-Methods'] = 'GET, HEAD, OPTIONS'
-            response.headers['Access-Control-Allow-Headers'] = 'Range, Accept-Ranges, Content-Range'
-            
-            # 对于MP4文件，添加特殊的响应头
-            if file_ext == '.mp4':
-                response.headers['Content-Type'] = 'video/mp4'
-                response.headers['X-Content-Type-Options'] = 'nosniff'
-            
+            response = stream_video(full_path, mime_type)
             logger.info("预览API: 视频文件处理完成")
             return response
         else:
@@ -1196,141 +1431,177 @@ def preview_file():
             logger.info("预览API: 图片文件处理完成")
             return response
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"预览API: 预览文件失败: {e}")
         return jsonify({"error": "预览文件失败"}), 500
 
+# 视频文件的 MIME 类型
+VIDEO_MIME_TYPES = {
+    '.mp4': 'video/mp4',
+    '.avi': 'video/x-msvideo',
+    '.mov': 'video/quicktime',
+    '.mkv': 'video/x-matroska',
+    '.flv': 'video/x-flv',
+    '.webm': 'video/webm',
+}
+# 流式发送时每次读取的字节数, 每个连接占用的内存不超过这个大小
+STREAM_CHUNK_SIZE = 64 * 1024
+# 一个请求最多处理的范围数, 超过时发送整个文件
+MAX_RANGES = 16
+
+def read_file_range(f, start, stop, chunk_size=STREAM_CHUNK_SIZE):
+    """按块读取文件的 [start, stop) 部分"""
+    f.seek(start)
+    remaining = stop - start
+    while remaining > 0:
+        data = f.read(min(chunk_size, remaining))
+        if not data:
+            break
+        remaining -= len(data)
+        yield data
+
+def parse_ranges(header, size):
+    """解析 Range 请求头并换算成 [start, stop), 合并重叠和相邻的范围
+
+    格式无效时返回 None(按规范忽略, 发送整个文件), 所有范围都超出文件时返回空列表
+    """
+    unit, _, spec = header.partition('=')
+    if unit.strip().lower() != 'bytes':
+        return None
+    resolved = []
+    for item in spec.split(','):
+        first, sep, last = (part.strip() for part in item.partition('-'))
+        if not sep or not (first or last) or (first and not first.isdigit()) or (last and not last.isdigit()):
+            return None
+        if not first:
+            # bytes=-N: 最后 N 个字节
+            start, stop = max(size - int(last), 0), size
+        else:
+            start = int(first)
+            if last and int(last) < start:
+                return None
+            stop = min(int(last) + 1, size) if last else size
+        if start < stop:
+            resolved.append((start, stop))
+    merged = []
+    for start, stop in sorted(resolved):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], stop))
+        else:
+            merged.append((start, stop))
+    return merged
+
+def range_response(full_path, ranges, size, mime_type):
+    """206 响应: 一个范围时直接发送, 多个范围时为 multipart/byteranges, 都按块读取"""
+    if len(ranges) == 1:
+        start, stop = ranges[0]
+
+        def generate():
+            with open(full_path, 'rb') as f:
+                yield from read_file_range(f, start, stop)
+
+        response = app.response_class(generate(), 206, content_type=mime_type, direct_passthrough=True)
+        response.headers['Content-Range'] = f'bytes {start}-{stop - 1}/{size}'
+        response.content_length = stop - start
+        return response
+
+    boundary = uuid.uuid4().hex
+    parts = [((f'--{boundary}\r\nContent-Type: {mime_type}\r\n'
+               f'Content-Range: bytes {start}-{stop - 1}/{size}\r\n\r\n').encode('ascii'), start, stop)
+             for start, stop in ranges]
+    tail = f'--{boundary}--\r\n'.encode('ascii')
+
+    def generate():
+        with open(full_path, 'rb') as f:
+            for head, start, stop in parts:
+                yield head
+                yield from read_file_range(f, start, stop)
+                yield b'\r\n'
+        yield tail
+
+    response = app.response_class(generate(), 206, content_type=f'multipart/byteranges; boundary={boundary}',
+                                  direct_passthrough=True)
+    response.content_length = sum(len(head) + stop - start + 2 for head, start, stop in parts) + len(tail)
+    return response
+
+def stream_video(full_path, mime_type):
+    """流式发送视频文件
+
+    完整文件和单个范围(包括 bytes=-N)交给 send_file: 按块发送, WSGI 服务器提供
+    wsgi.file_wrapper 时(如 gunicorn)使用 sendfile; 同时处理 ETag/Last-Modified
+    条件请求(304)、If-Range 和无法满足的范围(416)。多个范围和 werkzeug 不接受的
+    范围(如重叠的范围)由 parse_ranges 解析, range_response 按块发送。
+    """
+    header = request.headers.get('Range')
+    # 这时 send_file 只处理 304, 范围在下面处理
+    custom = header is not None and (request.range is None or request.range.units != 'bytes'
+                                     or len(request.range.ranges) != 1)
+    response = send_file(full_path, mimetype=mime_type, as_attachment=False, conditional=not custom,
+                         etag=True, max_age=3600)
+    if custom:
+        response = response.make_conditional(request.environ)
+    # If-Range 不匹配、格式无效或范围太多时发送整个文件
+    if (custom and response.status_code == 200
+            and ('If-Range' not in request.headers
+                 or not is_resource_modified(request.environ, etag=response.get_etag()[0],
+                                             last_modified=response.last_modified, ignore_if_range=False))):
+        size = response.content_length
+        ranges = parse_ranges(header, size)
+        if ranges is not None and len(ranges) <= MAX_RANGES:
+            headers = {name: response.headers[name] for name in ('ETag', 'Last-Modified', 'Cache-Control', 'Expires')
+                       if name in response.headers}
+            response.close()
+            if not ranges:
+                response = app.response_class(status=416)
+                response.headers['Content-Range'] = f'bytes */{size}'
+            else:
+                response = range_response(full_path, ranges, size, mime_type)
+            response.headers.update(headers)
+
+    response.headers['Accept-Ranges'] = 'bytes'
+    response.headers['Content-Disposition'] = 'inline'
+    response.headers['Access-Control-Allow-Origin'] = '*'
+    response.headers['Access-Control-Allow-Methods'] = 'GET, HEAD, OPTIONS'
+    response.headers['Access-Control-Allow-Headers'] = 'Range, Accept-Ranges, Content-Range'
+    response.headers['Access-Control-Expose-Headers'] = 'Content-Range, Content-Length, ETag'
+    if full_path.suffix.lower() == '.mp4':
+        response.headers['X-Content-Type-Options'] = 'nosniff'
+    return response
+
 @app.route('/api/file/video', methods=['GET'])
 def serve_video():
-    """专门用于视频文件的API"""
+    """专门用于视频文件的API, 按块流式发送, 支持范围请求和条件请求"""
     try:
         file_path = request.args.get('path', '')
         if not file_path:
             logger.error("视频API: 文件路径为空")
             return jsonify({"error": "文件路径不能为空"}), 400
         
-        logger.info(f"视频API: 开始处理请求，路径: {file_path}")
-        
         # 构建完整文件路径
         download_path = Path(config_manager.config.get('path', './Downloaded/')).resolve()
         # 修复路径分隔符问题
         file_path = file_path.replace('\\', '/')
         full_path = download_path / file_path
         
-        logger.info(f"视频API: 下载路径: {download_path}")
-        logger.info(f"视频API: 原始文件路径: {file_path}")
-        logger.info(f"视频API: 完整文件路径: {full_path}")
-        
-        if not full_path.exists():
+        if not full_path.is_file():
             logger.error(f"视频API: 文件不存在: {full_path}")
             return jsonify({"error": "文件不存在"}), 404
         
         # 检查文件类型
         file_ext = full_path.suffix.lower()
-        logger.info(f"视频API: 文件扩展名: {file_ext}")
-        
-        if file_ext not in ['.mp4', '.avi', '.mov', '.mkv', '.flv', '.webm']:
+        if file_ext not in VIDEO_MIME_TYPES:
             logger.error(f"视频API: 不支持的文件类型: {file_ext}")
             return jsonify({"error": "不是视频文件"}), 400
         
-        # 获取文件大小
-        file_size = full_path.stat().st_size
-        logger.info(f"视频API: 文件大小: {file_size} bytes")
-        
-        # 处理Range请求
-        range_header = request.headers.get('Range', None)
-        logger.info(f"视频API: Range请求头: {range_header}")
-        
-        if range_header:
-            logger.info("视频API: 处理Range请求")
-            byte1, byte2 = 0, None
-            m = re.search(r'(\d+)-(\d*)', range_header)
-            if m:
-                g = m.groups()
-                
-                if g[0]: byte1 = int(g[0])
-                if g[1]: byte2 = int(g[1])
-                
-                if byte2 is None:
-                    byte2 = file_size - 1
-                
-                length = byte2 - byte1 + 1
-                
-                logger.info(f"视频API: Range请求 - 开始字节: {byte1}, 结束字节: {byte2}, 长度: {length}")
-                
-                try:
-                    with open(full_path, 'rb') as f:
-                        f.seek(byte1)
-                        data = f.read(length)
-                    
-                    logger.info(f"视频API: 成功读取Range数据，实际读取: {len(data)} bytes")
-                    
-                    response = app.response_class(
-                        data,
-                        206,
-                        mimetype='video/mp4',
-                        direct_passthrough=True
-                    )
-                    
-                    response.headers.add('Content-Range', f'bytes {byte1}-{byte2}/{file_size}')
-                    response.headers.add('Accept-Ranges', 'bytes')
-                    response.headers.add('Content-Length', str(length))
-                    response.headers.add('Cache-Control', 'public, max-age=3600')
-                    response.headers.add('Content-Disposition', 'inline')
-                    response.headers['Access-Control-Allow-Origin'] = '*'
-                    response.headers['Access-Control-Allow-Methods'] = 'GET, HEAD, OPTIONS'
-                    response.headers['Access-Control-Allow-Headers'] = 'Range, Accept-Ranges, Content-Range'
-                    
-                    # For MP4 files, add specific headers
-                    if file_ext == '.mp4':
-                        response.headers['Content-Type'] = 'video/mp4'
-                        response.headers['X-Content-Type-Options'] = 'nosniff'
-                    
-                    logger.info(f"视频API: Range请求成功，状态码: 206")
-                    return response
-                    
-                except Exception as e:
-                    logger.error(f"视频API: Range请求读取文件失败: {e}")
-                    return jsonify({"error": "读取文件失败"}), 500
-            else:
-                logger.error(f"视频API: Range请求格式无效: {range_header}")
-                return jsonify({"error": "Range请求格式无效"}), 400
-        else:
-            logger.info("视频API: 处理完整文件请求")
-            try:
-                # 完整文件请求
-                with open(full_path, 'rb') as f:
-                    data = f.read()
-                
-                logger.info(f"视频API: 成功读取完整文件，大小: {len(data)} bytes")
-                
-                response = app.response_class(
-                    data,
-                    200,
-                    mimetype='video/mp4',
-                    direct_passthrough=True
-                )
-                
-                response.headers.add('Accept-Ranges', 'bytes')
-                response.headers.add('Content-Length', str(file_size))
-                response.headers.add('Cache-Control', 'public, max-age=3600')
-                response.headers.add('Content-Disposition', 'inline')
-                response.headers['Access-Control-Allow-Origin'] = '*'
-                response.headers['Access-Control-Allow-Methods'] = 'GET, HEAD, OPTIONS'
-                response.headers['Access-Control-Allow-Headers'] = 'Range, Accept-Ranges, Content-Range'
-                
-                # For MP4 files, add specific headers
-                if file_ext == '.mp4':
-                    response.headers['Content-Type'] = 'video/mp4'
-                    response.headers['X-Content-Type-Options'] = 'nosniff'
-                
-                logger.info(f"视频API: 完整文件请求成功，状态码: 200")
-                return response
-                
-            except Exception as e:
-                logger.error(f"视频API: 完整文件请求读取失败: {e}")
-                return jsonify({"error": "读取文件失败"}), 500
+        response = stream_video(full_path, VIDEO_MIME_TYPES[file_ext])
+        logger.debug(f"视频API: {file_path} Range: {request.headers.get('Range')} -> {response.status_code}")
+        return response
             
+    except HTTPException:
+        # 304/416 等由 Flask 返回
+        raise
     except Exception as e:
         logger.error(f"视频API: 处理请求时发生异常: {e}")
         return jsonify({"error": "视频服务失败"}), 500
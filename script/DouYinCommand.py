@@ -8,6 +8,8 @@ import sys
 import json
 import yaml
 import time
+import itertools
+import importlib.util
 from dataclasses import dataclass, field
 from typing import List, Dict, Optional
 from pathlib import Path
@@ -22,18 +24,16 @@ logging.basicConfig(
 douyin_logger = logging.getLogger("DouYin")
 
 # 现在可以安全使用douyin_logger
-try:
-    import asyncio
-    import aiohttp
-    ASYNC_SUPPORT = True
-except ImportError:
-    ASYNC_SUPPORT = False
+# 只检查是否安装了 aiohttp, 由 AsyncDownload 自己导入
+ASYNC_SUPPORT = importlib.util.find_spec("aiohttp") is not None
+if not ASYNC_SUPPORT:
     douyin_logger.warning("aiohttp 未安装，异步下载功能不可用")
 
 from apiproxy.douyin.douyin import Douyin
 from apiproxy.douyin.download import Download
+from apiproxy.douyin.assets import ASSET_DIR
 from apiproxy.douyin import douyin_headers
-from apiproxy.common import utils
+from apiproxy.common import utils, retrier, ratelimiter, cookiepool, bandwidth
 
 @dataclass
 class DownloadConfig:
@@ -99,6 +99,44 @@ configModel = {
         "music": False,
     },
     "thread": 5,
+    # 下载引擎: thread(多线程) 或 async(协程, 需要 aiohttp)
+    "engine": "thread",
+    # async 引擎下单个主机的最大连接数, 0 表示不限制
+    "limit_per_host": 8,
+    # 边下载边预先获取的列表页数, 队列满时暂停获取
+    "prefetch": 2,
+    # 大于 segment_threshold MB 的文件分成 segments 段同时下载, segments 为 1 时不分段
+    "segments": 4,
+    "segment_threshold": 20,
+    # 有其它镜像地址可换时首字节超过 mirror_timeout 秒换下一个; mirror_race 大于 0 时对新的 CDN 主机先测速(KB)
+    "mirror_timeout": 5,
+    "mirror_race": 0,
+    # 视频清晰度选择: strategy 为 best(最高清晰度) 或 smallest(不低于 min_height 的最小文件),
+    # max_height/max_size(MB)/max_bitrate(kbps) 为上限, 0 表示不限制
+    "quality": {
+        "strategy": "best",
+        "max_height": 0,
+        "min_height": 0,
+        "max_size": 0,
+        "max_bitrate": 0,
+        "prefer_h265": False,
+    },
+    # 头像、音乐、封面按内容只保存一份, 作品目录中为硬链接; asset_dir 为空时使用 <path>/.assets
+    "dedup": True,
+    "asset_dir": "",
+    # 不显示进度条(在服务器上运行时), 下载进度仍然可以通过 Download.board 获取
+    "headless": False,
+    # 下载带宽上限(MB/s): total 为所有下载合计, job 为单个下载任务, 0 表示不限制
+    "bandwidth": {
+        "total": 0,
+        "job": 0,
+    },
+    # API 请求重试策略, 格式: {default: {...}, USER_POST: {...}}
+    "retry": {},
+    # 接口限速, 格式: {default: {rate, burst}, host: {rate, burst}, USER_POST: {...}}
+    "rate_limit": {},
+    # Cookie 池, 格式: [cookie, ...] 或 {cookies: [...], min_score, max_expired, cooldown}
+    "cookie_pool": [],
     "cookie": os.environ.get("DOUYIN_COOKIE", "")
 }
 
@@ -148,6 +186,42 @@ def argument():
     parser.add_argument("--thread", "-t",
                         help="设置线程数, 默认5个线程",
                         type=int, required=False, default=5)
+    parser.add_argument("--engine", "-E", help="下载引擎, thread 为多线程, async 为协程(需要 aiohttp), 默认为thread",
+                        type=str, required=False, default="thread", choices=["thread", "async"])
+    parser.add_argument("--limitperhost", help="async 引擎下单个主机的最大连接数, 0 表示不限制, 默认为8",
+                        type=int, required=False, default=8)
+    parser.add_argument("--prefetch", help="下载时后台预先获取的列表页数, 默认为2",
+                        type=int, required=False, default=2)
+    parser.add_argument("--segments", help="大文件分段下载的连接数, 1 表示不分段, 默认为4",
+                        type=int, required=False, default=4)
+    parser.add_argument("--segmentthreshold", help="大于这个大小(MB)的文件分段下载, 默认为20",
+                        type=float, required=False, default=20)
+    parser.add_argument("--mirrortimeout", help="有其它镜像地址可换时, 首字节超过这个时间(秒)就换下一个, 0 表示不换, 默认为5",
+                        type=float, required=False, default=5)
+    parser.add_argument("--mirrorrace", help="大于0时, 遇到新的 CDN 主机先同时下载各镜像的前这么多 KB 比较速度, 默认为0",
+                        type=float, required=False, default=0)
+    parser.add_argument("--quality", help="视频清晰度策略, best 为满足限制的最高清晰度, smallest 为不低于 minheight 的最小文件, 默认为best",
+                        type=str, required=False, default="best", choices=["best", "smallest"])
+    parser.add_argument("--maxheight", help="视频分辨率上限(短边, 如 720), 0 表示不限制, 默认为0",
+                        type=int, required=False, default=0)
+    parser.add_argument("--minheight", help="smallest 策略下视频分辨率的下限(短边), 默认为0",
+                        type=int, required=False, default=0)
+    parser.add_argument("--maxsize", help="视频文件大小上限(MB), 0 表示不限制, 默认为0",
+                        type=float, required=False, default=0)
+    parser.add_argument("--maxbitrate", help="视频码率上限(kbps), 0 表示不限制, 默认为0",
+                        type=float, required=False, default=0)
+    parser.add_argument("--preferh265", help="是否优先下载 H.265 编码的视频(True/False), 默认为False",
+                        type=utils.str2bool, required=False, default=False)
+    parser.add_argument("--dedup", help="头像、音乐、封面是否只下载和保存一份, 作品目录中为链接(True/False), 默认为True",
+                        type=utils.str2bool, required=False, default=True)
+    parser.add_argument("--assetdir", help="资源库目录, 默认为下载目录下的 .assets",
+                        type=str, required=False, default="")
+    parser.add_argument("--headless", help="不显示进度条(True/False), 在服务器上运行时使用, 默认为False",
+                        type=utils.str2bool, required=False, default=False)
+    parser.add_argument("--maxspeed", help="所有下载合计的速度上限(MB/s), 0 表示不限制, 默认为0",
+                        type=float, required=False, default=0)
+    parser.add_argument("--jobmaxspeed", help="单个下载任务的速度上限(MB/s), 0 表示不限制, 默认为0",
+                        type=float, required=False, default=0)
     parser.add_argument("--cookie", help="设置cookie, 格式: \"name1=value1; name2=value2;\" 注意要加冒号",
                         type=str, required=False, default='')
     parser.add_argument("--config", "-F", 
@@ -235,6 +309,12 @@ def main(load_from_file=True):
     if configModel["cookie"]:
         douyin_headers["Cookie"] = configModel["cookie"]
 
+    # 重试策略
+    retrier.load(configModel["retry"])
+    ratelimiter.load(configModel["rate_limit"])
+    cookiepool.load(configModel["cookie_pool"])
+    bandwidth.load(configModel["bandwidth"])
+
     # 路径处理
     configModel["path"] = os.path.abspath(configModel["path"])
     os.makedirs(configModel["path"], exist_ok=True)
@@ -242,14 +322,7 @@ def main(load_from_file=True):
 
     # 初始化下载器
     dy = Douyin(database=configModel["database"])
-    dl = Download(
-        thread=configModel["thread"],
-        music=configModel["music"],
-        cover=configModel["cover"],
-        avatar=configModel["avatar"],
-        resjson=configModel["json"],
-        folderstyle=configModel["folderstyle"]
-    )
+    dl = create_downloader(configModel)
 
     # 处理每个链接
     for link in configModel["link"]:
@@ -260,6 +333,36 @@ def main(load_from_file=True):
     douyin_logger.info(f'\n[下载完成]:总耗时: {int(duration/60)}分钟{int(duration%60)}秒\n')
 
 
+def create_downloader(config: dict):
+    """根据配置中的 engine 创建下载器"""
+    options = dict(
+        thread=config["thread"],
+        music=config["music"],
+        cover=config["cover"],
+        avatar=config["avatar"],
+        resjson=config["json"],
+        folderstyle=config["folderstyle"],
+        prefetch=config.get("prefetch", 2),
+        segments=config.get("segments", 4),
+        segment_threshold=config.get("segment_threshold", 20),
+        mirror_timeout=config.get("mirror_timeout", 5),
+        mirror_race=config.get("mirror_race", 0),
+        quality=config.get("quality"),
+        asset_dir=(config.get("asset_dir") or os.path.join(config["path"], ASSET_DIR))
+        if config.get("dedup", True) else None,
+        headless=config.get("headless", False)
+    )
+
+    if config.get("engine", "thread") == "async":
+        if ASYNC_SUPPORT:
+            from apiproxy.douyin.async_download import AsyncDownload
+            douyin_logger.info("[  提示  ]:使用 async 下载引擎")
+            return AsyncDownload(limit_per_host=config.get("limit_per_host", 8), **options)
+        douyin_logger.warning("aiohttp 未安装，改用多线程下载引擎")
+
+    return Download(**options)
+
+
 def process_link(dy, dl, link):
     """处理单个链接的下载逻辑"""
     douyin_logger.info("-" * 80)
@@ -306,9 +409,18 @@ def handle_user_download(dy, dl, key):
         elif mode == 'mix':
             _handle_mix_mode(dy, dl, key, userPath)
 
+def _peek_pages(pages):
+    """取出第一个作品(用于确定保存目录), 返回 (第一个作品, 包含已取出页面的完整迭代器)"""
+    consumed = []
+    for page in pages:
+        consumed.append(page)
+        if page.awemes:
+            return page.awemes[0], itertools.chain(consumed, pages)
+    return None, iter(())
+
 def _handle_post_like_mode(dy, dl, key, mode, userPath):
-    """处理发布/喜欢模式的下载"""
-    datalist = dy.getUserInfo(
+    """处理发布/喜欢模式的下载, 获取列表和下载同时进行"""
+    pages = dy.iterUserInfo(
         key, 
         mode, 
         35, 
@@ -317,14 +429,11 @@ def _handle_post_like_mode(dy, dl, key, mode, userPath):
         start_time=configModel.get("start_time", ""),
         end_time=configModel.get("end_time", "")
     )
-    
-    if not datalist:
-        return
-        
+
     modePath = os.path.join(userPath, mode)
     os.makedirs(modePath, exist_ok=True)
     
-    dl.userDownload(awemeList=datalist, savePath=modePath)
+    dl.pageDownload(pages, savePath=modePath)
 
 def _handle_mix_mode(dy, dl, key, userPath):
     """处理合集模式的下载"""
@@ -338,7 +447,7 @@ def _handle_mix_mode(dy, dl, key, userPath):
     for mix_id, mix_name in mixIdNameDict.items():
         douyin_logger.info(f'[  提示  ]:正在下载合集 [{mix_name}] 中的作品')
         mix_file_name = utils.replaceStr(mix_name)
-        datalist = dy.getMixInfo(
+        pages = dy.iterMixInfo(
             mix_id, 
             35, 
             0, 
@@ -348,15 +457,14 @@ def _handle_mix_mode(dy, dl, key, userPath):
             end_time=configModel.get("end_time", "")
         )
         
-        if datalist:
-            dl.userDownload(awemeList=datalist, savePath=os.path.join(modePath, mix_file_name))
-            douyin_logger.info(f'[  提示  ]:合集 [{mix_name}] 中的作品下载完成')
+        dl.pageDownload(pages, savePath=os.path.join(modePath, mix_file_name))
+        douyin_logger.info(f'[  提示  ]:合集 [{mix_name}] 中的作品下载完成')
 
 def handle_mix_download(dy, dl, key):
     """处理单个合集下载"""
     douyin_logger.info("[  提示  ]:正在请求单个合集下作品")
     try:
-        datalist = dy.getMixInfo(
+        first, pages = _peek_pages(dy.iterMixInfo(
             key, 
             35, 
             configModel["number"]["mix"], 
@@ -364,29 +472,30 @@ def handle_mix_download(dy, dl, key):
             "",
             start_time=configModel.get("start_time", ""),
             end_time=configModel.get("end_time", "")
-        )
+        ))
         
-        if not datalist:
+        if not first:
             douyin_logger.error("获取合集信息失败")
             return
             
-        mixname = utils.replaceStr(datalist[0]["mix_info"]["mix_name"])
+        mixname = utils.replaceStr(first["mix_info"]["mix_name"])
         mixPath = os.path.join(configModel["path"], f"mix_{mixname}_{key}")
         os.makedirs(mixPath, exist_ok=True)
-        dl.userDownload(awemeList=datalist, savePath=mixPath)
+        dl.pageDownload(pages, savePath=mixPath)
     except Exception as e:
         douyin_logger.error(f"处理合集时出错: {str(e)}")
 
 def handle_music_download(dy, dl, key):
     """处理音乐作品下载"""
     douyin_logger.info("[  提示  ]:正在请求音乐(原声)下作品")
-    datalist = dy.getMusicInfo(key, 35, configModel["number"]["music"], configModel["increase"]["music"])
+    first, pages = _peek_pages(
+        dy.iterMusicInfo(key, 35, configModel["number"]["music"], configModel["increase"]["music"]))
 
-    if datalist:
-        musicname = utils.replaceStr(datalist[0]["music"]["title"])
+    if first:
+        musicname = utils.replaceStr(first["music"]["title"])
         musicPath = os.path.join(configModel["path"], f"music_{musicname}_{key}")
         os.makedirs(musicPath, exist_ok=True)
-        dl.userDownload(awemeList=datalist, savePath=musicPath)
+        dl.pageDownload(pages, savePath=musicPath)
 
 def handle_aweme_download(dy, dl, key):
     """处理单个作品下载"""
@@ -463,17 +572,6 @@ def handle_live_download(dy, dl, key):
         with open(json_path, "w", encoding='utf-8') as f:
             json.dump(live_json, f, ensure_ascii=False, indent=2)
 
-# 条件定义异步函数
-if ASYNC_SUPPORT:
-    async def download_file(url, path):
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url) as response:
-                if response.status == 200:
-                    with open(path, 'wb') as f:
-                        f.write(await response.read())
-                    return True
-        return False
-
 def update_config_from_args(args):
     """从命令行参数更新配置"""
     configModel["link"] = args.link
@@ -485,6 +583,25 @@ def update_config_from_args(args):
     configModel["folderstyle"] = args.folderstyle
     configModel["mode"] = args.mode if args.mode else ["post"]
     configModel["thread"] = args.thread
+    configModel["engine"] = args.engine
+    configModel["limit_per_host"] = args.limitperhost
+    configModel["prefetch"] = args.prefetch
+    configModel["segments"] = args.segments
+    configModel["segment_threshold"] = args.segmentthreshold
+    configModel["mirror_timeout"] = args.mirrortimeout
+    configModel["mirror_race"] = args.mirrorrace
+    configModel["quality"] = {
+        "strategy": args.quality,
+        "max_height": args.maxheight,
+        "min_height": args.minheight,
+        "max_size": args.maxsize,
+        "max_bitrate": args.maxbitrate,
+        "prefer_h265": args.preferh265,
+    }
+    configModel["dedup"] = args.dedup
+    configModel["bandwidth"] = {"total": args.maxspeed, "job": args.jobmaxspeed}
+    configModel["headless"] = args.headless
+    configModel["asset_dir"] = args.assetdir
     configModel["cookie"] = args.cookie
     configModel["database"] = args.database
     
@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+重复资源去重基准测试
+
+构造同一个作者的一批作品(头像相同, 几首热门音乐被反复使用, 封面各不相同),
+在本地启动一个 HTTP 桩服务器, 对比不使用资源库和使用资源库时:
+1. 头像、音乐、封面的请求次数
+2. 下载目录实际占用的磁盘空间(硬链接只计算一次)
+3. 每个作品目录中的文件内容都正确
+4. 换一个保存目录再次下载时, 相同 uri 的资源不访问网络
+5. uri 不同但内容相同的文件只保存一份
+"""
+
+import os
+import sys
+import tempfile
+import threading
+from pathlib import Path
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+WORKS = 100
+TRACKS = 4
+AVATAR = os.urandom(200 * 1024)
+MUSIC = [os.urandom(1024 * 1024) for _ in range(TRACKS)]
+# 两个不同 uri 的封面内容相同(同一张图的不同地址)
+COVERS = {i: os.urandom(50 * 1024) for i in range(WORKS)}
+COVERS[1] = COVERS[0]
+VIDEO = os.urandom(64 * 1024)
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 64
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.lock = threading.Lock()
+        self.requests = {}
+
+
+class AssetHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        # /<类型>/<编号>
+        _, kind, number = self.path.split("/")
+        body = {"avatar": lambda n: AVATAR, "music": lambda n: MUSIC[n], "cover": lambda n: COVERS[n],
+                "video": lambda n: VIDEO}[kind](int(number))
+        with self.server.lock:
+            self.server.requests[kind] = self.server.requests.get(kind, 0) + 1
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def build_aweme_list(base):
+    return [{
+        "awemeType": 0,
+        "aweme_id": str(i),
+        "create_time": f"2024-01-01 00.{i // 60:02d}.{i % 60:02d}",
+        "desc": f"work{i}",
+        "author": {"avatar": {"uri": "aweme-avatar/1080x1080/author", "url_list": [f"{base}/avatar/0"]}},
+        "music": {"title": f"track{i % TRACKS}",
+                  "play_url": {"uri": f"music/{i % TRACKS}.mp3", "url_list": [f"{base}/music/{i % TRACKS}"]}},
+        "video": {"play_addr": {"uri": f"v{i}", "url_list": [f"{base}/video/{i}"]},
+                  "cover": {"uri": f"cover/{i}", "url_list": [f"{base}/cover/{i}"]}},
+    } for i in range(WORKS)]
+
+
+def disk_usage(*folders):
+    """实际占用的字节数, 同一个 inode 只计算一次"""
+    seen = set()
+    total = 0
+    for folder in folders:
+        for path in Path(folder).rglob("*"):
+            if path.is_symlink() or not path.is_file():
+                continue
+            stat = path.stat()
+            if (stat.st_dev, stat.st_ino) not in seen:
+                seen.add((stat.st_dev, stat.st_ino))
+                total += stat.st_size
+    return total
+
+
+def check_files(folder):
+    """每个作品目录中的头像、音乐、封面内容正确"""
+    ok = 0
+    for path in Path(folder).rglob("*.jpeg"):
+        if path.name.endswith("_avatar.jpeg"):
+            ok += path.read_bytes() == AVATAR
+        else:
+            ok += path.read_bytes() == COVERS[int(path.parent.name.rsplit("work", 1)[1])]
+    for path in Path(folder).rglob("*.mp3"):
+        ok += path.read_bytes() == MUSIC[int(path.stem.rsplit("track", 1)[1])]
+    return ok
+
+
+def run_once(server, aweme_list, save_path, asset_dir):
+    from apiproxy.douyin.download import Download
+
+    server.requests = {}
+    dl = Download(thread=8, music=True, cover=True, avatar=True, resjson=False, folderstyle=True,
+                  segments=1, asset_dir=asset_dir)
+    dl.retry_times = 1
+    dl.userDownload(awemeList=aweme_list, savePath=save_path)
+    stats = dl.assets.stats() if dl.assets else {}
+    if dl.assets:
+        dl.assets.close()
+    return dict(server.requests), stats
+
+
+def benchmark_assets():
+    print("=" * 50)
+    print("重复资源去重基准测试")
+    print("=" * 50)
+
+    server = StubServer(("127.0.0.1", 0), AssetHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    aweme_list = build_aweme_list(base)
+    checks = []
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        plain, _ = run_once(server, aweme_list, tmp / "plain", None)
+        plain_disk = disk_usage(tmp / "plain")
+        plain_ok = check_files(tmp / "plain")
+
+        store = tmp / "dedup" / ".assets"
+        first, stats = run_once(server, aweme_list, tmp / "dedup" / "user", store)
+        dedup_disk = disk_usage(tmp / "dedup")
+        dedup_ok = check_files(tmp / "dedup" / "user")
+
+        # 同一批作品保存到另一个目录(例如同时出现在主页和合集中)
+        again, _ = run_once(server, aweme_list, tmp / "dedup" / "mix", store)
+        again_ok = check_files(tmp / "dedup" / "mix")
+        total_disk = disk_usage(tmp / "dedup")
+
+    server.shutdown()
+
+    expected = WORKS * 3
+    print(f"\n{WORKS} 个作品, 同一个作者, {TRACKS} 首音乐")
+    print(f"{'方式':<20}{'头像请求':<10}{'音乐请求':<10}{'封面请求':<10}{'占用(MB)'}")
+    for name, requests, disk in (("不使用资源库", plain, plain_disk), ("使用资源库", first, dedup_disk)):
+        print(f"{name:<20}{requests.get('avatar', 0):<12}{requests.get('music', 0):<12}"
+              f"{requests.get('cover', 0):<12}{disk / 1024 / 1024:.1f}")
+    print(f"{'再保存到另一个目录':<16}{again.get('avatar', 0):<12}{again.get('music', 0):<12}"
+          f"{again.get('cover', 0):<12}+{(total_disk - dedup_disk) / 1024 / 1024:.1f}")
+    print(f"\n资源库统计: {stats}")
+
+    checks.append(("文件内容正确", plain_ok == expected and dedup_ok == expected and again_ok == expected))
+    checks.append((f"头像只下载 1 次(原来 {plain.get('avatar', 0)} 次)", first.get("avatar") == 1))
+    checks.append((f"音乐只下载 {TRACKS} 次(原来 {plain.get('music', 0)} 次)", first.get("music") == TRACKS))
+    checks.append((f"磁盘占用减少 {1 - dedup_disk / plain_disk:.0%}", dedup_disk < plain_disk / 2))
+    checks.append(("内容相同的封面只保存一份", stats.get("deduplicated") == 1))
+    checks.append(("再次保存时头像、音乐、封面不访问网络",
+                   not any(again.get(kind) for kind in ("avatar", "music", "cover"))
+                   and total_disk - dedup_disk == WORKS * len(VIDEO)))
+    print()
+    for name, ok in checks:
+        print(f"{'✓' if ok else '✗'} {name}")
+    return all(ok for _, ok in checks)
+
+
+if __name__ == '__main__':
+    sys.exit(0 if benchmark_assets() else 1)
@@ -0,0 +1,183 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+作品数据转换基准测试
+
+对比原来的 Result(clearDict + dataConvert + deepcopy)和新的 Aweme 记录:
+1. 对视频、图集、缺字段等多种作品, 两种方式生成的 JSON 完全相同
+   (Result 不再修改, 之后新增的字段不参与比较, 与固定的结果核对)
+2. 多线程同时转换时结果正确
+3. 每个作品的转换耗时
+"""
+
+import sys
+import copy
+import json
+import time
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from apiproxy.douyin.aweme import convert_aweme
+from apiproxy.douyin.result import Result
+
+ROUNDS = 5000      # 计时转换次数
+THREADS = 8        # 并发转换线程数
+
+# Result 之后新增的字段 (所在的字典, 字段名)
+ADDED_FIELDS = (("video", "bit_rate"),)
+# build_raw(0) 的 video.bit_rate
+EXPECTED_BIT_RATE = [
+    {"gear_name": "normal_1080_0", "quality_type": "", "bit_rate": 2500000, "codec": "h264", "width": 1080,
+     "height": 1920, "fps": 30, "data_size": 4700000, "uri": "v0", "url_list": ["https://v/0/1080", "https://v/0/bak"]},
+    # 没有 data_size 时按码率和时长估算
+    {"gear_name": "adapt_720_1", "quality_type": "", "bit_rate": 900000, "codec": "h265", "width": 720,
+     "height": 1280, "fps": 0, "data_size": 1687500, "uri": "v0_720", "url_list": ["https://v/0/720"]},
+]
+
+
+def image(uri, size=720):
+    return {"height": size, "uri": uri, "url_list": [f"https://p3.douyinpic.com/{uri}~100x100.jpeg"], "width": size}
+
+
+def build_raw(i, kind="video"):
+    """构造接口中的单个作品"""
+    raw = {
+        "aweme_id": str(7300000000000000000 + i),
+        "create_time": 1700000000 + i,
+        "desc": f"作品{i} #话题",
+        "is_top": 0,
+        "author": {
+            "avatar_thumb": image(f"avatar/100x100/{i}", 100),
+            "cover_url": [image(f"cover/{i}")],
+            "follower_count": 1000 + i,
+            "nickname": f"作者{i}",
+            "sec_uid": f"MS4wLjABAAAA{i}",
+            "uid": str(i),
+            "unique_id": f"user{i}",
+            "extra": {"ignored": True},
+        },
+        "music": {
+            "cover_hd": image(f"music/hd/{i}"),
+            "cover_thumb": image(f"music/thumb/{i}"),
+            "owner_nickname": f"音乐人{i}",
+            "play_url": {"uri": f"music/{i}.mp3", "url_key": str(i), "url_list": [f"https://music/{i}.mp3"]},
+            "title": f"原声{i}",
+        },
+        "mix_info": {
+            "cover_url": image(f"mix/{i}"),
+            "mix_id": str(i),
+            "mix_name": f"合集{i}",
+            "statis": {"current_episode": 3, "updated_to_episode": 10},
+        },
+        "statistics": {"admire_count": 0, "collect_count": 5, "comment_count": 6, "digg_count": 7,
+                       "play_count": 0, "share_count": 8},
+        "images": None,
+        "video": {
+            "duration": 15000,
+            "bit_rate": [{"gear_name": "normal_1080_0", "bit_rate": 2500000, "is_h265": 0, "FPS": 30,
+                          "play_addr": {"uri": f"v{i}", "url_list": [f"https://v/{i}/1080", f"https://v/{i}/bak"],
+                                        "width": 1080, "height": 1920, "data_size": 4700000}},
+                         {"gear_name": "adapt_720_1", "bit_rate": 900000, "is_bytevc1": 1,
+                          "play_addr": {"uri": f"v{i}_720", "url_list": [f"https://v/{i}/720"],
+                                        "width": 720, "height": 1280}}],
+            "cover": image(f"video/cover/{i}"),
+            "origin_cover": image(f"video/origin/{i}"),
+            "dynamic_cover": image(f"video/dynamic/{i}"),
+        },
+    }
+    if kind == "images":
+        raw["images"] = [dict(image(f"img/{i}/{j}", 1080), mask_url_list=None, download_url_list=[]) for j in range(3)]
+    elif kind == "sparse":
+        # 缺少作者头像、音乐为 null、没有合集和 bit_rate
+        del raw["author"]["avatar_thumb"]
+        raw["music"] = None
+        del raw["mix_info"]
+        del raw["video"]["bit_rate"]
+        del raw["create_time"]
+    return raw
+
+
+def convert_old(result, raw):
+    """原来 Douyin 中的转换写法"""
+    result.clearDict(result.awemeDict)
+    awemeType = 1 if raw.get("images") is not None else 0
+    result.dataConvert(awemeType, result.awemeDict, raw)
+    return copy.deepcopy(result.awemeDict)
+
+
+def dumps(data):
+    return json.dumps(data, ensure_ascii=False, indent=2)
+
+
+def without_added(data):
+    """去掉 Result 之后新增的字段"""
+    data = copy.deepcopy(data)
+    for parent, key in ADDED_FIELDS:
+        data[parent].pop(key, None)
+    return data
+
+
+def check_same_json():
+    samples = [build_raw(i, kind) for i in range(20) for kind in ("video", "images", "sparse")]
+    result = Result()
+    mismatches = [raw["aweme_id"] for raw in samples
+                  if dumps(convert_old(result, raw)) != dumps(without_added(convert_aweme(raw)))]
+    print(f"{'✓' if not mismatches else '✗'} JSON 一致: {len(samples) - len(mismatches)}/{len(samples)}")
+    return not mismatches
+
+
+def check_added_fields():
+    ok = (convert_aweme(build_raw(0, "video"))["video"]["bit_rate"] == EXPECTED_BIT_RATE
+          and convert_aweme(build_raw(0, "images"))["video"]["bit_rate"] == []
+          and convert_aweme(build_raw(0, "sparse"))["video"]["bit_rate"] == [])
+    print(f"{'✓' if ok else '✗'} 新增的 video.bit_rate 与预期一致")
+    return ok
+
+
+def check_threads():
+    samples = [build_raw(i, ("video", "images", "sparse")[i % 3]) for i in range(600)]
+    expected = [dumps(convert_aweme(raw)) for raw in samples]
+    with ThreadPoolExecutor(THREADS) as executor:
+        actual = list(executor.map(lambda raw: dumps(convert_aweme(raw)), samples))
+    ok = actual == expected
+    print(f"{'✓' if ok else '✗'} {THREADS} 线程并发转换 {len(samples)} 个作品结果正确")
+    return ok
+
+
+def benchmark_speed():
+    samples = [build_raw(i, ("video", "images")[i % 2]) for i in range(100)]
+    result = Result()
+
+    start = time.perf_counter()
+    for n in range(ROUNDS):
+        convert_old(result, samples[n % len(samples)])
+    old = (time.perf_counter() - start) / ROUNDS * 1e6
+
+    start = time.perf_counter()
+    for n in range(ROUNDS):
+        convert_aweme(samples[n % len(samples)])
+    new = (time.perf_counter() - start) / ROUNDS * 1e6
+
+    print(f"\n{'方式':<24}{'每个作品(微秒)'}")
+    print(f"{'Result + deepcopy':<24}{old:.1f}")
+    print(f"{'Aweme':<24}{new:.1f}")
+    print(f"\n✓ 加速 {old / new:.1f}x")
+
+
+def benchmark_aweme():
+    print("=" * 50)
+    print("作品数据转换基准测试")
+    print("=" * 50)
+    check_same_json()
+    check_added_fields()
+    check_threads()
+    benchmark_speed()
+
+
+if __name__ == '__main__':
+    benchmark_aweme()
@@ -0,0 +1,199 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+下载带宽限制基准测试
+
+在本地启动一个不限速的 HTTP 桩服务器, 检查:
+1. 不限速时的下载速度(对照)
+2. 全局上限在多个工作线程之间共同生效(线程引擎和 async 引擎)
+3. 大文件分段下载时多个连接的合计速度也不超过上限
+4. 两个下载任务同时进行时, 单任务上限和全局上限同时生效
+5. 下载过程中修改上限, 速度随之变化
+6. 实际速度与允许速度的统计
+"""
+
+import os
+import sys
+import time
+import tempfile
+import threading
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+MB = 1024 * 1024
+FILE_SIZE = 512 * 1024
+LARGE = 8 * MB
+PAYLOAD = os.urandom(LARGE)
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 64
+
+
+class FileHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        body = PAYLOAD if self.path.startswith("/large") else PAYLOAD[:FILE_SIZE]
+        start, end = 0, len(body) - 1
+        header = self.headers.get("Range")
+        if header:
+            first, last = header.split("=", 1)[1].split("-")
+            start, end = int(first), min(int(last) if last else end, end)
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{len(body)}")
+        else:
+            self.send_response(200)
+        self.send_header("Content-Length", str(end - start + 1))
+        self.end_headers()
+        try:
+            self.wfile.write(body[start:end + 1])
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, format, *args):
+        pass
+
+
+def build_aweme_list(base, count, prefix="f"):
+    return [{
+        "awemeType": 1,
+        "aweme_id": f"{prefix}{i}",
+        "create_time": f"2024-01-01 00.00.{i:02d}",
+        "desc": f"{prefix}{i}",
+        "images": [{"url_list": [f"{base}/{prefix}/{i}"]}],
+    } for i in range(count)]
+
+
+def create_download(engine="thread", **options):
+    from apiproxy.douyin.download import Download
+    from apiproxy.douyin.async_download import AsyncDownload
+
+    cls = AsyncDownload if engine == "async" else Download
+    dl = cls(thread=8, music=False, cover=False, avatar=False, resjson=False, folderstyle=False, **options)
+    dl.retry_times = 1
+    return dl
+
+
+def run_job(dl, base, folder, prefix, workers):
+    """一个下载任务: workers 个线程下载 8 个文件"""
+    folder.mkdir()
+    paths = [(f"{base}/{prefix}/{i}", folder / f"{i}.jpeg") for i in range(8)]
+    with ThreadPoolExecutor(workers) as executor:
+        list(executor.map(lambda item: dl.download_with_resume(item[0], item[1], item[1].name), paths))
+
+
+def timed(fn):
+    start = time.time()
+    fn()
+    return time.time() - start
+
+
+def rate_of(size, elapsed):
+    return size / elapsed / MB
+
+
+def benchmark_bandwidth():
+    from apiproxy.common import bandwidth
+
+    print("=" * 50)
+    print("下载带宽限制基准测试")
+    print("=" * 50)
+
+    server = StubServer(("127.0.0.1", 0), FileHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    results = []
+    checks = []
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        count = 16
+        size = count * FILE_SIZE
+
+        bandwidth.load({"total": 0, "job": 0})
+        elapsed = timed(lambda: create_download(segments=1).userDownload(
+            build_aweme_list(base, count), tmp / "unlimited"))
+        results.append(("不限速, 8 线程", 0, rate_of(size, elapsed)))
+
+        for engine in ("thread", "async"):
+            bandwidth.load({"total": 2, "job": 0})
+            elapsed = timed(lambda: create_download(engine, segments=1).userDownload(
+                build_aweme_list(base, count), tmp / engine))
+            achieved = rate_of(size, elapsed)
+            results.append((f"全局 2MB/s, {engine} 引擎", 2, achieved))
+            checks.append((f"{engine} 引擎 8 个并发下载合计不超过全局上限", 1.6 < achieved <= 2.2))
+
+        # 大文件分段下载
+        bandwidth.load({"total": 3, "job": 0})
+        dl = create_download(segments=4, segment_threshold=1)
+        path = tmp / "large.mp4"
+        elapsed = timed(lambda: dl.download_with_resume(f"{base}/large", path, "large"))
+        achieved = rate_of(LARGE, elapsed)
+        results.append(("全局 3MB/s, 4 段下载", 3, achieved))
+        checks.append(("分段下载的多个连接合计不超过全局上限",
+                       2.4 < achieved <= 3.3 and path.read_bytes() == PAYLOAD))
+
+        # 两个任务: 每个任务 1MB/s, 全局 1.5MB/s
+        bandwidth.load({"total": 1.5, "job": 1})
+        # 同一时间只能显示一个进度条, 两个任务直接调用 download_with_resume
+        jobs = [create_download(segments=1) for _ in range(2)]
+        threads = [threading.Thread(target=run_job, args=(dl, base, tmp / f"job{n}", f"j{n}", 4))
+                   for n, dl in enumerate(jobs)]
+        start = time.time()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        achieved = rate_of(2 * 8 * FILE_SIZE, time.time() - start)
+        results.append(("两个任务, 各 1MB/s, 全局 1.5MB/s", 1.5, achieved))
+        checks.append(("两个任务同时进行时合计不超过全局上限", 1.2 < achieved <= 1.65))
+
+        # 单个任务: 只限制任务
+        bandwidth.load({"total": 0, "job": 1})
+        elapsed = timed(lambda: create_download(segments=1).userDownload(
+            build_aweme_list(base, 8, "single"), tmp / "single"))
+        achieved = rate_of(8 * FILE_SIZE, elapsed)
+        results.append(("单任务 1MB/s", 1, achieved))
+        checks.append(("单任务上限生效", 0.8 < achieved <= 1.1))
+
+        # 下载过程中修改上限: 前 2 秒 1MB/s, 之后 4MB/s
+        bandwidth.load({"total": 1, "job": 0})
+        dl = create_download(segments=1)
+        samples = []
+        worker = threading.Thread(target=dl.userDownload, args=(build_aweme_list(base, 24, "live"), tmp / "live"))
+        worker.start()
+        time.sleep(2)
+        samples.append(bandwidth.total.stats())
+        bandwidth.load({"total": 4})
+        time.sleep(2)
+        samples.append(bandwidth.total.stats())
+        worker.join()
+        stats = bandwidth.stats()
+        print(f"\n修改上限前后的统计: {samples}")
+        checks.append((f"修改上限后速度随之变化({samples[0]['achieved']} -> {samples[1]['achieved']} MB/s)",
+                       samples[1]["achieved"] > samples[0]["achieved"] * 2))
+        checks.append(("统计中包含允许速度、实际速度和限速等待时间",
+                       stats["total"]["allowed"] == 4 and stats["total"]["throttled"] > 0))
+
+    bandwidth.load({"total": 0, "job": 0})
+    server.shutdown()
+
+    print(f"\n{'方式':<32}{'上限(MB/s)':<12}{'实际(MB/s)'}")
+    for name, limit, achieved in results:
+        print(f"{name:<32}{limit or '不限':<12}{achieved:.2f}")
+    print()
+    for name, ok in checks:
+        print(f"{'✓' if ok else '✗'} {name}")
+    return all(ok for _, ok in checks)
+
+
+if __name__ == '__main__':
+    sys.exit(0 if benchmark_bandwidth() else 1)
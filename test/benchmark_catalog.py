@@ -0,0 +1,213 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+文件索引基准测试
+
+在临时目录中生成一个较大的下载目录(多个用户目录, 每个作品一个目录), 对比:
+1. 原来的 /api/files: rglob 遍历整个目录, 每个文件 stat 两次, 返回全部文件
+2. 文件索引: 第一次建立、没有变化时和新增少量文件后的增量同步耗时
+3. 分页查询(第一页、游标翻到很后面的页、按类型和文件名筛选)的耗时和响应大小
+并检查按游标翻完所有页得到的文件与目录中的文件完全一致、顺序正确
+"""
+
+import os
+import sys
+import json
+import time
+import tempfile
+from pathlib import Path
+from datetime import datetime
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+USERS = 20
+WORKS = 1000           # 每个用户的作品数
+# 每个作品: 视频、封面、音乐、头像和 JSON(不显示)
+SUFFIXES = ("mp4", "jpeg", "mp3")
+PAGE = 50
+
+
+def build_tree(root: Path) -> int:
+    count = 0
+    for user in range(USERS):
+        user_dir = root / f"user_作者{user}_MS4wLjABAAAA{user:04d}" / "post"
+        for work in range(WORKS):
+            work_dir = user_dir / f"2024-01-{work % 28 + 1:02d} 12.{work // 60 % 60:02d}.{work % 60:02d}_作品{work}"
+            work_dir.mkdir(parents=True)
+            for n, suffix in enumerate(SUFFIXES):
+                path = work_dir / f"作品{work}_{n}.{suffix}"
+                path.write_bytes(b"x" * ((user * WORKS + work) % 977 + n))
+                count += 1
+            (work_dir / f"作品{work}_avatar.jpeg").write_bytes(b"a")
+            (work_dir / f"作品{work}_result.json").write_bytes(b"{}")
+            count += 1
+    # 缩略图缓存和资源库中的文件不显示
+    (root / "temp" / "thumbnails").mkdir(parents=True)
+    (root / "temp" / "thumbnails" / "x.jpg").write_bytes(b"t")
+    (root / ".assets" / "objects").mkdir(parents=True)
+    (root / ".assets" / "objects" / "y.mp3").write_bytes(b"a")
+    return count
+
+
+def legacy_files(download_path: Path):
+    """原来的 /api/files"""
+    excluded_extensions = {'.json', '.txt', '.log', '.part'}
+    files = []
+    for item in download_path.rglob('*'):
+        if item.is_file():
+            if 'temp' in item.parts or '.assets' in item.parts:
+                continue
+            if item.suffix.lower() in excluded_extensions:
+                continue
+            files.append({
+                'name': item.name,
+                'path': str(item.relative_to(download_path)),
+                'size': item.stat().st_size,
+                'modified': datetime.fromtimestamp(item.stat().st_mtime).isoformat()
+            })
+    return files
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, (time.perf_counter() - start) * 1000
+
+
+def benchmark_catalog():
+    from apiproxy.douyin.catalog import FileCatalog
+
+    print("=" * 50)
+    print("文件索引基准测试")
+    print("=" * 50)
+    checks = []
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp) / "Downloaded"
+        count = build_tree(root)
+        print(f"\n{USERS} 个用户, {USERS * WORKS} 个作品, {count} 个文件")
+
+        legacy, legacy_ms = timed(lambda: legacy_files(root))
+        legacy_size = len(json.dumps(legacy, ensure_ascii=False).encode("utf-8"))
+
+        catalog = FileCatalog(root)
+        first, first_ms = timed(catalog.sync)
+        idle, idle_ms = timed(catalog.sync)
+        new_dir = next((root / "user_作者0_MS4wLjABAAAA0000" / "post").glob("*_作品0"))
+        for n in range(10):
+            (new_dir / f"新文件{n}.mp4").write_bytes(b"n" * n)
+        (new_dir / "作品0_0.mp4").unlink()
+        changed, changed_ms = timed(catalog.sync)
+
+        print(f"\n{'操作':<28}{'耗时(毫秒)':<14}{'说明'}")
+        print(f"{'原来: 遍历目录返回全部文件':<22}{legacy_ms:<14.0f}{len(legacy)} 个文件, {legacy_size / 1024:.0f}KB")
+        print(f"{'建立索引':<26}{first_ms:<14.0f}{first}")
+        print(f"{'增量同步(没有变化)':<22}{idle_ms:<14.0f}{idle}")
+        print(f"{'增量同步(一个目录变化)':<20}{changed_ms:<14.0f}{changed}")
+        checks.append(("建立索引时文件数正确", first["added"] == len(legacy)))
+        checks.append(("没有变化时不读取文件属性", idle["scanned_dirs"] == 0 and idle["added"] == 0))
+        checks.append(("一个目录变化时只检查这个目录",
+                       changed["scanned_dirs"] == 1 and changed["added"] == 10 and changed["removed"] == 1))
+
+        # 分页查询
+        queries = []
+        (page, cursor), ms = timed(lambda: catalog.query(limit=PAGE))
+        queries.append(("第一页(按时间倒序)", ms, page))
+        for _ in range(199):
+            page, cursor = catalog.query(limit=PAGE, cursor=cursor)
+        (page, _), ms = timed(lambda: catalog.query(limit=PAGE, cursor=cursor))
+        queries.append(("第 201 页(游标)", ms, page))
+        (offset_page, _), ms = timed(lambda: catalog.query(limit=PAGE, offset=200 * PAGE))
+        queries.append(("第 201 页(offset)", ms, offset_page))
+        (videos, _), ms = timed(lambda: catalog.query(limit=PAGE, sort="size-desc", type="video"))
+        queries.append(("视频, 按大小排序", ms, videos))
+        (found, _), ms = timed(lambda: catalog.query(limit=PAGE, sort="name-asc", q="作品99_"))
+        queries.append(("搜索文件名", ms, found))
+        total, ms = timed(lambda: catalog.count(type="video", source="user_作者3_MS4wLjABAAAA0003"))
+        queries.append(("按类型和来源计数", ms, []))
+        summary, ms = timed(catalog.summary)
+        queries.append(("各类型文件数和来源", ms, []))
+
+        print(f"\n{'查询':<24}{'耗时(毫秒)':<14}{'响应大小'}")
+        for name, ms, files in queries:
+            size = len(json.dumps(files, ensure_ascii=False).encode("utf-8"))
+            print(f"{name:<22}{ms:<14.2f}{size / 1024:.1f}KB")
+        checks.append(("每个分页查询都在 50 毫秒内", all(ms < 50 for _, ms, _ in queries)))
+        checks.append(("游标和 offset 翻到的页相同", page == offset_page))
+        checks.append(("筛选结果正确",
+                       all(file["type"] == "video" for file in videos)
+                       and [file["size"] for file in videos] == sorted((file["size"] for file in videos), reverse=True)
+                       and all("作品99_" in file["name"] for file in found) and catalog.count(q="作品99_") == USERS * 4
+                       and total == WORKS))
+        checks.append(("各类型文件数正确", summary["stats"]["total"] == len(legacy) + 9
+                       and summary["stats"]["video"] == USERS * WORKS + 9 and len(summary["sources"]) == USERS))
+
+        # 翻完所有页
+        paths, cursor = [], None
+        while True:
+            page, cursor = catalog.query(limit=500, cursor=cursor, sort="date-desc")
+            paths.extend((file["modified"], file["path"]) for file in page)
+            if cursor is None:
+                break
+        expected = {str(path.relative_to(root)).replace(os.sep, "/") for path in root.rglob("*")
+                    if path.is_file() and path.suffix not in (".json",) and "temp" not in path.parts
+                    and ".assets" not in path.parts}
+        checks.append(("按游标翻完所有页: 每个文件出现一次", len(paths) == len(expected)
+                       and {path for _, path in paths} == expected))
+        checks.append(("按游标翻完所有页: 顺序正确", paths == sorted(paths, reverse=True)))
+
+        # Web 接口
+        os.chdir(tmp)
+        import app as web
+        web.config_manager.config["path"] = str(root)
+        web.get_file_catalog(root.resolve()).sync()
+        client = web.app.test_client()
+        response, ms = timed(lambda: client.get(f"/api/files?limit={PAGE}&sort=date-desc&type=all"))
+        data = response.get_json()
+        print(f"\nGET /api/files?limit={PAGE}: {ms:.1f} 毫秒, {len(response.data) / 1024:.1f}KB")
+        cursor_page = client.get(f"/api/files?limit={PAGE}&cursor={data['next_cursor']}").get_json()
+        checks.append(("接口返回一页文件、总数、下一页游标和统计",
+                       len(data["files"]) == PAGE and data["total"] == len(expected) and data["next_cursor"]
+                       and data["stats"]["total"] == len(expected) and "stats" not in cursor_page
+                       and cursor_page["files"][0]["path"] != data["files"][0]["path"]))
+        checks.append(("无效的游标返回 400", client.get("/api/files?limit=5&cursor=abc").status_code == 400))
+        legacy_response = client.get("/api/files").get_json()
+        checks.append(("没有参数时仍返回全部文件的列表", isinstance(legacy_response, list)
+                       and len(legacy_response) == len(expected)))
+        # 新的下载目录: 第一次请求时索引还在后台建立
+        fresh = Path(tmp) / "Fresh"
+        for work in range(WORKS):
+            (fresh / "user" / f"作品{work}").mkdir(parents=True)
+            (fresh / "user" / f"作品{work}" / f"作品{work}.mp4").write_bytes(b"v")
+        web.config_manager.config["path"] = str(fresh)
+        fresh_response = client.get("/api/files").get_json()
+        checks.append(("没有参数时等待第一次建立索引, 返回全部文件", len(fresh_response) == WORKS))
+        # 原地覆盖的文件: 目录的修改时间不变, 增量同步发现不了
+        fresh_catalog = web.get_file_catalog(fresh.resolve())
+        (fresh / "user" / "作品0" / "作品0.mp4").write_bytes(b"overwritten")
+        client.get("/api/files?limit=5&refresh=1")
+        fresh_catalog._thread.join()
+        overwritten = fresh_catalog.query(limit=1, q="作品0.mp4")[0]
+        checks.append(("刷新时更新原地覆盖的文件", overwritten and overwritten[0]["size"] == len(b"overwritten")))
+        # 其它程序增删的文件(没有 watchdog 时不会收到事件)
+        (fresh / "user" / "作品1" / "作品1.mp4").unlink()
+        (fresh / "user" / "新作品").mkdir()
+        (fresh / "user" / "新作品" / "新作品.mp4").write_bytes(b"v")
+        changed = {file["path"] for file in client.get("/api/files").get_json()}
+        checks.append(("没有参数时返回其它程序增删后的文件", len(changed) == WORKS
+                       and "user/新作品/新作品.mp4" in changed and "user/作品1/作品1.mp4" not in changed))
+        for catalog_ in list(web.file_catalogs.values()) + [catalog]:
+            catalog_.close()
+        os.chdir(project_root)
+
+    print()
+    for name, ok in checks:
+        print(f"{'✓' if ok else '✗'} {name}")
+    return all(ok for _, ok in checks)
+
+
+if __name__ == '__main__':
+    sys.exit(0 if benchmark_catalog() else 1)
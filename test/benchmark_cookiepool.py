@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Cookie 池基准测试
+
+在本地启动一个 HTTP 桩服务器, 按请求的 Cookie 返回正常数据或
+token 过期({"status_code": 0}), 检查:
+1. 多线程请求分散到各组身份上
+2. token 过期的身份被淘汰, 请求换一组身份重试后成功
+3. 接口限速按身份分开计算: 同样的接口限速下, 身份越多合计速率越高
+4. 限流和服务器错误只降低身份的选择顺序, 连续 max_expired 次 token 过期才淘汰
+"""
+
+import sys
+import json
+import time
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+RATE = 5.0        # 每组身份的接口限速(每秒请求数)
+REQUESTS = 30     # 每轮请求数
+THREADS = 6       # 并发线程数
+GOOD = json.dumps({"status_code": 0, "aweme_list": []}).encode()
+EXPIRED = json.dumps({"status_code": 0}).encode()
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.lock = threading.Lock()
+        self.cookies = Counter()
+
+
+class CookieHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        cookie = self.headers.get("Cookie", "")
+        with self.server.lock:
+            self.server.cookies[cookie] += 1
+        body = EXPIRED if "expired" in cookie else GOOD
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def run(url, count=REQUESTS):
+    """多线程请求 count 次, 返回 (耗时, 成功次数)"""
+    from apiproxy.common import retrier
+
+    start = time.time()
+    with ThreadPoolExecutor(THREADS) as pool:
+        results = list(pool.map(lambda _: retrier.request_json("USER_POST", url, headers={"Cookie": "default"}),
+                                range(count)))
+    return time.time() - start, sum(1 for r in results if r and "aweme_list" in r)
+
+
+def benchmark_cookiepool():
+    from apiproxy.common import cookiepool, ratelimiter, retrier
+    from apiproxy.common.ratelimit import Bucket
+
+    print("=" * 50)
+    print("Cookie 池基准测试")
+    print("=" * 50)
+
+    server = StubServer(("127.0.0.1", 0), CookieHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/aweme/post/?"
+
+    # 只按接口限速, 本地主机不限速; 不写共享状态文件
+    ratelimiter.shared = False
+    ratelimiter.endpoint_default = Bucket(rate=RATE, burst=1)
+    ratelimiter.host_default = Bucket(rate=0)
+    retrier.configure(base_delay=0.01, max_delay=0.05)
+    checks = []
+
+    try:
+        # 1. 分散到各组身份
+        cookiepool.load(["a=1", "b=2", "c=3"])
+        ratelimiter.reset()
+        server.cookies.clear()
+        elapsed, ok = run(url)
+        spread = dict(server.cookies)
+        print(f"\n3 组身份, {REQUESTS} 次请求, 各身份请求数: {spread}")
+        checks.append(("请求分散到各组身份", ok == REQUESTS and len(spread) == 3
+                       and max(spread.values()) - min(spread.values()) <= THREADS))
+
+        # 2. token 过期的身份被淘汰, 换身份重试
+        cookiepool.load({"cookies": ["a=1", {"name": "bad", "cookie": "expired=1"}, "c=3"],
+                         "max_expired": 2, "cooldown": 0})
+        ratelimiter.reset()
+        server.cookies.clear()
+        elapsed, ok = run(url)
+        stats = {item["name"]: item for item in cookiepool.stats()}
+        print(f"含一组过期身份, 成功 {ok}/{REQUESTS}, 过期身份请求 {server.cookies['expired=1']} 次, "
+              f"健康分: { {name: item['score'] for name, item in stats.items()} }")
+        checks.append(("过期后换一组身份重试成功", ok == REQUESTS))
+        server.cookies.clear()
+        run(url, count=THREADS)
+        checks.append(("过期身份被淘汰, 之后不再使用", stats["bad"]["retired"] and not server.cookies["expired=1"]))
+
+        # 3. 接口限速按身份计算
+        print(f"\n{'身份数':<10}{'耗时(秒)':<12}{'请求/秒'}")
+        rates = {}
+        for n in (1, 3):
+            cookiepool.load([f"id{i}=1" for i in range(n)])
+            ratelimiter.reset()
+            elapsed, ok = run(url)
+            rates[n] = ok / elapsed
+            print(f"{n:<10}{elapsed:<12.2f}{rates[n]:.1f}")
+        checks.append((f"3 组身份的合计速率约为 1 组的 3 倍({rates[3] / rates[1]:.1f} 倍)",
+                       rates[3] > rates[1] * 2.2))
+
+        # 限流和服务器错误只降低选择顺序, 不淘汰; 过期次数未达到 max_expired 时不淘汰
+        cookiepool.load({"cookies": ["a=1", "b=2"], "max_expired": 3, "cooldown": 0})
+        first, second = cookiepool.credentials
+        for _ in range(10):
+            cookiepool.report(first, ok=False)
+        demoted = [cookiepool.acquire() for _ in range(4)]
+        for credential in demoted:
+            cookiepool.release(credential)
+        for _ in range(2):
+            cookiepool.report(second, ok=False, token_expired=True)
+        fallback = cookiepool.acquire()
+        cookiepool.release(fallback)
+        for _ in range(20):
+            cookiepool.report(first, ok=True)
+        checks.append(("连续限流和两次过期不淘汰身份, 健康分低的身份排在后面并能回升",
+                       not first.retired and not second.retired and all(c is second for c in demoted)
+                       and fallback is not None and first.score >= cookiepool.min_score))
+        cookiepool.report(second, ok=False, token_expired=True)
+        checks.append(("连续过期 max_expired 次后淘汰", second.retired))
+
+        # 没有配置时使用默认 Cookie
+        cookiepool.load([])
+        server.cookies.clear()
+        run(url, count=3)
+        checks.append(("没有配置 Cookie 池时使用原来的 Cookie", set(server.cookies) == {"default"}))
+    finally:
+        server.shutdown()
+
+    print()
+    for name, ok in checks:
+        print(f"{'✓' if ok else '✗'} {name}")
+    return all(ok for _, ok in checks)
+
+
+if __name__ == '__main__':
+    sys.exit(0 if benchmark_cookiepool() else 1)
@@ -0,0 +1,163 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+数据库基准测试
+
+1. 迁移: 用旧版本的表结构(无索引, t_mix 有重复记录)创建数据库,
+   再用 DataBase 打开, 检查版本号、索引和数据
+2. 性能: 对比旧写法(默认日志模式, 每次插入都提交, 无索引)和新写法
+   (WAL, 每页一个事务, 联合索引)的插入和查询耗时
+3. 增量检查: 重新扫描一个已全部记录的大账号, 对比逐个作品查询和
+   按页批量检查(split_seen, 内存中的已记录集合)的耗时
+"""
+
+import os
+import sys
+import json
+import time
+import sqlite3
+import tempfile
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from apiproxy.douyin.database import DataBase
+
+ROWS = 20000       # 合集作品数量
+PAGE_SIZE = 20     # 每页作品数
+LOOKUPS = 2000     # 查询次数
+ACCOUNT = 50000    # 增量检查的账号作品数
+DATA = {"desc": "x" * 200}
+
+OLD_SCHEMA = [
+    """CREATE TABLE t_user_post (id integer primary key autoincrement, sec_uid varchar(200),
+           aweme_id integer unique, rawdata json);""",
+    """CREATE TABLE t_user_like (id integer primary key autoincrement, sec_uid varchar(200),
+           aweme_id integer unique, rawdata json);""",
+    """CREATE TABLE t_mix (id integer primary key autoincrement, sec_uid varchar(200),
+           mix_id varchar(200), aweme_id integer, rawdata json);""",
+    """CREATE TABLE t_music (id integer primary key autoincrement, music_id varchar(200),
+           aweme_id integer unique, rawdata json);""",
+]
+
+
+def create_old_database(path, rows=0):
+    """按旧版本的写法创建数据库并插入数据"""
+    conn = sqlite3.connect(path)
+    cursor = conn.cursor()
+    for sql in OLD_SCHEMA:
+        cursor.execute(sql)
+    conn.commit()
+    start = time.time()
+    for i in range(rows):
+        cursor.execute("insert into t_mix (sec_uid, mix_id, aweme_id, rawdata) values(?,?,?,?);",
+                       ("user", "mix", i, json.dumps(DATA)))
+        conn.commit()
+    return conn, time.time() - start
+
+
+def test_migration(tmp):
+    path = os.path.join(tmp, "old.db")
+    conn, _ = create_old_database(path)
+    conn.executemany("insert into t_mix (sec_uid, mix_id, aweme_id, rawdata) values(?,?,?,?);",
+                     [("user", "mix", 1, "{}"), ("user", "mix", 1, "{}"), ("user", "mix", 2, "{}")])
+    conn.execute("insert into t_user_post (sec_uid, aweme_id, rawdata) values('user', 1, '{}');")
+    conn.commit()
+    conn.close()
+
+    db = DataBase(path)
+    indexes = {row[0] for row in db.cursor.execute("select name from sqlite_master where type='index';")}
+    mix_rows = db.cursor.execute("select count(*) from t_mix;").fetchone()[0]
+    journal = db.cursor.execute("PRAGMA journal_mode;").fetchone()[0]
+
+    checks = [
+        ("表结构版本", db.schema_version() == DataBase.SCHEMA_VERSION),
+        ("日志模式 WAL", journal == "wal"),
+        ("联合索引", "idx_mix_sec_uid_mix_id_aweme_id" in indexes and "idx_user_post_sec_uid_aweme_id" in indexes),
+        ("t_mix 重复记录已合并", mix_rows == 2),
+        ("旧数据保留", db.get_user_post("user", 1) is not None),
+    ]
+    db.close()
+    # 再次打开不会重复迁移
+    db = DataBase(path)
+    checks.append(("重复打开", db.schema_version() == DataBase.SCHEMA_VERSION))
+    db.close()
+
+    print("\n迁移测试:")
+    for name, ok in checks:
+        print(f"{'✓' if ok else '✗'} {name}")
+    return all(ok for _, ok in checks)
+
+
+def benchmark_performance(tmp):
+    old_conn, old_insert = create_old_database(os.path.join(tmp, "bench_old.db"), ROWS)
+    start = time.time()
+    for i in range(0, ROWS, ROWS // LOOKUPS):
+        old_conn.execute("select id from t_mix where sec_uid=? and mix_id=? and aweme_id=?;",
+                         ("user", "mix", i)).fetchone()
+        old_conn.commit()
+    old_lookup = time.time() - start
+    old_conn.close()
+
+    db = DataBase(os.path.join(tmp, "bench_new.db"))
+    start = time.time()
+    for page in range(0, ROWS, PAGE_SIZE):
+        with db.transaction():
+            for i in range(page, page + PAGE_SIZE):
+                db.insert_mix("user", "mix", i, DATA)
+    new_insert = time.time() - start
+    start = time.time()
+    for i in range(0, ROWS, ROWS // LOOKUPS):
+        db.get_mix("user", "mix", i)
+    new_lookup = time.time() - start
+    db.close()
+
+    print(f"\n{'方式':<10}{'插入 ' + str(ROWS) + ' 条(秒)':<20}{'查询 ' + str(LOOKUPS) + ' 次(秒)'}")
+    print(f"{'旧写法':<10}{old_insert:<20.3f}{old_lookup:.3f}")
+    print(f"{'新写法':<10}{new_insert:<20.3f}{new_lookup:.3f}")
+    print(f"\n✓ 插入加速 {old_insert / new_insert:.1f}x, 查询加速 {old_lookup / new_lookup:.1f}x")
+
+
+def benchmark_rescan(tmp):
+    db = DataBase(os.path.join(tmp, "bench_rescan.db"))
+    pages = [[{"aweme_id": str(i), **DATA} for i in range(page, page + PAGE_SIZE)]
+             for page in range(0, ACCOUNT, PAGE_SIZE)]
+    for page in pages:
+        db.insert_many("post", "user", page)
+
+    # 新开一个连接, 模拟下一次运行
+    db.close()
+    db = DataBase(os.path.join(tmp, "bench_rescan.db"))
+    start = time.time()
+    per_row = sum(1 for page in pages for aweme in page if db.get_user_post("user", aweme["aweme_id"]))
+    per_row_time = time.time() - start
+
+    start = time.time()
+    bulk = sum(len(db.split_seen("post", "user", [aweme["aweme_id"] for aweme in page])[0]) for page in pages)
+    bulk_time = time.time() - start
+    db.close()
+
+    print(f"\n重新扫描 {ACCOUNT} 个作品({len(pages)} 页):")
+    print(f"   逐个查询: {per_row_time:.3f} 秒, 已记录 {per_row}")
+    print(f"   按页检查: {bulk_time:.3f} 秒(含读入内存), 已记录 {bulk}")
+    print(f"{'✓' if per_row == bulk == ACCOUNT else '✗'} 结果一致, 加速 {per_row_time / bulk_time:.1f}x")
+    return per_row == bulk == ACCOUNT
+
+
+def benchmark_database():
+    print("=" * 50)
+    print("数据库基准测试")
+    print("=" * 50)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        migrated = test_migration(tmp)
+        benchmark_performance(tmp)
+        rescanned = benchmark_rescan(tmp)
+    return migrated and rescanned
+
+
+if __name__ == '__main__':
+    sys.exit(0 if benchmark_database() else 1)
@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+下载并发基准测试
+
+在本地启动一个带固定延迟的 HTTP 桩服务器, 用不同的线程数运行
+Download.userDownload, 对比吞吐量是否随线程数增长,
+并与 async 引擎(AsyncDownload, 需要 aiohttp)对比
+"""
+
+import sys
+import time
+import tempfile
+import threading
+from pathlib import Path
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+LATENCY = 0.05          # 每个请求的首字节延迟(秒)
+PAYLOAD = b"x" * 65536  # 每个文件 64KB
+WORKS = 40              # 作品数量
+IMAGES_PER_WORK = 3     # 每个图集的图片数
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # 默认的 listen 队列只有 5, 高并发时会丢弃连接请求
+    request_queue_size = 256
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        time.sleep(LATENCY)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(len(PAYLOAD)))
+        self.end_headers()
+        self.wfile.write(PAYLOAD)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub_server():
+    """启动本地桩服务器, 返回 (server, base_url)"""
+    server = StubServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def build_aweme_list(base_url):
+    """构造图集作品列表, 每个作品包含多张图片"""
+    awemeList = []
+    for i in range(WORKS):
+        awemeList.append({
+            "awemeType": 1,
+            "aweme_id": str(i),
+            "create_time": f"2024-01-01 00.00.{i:02d}",
+            "desc": f"bench{i}",
+            "images": [{"url_list": [f"{base_url}/img/{i}/{j}"]} for j in range(IMAGES_PER_WORK)],
+        })
+    return awemeList
+
+
+def run_once(base_url, thread, engine="thread"):
+    """用指定线程数(并发数)下载一次, 返回 (耗时, 文件数)"""
+    options = dict(thread=thread, music=False, cover=False, avatar=False, resjson=False, folderstyle=True)
+    if engine == "async":
+        from apiproxy.douyin.async_download import AsyncDownload
+        # 桩服务器只有一个主机, 不限制单主机连接数
+        dl = AsyncDownload(limit_per_host=0, **options)
+    else:
+        from apiproxy.douyin.download import Download
+        dl = Download(**options)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.time()
+        dl.userDownload(awemeList=build_aweme_list(base_url), savePath=Path(tmp))
+        duration = time.time() - start
+        files = sum(1 for p in Path(tmp).rglob("*.jpeg"))
+    return duration, files
+
+
+def benchmark_download_threads():
+    """对比不同线程数的下载吞吐量"""
+    print("=" * 50)
+    print("下载并发基准测试")
+    print("=" * 50)
+
+    server, base_url = start_stub_server()
+    total_files = WORKS * IMAGES_PER_WORK
+    results = []
+    try:
+        for thread in (1, 2, 4, 8, 16):
+            duration, files = run_once(base_url, thread)
+            results.append(("thread", thread, duration, files))
+        try:
+            for thread in (16, 64):
+                duration, files = run_once(base_url, thread, engine="async")
+                results.append(("async", thread, duration, files))
+        except ImportError as e:
+            print(f"⚠ 跳过 async 引擎: {e}")
+    finally:
+        server.shutdown()
+
+    print(f"\n{'引擎':<8}{'并发数':<8}{'耗时(秒)':<12}{'文件/秒':<12}{'MB/秒':<10}{'完成'}")
+    for engine, thread, duration, files in results:
+        rate = files / duration if duration else 0
+        mbps = files * len(PAYLOAD) / duration / 1024 / 1024 if duration else 0
+        print(f"{engine:<8}{thread:<8}{duration:<12.2f}{rate:<12.1f}{mbps:<10.2f}{files}/{total_files}")
+
+    base = results[0][2]
+    print(f"\n✓ 16 线程相对单线程加速: {base / results[4][2]:.1f}x")
+    return results
+
+
+if __name__ == '__main__':
+    benchmark_download_threads()
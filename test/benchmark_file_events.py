@@ -0,0 +1,185 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+文件事件基准测试
+
+在已有大量文件的下载目录中用本地桩服务器下载一批作品, 对比:
+1. 原来: 下载期间每 2 秒以及每个链接结束后遍历整个下载目录统计文件数
+2. 现在: 下载器每保存一个文件发出一次事件, 文件数和文件索引随之更新, 读取文件数不访问磁盘
+并检查事件计数与实际新增的文件一致、跳过的已存在文件不计数、删除事件和
+(安装了 watchdog 时)其它程序增删的文件会更新到索引中
+"""
+
+import io
+import os
+import sys
+import time
+import tempfile
+import threading
+from pathlib import Path
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from rich.console import Console
+
+EXISTING = 40000       # 下载目录中已有的文件数
+WORKS = 200
+PAYLOAD = os.urandom(64 * 1024)
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 64
+
+
+class FileHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(PAYLOAD)))
+        self.end_headers()
+        self.wfile.write(PAYLOAD)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def build_library(root: Path) -> None:
+    for n in range(EXISTING // 4):
+        work_dir = root / f"user_old{n % 10}" / "post" / f"work{n}"
+        work_dir.mkdir(parents=True)
+        for suffix in ("mp4", "jpeg", "mp3"):
+            (work_dir / f"work{n}.{suffix}").write_bytes(b"x")
+        (work_dir / f"work{n}_avatar.jpeg").write_bytes(b"a")
+
+
+def count_downloaded_files(download_path: Path) -> int:
+    """原来的文件数统计"""
+    excluded_extensions = {'.json', '.txt', '.log', '.part'}
+    count = 0
+    for item in download_path.rglob('*'):
+        if item.is_file():
+            if 'temp' in item.parts or '.assets' in item.parts:
+                continue
+            if item.suffix.lower() in excluded_extensions:
+                continue
+            count += 1
+    return count
+
+
+def build_aweme_list(base, prefix):
+    return [{
+        "awemeType": 0,
+        "aweme_id": f"{prefix}{i}",
+        "create_time": f"2024-02-01 00.{i // 60:02d}.{i % 60:02d}",
+        "desc": f"{prefix}{i}",
+        "author": {"avatar": {"url_list": [f"{base}/avatar/{i}"]}},
+        "music": {"title": f"track{i}", "play_url": {"url_list": [f"{base}/music/{i}"]}},
+        "video": {"play_addr": {"url_list": [f"{base}/video/{i}"]},
+                  "cover": {"url_list": [f"{base}/cover/{i}"]}},
+    } for i in range(WORKS)]
+
+
+def download(root, base, catalog, prefix="new"):
+    from apiproxy.douyin.download import Download
+
+    dl = Download(thread=8, music=True, cover=True, avatar=True, resjson=True, folderstyle=True,
+                  segments=1, headless=True)
+    dl.console = Console(file=io.StringIO())
+    dl.retry_times = 1
+    dl.board.on_file(catalog.notify)
+    start = time.perf_counter()
+    dl.userDownload(awemeList=build_aweme_list(base, prefix), savePath=root / f"user_{prefix}" / "post")
+    catalog.flush()
+    return dl, time.perf_counter() - start
+
+
+def benchmark_file_events():
+    from apiproxy.douyin import catalog as catalog_module
+    from apiproxy.douyin.catalog import FileCatalog
+
+    print("=" * 50)
+    print("文件事件基准测试")
+    print("=" * 50)
+    checks = []
+
+    server = StubServer(("127.0.0.1", 0), FileHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp) / "Downloaded"
+        build_library(root)
+        catalog = FileCatalog(root)
+        catalog.sync()
+        before = catalog.total
+
+        dl, elapsed = download(root, base, catalog)
+        new_files = WORKS * 4
+        on_disk = count_downloaded_files(root)
+
+        # 原来: 下载期间每 2 秒一次, 每个链接结束后和全部结束时各一次
+        start = time.perf_counter()
+        count_downloaded_files(root)
+        scan = time.perf_counter() - start
+        scans = int(elapsed // 2) + 2
+
+        start = time.perf_counter()
+        for _ in range(10000):
+            dl.board.files_saved, catalog.total
+        read = (time.perf_counter() - start) / 10000
+
+        print(f"\n已有 {EXISTING} 个文件, 下载 {WORKS} 个作品({new_files} 个文件), 耗时 {elapsed:.2f} 秒")
+        print(f"\n{'方式':<26}{'读取一次':<16}{'下载期间合计'}")
+        print(f"{'原来: 遍历下载目录':<22}{scan * 1000:<12.0f}毫秒  {scans} 次, {scan * scans:.2f} 秒")
+        print(f"{'现在: 文件事件计数':<22}{read * 1e6:<12.2f}微秒  0 次遍历")
+
+        checks.append((f"读取文件数从 {scan * 1000:.0f} 毫秒降到 {read * 1e6:.1f} 微秒", read * 1000 < scan))
+        checks.append(("下载器计数与新增文件一致", dl.board.files_saved == new_files))
+        checks.append(("文件索引的总数与目录一致", catalog.total == before + new_files == on_disk))
+        files, _ = catalog.query(limit=None, source="user_new")
+        checks.append(("新文件已写入索引(不需要同步)", len(files) == new_files))
+        stats = catalog.sync()
+        checks.append(("之后同步没有遗漏的文件", stats["added"] == 0 and stats["removed"] == 0
+                       and catalog.total == on_disk))
+
+        again, _ = download(root, base, catalog)
+        checks.append(("跳过的已存在文件不计数", again.board.files_saved == 0 and catalog.total == on_disk))
+
+        victim = next((root / "user_new" / "post").rglob("*_video.mp4"))
+        victim.unlink()
+        catalog.notify(victim, removed=True)
+        catalog.flush()
+        checks.append(("删除事件更新总数", catalog.total == on_disk - 1))
+
+        if catalog_module.Observer is not None:
+            catalog.watch()
+            time.sleep(0.2)
+            extra = root / "user_old0" / "post" / "work0" / "copied.mp4"
+            extra.write_bytes(b"c")
+            (root / "user_old1" / "post" / "work1" / "work1.mp4").unlink()
+            deadline = time.time() + 5
+            while time.time() < deadline and catalog.count(q="copied.mp4") != 1:
+                time.sleep(0.1)
+            time.sleep(0.5)
+            catalog.flush()
+            checks.append(("监视到其它程序增删的文件", catalog.count(q="copied.mp4") == 1
+                           and catalog.total == on_disk - 1))
+        else:
+            print("\nwatchdog 未安装, 跳过目录监视检查")
+        catalog.close()
+
+    server.shutdown()
+    print()
+    for name, ok in checks:
+        print(f"{'✓' if ok else '✗'} {name}")
+    return all(ok for _, ok in checks)
+
+
+if __name__ == '__main__':
+    sys.exit(0 if benchmark_file_events() else 1)
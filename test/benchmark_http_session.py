@@ -0,0 +1,179 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+共享连接池基准测试
+
+在本地启动一个 TLS 桩服务器(自签名证书, 需要 openssl 命令),
+统计服务器接受的连接数(即 TCP+TLS 握手次数), 对比:
+1. 每次调用 requests.get 新建连接
+2. 通过 apiproxy.common.session 复用 keep-alive 连接
+3. 完整流程: Douyin.getUserInfo 翻页 + Download.userDownload 下载
+"""
+
+import os
+import sys
+import ssl
+import json
+import time
+import tempfile
+import threading
+import subprocess
+from pathlib import Path
+from urllib.parse import urlparse, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import requests
+
+REQUESTS = 100          # 单独测试的请求次数
+PAGES = 3               # 用户主页的翻页次数
+PAGE_SIZE = 10          # 每页作品数
+PAYLOAD = b"x" * 16384  # 每个媒体文件 16KB
+
+
+class CountingServer(ThreadingHTTPServer):
+    """记录 accept 次数的服务器, 每次 accept 对应一次 TCP+TLS 握手"""
+    daemon_threads = True
+    connections = 0
+
+    def get_request(self):
+        request = super().get_request()
+        self.connections += 1
+        return request
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # 头部和正文分开写出, 关闭 Nagle 避免 keep-alive 连接上的延迟确认
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path.startswith("/aweme/v1/web/aweme/post/"):
+            cursor = int(parse_qs(url.query).get("max_cursor", ["0"])[0])
+            body = json.dumps(build_page(self.server.base_url, cursor)).encode()
+            content_type = "application/json"
+        else:
+            body = PAYLOAD
+            content_type = "application/octet-stream"
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def build_page(base_url, cursor):
+    """构造一页用户作品接口返回的数据"""
+    aweme_list = []
+    for i in range(PAGE_SIZE):
+        aweme_id = cursor * PAGE_SIZE + i
+        aweme_list.append({
+            "aweme_id": str(aweme_id),
+            "create_time": 1700000000 + aweme_id,
+            "desc": f"bench{aweme_id}",
+            "is_top": 0,
+            "images": [{"url_list": [f"{base_url}/media/{aweme_id}/{j}"]} for j in range(2)],
+        })
+    return {
+        "status_code": 0,
+        "aweme_list": aweme_list,
+        "has_more": cursor + 1 < PAGES,
+        "max_cursor": cursor + 1,
+    }
+
+
+def create_certificate(directory):
+    """用 openssl 生成 127.0.0.1 的自签名证书"""
+    cert = os.path.join(directory, "cert.pem")
+    key = os.path.join(directory, "key.pem")
+    subprocess.run([
+        "openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes",
+        "-keyout", key, "-out", cert, "-days", "1",
+        "-subj", "/CN=127.0.0.1", "-addext", "subjectAltName=IP:127.0.0.1",
+    ], check=True, capture_output=True)
+    return cert, key
+
+
+def start_tls_server(cert, key):
+    server = CountingServer(("127.0.0.1", 0), StubHandler)
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(cert, key)
+    server.socket = context.wrap_socket(server.socket, server_side=True)
+    server.base_url = f"https://127.0.0.1:{server.server_address[1]}"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def measure(server, fetch):
+    """执行 fetch, 返回 (耗时, 新建连接数)"""
+    before = server.connections
+    start = time.time()
+    fetch()
+    return time.time() - start, server.connections - before
+
+
+def benchmark_http_session():
+    print("=" * 50)
+    print("共享连接池基准测试")
+    print("=" * 50)
+
+    from apiproxy.common import session
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cert, key = create_certificate(tmp)
+        # requests 和共享会话都会读取这个环境变量来校验自签名证书
+        os.environ["REQUESTS_CA_BUNDLE"] = cert
+        server = start_tls_server(cert, key)
+        url = f"{server.base_url}/media/0/0"
+
+        try:
+            def plain():
+                for _ in range(REQUESTS):
+                    requests.get(url).content
+
+            def pooled():
+                for _ in range(REQUESTS):
+                    session.get(url).content
+
+            plain_time, plain_conn = measure(server, plain)
+            pooled_time, pooled_conn = measure(server, pooled)
+
+            print(f"\n{'方式':<16}{'请求数':<8}{'握手次数':<10}{'总耗时(秒)':<12}{'单次(毫秒)'}")
+            print(f"{'requests.get':<16}{REQUESTS:<8}{plain_conn:<10}{plain_time:<12.3f}{plain_time / REQUESTS * 1000:.2f}")
+            print(f"{'共享会话':<16}{REQUESTS:<8}{pooled_conn:<10}{pooled_time:<12.3f}{pooled_time / REQUESTS * 1000:.2f}")
+            print(f"\n✓ 每次请求节省: {(plain_time - pooled_time) / REQUESTS * 1000:.2f} 毫秒")
+
+            # 完整流程: 翻页获取作品 + 多线程下载
+            from apiproxy.douyin.douyin import Douyin
+            from apiproxy.douyin.download import Download
+
+            dy = Douyin(database=False)
+            dy.urls.USER_POST = f"{server.base_url}/aweme/v1/web/aweme/post/?"
+            dl = Download(thread=4, music=False, cover=False, avatar=False, resjson=False)
+            save_path = Path(tmp) / "download"
+
+            result = {}
+
+            def flow():
+                result["list"] = dy.getUserInfo("bench", "post", PAGE_SIZE)
+                dl.userDownload(awemeList=result["list"], savePath=save_path)
+
+            flow_time, flow_conn = measure(server, flow)
+            total_requests = PAGES + len(result["list"]) * 2
+            print(f"\n完整流程: {PAGES} 页 + {len(result['list']) * 2} 个文件 = {total_requests} 次请求")
+            print(f"   握手次数: {flow_conn}, 耗时: {flow_time:.2f} 秒")
+        finally:
+            server.shutdown()
+            os.environ.pop("REQUESTS_CA_BUNDLE", None)
+
+
+if __name__ == '__main__':
+    benchmark_http_session()
@@ -0,0 +1,191 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+镜像地址选择基准测试
+
+在本地启动几个模拟 CDN 节点的桩服务器(不同端口即不同主机):
+- slow: 首字节延迟很长
+- broken: 总是返回 503
+- fast: 正常
+- flaky: 发送一半后断开连接
+- short: 正常结束响应, 但只发送一半(Content-Length 与发送的数据一致, Content-Range 为完整大小)
+作品的 url_list 按 [slow, broken, fast] 排列, 对比原来只用 url_list[0] 和现在
+按主机统计选择镜像的总耗时, 并检查测速模式、换镜像后的续传和不完整的传输只记为失败
+"""
+
+import os
+import sys
+import time
+import tempfile
+import threading
+from pathlib import Path
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+SLOW_LATENCY = 1.5      # slow 节点的首字节延迟(秒)
+MIRROR_TIMEOUT = 0.3    # 换镜像的首字节超时(秒)
+WORKS = 20              # 作品数量
+PAYLOAD = os.urandom(256 * 1024)
+
+
+class NodeServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 64
+
+    def __init__(self, kind):
+        super().__init__(("127.0.0.1", 0), NodeHandler)
+        self.kind = kind
+        self.requests = 0
+        # Range 请求的起始位置
+        self.starts = []
+        self.url = f"http://127.0.0.1:{self.server_address[1]}"
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+
+class NodeHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        kind = self.server.kind
+        self.server.requests += 1
+        if kind == "slow":
+            time.sleep(SLOW_LATENCY)
+        if kind == "broken":
+            self.send_response(503)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        start = 0
+        header = self.headers.get("Range")
+        if header:
+            start = int(header.split("=", 1)[1].split("-")[0])
+            self.server.starts.append(start)
+        if header or kind == "short":
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{len(PAYLOAD) - 1}/{len(PAYLOAD)}")
+        else:
+            self.send_response(200)
+        data = PAYLOAD[start:]
+        length = len(data)
+        if kind == "short":
+            data = data[:len(data) // 2]
+            length = len(data)
+        self.send_header("ETag", '"payload"')
+        self.send_header("Content-Length", str(length))
+        self.end_headers()
+        if kind == "flaky":
+            data = data[:len(data) // 2]
+            self.close_connection = True
+        try:
+            self.wfile.write(data)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, format, *args):
+        pass
+
+
+def build_aweme_list(urls):
+    return [{
+        "awemeType": 1,
+        "aweme_id": str(i),
+        "create_time": f"2024-01-01 00.00.{i:02d}",
+        "desc": f"mirror{i}",
+        "images": [{"url_list": [f"{url}/img/{i}" for url in urls]}],
+    } for i in range(WORKS)]
+
+
+def run_once(urls, engine=None, **options):
+    """下载一次, 返回 (耗时, 内容正确的文件数); engine 为下载引擎的类, 默认为 Download"""
+    from apiproxy.common import mirrors
+    from apiproxy.douyin.download import Download
+
+    mirrors.reset()
+    dl = (engine or Download)(thread=4, music=False, cover=False, avatar=False, resjson=False, folderstyle=True,
+                  segments=1, **options)
+    dl.retry_times = 1
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.time()
+        dl.userDownload(awemeList=build_aweme_list(urls), savePath=Path(tmp))
+        duration = time.time() - start
+        files = sum(1 for p in Path(tmp).rglob("*.jpeg") if p.read_bytes() == PAYLOAD)
+    return duration, files
+
+
+def benchmark_mirrors():
+    from apiproxy.common import mirrors
+
+    print("=" * 50)
+    print("镜像地址选择基准测试")
+    print("=" * 50)
+
+    nodes = {kind: NodeServer(kind) for kind in ("slow", "broken", "fast", "flaky", "short")}
+    mirror_urls = [nodes["slow"].url, nodes["broken"].url, nodes["fast"].url]
+    results = []
+    checks = []
+    try:
+        # 原来只使用 url_list[0]
+        duration, files = run_once(mirror_urls[:1], mirror_timeout=0)
+        results.append(("只用 url_list[0]", duration, files))
+
+        for node in nodes.values():
+            node.requests = 0
+        duration, files = run_once(mirror_urls, mirror_timeout=MIRROR_TIMEOUT)
+        results.append(("按主机统计选择镜像", duration, files))
+        stats = mirrors.stats()
+        requests = {kind: nodes[kind].requests for kind in ("slow", "broken", "fast")}
+
+        duration, files = run_once(mirror_urls, mirror_timeout=MIRROR_TIMEOUT, mirror_race=16)
+        results.append(("先测速再选择", duration, files))
+
+        # 换镜像后续传: flaky 节点发送一半后断开, fast 节点从断开的位置继续
+        nodes["fast"].starts = []
+        duration, files = run_once([nodes["flaky"].url, nodes["fast"].url], mirror_timeout=MIRROR_TIMEOUT)
+        results.append(("中途断开后换镜像续传", duration, files))
+
+        # 不完整的传输: 只记为失败, 不计入速度
+        duration, files = run_once([nodes["short"].url, nodes["fast"].url], mirror_timeout=MIRROR_TIMEOUT)
+        results.append(("不完整的传输后换镜像", duration, files))
+        short = mirrors.stats()[mirrors.host(nodes["short"].url)]
+        short_requests = nodes["short"].requests
+        from apiproxy.douyin.async_download import AsyncDownload
+        duration, files = run_once([nodes["short"].url, nodes["fast"].url], engine=AsyncDownload,
+                                   mirror_timeout=MIRROR_TIMEOUT)
+        results.append(("不完整的传输后换镜像(async)", duration, files))
+        async_short = mirrors.stats()[mirrors.host(nodes["short"].url)]
+        async_short["requests"] = nodes["short"].requests - short_requests
+    finally:
+        for node in nodes.values():
+            node.shutdown()
+
+    print(f"\n{'方式':<24}{'耗时(秒)':<12}{'完成'}")
+    for name, duration, files in results:
+        print(f"{name:<24}{duration:<12.2f}{files}/{WORKS}")
+    print(f"\n各节点请求数: {requests}")
+    print("主机统计: " + ", ".join(f"{host}: 延迟 {s['latency']}, 失败率 {s['error']}" for host, s in stats.items()))
+
+    checks.append(("所有方式下载的文件内容正确", all(files == WORKS for _, _, files, in results)))
+    checks.append((f"慢节点不再拖慢整批下载(加速 {results[0][1] / results[1][1]:.1f} 倍)",
+                   results[1][1] * 3 < results[0][1]))
+    checks.append(("之后的文件直接使用最快的主机", requests["fast"] == WORKS and requests["slow"] < WORKS // 2))
+    checks.append(("测速模式不等待慢节点超时", results[2][1] < results[1][1]))
+    resumed = nodes["fast"].starts
+    # 之后的文件直接从 fast 节点完整下载, 不带 Range
+    checks.append((f"换镜像后从断开的位置继续({len(resumed)} 个文件)", results[3][2] == WORKS and resumed
+                   and set(resumed) == {len(PAYLOAD) // 2}))
+    checks.append(("不完整的传输只记为一次失败, 不计入速度", short["samples"] == short_requests
+                   and short["rate"] is None and short["error"] > 0))
+    checks.append(("async 引擎: 不完整的传输只记为一次失败", async_short["samples"] == async_short["requests"]
+                   and async_short["rate"] is None and async_short["error"] > 0))
+    print()
+    for name, ok in checks:
+        print(f"{'✓' if ok else '✗'} {name}")
+    return all(ok for _, ok in checks)
+
+
+if __name__ == '__main__':
+    sys.exit(0 if benchmark_mirrors() else 1)
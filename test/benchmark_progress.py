@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+下载进度汇总基准测试
+
+1. 多个线程同时报告进度: 对比原来每块数据调用 rich Progress.update 和现在
+   累加 FileProgress 计数的耗时(CPU 时间)
+2. 多个线程同时累加同一个文件(分段下载)时计数不丢失
+3. 本地桩服务器下完整下载: 进度条模式和 headless 模式的 CPU 时间,
+   下载量统计正确, 采样线程按固定间隔运行, headless 且没有监听者时不启动采样线程
+"""
+
+import io
+import os
+import sys
+import time
+import tempfile
+import threading
+from pathlib import Path
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from rich.console import Console
+from rich.progress import Progress
+
+THREADS = 16
+UPDATES = 20000        # 每个线程的进度报告次数
+CHUNK = 8192
+FILES = 256
+FILE_SIZE = 1024 * 1024
+PAYLOAD = os.urandom(FILE_SIZE)
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 64
+
+
+class FileHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(PAYLOAD)))
+        self.end_headers()
+        self.wfile.write(PAYLOAD)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def measure(fn):
+    """返回 (墙钟时间, CPU 时间)"""
+    wall, cpu = time.perf_counter(), time.process_time()
+    fn()
+    return time.perf_counter() - wall, time.process_time() - cpu
+
+
+def run_threads(target):
+    threads = [threading.Thread(target=target, args=(n,)) for n in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def benchmark_updates():
+    """每块数据报告一次进度的开销"""
+    from apiproxy.douyin.progress import ProgressBoard
+
+    # 原来: 每个文件一个 rich 任务, 每块数据 update(advance=...), rich 在后台每秒刷新 10 次
+    progress = Progress(console=Console(file=io.StringIO(), force_terminal=True), transient=True)
+    with progress:
+        tasks = [progress.add_task(f"file{n}", total=UPDATES * CHUNK) for n in range(THREADS)]
+        old = measure(lambda: run_threads(lambda n: [progress.update(tasks[n], advance=CHUNK)
+                                                     for _ in range(UPDATES)]))
+
+    board = ProgressBoard()
+    files = [board.start_file(f"file{n}", UPDATES * CHUNK) for n in range(THREADS)]
+    new = measure(lambda: run_threads(lambda n: [files[n].advance(CHUNK) for _ in range(UPDATES)]))
+
+    # 分段下载: 所有线程累加同一个文件
+    shared = board.start_file("segmented", THREADS * UPDATES * CHUNK)
+    run_threads(lambda n: [shared.advance(CHUNK) for _ in range(UPDATES)])
+    return old, new, shared.completed == THREADS * UPDATES * CHUNK
+
+
+def benchmark_download(base, headless, listen=True):
+    """下载 FILES 个文件, 返回 (墙钟时间, CPU 时间, 统计的字节数, 采样次数, 是否启动了采样线程)"""
+    from apiproxy.douyin.download import Download
+
+    dl = Download(thread=8, music=False, cover=False, avatar=False, resjson=False, folderstyle=False,
+                  segments=1, headless=headless)
+    dl.console = Console(file=io.StringIO())
+    dl.progress.live.console = Console(file=io.StringIO(), force_terminal=True)
+    dl.retry_times = 1
+    samples = []
+    if listen:
+        dl.board.listen(samples.append)
+    sampler = []
+    watcher = threading.Thread(target=lambda: [sampler.append(any(t.name == "progress-sampler"
+                                                                  for t in threading.enumerate()))
+                                               or time.sleep(0.05) for _ in range(10)])
+    aweme_list = [{
+        "awemeType": 1,
+        "aweme_id": str(i),
+        "create_time": f"2024-01-01 00.{i // 60:02d}.{i % 60:02d}",
+        "desc": f"progress{i}",
+        "images": [{"url_list": [f"{base}/{i}"]}],
+    } for i in range(FILES)]
+    with tempfile.TemporaryDirectory() as tmp:
+        watcher.start()
+        wall, cpu = measure(lambda: dl.userDownload(awemeList=aweme_list, savePath=Path(tmp)))
+        watcher.join()
+    return wall, cpu, dl.board.transferred(), samples, any(sampler)
+
+
+def benchmark_progress():
+    print("=" * 50)
+    print("下载进度汇总基准测试")
+    print("=" * 50)
+    checks = []
+
+    old, new, exact = benchmark_updates()
+    total = THREADS * UPDATES
+    print(f"\n{THREADS} 线程共报告 {total} 次进度")
+    print(f"{'方式':<28}{'耗时(秒)':<12}{'CPU(秒)':<12}{'每次(微秒)'}")
+    print(f"{'rich Progress.update':<28}{old[0]:<12.3f}{old[1]:<12.3f}{old[0] / total * 1e6:.2f}")
+    print(f"{'FileProgress.advance':<28}{new[0]:<12.3f}{new[1]:<12.3f}{new[0] / total * 1e6:.2f}")
+    checks.append((f"报告进度的耗时减少到 {new[0] / old[0]:.0%}", new[0] * 2 < old[0]))
+    checks.append(("多个线程累加同一个文件时计数不丢失", exact))
+
+    server = StubServer(("127.0.0.1", 0), FileHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        shown = benchmark_download(base, headless=False)
+        headless = benchmark_download(base, headless=True)
+        silent = benchmark_download(base, headless=True, listen=False)
+    finally:
+        server.shutdown()
+
+    print(f"\n下载 {FILES} 个 {FILE_SIZE // 1024 // 1024}MB 文件")
+    print(f"{'方式':<28}{'耗时(秒)':<12}{'CPU(秒)':<12}{'采样次数'}")
+    for name, result in (("显示进度条", shown), ("headless + 监听", headless), ("headless", silent)):
+        print(f"{name:<28}{result[0]:<12.2f}{result[1]:<12.2f}{len(result[3])}")
+
+    expected = FILES * FILE_SIZE
+    checks.append(("下载量统计正确", shown[2] == expected and headless[2] == expected and silent[2] == expected))
+    final = headless[3][-1] if headless[3] else {}
+    checks.append(("最后一次采样包含全部作品和字节数",
+                   final.get("works_done") == FILES and final.get("bytes") == expected and not final.get("files")))
+    # 采样间隔 0.25 秒, 加上结束时的一次
+    checks.append((f"采样按固定间隔进行({len(headless[3])} 次 / {headless[0]:.2f} 秒)",
+                   len(headless[3]) <= headless[0] / 0.25 + 2))
+    checks.append(("headless 且没有监听者时不启动采样线程", not silent[4] and not silent[3]))
+    print()
+    for name, ok in checks:
+        print(f"{'✓' if ok else '✗'} {name}")
+    return all(ok for _, ok in checks)
+
+
+if __name__ == '__main__':
+    sys.exit(0 if benchmark_progress() else 1)
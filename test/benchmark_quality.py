@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+视频清晰度选择基准测试
+
+构造带完整 bit_rate 的作品(1080p/720p/540p, H.264 和 H.265), 在本地启动一个按地址
+返回对应大小文件的 HTTP 桩服务器, 对比原来总是下载 play_addr(最高清晰度)和各种清晰度
+策略实际传输的数据量, 并检查:
+1. 转换后的作品保留所有清晰度的分辨率、码率、编码和大小
+2. 选中的清晰度满足分辨率、大小上限和 H.265 偏好
+3. 默认配置仍然下载 play_addr
+"""
+
+import sys
+import tempfile
+import threading
+from pathlib import Path
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+WORKS = 20
+SCALE = 100    # 文件按真实大小的 1/SCALE 发送
+# (gear_name, 短边, 码率 bit/s, 是否 H.265), 接口中最高清晰度排在第一个
+GEARS = [
+    ("normal_1080_0", 1080, 2800000, 0),
+    ("1080_1_1", 1080, 1600000, 1),
+    ("normal_720_0", 720, 1400000, 0),
+    ("adapt_lowest_720_1", 720, 800000, 1),
+    ("normal_540_0", 540, 700000, 0),
+]
+DURATION = 30000    # 毫秒
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 64
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.lock = threading.Lock()
+        self.sent = 0
+        self.gears = []
+
+
+class SizeHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        # /<gear>/<size>/<作品>
+        _, gear, size, _ = self.path.split("/", 3)
+        body = b"\0" * (int(size) // SCALE)
+        with self.server.lock:
+            self.server.sent += len(body)
+            self.server.gears.append(gear)
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def build_raw(base, i):
+    bit_rate = []
+    for gear, side, rate, h265 in GEARS:
+        size = rate * DURATION // 8000
+        bit_rate.append({
+            "gear_name": gear,
+            "quality_type": 0,
+            "bit_rate": rate,
+            "is_h265": h265,
+            "FPS": 30,
+            "play_addr": {"uri": f"{i}_{gear}", "width": side, "height": side * 16 // 9, "data_size": size,
+                          "url_list": [f"{base}/{gear}/{size}/{i}"]},
+        })
+    return {
+        "aweme_id": str(7300000000000000000 + i),
+        "create_time": 1700000000 + i,
+        "desc": f"作品{i}",
+        "author": {"nickname": f"作者{i}"},
+        "images": None,
+        "video": {"duration": DURATION, "bit_rate": bit_rate},
+    }
+
+
+def run_policy(server, aweme_list, quality):
+    from apiproxy.douyin.download import Download
+
+    server.sent = 0
+    server.gears = []
+    dl = Download(thread=4, music=False, cover=False, avatar=False, resjson=False, folderstyle=False,
+                  segments=1, quality=quality)
+    dl.retry_times = 1
+    with tempfile.TemporaryDirectory() as tmp:
+        dl.userDownload(awemeList=aweme_list, savePath=Path(tmp))
+        files = sum(1 for _ in Path(tmp).rglob("*_video.mp4"))
+    return server.sent * SCALE, files, set(server.gears)
+
+
+def benchmark_quality():
+    from apiproxy.douyin.aweme import convert_aweme
+
+    print("=" * 50)
+    print("视频清晰度选择基准测试")
+    print("=" * 50)
+
+    server = StubServer(("127.0.0.1", 0), SizeHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    aweme_list = [convert_aweme(build_raw(base, i)) for i in range(WORKS)]
+    checks = []
+
+    ladder = aweme_list[0]["video"]["bit_rate"]
+    checks.append(("转换后保留所有清晰度", [r["gear_name"] for r in ladder] == [g[0] for g in GEARS]
+                   and all(r["url_list"] and r["data_size"] and r["height"] for r in ladder)
+                   and [r["codec"] for r in ladder] == ["h265" if g[3] else "h264" for g in GEARS]))
+    checks.append(("play_addr 仍是第一个清晰度", aweme_list[0]["video"]["play_addr"]["uri"] == ladder[0]["uri"]))
+
+    policies = [
+        ("默认(play_addr)", None, {"normal_1080_0"}),
+        ("max_height 720", {"max_height": 720}, {"normal_720_0"}),
+        ("max_height 720 + H.265", {"max_height": 720, "prefer_h265": True}, {"adapt_lowest_720_1"}),
+        ("prefer_h265", {"prefer_h265": True}, {"1080_1_1"}),
+        ("max_size 4MB", {"max_size": 4}, {"adapt_lowest_720_1"}),
+        ("smallest ≥720", {"strategy": "smallest", "min_height": 720}, {"adapt_lowest_720_1"}),
+        ("max_size 1MB(都超出)", {"max_size": 1}, {"normal_540_0"}),
+    ]
+    results = []
+    try:
+        for name, quality, expected in policies:
+            sent, files, gears = run_policy(server, aweme_list, quality)
+            results.append((name, sent, files))
+            checks.append((f"{name}: 选择 {', '.join(sorted(gears))}", files == WORKS and gears == expected))
+    finally:
+        server.shutdown()
+
+    top = results[0][1]
+    print(f"\n{WORKS} 个作品, 每个 {DURATION // 1000} 秒")
+    print(f"{'策略':<28}{'传输(MB)':<12}{'相对最高清晰度'}")
+    for name, sent, files in results:
+        print(f"{name:<28}{sent / 1024 / 1024:<12.1f}{sent / top:.0%}")
+    print()
+    for name, ok in checks:
+        print(f"{'✓' if ok else '✗'} {name}")
+    return all(ok for _, ok in checks)
+
+
+if __name__ == '__main__':
+    sys.exit(0 if benchmark_quality() else 1)
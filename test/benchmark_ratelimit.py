@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+接口限速基准测试
+
+1. 多进程共享: 启动多个进程同时请求同一个接口, 统计合计的请求速率
+   是否被限制在配置的 rate 附近(需要 fcntl, 即 Linux/macOS)
+2. 自适应: 连续返回 token 过期后请求间隔变长, 正常返回后逐步恢复
+3. max_wait: 需要等待的时间超过 max_wait 时立即返回, 不占用令牌
+"""
+
+import os
+import sys
+import time
+import tempfile
+import multiprocessing
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+RATE = 10.0        # 每秒请求数
+BURST = 2          # 最多连续请求数
+PROCESSES = 4      # 并行进程数
+PER_PROCESS = 10   # 每个进程的请求数
+URL = "https://www.douyin.com/aweme/v1/web/aweme/post/?"
+
+
+def create_limiter(path, shared=True):
+    from apiproxy.common.ratelimit import RateLimiter, Bucket
+    return RateLimiter(endpoint=Bucket(rate=RATE, burst=BURST), host=Bucket(rate=0),
+                       shared=shared, path=path)
+
+
+def worker(path, queue):
+    limiter = create_limiter(path)
+    stamps = []
+    for _ in range(PER_PROCESS):
+        limiter.acquire("USER_POST", URL)
+        stamps.append(time.time())
+    queue.put(stamps)
+
+
+def run_processes(path):
+    """多个进程共享同一个状态文件, 返回合计速率"""
+    queue = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=worker, args=(path, queue)) for _ in range(PROCESSES)]
+    for p in processes:
+        p.start()
+    stamps = sorted(t for _ in processes for t in queue.get())
+    for p in processes:
+        p.join()
+    # 去掉 burst 允许的前几个请求, 按稳定阶段计算速率
+    steady = stamps[BURST - 1:]
+    return (len(steady) - 1) / (steady[-1] - steady[0])
+
+
+def run_adaptive(path):
+    """返回每个阶段的实际请求间隔"""
+    limiter = create_limiter(path, shared=False)
+    phases = []
+
+    def interval(count, throttled):
+        start = time.time()
+        for _ in range(count):
+            limiter.acquire("USER_POST", URL)
+            limiter.feedback("USER_POST", URL, throttled=throttled)
+        return (time.time() - start) / count
+
+    phases.append(("正常", interval(5, False)))
+    phases.append(("token 过期", interval(4, True)))
+    phases.append(("恢复中", interval(10, False)))
+    phases.append(("恢复后", interval(5, False)))
+    return phases
+
+
+def run_max_wait(path):
+    """减速后用 max_wait 预约令牌, 返回 (是否立即抛出 RateLimitTimeout, 之后能否按原来的等待时间取得令牌)"""
+    from apiproxy.common.ratelimit import RateLimitTimeout
+
+    limiter = create_limiter(path, shared=False)
+    for _ in range(4):
+        limiter.feedback("USER_POST", URL, throttled=True)
+    for _ in range(BURST):
+        limiter.acquire("USER_POST", URL)
+    # 16 倍减速后下一个令牌约 1.6 秒后才有
+    start = time.time()
+    try:
+        limiter.acquire("USER_POST", URL, max_wait=0.1)
+        raised = False
+    except RateLimitTimeout as e:
+        raised = e.wait > 0.1
+    fast = raised and time.time() - start < 0.05
+    # 没有占用令牌: 再次等待的时间不变
+    waited = limiter.acquire("USER_POST", URL, max_wait=5)
+    return fast, waited < 16 / RATE + 0.1
+
+
+def benchmark_ratelimit():
+    print("=" * 50)
+    print("接口限速基准测试")
+    print("=" * 50)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "ratelimit.json")
+
+        from apiproxy.common import ratelimit
+        if ratelimit.fcntl is None:
+            print("⚠ 跳过多进程测试: 当前系统没有 fcntl")
+        else:
+            rate = run_processes(path)
+            print(f"\n{PROCESSES} 个进程 x {PER_PROCESS} 次请求, 配置速率 {RATE}/秒")
+            print(f"   实际合计速率: {rate:.2f}/秒")
+            print(f"{'✓' if rate <= RATE * 1.1 else '✗'} 多进程共享限速")
+
+        print(f"\n{'阶段':<12}{'平均间隔(秒)'}")
+        for name, value in run_adaptive(path):
+            print(f"{name:<12}{value:.3f}")
+
+        fast, unreserved = run_max_wait(path)
+        print(f"\n{'✓' if fast else '✗'} 等待时间超过 max_wait 时立即抛出 RateLimitTimeout")
+        print(f"{'✓' if unreserved else '✗'} 超时的请求不占用令牌")
+
+
+if __name__ == '__main__':
+    benchmark_ratelimit()
@@ -0,0 +1,203 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+断点续传正确性基准测试
+
+在本地启动一个 HTTP 桩服务器(带 ETag, 可以在发送一半后断开连接、忽略 Range
+或更换文件内容), 对比原来直接写目标文件的续传写法和现在先写 .part 的写法:
+1. 下载中断后, 原来的写法留下不完整的目标文件, 之后一直被当作已下载跳过
+2. 续传时服务器忽略 Range 返回 200, 原来的写法把完整文件追加到已有数据后面
+3. 续传时文件已变化, If-Range 让服务器返回新文件, 不会拼接新旧内容
+4. 跳过已下载文件的检查耗时(只 stat, 不访问网络)
+"""
+
+import os
+import sys
+import time
+import tempfile
+import threading
+from pathlib import Path
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+SIZE = 1024 * 1024        # 文件大小
+FILES = 10000             # 检查跳过耗时的文件数
+VERSIONS = {"v1": os.urandom(SIZE), "v2": os.urandom(SIZE)}
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.version = "v1"
+        # 下一个请求发送这么多字节后断开连接
+        self.drop_after = None
+        # 忽略 Range, 总是返回 200
+        self.ignore_range = False
+        self.sent = 0
+
+
+class ResumeHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server = self.server
+        body = VERSIONS[server.version]
+        etag = f'"{server.version}"'
+        start = 0
+        header = self.headers.get("Range")
+        if_range = self.headers.get("If-Range")
+        if header and not server.ignore_range and (if_range is None or if_range == etag):
+            start = int(header.split("=", 1)[1].split("-")[0])
+            if start >= len(body):
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{len(body)}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{len(body) - 1}/{len(body)}")
+        else:
+            self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(body) - start))
+        self.end_headers()
+        data = body[start:]
+        if server.drop_after is not None:
+            data, server.drop_after = data[:server.drop_after], None
+            self.close_connection = True
+        # 先计数再发送, 客户端收完数据时计数已经更新
+        server.sent += len(data)
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def legacy_download(url, filepath):
+    """原来 Download.download_with_resume 的写法(去掉进度条)"""
+    from apiproxy.common import session
+
+    file_size = filepath.stat().st_size if filepath.exists() else 0
+    headers = {'Range': f'bytes={file_size}-'} if file_size > 0 else {}
+    try:
+        with session.get(url, headers=headers, stream=True, timeout=5) as response:
+            if response.status_code not in (200, 206):
+                return False
+            with open(filepath, 'ab' if file_size > 0 else 'wb') as f:
+                for chunk in response.iter_content(chunk_size=8192):
+                    f.write(chunk)
+        return True
+    except Exception:
+        return False
+
+
+def current_download(url, filepath):
+    from apiproxy.douyin.download import Download
+    from apiproxy.douyin.partial import is_complete
+
+    if is_complete(filepath):
+        return True
+    dl = Download(thread=1, segments=1)
+    dl.retry_times = 1
+    return dl.download_with_resume(url, filepath, filepath.name)
+
+
+def legacy_skip(filepath):
+    return filepath.exists()
+
+
+def run_scenario(server, url, tmp, download, skip):
+    """返回每个场景的结果 {名称: 文件内容是否正确}"""
+    results = {}
+
+    # 1. 中断后再次运行
+    path = tmp / "interrupted.mp4"
+    server.version, server.drop_after = "v1", SIZE // 3
+    download(url, path)
+    server.sent = 0
+    if not skip(path):
+        download(url, path)
+    results["中断后再次运行"] = (path.exists() and path.read_bytes() == VERSIONS["v1"], server.sent)
+
+    # 2. 续传时服务器忽略 Range
+    path = tmp / "ignored.mp4"
+    server.drop_after = SIZE // 3
+    download(url, path)
+    server.ignore_range = True
+    server.sent = 0
+    download(url, path)
+    server.ignore_range = False
+    results["续传时服务器忽略 Range"] = (path.exists() and path.read_bytes() == VERSIONS["v1"], server.sent)
+
+    # 3. 续传时文件已变化
+    path = tmp / "changed.mp4"
+    server.drop_after = SIZE // 3
+    download(url, path)
+    server.version = "v2"
+    server.sent = 0
+    download(url, path)
+    results["续传时文件已变化"] = (path.exists() and path.read_bytes() == VERSIONS["v2"], server.sent)
+    return results
+
+
+def benchmark_skip(tmp):
+    from apiproxy.douyin.partial import is_complete
+
+    folder = tmp / "library"
+    folder.mkdir()
+    paths = []
+    for i in range(FILES):
+        path = folder / f"{i}_video.mp4"
+        path.write_bytes(b"x")
+        paths.append(path)
+    start = time.perf_counter()
+    complete = sum(1 for path in paths if is_complete(path))
+    elapsed = time.perf_counter() - start
+    return complete, elapsed
+
+
+def benchmark_resume():
+    print("=" * 50)
+    print("断点续传正确性基准测试")
+    print("=" * 50)
+
+    server = StubServer(("127.0.0.1", 0), ResumeHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/video"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        (tmp / "legacy").mkdir()
+        (tmp / "current").mkdir()
+        legacy = run_scenario(server, url, tmp / "legacy", legacy_download, legacy_skip)
+        current = run_scenario(server, url, tmp / "current", current_download, lambda path: False)
+
+        print(f"\n{'场景':<24}{'原来的写法':<20}{'现在的写法'}")
+        for name in legacy:
+            old = f"{'✓' if legacy[name][0] else '✗'} 传输 {legacy[name][1] // 1024}KB"
+            new = f"{'✓' if current[name][0] else '✗'} 传输 {current[name][1] // 1024}KB"
+            print(f"{name:<24}{old:<20}{new}")
+
+        leftovers = [p.name for p in (tmp / "current").iterdir() if p.name.endswith((".part", ".part.json"))]
+        complete, elapsed = benchmark_skip(tmp)
+
+    server.shutdown()
+    checks = [(f"{name}: 文件内容正确", ok) for name, (ok, _) in current.items()]
+    checks.append(("中断后只下载剩余部分", 0 < current['中断后再次运行'][1] < SIZE))
+    checks.append((f"完成后没有留下 .part 和记录文件 {leftovers}", not leftovers))
+    checks.append((f"检查 {FILES} 个已下载文件耗时 {elapsed * 1000:.1f} 毫秒"
+                   f"({elapsed / FILES * 1e6:.1f} 微秒/个, 不访问网络)", complete == FILES))
+    print()
+    for name, ok in checks:
+        print(f"{'✓' if ok else '✗'} {name}")
+    return all(ok for _, ok in checks)
+
+
+if __name__ == '__main__':
+    sys.exit(0 if benchmark_resume() else 1)
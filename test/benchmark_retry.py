@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+重试策略基准测试
+
+在本地启动一个不稳定的 HTTP 桩服务器(随机返回 503、空响应或正常数据),
+对比原来的忙等重试循环(失败后立即重试, 直到超时)和 apiproxy.common.retrier
+的指数退避策略在请求次数(重试放大倍数)和 CPU 占用上的差别,
+以及服务器卡住不返回时一次调用的总耗时不超过 deadline,
+接口限流减速后(等待令牌的时间超过 deadline)仍然按策略重试
+"""
+
+import sys
+import json
+import time
+import random
+import threading
+from pathlib import Path
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+CALLS = 20           # 不稳定接口的调用次数
+FAIL_RATE = 0.6      # 不稳定接口的失败概率
+DEADLINE = 2.0       # 接口完全不可用时的总时间上限(秒)
+SLOWED_RATE = 10.0   # 限流减速的接口的速率, 减速 16 倍后每 1.6 秒一个令牌
+BODY = json.dumps({"status_code": 0, "aweme_list": []}).encode()
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    requests = 0
+
+
+class FlakyHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self.server.requests += 1
+        if self.path.startswith("/stall"):
+            # 连接建立后迟迟不返回
+            time.sleep(DEADLINE * 3)
+        if self.path.startswith("/down") or random.random() < FAIL_RATE:
+            # 一半返回 503, 一半返回空响应(抖音接口风控时的常见表现)
+            status, body = random.choice([(503, b""), (200, b"")])
+        else:
+            status, body = 200, BODY
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def busy_spin(url, timeout):
+    """原来 Douyin 中的重试写法: 失败后立即重试, 直到超过 timeout 秒"""
+    from apiproxy.common import session
+
+    start = time.time()
+    while True:
+        try:
+            datadict = json.loads(session.get(url).text)
+            if datadict is not None and datadict["status_code"] == 0:
+                return datadict
+        except Exception:
+            if time.time() - start > timeout:
+                return None
+
+
+def measure(server, fetch):
+    """执行 fetch, 返回 (墙钟耗时, CPU 耗时, 请求数, 成功次数)"""
+    before = server.requests
+    wall, cpu = time.time(), time.process_time()
+    ok = fetch()
+    return time.time() - wall, time.process_time() - cpu, server.requests - before, ok
+
+
+def benchmark_retry():
+    print("=" * 50)
+    print("重试策略基准测试")
+    print("=" * 50)
+
+    from apiproxy.common import retrier, ratelimiter
+    from apiproxy.common.retry import RetryPolicy
+    from apiproxy.common.ratelimit import Bucket
+
+    # 只比较重试策略本身, 关闭接口限速
+    ratelimiter.load({"shared": False, "default": {"rate": 0}, "host": {"rate": 0}})
+
+    policy = RetryPolicy(base_delay=0.05, max_delay=0.5, deadline=DEADLINE)
+    server = StubServer(("127.0.0.1", 0), FlakyHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    accept = lambda d: d.get("status_code") == 0
+
+    rows = []
+    try:
+        random.seed(1)
+        rows.append(("忙等/不稳定", CALLS) + measure(server, lambda: sum(
+            busy_spin(f"{base_url}/flaky", DEADLINE) is not None for _ in range(CALLS))))
+        random.seed(1)
+        retrier.reset_stats()
+        rows.append(("退避/不稳定", CALLS) + measure(server, lambda: sum(
+            retrier.request_json("FLAKY", f"{base_url}/flaky", accept=accept, policy=policy) is not None
+            for _ in range(CALLS))))
+        rows.append(("忙等/不可用", 1) + measure(server, lambda: int(
+            busy_spin(f"{base_url}/down", DEADLINE) is not None)))
+        rows.append(("退避/不可用", 1) + measure(server, lambda: int(
+            retrier.request_json("DOWN", f"{base_url}/down", accept=accept, policy=policy) is not None)))
+        rows.append(("退避/卡住", 1) + measure(server, lambda: int(
+            retrier.request_json("STALL", f"{base_url}/stall", accept=accept, policy=policy) is not None)))
+        # 接口被限流后减速 16 倍, 每次等待令牌的时间超过 deadline
+        ratelimiter.overrides["SLOWED"] = Bucket(rate=SLOWED_RATE, burst=1)
+        for _ in range(4):
+            ratelimiter.feedback("SLOWED", base_url, throttled=True)
+        slowed = policy.replace(max_attempts=3, deadline=1.0)
+        rows.append(("退避/限流减速", 1) + measure(server, lambda: int(
+            retrier.request_json("SLOWED", f"{base_url}/down", accept=accept, policy=slowed) is not None)))
+        rows.append(("退避/等不到令牌", 1) + measure(server, lambda: int(
+            retrier.request_json("SLOWED", f"{base_url}/down", accept=accept,
+                                 policy=slowed.replace(max_wait=0.5)) is not None)))
+    finally:
+        server.shutdown()
+
+    print(f"\n{'方式':<12}{'调用数':<8}{'成功':<6}{'请求数':<10}{'放大倍数':<10}{'耗时(秒)':<10}{'CPU(秒)'}")
+    for name, calls, wall, cpu, count, ok in rows:
+        print(f"{name:<12}{calls:<8}{ok:<6}{count:<10}{count / calls:<10.1f}{wall:<10.2f}{cpu:.2f}")
+
+    print("\nretrier 统计:")
+    for endpoint, stats in retrier.stats().items():
+        print(f"   {endpoint}: {stats}")
+
+    down_spin, down_backoff = rows[2][4], rows[3][4]
+    stalled = rows[4][2]
+    slowed_requests, starved_wall, starved_requests = rows[5][4], rows[6][2], rows[6][4]
+    print(f"\n✓ 接口不可用时请求数: {down_spin} -> {down_backoff}")
+    print(f"{'✓' if stalled < DEADLINE + 0.5 else '✗'} 服务器卡住时 {stalled:.2f} 秒内返回(deadline {DEADLINE} 秒)")
+    print(f"{'✓' if slowed_requests == 3 else '✗'} 限流减速后等待令牌不计入 deadline, "
+          f"仍然请求 {slowed_requests}/3 次")
+    print(f"{'✓' if starved_requests == 0 and starved_wall < 1.5 else '✗'} "
+          f"等不到令牌时不发出请求, {starved_wall:.2f} 秒后放弃")
+    return rows
+
+
+if __name__ == '__main__':
+    benchmark_retry()
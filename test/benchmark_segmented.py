@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+分段下载基准测试
+
+在本地启动一个限制单连接速度的 HTTP 桩服务器(模拟 CDN 的单连接带宽上限),
+对比单连接下载和多连接分段下载大文件的耗时, 并检查:
+1. 服务器忽略 Range 时改为单连接下载, 文件内容正确
+2. 部分分段失败(进程中断)后, 再次下载只请求未完成的分段
+3. 小于阈值的文件仍然单连接下载
+"""
+
+import os
+import sys
+import time
+import tempfile
+import threading
+from pathlib import Path
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+SIZE = 8 * 1024 * 1024        # 大文件大小
+SMALL = 256 * 1024            # 小文件大小
+SPEED = 4 * 1024 * 1024       # 单连接速度(字节/秒)
+CHUNK = 64 * 1024
+PAYLOAD = os.urandom(SIZE)
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 64
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.lock = threading.Lock()
+        self.ranges = []
+        # 这个位置之后的 Range 请求返回 500, 模拟下载中断
+        self.fail_from = None
+
+
+class RangeHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        body = PAYLOAD[:SMALL] if self.path.startswith("/small") else PAYLOAD
+        header = self.headers.get("Range")
+        start, end = 0, len(body) - 1
+        if header and not self.path.startswith("/norange"):
+            first, last = header.split("=", 1)[1].split("-")
+            start, end = int(first), min(int(last) if last else end, end)
+            with self.server.lock:
+                self.server.ranges.append((self.path, start, end))
+            if self.server.fail_from is not None and start >= self.server.fail_from:
+                self.send_response(500)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{len(body)}")
+        else:
+            self.send_response(200)
+        self.send_header("Content-Type", "video/mp4")
+        self.send_header("Content-Length", str(end - start + 1))
+        self.end_headers()
+        # 按固定速度发送
+        try:
+            for pos in range(start, end + 1, CHUNK):
+                self.wfile.write(body[pos:min(pos + CHUNK, end + 1)])
+                time.sleep(CHUNK / SPEED)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, format, *args):
+        pass
+
+
+def create_download(segments):
+    from apiproxy.douyin.download import Download
+    dl = Download(thread=1, segments=segments, segment_threshold=1)
+    dl.retry_times = 1
+    dl.segmented.retry_times = 1
+    return dl
+
+
+def timed_download(dl, url, path):
+    start = time.time()
+    ok = dl.download_with_resume(url, path, path.name)
+    return ok, time.time() - start
+
+
+def benchmark_segmented():
+    from apiproxy.douyin.partial import meta_path, part_path
+
+    print("=" * 50)
+    print("分段下载基准测试")
+    print("=" * 50)
+
+    server = StubServer(("127.0.0.1", 0), RangeHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    checks = []
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        print(f"\n文件 {SIZE // 1024 // 1024}MB, 单连接限速 {SPEED // 1024 // 1024}MB/s")
+        print(f"{'方式':<16}{'耗时(秒)':<12}{'MB/s'}")
+        elapsed = {}
+        for segments in (1, 4, 8):
+            path = tmp / f"video_{segments}.mp4"
+            ok, elapsed[segments] = timed_download(create_download(segments), f"{base}/video", path)
+            name = "单连接" if segments == 1 else f"{segments} 段"
+            print(f"{name:<16}{elapsed[segments]:<12.2f}{SIZE / elapsed[segments] / 1024 / 1024:.1f}")
+            checks.append((f"{name}下载内容正确", ok and path.read_bytes() == PAYLOAD))
+        checks.append((f"4 段下载比单连接快 {elapsed[1] / elapsed[4]:.1f} 倍", elapsed[1] > elapsed[4] * 2.5))
+
+        # 服务器忽略 Range
+        path = tmp / "norange.mp4"
+        ok, _ = timed_download(create_download(4), f"{base}/norange", path)
+        checks.append(("服务器忽略 Range 时单连接下载", ok and path.read_bytes() == PAYLOAD))
+
+        # 中断后续传
+        dl = create_download(4)
+        path = tmp / "resume.mp4"
+        server.fail_from = SIZE // 2
+        ok, _ = timed_download(dl, f"{base}/resume", path)
+        sidecar = meta_path(path)
+        checks.append(("部分分段失败时保留 .part 和分段记录", not ok and not path.exists()
+                       and sidecar.exists() and part_path(path).exists()))
+        server.fail_from = None
+        server.ranges.clear()
+        ok, _ = timed_download(dl, f"{base}/resume", path)
+        fetched = [r for r in server.ranges if r[0] == "/resume"]
+        checks.append((f"续传只请求未完成的分段({len(fetched)} 个, 都在后半部分)",
+                       ok and fetched and all(start >= SIZE // 2 for _, start, _ in fetched)
+                       and path.read_bytes() == PAYLOAD and not sidecar.exists()))
+
+        # 小文件
+        server.ranges.clear()
+        path = tmp / "small.jpeg"
+        ok, _ = timed_download(create_download(4), f"{base}/small", path)
+        checks.append(("小于阈值的文件单连接下载", ok and len(server.ranges) == 1
+                       and path.read_bytes() == PAYLOAD[:SMALL]))
+
+    server.shutdown()
+    print()
+    for name, ok in checks:
+        print(f"{'✓' if ok else '✗'} {name}")
+    return all(ok for _, ok in checks)
+
+
+if __name__ == '__main__':
+    sys.exit(0 if benchmark_segmented() else 1)
@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+启动耗时基准测试
+
+本地启动一个只接受连接、从不响应的 "黑洞" 代理, 子进程通过 HTTPS_PROXY
+使用它, 模拟网络不可达时请求一直挂起的情况, 对比:
+1. 原来 import 时调用的 utils.getttwid()(没有超时)
+2. 现在 import apiproxy.douyin.douyin: 不访问网络
+3. 第一次读取请求头中的 Cookie: 同步获取 ttwid, 在超时后返回
+并检查 TtwidCache 的磁盘缓存、后台刷新和过期后重新获取
+"""
+
+import os
+import sys
+import time
+import socket
+import tempfile
+import threading
+import subprocess
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+HANG_LIMIT = 5     # 认为请求挂起的时间(秒)
+TTWID_TIMEOUT = 1  # 子进程中获取 ttwid 的超时(秒)
+
+
+class BlackholeProxy(object):
+    """接受连接后什么都不做"""
+
+    def __init__(self):
+        self.sock = socket.socket()
+        self.sock.bind(("127.0.0.1", 0))
+        self.sock.listen(64)
+        self.url = f"http://127.0.0.1:{self.sock.getsockname()[1]}"
+        self.connections = 0
+        self.clients = []
+        threading.Thread(target=self.serve, daemon=True).start()
+
+    def serve(self):
+        while True:
+            try:
+                client, _ = self.sock.accept()
+            except OSError:
+                return
+            self.connections += 1
+            self.clients.append(client)
+
+    def close(self):
+        self.sock.close()
+        for client in self.clients:
+            client.close()
+
+
+def run_child(code, proxy, tmp):
+    """在子进程中执行 code, 返回 (耗时, 输出), 超时返回 (None, '')"""
+    env = dict(os.environ, HTTPS_PROXY=proxy.url, HTTP_PROXY=proxy.url, TMPDIR=tmp,
+               PYTHONPATH=str(project_root))
+    start = time.time()
+    try:
+        result = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True,
+                                text=True, timeout=HANG_LIMIT)
+    except subprocess.TimeoutExpired:
+        return None, ""
+    return time.time() - start, result.stdout.strip()
+
+
+def show(name, elapsed, connections):
+    value = f"> {HANG_LIMIT} (挂起)" if elapsed is None else f"{elapsed:.2f}"
+    print(f"{name:<32}{value:<16}{connections}")
+
+
+def benchmark_offline(tmp):
+    proxy = BlackholeProxy()
+    try:
+        print(f"\n{'方式':<32}{'耗时(秒)':<16}{'代理连接数'}")
+
+        before = proxy.connections
+        elapsed, _ = run_child("from apiproxy.common import utils; utils.getttwid()", proxy, tmp)
+        show("原来 import 时的 getttwid()", elapsed, proxy.connections - before)
+
+        before = proxy.connections
+        elapsed, _ = run_child("import apiproxy.douyin.douyin", proxy, tmp)
+        connections = proxy.connections - before
+        show("import apiproxy.douyin.douyin", elapsed, connections)
+        import_ok = elapsed is not None and connections == 0
+
+        before = proxy.connections
+        elapsed, output = run_child(
+            "from apiproxy.common import ttwid; ttwid.timeout = %d\n"
+            "from apiproxy.douyin import douyin_headers\n"
+            "douyin_headers['Cookie']; import time; t = time.time(); douyin_headers['Cookie']\n"
+            "print(f'{time.time() - t:.4f}')" % TTWID_TIMEOUT, proxy, tmp)
+        show("第一次读取 Cookie", elapsed, proxy.connections - before)
+    finally:
+        proxy.close()
+
+    print(f"\n{'✓' if import_ok else '✗'} import 不访问网络")
+    ok = elapsed is not None and elapsed < HANG_LIMIT
+    print(f"{'✓' if ok else '✗'} 网络不可达时获取 ttwid 在 {TTWID_TIMEOUT} 秒超时后返回, "
+          f"之后读取不再等待({output} 秒)")
+    return import_ok and ok
+
+
+def check_cache(tmp):
+    from apiproxy.common.ttwid import TtwidCache
+
+    calls = []
+
+    def fetch(timeout):
+        calls.append(time.time())
+        time.sleep(0.2)
+        return f"ttwid{len(calls)}"
+
+    path = os.path.join(tmp, "ttwid.json")
+    checks = []
+
+    cache = TtwidCache(path=path, fetch=fetch)
+    start = time.time()
+    checks.append(("第一次使用时获取", cache.get() == "ttwid1" and len(calls) == 1,
+                   time.time() - start))
+
+    start = time.time()
+    value = TtwidCache(path=path, fetch=fetch).get()
+    checks.append(("新进程读取磁盘缓存, 不请求", value == "ttwid1" and len(calls) == 1, time.time() - start))
+
+    refresh = TtwidCache(path=path, fetch=fetch, refresh_after=0)
+    start = time.time()
+    value = refresh.get()
+    elapsed = time.time() - start
+    time.sleep(0.5)
+    checks.append(("需要刷新时先返回旧值, 后台刷新", value == "ttwid1" and refresh.get() == "ttwid2", elapsed))
+
+    time.sleep(0.5)
+    before = len(calls)
+    expired = TtwidCache(path=path, fetch=fetch, max_age=0)
+    start = time.time()
+    value = expired.get()
+    checks.append(("过期后同步重新获取", value == f"ttwid{before + 1}", time.time() - start))
+
+    failing = TtwidCache(path=os.path.join(tmp, "missing.json"), fetch=lambda timeout: None, retry_after=60)
+    start = time.time()
+    checks.append(("获取失败返回空值, 不重复请求", failing.get() == "" and failing.get() == "", time.time() - start))
+
+    print("\nTtwidCache:")
+    for name, ok, elapsed in checks:
+        print(f"{'✓' if ok else '✗'} {name}({elapsed * 1000:.1f} 毫秒)")
+    return all(ok for _, ok, _ in checks)
+
+
+def benchmark_startup():
+    print("=" * 50)
+    print("启动耗时基准测试")
+    print("=" * 50)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        offline_ok = benchmark_offline(tmp)
+        cache_ok = check_cache(tmp)
+    return offline_ok and cache_ok
+
+
+if __name__ == '__main__':
+    sys.exit(0 if benchmark_startup() else 1)
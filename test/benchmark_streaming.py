@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+边翻页边下载基准测试
+
+本地桩服务器模拟一个多页的用户主页, 每页请求有固定延迟(接口限速),
+每个媒体文件也有下载延迟, 对比:
+1. 先 getUserInfo 取完所有页, 再 userDownload 下载
+2. iterUserInfo 按页产出, userDownload 拿到一页就开始下载, 下载任务提交完再请求下一页
+3. pageDownload 的预取流水线: 后台线程提前获取下一页, 与当前页的下载同时进行
+统计第一个文件开始下载的时间和总耗时, 并检查:
+- 几种方式下载的文件相同
+- 下载慢于翻页时, 获取线程在队列满后暂停, 缓存的页数有上限
+- 从某一页的 cursor 继续扫描, 得到的作品与完整扫描的剩余部分一致
+- AsyncDownload(需要 aiohttp)同样可以边翻页边下载
+"""
+
+import sys
+import json
+import time
+import tempfile
+import threading
+from pathlib import Path
+from urllib.parse import urlparse, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+PAGES = 6              # 用户主页的页数
+PAGE_SIZE = 8          # 每页作品数
+PAGE_DELAY = 0.3       # 每页请求的延迟(秒)
+MEDIA_DELAY = 0.05     # 每个媒体文件的延迟(秒)
+THREADS = 8            # 下载线程数
+PAYLOAD = b"x" * 4096
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    first_media = None
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path.startswith("/aweme/v1/web/aweme/post/"):
+            time.sleep(PAGE_DELAY)
+            cursor = int(parse_qs(url.query).get("max_cursor", ["0"])[0])
+            body = json.dumps(build_page(self.server.base_url, cursor)).encode()
+        else:
+            if self.server.first_media is None:
+                self.server.first_media = time.time()
+            time.sleep(MEDIA_DELAY)
+            body = PAYLOAD
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def build_page(base_url, cursor):
+    """构造一页用户作品接口返回的数据, cursor 为页号"""
+    aweme_list = []
+    for i in range(PAGE_SIZE):
+        aweme_id = cursor * PAGE_SIZE + i
+        aweme_list.append({
+            "aweme_id": str(aweme_id),
+            "create_time": 1700000000 + aweme_id,
+            "desc": f"stream{aweme_id}",
+            "is_top": 0,
+            "images": [{"url_list": [f"{base_url}/media/{aweme_id}/{j}"]} for j in range(2)],
+        })
+    return {
+        "status_code": 0,
+        "aweme_list": aweme_list,
+        "has_more": cursor + 1 < PAGES,
+        "max_cursor": cursor + 1,
+    }
+
+
+def start_server():
+    server = StubServer(("127.0.0.1", 0), StubHandler)
+    server.base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def run(server, flow):
+    """执行 flow, 返回 (第一个文件开始下载的时间, 总耗时)"""
+    server.first_media = None
+    start = time.time()
+    flow()
+    return server.first_media - start, time.time() - start
+
+
+def files(path):
+    return sorted(p.name for p in Path(path).rglob("*") if p.is_file())
+
+
+def benchmark_streaming():
+    print("=" * 50)
+    print("边翻页边下载基准测试")
+    print("=" * 50)
+
+    from apiproxy.common import ratelimiter
+    from apiproxy.douyin.douyin import Douyin
+    from apiproxy.douyin.download import Download
+
+    # 翻页间隔由桩服务器的延迟模拟, 不额外限速
+    ratelimiter.load({"shared": False, "default": {"rate": 0}, "host": {"rate": 0}})
+    server = start_server()
+    dy = Douyin(database=False)
+    dy.urls.USER_POST = f"{server.base_url}/aweme/v1/web/aweme/post/?"
+    options = dict(thread=THREADS, music=False, cover=False, avatar=False, resjson=False)
+
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            dl = Download(**options)
+            batch = run(server, lambda: dl.userDownload(
+                awemeList=dy.getUserInfo("bench", "post", PAGE_SIZE), savePath=Path(tmp) / "batch"))
+            stream = run(server, lambda: dl.userDownload(
+                (a for page in dy.iterUserInfo("bench", "post", PAGE_SIZE) for a in page.awemes),
+                savePath=Path(tmp) / "stream"))
+            result = {}
+            pipeline = run(server, lambda: result.update(stats=dl.pageDownload(
+                dy.iterUserInfo("bench", "post", PAGE_SIZE), savePath=Path(tmp) / "pipeline")))
+
+            print(f"\n{PAGES} 页 x {PAGE_SIZE} 个作品, 每页延迟 {PAGE_DELAY} 秒, 每个文件 {MEDIA_DELAY} 秒")
+            print(f"\n{'方式':<20}{'首个文件(秒)':<16}{'总耗时(秒)'}")
+            print(f"{'先获取后下载':<20}{batch[0]:<16.2f}{batch[1]:.2f}")
+            print(f"{'边翻页边下载':<20}{stream[0]:<16.2f}{stream[1]:.2f}")
+            print(f"{'预取流水线':<20}{pipeline[0]:<16.2f}{pipeline[1]:.2f}")
+            print(f"\n流水线阶段耗时:\n{result['stats'].summary()}")
+
+            same = (files(Path(tmp) / "batch") == files(Path(tmp) / "stream") == files(Path(tmp) / "pipeline"))
+            print(f"\n{'✓' if same else '✗'} 下载的文件相同: {len(files(Path(tmp) / 'pipeline'))} 个")
+            print(f"{'✓' if pipeline[1] < batch[1] else '✗'} 流水线总耗时缩短 {batch[1] - pipeline[1]:.2f} 秒")
+
+            # 单线程慢速下载: 翻页快于下载, 获取线程应在队列满后等待
+            slow = Download(**dict(options, thread=1, prefetch=1))
+            stats = slow.pageDownload(dy.iterUserInfo("bench", "post", PAGE_SIZE), savePath=Path(tmp) / "slow")
+            print(f"{'✓' if stats.fetch_blocked > 0 and stats.bottleneck() == '下载' else '✗'} "
+                  f"下载较慢时暂停获取: 等待 {stats.fetch_blocked:.2f} 秒, 瓶颈: {stats.bottleneck()}")
+
+            # 从第 3 页的 cursor 继续扫描
+            pages = list(dy.iterUserInfo("bench", "post", PAGE_SIZE))
+            resumed = list(dy.iterUserInfo("bench", "post", PAGE_SIZE, cursor=pages[2].cursor))
+            expected = [a["aweme_id"] for page in pages[2:] for a in page.awemes]
+            actual = [a["aweme_id"] for page in resumed for a in page.awemes]
+            print(f"{'✓' if actual == expected else '✗'} 从 cursor={pages[2].cursor} 继续: {len(actual)} 个作品")
+
+            try:
+                from apiproxy.douyin.async_download import AsyncDownload
+                adl = AsyncDownload(limit_per_host=0, **options)
+            except ImportError:
+                print("⚠ 跳过 async 引擎: 未安装 aiohttp")
+            else:
+                async_stream = run(server, lambda: adl.pageDownload(
+                    dy.iterUserInfo("bench", "post", PAGE_SIZE), savePath=Path(tmp) / "async"))
+                same = files(Path(tmp) / "async") == files(Path(tmp) / "batch")
+                print(f"{'✓' if same else '✗'} async 引擎边翻页边下载: 首个文件 {async_stream[0]:.2f} 秒, "
+                      f"总耗时 {async_stream[1]:.2f} 秒")
+    finally:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    benchmark_streaming()
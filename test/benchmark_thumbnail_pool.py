@@ -0,0 +1,206 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+缩略图生成线程池基准测试
+
+用一个模拟 ffmpeg 的脚本(每个视频耗时 FRAME_SECONDS 秒, 记录调用次数)代替 ffmpeg,
+下载完成后批量补齐 VIDEOS 个视频的缩略图, 同时用户浏览最后一页的视频(多次刷新), 对比:
+1. 原来: 一个线程从 FIFO 队列中取任务, 每次请求都重新加入队列
+2. 现在: 线程池 + 优先级队列, 正在浏览的文件先生成, 排队中和正在生成的文件不重复加入
+并检查 ffmpeg 调用次数、指标接口(队列长度、延迟)、取消批量任务和结束正在运行的 ffmpeg
+"""
+
+import os
+import sys
+import stat
+import time
+import queue
+import tempfile
+import threading
+import subprocess
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from PIL import Image
+
+VIDEOS = 120
+PAGE = 15
+VISITS = 3             # 用户刷新页面的次数
+FRAME_SECONDS = 0.1    # 模拟 ffmpeg 提取一帧的耗时
+WORKERS = 4
+
+FAKE_FFMPEG = """#!/bin/sh
+if [ "$1" = "-version" ]; then echo "ffmpeg version stub"; exit 0; fi
+echo "$3" >> "$FFMPEG_LOG"
+case "$3" in *slow_*) exec sleep 10;; esac
+for last; do :; done
+sleep {seconds}
+cp "$FFMPEG_TEMPLATE" "$last"
+"""
+
+
+class LegacyManager(object):
+    """原来的 VideoThumbnailManager: 一个线程, FIFO 队列, 不去重"""
+
+    def __init__(self, download_path, cache_dir):
+        self.download_path = download_path
+        self.cache_dir = cache_dir
+        self.generation_queue = queue.Queue()
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def thumbnail_path(self, video_path):
+        return self.cache_dir / (video_path.replace("/", "_") + ".jpg")
+
+    def request_thumbnail_generation(self, video_path):
+        if not self.thumbnail_path(video_path).exists():
+            self.generation_queue.put(video_path)
+
+    def _run(self):
+        while True:
+            video_path = self.generation_queue.get()
+            out = str(self.thumbnail_path(video_path)) + ".tmp.jpg"
+            subprocess.run(["ffmpeg", "-i", str(self.download_path / video_path), "-ss", "00:00:01",
+                            "-vframes", "1", "-y", out], capture_output=True)
+            os.replace(out, self.thumbnail_path(video_path))
+            self.generation_queue.task_done()
+
+
+def ffmpeg_calls(log: Path) -> list:
+    return log.read_text().splitlines() if log.exists() else []
+
+
+def scenario(manager, ready, videos, log: Path):
+    """批量补齐所有视频, 用户浏览最后一页; 返回 (最后一页的等待时间, 全部完成的时间, ffmpeg 调用次数)"""
+    log.write_text("")
+    viewed = videos[-PAGE:]
+    start = time.perf_counter()
+    for video in videos:
+        manager.request_thumbnail_generation(video, *(() if isinstance(manager, LegacyManager)
+                                                      else (manager.PRIORITY_BATCH,)))
+    for _ in range(VISITS):
+        for video in viewed:
+            manager.request_thumbnail_generation(video)
+        time.sleep(0.05)
+    while not all(ready(video) for video in viewed):
+        time.sleep(0.01)
+    view_time = time.perf_counter() - start
+    while not all(ready(video) for video in videos):
+        time.sleep(0.01)
+    total_time = time.perf_counter() - start
+    if isinstance(manager, LegacyManager):
+        manager.generation_queue.join()
+    else:
+        while manager.get_metrics()["running"]:
+            time.sleep(0.01)
+    return view_time, total_time, len(ffmpeg_calls(log))
+
+
+def benchmark_thumbnail_pool():
+    print("=" * 50)
+    print("缩略图生成线程池基准测试")
+    print("=" * 50)
+    checks = []
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        bin_dir = tmp / "bin"
+        bin_dir.mkdir()
+        fake = bin_dir / "ffmpeg"
+        fake.write_text(FAKE_FFMPEG.format(seconds=FRAME_SECONDS))
+        fake.chmod(fake.stat().st_mode | stat.S_IEXEC)
+        Image.new("RGB", (200, 150)).save(tmp / "template.jpg")
+        log = tmp / "ffmpeg.log"
+        os.environ["PATH"] = f"{bin_dir}{os.pathsep}{os.environ['PATH']}"
+        os.environ["FFMPEG_LOG"] = str(log)
+        os.environ["FFMPEG_TEMPLATE"] = str(tmp / "template.jpg")
+
+        os.chdir(tmp)
+        root = tmp / "Downloaded"
+        video_dir = root / "user_作者" / "post"
+        video_dir.mkdir(parents=True)
+        videos = []
+        for n in range(VIDEOS):
+            (video_dir / f"作品{n}.mp4").write_bytes(b"v")
+            videos.append(f"user_作者/post/作品{n}.mp4")
+
+        import app as web
+
+        # 原来
+        legacy_cache = tmp / "legacy"
+        legacy_cache.mkdir()
+        legacy = LegacyManager(root, legacy_cache)
+        old = scenario(legacy, lambda video: legacy.thumbnail_path(video).exists(), videos, log)
+
+        # 现在
+        web.thumbnail_manager.stop_background_generator()
+        manager = web.VideoThumbnailManager(root, workers=WORKERS)
+        web.thumbnail_manager = manager
+        new = scenario(manager, lambda video: manager.get_thumbnail_status(video) == "ready", videos, log)
+        metrics = web.app.test_client().get("/api/file/thumbnail/metrics").get_json()
+
+        print(f"\n{VIDEOS} 个视频批量补齐缩略图(每个 {FRAME_SECONDS} 秒), 同时浏览最后 {PAGE} 个视频并刷新 {VISITS} 次")
+        print(f"{'方式':<28}{'浏览页就绪(秒)':<16}{'全部完成(秒)':<16}{'ffmpeg 次数'}")
+        print(f"{'原来: 单线程 FIFO':<24}{old[0]:<16.2f}{old[1]:<16.2f}{old[2]}")
+        print(f"{f'现在: {WORKERS} 线程 + 优先级':<22}{new[0]:<16.2f}{new[1]:<16.2f}{new[2]}")
+        view, batch = metrics["latency_ms"]["view"], metrics["latency_ms"]["batch"]
+        print(f"\n指标: 完成 {metrics['completed']}, 去重 {metrics['deduplicated']}, "
+              f"浏览的文件排队 p95 {view['wait_p95']} 毫秒, 批量文件排队 p95 {batch['wait_p95']} 毫秒")
+
+        checks.append((f"浏览的视频就绪时间从 {old[0]:.2f} 秒降到 {new[0]:.2f} 秒", new[0] * 5 < old[0]))
+        checks.append((f"全部完成的时间从 {old[1]:.2f} 秒降到 {new[1]:.2f} 秒", new[1] * 2 < old[1]))
+        checks.append(("原来重复请求会重复生成", old[2] > VIDEOS))
+        checks.append(("每个视频只运行一次 ffmpeg", new[2] == VIDEOS))
+        # 刷新时已经生成好的文件不计为重复, 只要求第二次浏览时都在排队或生成中
+        checks.append(("指标: 完成数、去重数、队列长度正确", metrics["completed"] == VIDEOS
+                       and metrics["deduplicated"] >= PAGE and metrics["queue_depth"] == 0
+                       and metrics["running"] == 0 and metrics["workers"] == WORKERS))
+        checks.append(("浏览的文件排队时间短于批量文件", view["count"] == PAGE and batch["count"] == VIDEOS - PAGE
+                       and view["wait_p95"] < batch["wait_p50"]))
+
+        # 取消: 批量任务和正在运行的 ffmpeg
+        client = web.app.test_client()
+        for thumb in manager.cache_dir.glob("*.jpg"):
+            thumb.unlink()
+        log.write_text("")
+        (video_dir / "slow_作品.mp4").write_bytes(b"v")
+        slow = "user_作者/post/slow_作品.mp4"
+        manager.request_thumbnail_generation(slow)
+        while manager.get_thumbnail_status(slow) != "generating":
+            time.sleep(0.01)
+        manager.request_batch_thumbnail_generation(videos)
+        queued = client.get("/api/file/thumbnail/metrics").get_json()["queued"]
+        status = client.get(f"/api/file/thumbnail/status?path={videos[-1]}").get_json()["status"]
+        cancelled_batch = client.post("/api/file/thumbnail/cancel", json={"scope": "batch"}).get_json()
+        start = time.perf_counter()
+        cancelled_slow = client.post("/api/file/thumbnail/cancel", json={"paths": [slow]}).get_json()
+        while manager.get_metrics()["running"] and time.perf_counter() - start < 5:
+            time.sleep(0.01)
+        kill_time = time.perf_counter() - start
+        time.sleep(FRAME_SECONDS * 3)
+        after = manager.get_metrics()
+        calls = ffmpeg_calls(log)
+        print(f"\n取消: 批量 {cancelled_batch['cancelled']} 个, 结束正在运行的 ffmpeg 用时 {kill_time:.2f} 秒")
+        checks.append(("批量任务在队列中显示为 queued", status == "queued" and queued["batch"] > 0))
+        checks.append(("取消批量任务后不再运行 ffmpeg", after["queue_depth"] == 0
+                       and cancelled_batch["cancelled"] + (len(calls) - 1) == VIDEOS))
+        checks.append(("取消时结束正在运行的 ffmpeg", cancelled_slow["cancelled"] == 1 and kill_time < 1
+                       and manager.get_thumbnail_status(slow) == "not_generated" and after["running"] == 0))
+        checks.append(("取消的任务不计为失败", after["failed"] == 0 and after["cancelled"] >= cancelled_batch["cancelled"] + 1))
+        checks.append(("无效的取消请求返回 400",
+                       client.post("/api/file/thumbnail/cancel", json={"scope": "x"}).status_code == 400))
+
+        manager.stop_background_generator()
+        os.chdir(project_root)
+
+    print()
+    for name, ok in checks:
+        print(f"{'✓' if ok else '✗'} {name}")
+    return all(ok for _, ok in checks)
+
+
+if __name__ == '__main__':
+    sys.exit(0 if benchmark_thumbnail_pool() else 1)
@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+图片缩略图缓存基准测试
+
+生成一个图集作品目录(100 张 1080x1440 的 JPEG 和几张带透明通道的 PNG), 对比:
+1. 原来的 /api/file/thumbnail: 每次请求都打开原图、缩放并重新编码
+2. 现在: 第一次请求生成缩略图并缓存(与视频缩略图共用缓存目录, 以路径和修改时间为键),
+   之后直接读取缓存, 带版本参数时浏览器长期缓存, 验证请求返回 304
+以及下载完成后批量生成的耗时, 并检查 ETag、Cache-Control、文件修改后缩略图更新、
+文件索引中的缩略图状态
+"""
+
+import io
+import os
+import sys
+import time
+import tempfile
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from PIL import Image
+
+PHOTOS = 100
+PNGS = 4
+SIZE = (1080, 1440)
+
+
+def build_gallery(root: Path):
+    work_dir = root / "user_作者" / "post" / "2024-03-01 12.00.00_图集"
+    work_dir.mkdir(parents=True)
+    paths = []
+    for n in range(PHOTOS):
+        img = Image.new("RGB", SIZE, ((n * 37) % 256, (n * 91) % 256, 128))
+        # 加一些细节, 避免编码后过小
+        for y in range(0, SIZE[1], 40):
+            img.paste((n % 256, y % 256, 255 - n % 256), (0, y, SIZE[0], y + 8))
+        path = work_dir / f"图集_image_{n}.jpeg"
+        img.save(path, "JPEG", quality=90)
+        paths.append(path)
+    for n in range(PNGS):
+        path = work_dir / f"贴纸_{n}.png"
+        Image.new("RGBA", (800, 800), (255, 0, 0, 128)).save(path)
+        paths.append(path)
+    return paths
+
+
+def legacy_thumbnail(full_path: Path) -> bytes:
+    """原来的图片缩略图: 每次请求打开原图并重新编码"""
+    with Image.open(full_path) as img:
+        if img.mode in ('RGBA', 'LA', 'P'):
+            img = img.convert('RGB')
+        img.thumbnail((200, 150), Image.Resampling.LANCZOS)
+        img_io = io.BytesIO()
+        img.save(img_io, 'JPEG', quality=85)
+        return img_io.getvalue()
+
+
+def visit(client, urls, headers=None):
+    """浏览一次图集页面, 返回 (耗时毫秒, 响应列表)"""
+    start = time.perf_counter()
+    responses = [client.get(url, headers=headers or {}) for url in urls]
+    return (time.perf_counter() - start) * 1000, responses
+
+
+def benchmark_thumbnails():
+    print("=" * 50)
+    print("图片缩略图缓存基准测试")
+    print("=" * 50)
+    checks = []
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        root = Path(tmp) / "Downloaded"
+        paths = build_gallery(root)
+        relative = [str(path.relative_to(root)).replace(os.sep, "/") for path in paths]
+
+        start = time.perf_counter()
+        for _ in range(2):
+            for path in paths:
+                legacy_thumbnail(path)
+        legacy_ms = (time.perf_counter() - start) * 1000 / 2
+
+        import app as web
+        client = web.app.test_client()
+        manager = web.thumbnail_manager
+        catalog = web.get_file_catalog(root.resolve())
+        catalog.sync()
+        mtimes = {file["path"]: file["modified"] for file in catalog.query(limit=None)[0]}
+        urls = [f"/api/file/thumbnail?path={path}&v={mtimes[path]}" for path in relative]
+
+        first_ms, first = visit(client, urls)
+        second_ms, second = visit(client, urls)
+        etags = [response.headers.get("ETag") for response in second]
+        revalidate_ms, revalidated = visit(client, urls[:1] * len(urls), {"If-None-Match": etags[0]})
+
+        # 下载完成后批量生成: 清空缓存后重新生成所有图片的缩略图
+        for thumb in manager.cache_dir.glob("*.jpg"):
+            thumb.unlink()
+        for path in relative:
+            catalog.set_thumbnail(path, False)
+        missing = catalog.missing_thumbnails("image")
+        start = time.perf_counter()
+        generated = manager.generate_image_thumbnails(missing)
+        bulk_ms = (time.perf_counter() - start) * 1000
+
+        print(f"\n{PHOTOS} 张 {SIZE[0]}x{SIZE[1]} JPEG 和 {PNGS} 张 PNG")
+        print(f"{'方式':<28}{'耗时(毫秒)':<14}{'每张(毫秒)'}")
+        count = len(paths)
+        for name, ms in (("原来: 每次重新生成", legacy_ms), ("现在: 第一次浏览(生成并缓存)", first_ms),
+                         ("现在: 再次浏览(读取缓存)", second_ms), ("现在: 浏览器验证(304)", revalidate_ms),
+                         ("下载完成后批量生成", bulk_ms)):
+            print(f"{name:<24}{ms:<14.1f}{ms / count:.2f}")
+
+        checks.append(("所有缩略图都返回 JPEG", all(response.status_code == 200
+                                                   and response.mimetype == "image/jpeg" for response in first)))
+        checks.append((f"再次浏览时耗时降到原来的 {second_ms / legacy_ms:.0%}", second_ms * 3 < legacy_ms))
+        checks.append(("两次浏览内容相同, ETag 为强 ETag",
+                       all(a.data == b.data for a, b in zip(first, second))
+                       and all(etag and not etag.startswith("W/") for etag in etags) and len(set(etags)) == count))
+        cache_control = second[0].headers.get("Cache-Control", "")
+        checks.append(("带版本参数时缓存一年", "max-age=31536000" in cache_control and "immutable" in cache_control))
+        unversioned = client.get(f"/api/file/thumbnail?path={relative[0]}")
+        checks.append(("不带版本参数时每次验证", "no-cache" in unversioned.headers.get("Cache-Control", "")
+                       and unversioned.headers.get("ETag") == etags[0]))
+        checks.append(("If-None-Match 返回 304", all(response.status_code == 304 for response in revalidated)))
+        sizes = [Image.open(io.BytesIO(response.data)).size for response in first]
+        checks.append(("缩略图不超过 200x150", all(w <= 200 and h <= 150 for w, h in sizes)))
+        checks.append(("批量生成所有图片的缩略图, 文件索引中标记为已生成", len(missing) == generated == count
+                       and catalog.missing_thumbnails("image") == []
+                       and all(file["thumbnail"] == "ready" for file in catalog.query(limit=None, type="image")[0])))
+        checks.append(("与视频缩略图共用缓存目录", len(list(manager.cache_dir.glob("*.jpg"))) == count
+                       and manager.cache_dir == root.resolve() / "temp" / "thumbnails"))
+
+        # 文件修改后对应新的缓存文件和 ETag
+        Image.new("RGB", (640, 480), (0, 0, 0)).save(paths[0], "JPEG")
+        os.utime(paths[0], (time.time() + 5, time.time() + 5))
+        changed = client.get(f"/api/file/thumbnail?path={relative[0]}", headers={"If-None-Match": etags[0]})
+        checks.append(("文件修改后生成新的缩略图", changed.status_code == 200
+                       and changed.headers.get("ETag") != etags[0] and changed.data != first[0].data))
+
+        for catalog_ in web.file_catalogs.values():
+            catalog_.close()
+        os.chdir(project_root)
+
+    print()
+    for name, ok in checks:
+        print(f"{'✓' if ok else '✗'} {name}")
+    return all(ok for _, ok in checks)
+
+
+if __name__ == '__main__':
+    sys.exit(0 if benchmark_thumbnails() else 1)
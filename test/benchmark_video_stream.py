@@ -0,0 +1,230 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+视频流式发送基准测试
+
+在本地启动 Web 服务(多线程 werkzeug 服务器), 多个客户端同时读取同一个大视频, 对比:
+1. 原来的 /api/file/video: 一次读出整个文件(或整个请求的范围)再发送
+2. 现在: 按块流式发送
+记录服务进程的内存(RSS)峰值, 并检查完整请求、单个范围、bytes=-N、多个范围、
+条件请求(304)、If-Range 和无法满足的范围(416)的响应
+"""
+
+import os
+import sys
+import time
+import logging
+import tempfile
+import threading
+import http.client
+from pathlib import Path
+from email.parser import BytesParser
+from email.utils import formatdate
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+FILE_SIZE = 32 * 1024 * 1024
+CLIENTS = 12
+READ_SIZE = 256 * 1024   # 客户端每次读取的字节数
+
+
+def rss() -> int:
+    """当前进程的内存(字节)"""
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) * 1024
+    return 0
+
+
+class RssSampler(object):
+    """在后台记录内存峰值"""
+
+    def __init__(self):
+        self.base = rss()
+        self.peak = self.base
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(0.01):
+            self.peak = max(self.peak, rss())
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self._stop.set()
+        self._thread.join()
+
+
+def legacy_video(full_path, range_header):
+    """原来的 /api/file/video: 读出整个文件或整个范围"""
+    import re
+    import app as web
+
+    file_size = full_path.stat().st_size
+    if range_header:
+        byte1, byte2 = 0, None
+        g = re.search(r'(\d+)-(\d*)', range_header).groups()
+        if g[0]: byte1 = int(g[0])
+        if g[1]: byte2 = int(g[1])
+        if byte2 is None:
+            byte2 = file_size - 1
+        with open(full_path, 'rb') as f:
+            f.seek(byte1)
+            data = f.read(byte2 - byte1 + 1)
+        response = web.app.response_class(data, 206, mimetype='video/mp4', direct_passthrough=True)
+        response.headers.add('Content-Range', f'bytes {byte1}-{byte2}/{file_size}')
+    else:
+        with open(full_path, 'rb') as f:
+            data = f.read()
+        response = web.app.response_class(data, 200, mimetype='video/mp4', direct_passthrough=True)
+    response.headers.add('Content-Length', str(len(data)))
+    return response
+
+
+def fetch(port, url, headers, received, index):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+    conn.request("GET", url, headers=headers)
+    response = conn.getresponse()
+    total = 0
+    while True:
+        data = response.read(READ_SIZE)
+        if not data:
+            break
+        total += len(data)
+        # 模拟播放器边下载边播放
+        time.sleep(0.002)
+    conn.close()
+    received[index] = total
+
+
+def load(port, url):
+    """CLIENTS 个客户端同时读取, 一半读完整文件, 一半请求 bytes=0-"""
+    received = [0] * CLIENTS
+    threads = [threading.Thread(target=fetch, args=(port, url, {"Range": "bytes=0-"} if n % 2 else {},
+                                                    received, n))
+               for n in range(CLIENTS)]
+    with RssSampler() as sampler:
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+    return sampler.peak - sampler.base, elapsed, received
+
+
+def parse_multipart(response):
+    """解析 multipart/byteranges, 返回 [(Content-Range, 数据)]"""
+    message = BytesParser().parsebytes(b"Content-Type: " + response.headers["Content-Type"].encode()
+                                       + b"\r\n\r\n" + response.data)
+    return [(part["Content-Range"], part.get_payload(decode=True)) for part in message.get_payload()]
+
+
+def check_responses(client, payload, name):
+    url = f"/api/file/video?path={name}"
+    size = len(payload)
+    checks = []
+
+    full = client.get(url)
+    etag, last_modified = full.headers.get("ETag"), full.headers.get("Last-Modified")
+    checks.append(("完整请求: 200, 内容、长度、ETag 和 Last-Modified 正确",
+                   full.status_code == 200 and full.data == payload and full.content_length == size
+                   and etag and last_modified and full.headers["Accept-Ranges"] == "bytes"))
+
+    single = client.get(url, headers={"Range": "bytes=100-199"})
+    checks.append(("单个范围: 206 和 Content-Range 正确", single.status_code == 206
+                   and single.data == payload[100:200] and single.headers["Content-Range"] == f"bytes 100-199/{size}"))
+    open_ended = client.get(url, headers={"Range": f"bytes={size - 1000}-"})
+    suffix = client.get(url, headers={"Range": "bytes=-500"})
+    checks.append(("bytes=N- 和 bytes=-N 返回文件末尾", open_ended.data == payload[-1000:]
+                   and suffix.status_code == 206 and suffix.data == payload[-500:]
+                   and suffix.headers["Content-Range"] == f"bytes {size - 500}-{size - 1}/{size}"))
+
+    multi = client.get(url, headers={"Range": "bytes=0-99,1000-1099,-10"})
+    parts = parse_multipart(multi) if multi.status_code == 206 else []
+    checks.append(("多个范围: multipart/byteranges, 每一部分正确", multi.status_code == 206
+                   and multi.headers["Content-Type"].startswith("multipart/byteranges")
+                   and multi.content_length == len(multi.data)
+                   and parts == [(f"bytes 0-99/{size}", payload[:100]), (f"bytes 1000-1099/{size}", payload[1000:1100]),
+                                 (f"bytes {size - 10}-{size - 1}/{size}", payload[-10:])]))
+    merged = client.get(url, headers={"Range": "bytes=0-99,50-199"})
+    checks.append(("重叠的范围合并为一个", merged.status_code == 206 and merged.data == payload[:200]
+                   and merged.headers["Content-Range"] == f"bytes 0-199/{size}"))
+
+    checks.append(("If-None-Match / If-Modified-Since 返回 304",
+                   client.get(url, headers={"If-None-Match": etag}).status_code == 304
+                   and client.get(url, headers={"If-Modified-Since": last_modified}).status_code == 304
+                   and client.get(url, headers={"If-None-Match": '"other"'}).status_code == 200))
+    stale = formatdate(0, usegmt=True)
+    checks.append(("If-Range 匹配时返回范围, 不匹配时返回完整文件",
+                   client.get(url, headers={"Range": "bytes=0-9", "If-Range": etag}).status_code == 206
+                   and client.get(url, headers={"Range": "bytes=0-9,20-29", "If-Range": etag}).status_code == 206
+                   and client.get(url, headers={"Range": "bytes=0-9", "If-Range": '"other"'}).status_code == 200
+                   and client.get(url, headers={"Range": "bytes=0-9,20-29", "If-Range": stale}).status_code == 200))
+    unsatisfiable = client.get(url, headers={"Range": f"bytes={size}-"})
+    unsatisfiable_multi = client.get(url, headers={"Range": f"bytes={size}-,{size + 10}-{size + 20}"})
+    checks.append(("无法满足的范围返回 416", unsatisfiable.status_code == 416
+                   and unsatisfiable_multi.status_code == 416
+                   and unsatisfiable_multi.headers["Content-Range"] == f"bytes */{size}"))
+    head = client.head(url)
+    checks.append(("HEAD 请求不读取内容", head.status_code == 200 and head.content_length == size and not head.data))
+    return checks
+
+
+def benchmark_video_stream():
+    from werkzeug.serving import make_server
+
+    print("=" * 50)
+    print("视频流式发送基准测试")
+    print("=" * 50)
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp) / "Downloaded"
+        (root / "user").mkdir(parents=True)
+        payload = os.urandom(FILE_SIZE)
+        (root / "user" / "video.mp4").write_bytes(payload)
+
+        os.chdir(tmp)
+        import app as web
+        from flask import request
+        web.config_manager.config["path"] = str(root)
+        web.app.add_url_rule("/legacy/video", "legacy_video",
+                             lambda: legacy_video(root / request.args["path"], request.headers.get("Range")))
+
+        checks = check_responses(web.app.test_client(), payload, "user/video.mp4")
+
+        server = make_server("127.0.0.1", 0, web.app, threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        port = server.server_port
+        try:
+            stream = load(port, "/api/file/video?path=user/video.mp4")
+            legacy = load(port, "/legacy/video?path=user/video.mp4")
+        finally:
+            server.shutdown()
+        os.chdir(project_root)
+
+    print(f"\n{CLIENTS} 个客户端同时读取 {FILE_SIZE // 1024 // 1024}MB 的视频")
+    print(f"{'方式':<24}{'内存增加(MB)':<16}{'耗时(秒)'}")
+    print(f"{'原来: 一次读出':<20}{legacy[0] / 1024 / 1024:<16.1f}{legacy[1]:.2f}")
+    print(f"{'现在: 按块发送':<20}{stream[0] / 1024 / 1024:<16.1f}{stream[1]:.2f}")
+    checks.insert(0, ("每个客户端都收到完整文件", all(n == FILE_SIZE for n in stream[2] + legacy[2])))
+    # 每个连接只占用一块的内存, 所有连接合计远小于一个文件
+    checks.insert(1, (f"同时发送时内存基本不变(增加 {stream[0] / 1024 / 1024:.1f}MB)", stream[0] < FILE_SIZE // 2))
+    checks.insert(2, ("原来的方式内存随客户端数增加", legacy[0] > stream[0] * 4))
+
+    print()
+    for name, ok in checks:
+        print(f"{'✓' if ok else '✗'} {name}")
+    return all(ok for _, ok in checks)
+
+
+if __name__ == '__main__':
+    sys.exit(0 if benchmark_video_stream() else 1)
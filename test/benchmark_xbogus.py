@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+X-Bogus 签名基准测试
+
+对比 Utils.get_xbogus(原始实现, 每次重新计算 UA 盐值和两轮 RC4)
+和 XBogusSigner(预先计算, 缓存 payload 摘要):
+1. 随机 payload、form 和时间戳下两种实现的签名完全相同
+2. 每秒签名次数: 翻页时每次 payload 都不同(缓存未命中), 以及重试时 payload 相同(缓存命中)
+"""
+
+import sys
+import time
+import random
+from pathlib import Path
+from unittest import mock
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import apiproxy
+from apiproxy.common import utils
+from apiproxy.common.xbogus import XBogusSigner
+
+SAMPLES = 2000     # 一致性检查的次数
+ROUNDS = 20000     # 计时签名次数
+
+
+def build_payload(cursor):
+    return (f"sec_user_id=MS4wLjABAAAA{cursor % 97}&count=35&max_cursor={cursor}"
+            f"&device_platform=webapp&aid=6383")
+
+
+def check_same():
+    signer = XBogusSigner()
+    rng = random.Random(0)
+    mismatches = 0
+    for i in range(SAMPLES):
+        payload = build_payload(rng.randint(0, 10 ** 13))
+        form = rng.choice(["", "aweme_id=1"])
+        timestamp = rng.randint(0, 2 ** 32 - 1)
+        with mock.patch("apiproxy.common.utils.time.time", return_value=timestamp):
+            old = utils.get_xbogus(payload, apiproxy.ua, form)
+        if old != signer.sign(payload, form, timestamp):
+            mismatches += 1
+    print(f"{'✓' if not mismatches else '✗'} 签名一致: {SAMPLES - mismatches}/{SAMPLES}")
+    return not mismatches
+
+
+def rate(sign, payloads):
+    start = time.perf_counter()
+    for payload in payloads:
+        sign(payload)
+    return len(payloads) / (time.perf_counter() - start)
+
+
+def benchmark_speed():
+    unique = [build_payload(i) for i in range(ROUNDS)]
+    repeated = [build_payload(i % 10) for i in range(ROUNDS)]
+
+    old_sign = lambda payload: utils.get_xbogus(payload, apiproxy.ua, "")
+    old = rate(old_sign, unique[:ROUNDS // 10])
+
+    signer = XBogusSigner()
+    cold = rate(signer.sign, unique)
+    warm = rate(signer.sign, repeated)
+
+    print(f"\n{'方式':<28}{'每秒签名次数'}")
+    print(f"{'Utils.get_xbogus':<28}{old:,.0f}")
+    print(f"{'XBogusSigner(不同 payload)':<28}{cold:,.0f}")
+    print(f"{'XBogusSigner(重复 payload)':<28}{warm:,.0f}")
+    print(f"\n✓ 加速 {cold / old:.1f}x(不同 payload), {warm / old:.1f}x(重复 payload)")
+    print(f"   缓存: {signer.cache_info()}")
+
+
+def benchmark_xbogus():
+    print("=" * 50)
+    print("X-Bogus 签名基准测试")
+    print("=" * 50)
+    check_same()
+    benchmark_speed()
+
+
+if __name__ == '__main__':
+    benchmark_xbogus()
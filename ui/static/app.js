@@ -1063,18 +1063,18 @@ async function updateStatistics() {
     const totalFilesElement = document.getElementById('totalFiles');
     if (totalFilesElement) {
         try {
-            // 从后端获取最新的文件列表来更新统计
-            const response = await fetch('/api/files');
+            // 从后端的文件索引获取文件数
+            const response = await fetch('/api/files/count');
             if (response.ok) {
-                const files = await response.json();
-                totalFilesElement.textContent = files.length;
-                console.log(`📊 更新文件统计: ${files.length} 个文件`);
+                const data = await response.json();
+                totalFilesElement.textContent = data.total;
+                console.log(`📊 更新文件统计: ${data.total} 个文件`);
             }
         } catch (error) {
             console.error('获取文件统计失败:', error);
             // 如果获取失败，尝试使用本地变量
-            if (typeof fileAllFiles !== 'undefined') {
-                totalFilesElement.textContent = fileAllFiles.length;
+            if (typeof fileTotalCount !== 'undefined') {
+                totalFilesElement.textContent = fileTotalCount;
             }
         }
     }
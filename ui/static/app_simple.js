@@ -1,95 +1,79 @@
 // 文件管理相关变量
-let fileAllFiles = [];
-let fileFilteredFiles = [];
+let filePageFiles = [];        // 当前页的文件(分页、排序和筛选由后端的文件索引完成)
+let fileTotal = 0;             // 符合筛选条件的文件数
+let fileTotalCount = 0;        // 所有文件数
 let fileCurrentPage = 1;
 let fileItemsPerPage = 15;
 let fileSources = new Set();
+let filePageCursors = {};      // 页码 -> 游标(上一页返回的 next_cursor), 没有时按 offset 跳页
+let fileQuerySeq = 0;          // 只显示最后一次查询的结果
+let fileFilterTimer = null;
+let fileIndexingTimer = null;
+let fileThumbnailPolls = new Map(); // 当前页请求生成缩略图的视频 -> 轮询定时器
 
 // 刷新文件列表
 async function fileRefreshFiles() {
+    filePageCursors = {};
+    // 同时让后端重新同步文件索引
+    await fileLoadPage(1, true);
+}
+
+// 查询一页文件
+async function fileLoadPage(page, refresh = false) {
+    const params = new URLSearchParams({
+        limit: fileItemsPerPage,
+        sort: document.getElementById('sortFilter')?.value || 'date-desc',
+        type: document.getElementById('typeFilter')?.value || 'all',
+        source: document.getElementById('sourceFilter')?.value || 'all',
+        q: document.getElementById('searchInput')?.value?.trim() || ''
+    });
+    if (filePageCursors[page]) {
+        params.set('cursor', filePageCursors[page]);
+    } else if (page > 1) {
+        params.set('offset', (page - 1) * fileItemsPerPage);
+    }
+    if (refresh) params.set('refresh', '1');
+    
+    const seq = ++fileQuerySeq;
     try {
-        console.log('开始获取文件列表...');
-        const response = await fetch('/api/files');
-        
+        const response = await fetch(`/api/files?${params}`);
         if (!response.ok) {
             throw new Error(`HTTP error! status: ${response.status}`);
         }
+        const data = await response.json();
+        if (seq !== fileQuerySeq) return;
         
-        const files = await response.json();
-        console.log(`成功获取 ${files.length} 个文件`);
-        
-        // 处理文件数据
-        fileAllFiles = files.map(file => {
-            const fileInfo = {
-                ...file,
-                fileType: fileGetFileType(file.name),
-                source: fileExtractSourceFromPath(file.path)
-            };
-            return fileInfo;
-        });
-        
-        // 收集文件来源
-        fileSources.clear();
-        fileAllFiles.forEach(file => {
-            if (file.source && file.source !== '未知来源') {
-                fileSources.add(file.source);
-            }
-        });
+        filePageFiles = data.files.map(file => ({ ...file, fileType: file.type }));
+        fileTotal = data.total;
+        fileCurrentPage = page;
+        if (data.next_cursor) filePageCursors[page + 1] = data.next_cursor;
         
-        console.log(`发现 ${fileSources.size} 个文件来源:`, Array.from(fileSources));
+        // 第一页同时返回各类型的文件数和所有来源
+        if (data.stats) {
+            fileTotalCount = data.stats.total;
+            fileSources = new Set(data.sources);
+            fileUpdateSourceFilter();
+            fileUpdateFileStats(data.stats);
+            document.getElementById('totalFiles').textContent = fileTotalCount;
+        }
         
-        fileUpdateSourceFilter();
-        fileFilterFiles();
-        document.getElementById('totalFiles').textContent = fileAllFiles.length;
+        fileRenderFiles();
+        fileUpdatePagination();
         
-        console.log('文件列表刷新完成');
+        // 后端正在同步文件索引, 稍后重新查询当前页
+        clearTimeout(fileIndexingTimer);
+        if (data.indexing) {
+            fileIndexingTimer = setTimeout(() => {
+                filePageCursors = {};
+                fileLoadPage(fileCurrentPage);
+            }, 2000);
+        }
     } catch (error) {
         console.error('获取文件列表失败:', error);
         fileShowError(`获取文件列表失败: ${error.message}`);
     }
 }
 
-// 获取文件类型
-function fileGetFileType(filename) {
-    const ext = fileGetFileExtension(filename).toLowerCase();
-    if (['mp4', 'avi', 'mov', 'mkv', 'flv', 'webm'].includes(ext)) return 'video';
-    if (['mp3', 'wav', 'aac', 'flac', 'm4a'].includes(ext)) return 'audio';
-    if (['jpg', 'jpeg', 'png', 'gif', 'bmp', 'webp'].includes(ext)) return 'image';
-    // 移除JSON等数据文件类型，将其归类为other
-    return 'other';
-}
-
-// 从路径提取来源
-function fileExtractSourceFromPath(path) {
-    try {
-        // 处理Windows和Unix路径分隔符
-        const normalizedPath = path.replace(/\\/g, '/');
-        const parts = normalizedPath.split('/');
-        
-        // 查找包含用户信息的目录
-        for (let i = 0; i < parts.length; i++) {
-            const part = parts[i];
-            // 检查是否是用户目录（通常包含用户ID或特殊标识）
-            if (part && part !== '.' && part !== '..' && 
-                (part.includes('user_') || part.includes('MS4w') || 
-                 part.includes('合集') || part.includes('用户') ||
-                 part.length > 10)) {
-                return part;
-            }
-        }
-        
-        // 如果没有找到特殊目录，返回第一级目录
-        if (parts.length >= 2 && parts[0] && parts[0] !== '.') {
-            return parts[0];
-        }
-        
-        return '未知来源';
-    } catch (error) {
-        console.error('解析文件路径失败:', path, error);
-        return '未知来源';
-    }
-}
-
 // 更新来源筛选器
 function fileUpdateSourceFilter() {
     const sourceFilter = document.getElementById('sourceFilter');
@@ -114,63 +98,17 @@ function fileUpdateSourceFilter() {
     }
 }
 
-// 筛选文件
+// 筛选文件(输入搜索词时等停顿后再查询)
 function fileFilterFiles() {
-    const typeFilter = document.getElementById('typeFilter')?.value || 'all';
-    const sourceFilter = document.getElementById('sourceFilter')?.value || 'all';
-    const sortFilter = document.getElementById('sortFilter')?.value || 'date-desc';
-    const searchInput = document.getElementById('searchInput')?.value?.toLowerCase() || '';
-    
-    console.log('开始筛选文件:', { typeFilter, sourceFilter, sortFilter, searchInput });
-    
-    fileFilteredFiles = fileAllFiles.filter(file => {
-        // 排除JSON等非目标文件类型
-        if (['json', 'txt', 'log'].includes(fileGetFileExtension(file.name).toLowerCase())) {
-            return false;
-        }
-        
-        if (typeFilter !== 'all' && file.fileType !== typeFilter) return false;
-        if (sourceFilter !== 'all' && file.source !== sourceFilter) return false;
-        if (searchInput && !file.name.toLowerCase().includes(searchInput)) return false;
-        return true;
-    });
-    
-    console.log(`筛选结果: ${fileFilteredFiles.length} 个文件`);
-    
-    fileSortFiles(sortFilter);
-    fileUpdateFileStats();
-    fileCurrentPage = 1;
-    fileRenderFiles();
-    fileUpdatePagination();
-}
-
-// 排序文件
-function fileSortFiles(sortType) {
-    switch (sortType) {
-        case 'date-desc': fileFilteredFiles.sort((a, b) => new Date(b.modified) - new Date(a.modified)); break;
-        case 'date-asc': fileFilteredFiles.sort((a, b) => new Date(a.modified) - new Date(b.modified)); break;
-        case 'name-asc': fileFilteredFiles.sort((a, b) => a.name.localeCompare(b.name)); break;
-        case 'name-desc': fileFilteredFiles.sort((a, b) => b.name.localeCompare(a.name)); break;
-        case 'size-desc': fileFilteredFiles.sort((a, b) => b.size - a.size); break;
-    }
+    clearTimeout(fileFilterTimer);
+    fileFilterTimer = setTimeout(() => {
+        filePageCursors = {};
+        fileLoadPage(1);
+    }, 250);
 }
 
 // 更新统计信息
-function fileUpdateFileStats() {
-    // 只统计目标文件类型，排除JSON等
-    const targetFiles = fileAllFiles.filter(file => {
-        const ext = fileGetFileExtension(file.name).toLowerCase();
-        return !['json', 'txt', 'log'].includes(ext);
-    });
-    
-    const stats = {
-        total: targetFiles.length,
-        video: targetFiles.filter(f => f.fileType === 'video').length,
-        image: targetFiles.filter(f => f.fileType === 'image').length,
-        audio: targetFiles.filter(f => f.fileType === 'audio').length,
-        other: targetFiles.filter(f => !['video', 'image', 'audio'].includes(f.fileType)).length
-    };
-    
+function fileUpdateFileStats(stats) {
     // 安全地更新统计信息
     const elements = {
         'totalFileCount': stats.total,
@@ -196,20 +134,17 @@ function fileRenderFiles() {
         return;
     }
     
+    fileCancelThumbnailRequests(new Set(filePageFiles.map(file => file.path.replace(/\\/g, '/'))));
     container.innerHTML = '';
     
-    if (fileFilteredFiles.length === 0) {
+    if (filePageFiles.length === 0) {
         container.innerHTML = '<div class="text-center py-5" style="grid-column: 1 / -1;"><i class="bi bi-folder-x" style="font-size: 3rem; color: #cbd5e1;"></i><p class="text-muted mt-3">没有找到符合条件的文件</p></div>';
         return;
     }
     
-    const startIndex = (fileCurrentPage - 1) * fileItemsPerPage;
-    const endIndex = startIndex + fileItemsPerPage;
-    const currentPageFiles = fileFilteredFiles.slice(startIndex, endIndex);
-    
-    console.log(`渲染第 ${fileCurrentPage} 页，显示 ${currentPageFiles.length} 个文件`);
+    console.log(`渲染第 ${fileCurrentPage} 页，显示 ${filePageFiles.length} 个文件`);
     
-    currentPageFiles.forEach(file => {
+    filePageFiles.forEach(file => {
         const fileCard = document.createElement('div');
         fileCard.className = 'file-card';
         
@@ -220,9 +155,21 @@ function fileRenderFiles() {
         let thumbnailContent = '';
         if (isImage || isVideo) {
             const imagePath = file.path.replace(/\\/g, '/');
-            const thumbnailUrl = `/api/file/thumbnail?path=${encodeURIComponent(imagePath)}`;
+            // 带上修改时间, 文件不变时浏览器直接使用缓存的缩略图
+            const thumbnailUrl = `/api/file/thumbnail?path=${encodeURIComponent(imagePath)}&v=${encodeURIComponent(file.modified || '')}`;
             
-            if (isVideo) {
+            if (isVideo && file.thumbnail === 'ready') {
+                // 文件索引中记录缩略图已生成, 直接显示, 不再检查状态
+                thumbnailContent = `
+                    <div class="file-thumbnail-container">
+                        <img src="${thumbnailUrl}" 
+                             alt="视频缩略图" 
+                             class="video-thumbnail"
+                             onerror="this.parentElement.innerHTML='<div class=\\'file-icon\\'><i class=\\'bi bi-camera-video-fill\\'></i></div>'"
+                             onload="this.classList.add('loaded')">
+                    </div>
+                `;
+            } else if (isVideo) {
                 // 视频文件：先显示默认图标，然后检查缩略图状态
                 thumbnailContent = `
                     <div class="file-thumbnail-container" data-video-path="${imagePath}">
@@ -311,8 +258,8 @@ async function fileCheckVideoThumbnailStatus(container, videoPath) {
         if (data.status === 'ready') {
             // 缩略图已生成，显示缩略图
             fileShowVideoThumbnail(container, videoPath);
-        } else if (data.status === 'not_generated' || data.status === 'outdated') {
-            // 请求生成缩略图
+        } else if (['not_generated', 'outdated', 'queued', 'generating'].includes(data.status)) {
+            // 请求生成缩略图(已在批量队列中时后端会提前处理)
             fileRequestVideoThumbnail(container, videoPath);
         } else {
             // 其他状态，显示错误
@@ -356,6 +303,10 @@ function fileStartThumbnailPolling(container, videoPath) {
     const maxPolls = 30; // 最多轮询30次（30秒）
     
     const pollInterval = setInterval(async () => {
+        if (!container.isConnected) {
+            clearInterval(pollInterval);
+            return;
+        }
         pollCount++;
         
         try {
@@ -365,10 +316,12 @@ function fileStartThumbnailPolling(container, videoPath) {
             if (data.status === 'ready') {
                 // 缩略图生成完成
                 clearInterval(pollInterval);
+                fileThumbnailPolls.delete(videoPath);
                 fileShowVideoThumbnail(container, videoPath);
             } else if (pollCount >= maxPolls) {
                 // 超时
                 clearInterval(pollInterval);
+                fileThumbnailPolls.delete(videoPath);
                 fileShowVideoThumbnailError(container, 'timeout');
             } else {
                 // 更新状态显示
@@ -381,10 +334,25 @@ function fileStartThumbnailPolling(container, videoPath) {
             console.error('轮询缩略图状态失败:', error);
             if (pollCount >= maxPolls) {
                 clearInterval(pollInterval);
+                fileThumbnailPolls.delete(videoPath);
                 fileShowVideoThumbnailError(container, 'poll_error');
             }
         }
     }, 1000);
+    fileThumbnailPolls.set(videoPath, pollInterval);
+}
+
+function fileCancelThumbnailRequests(keep) {
+    // 翻页或筛选后, 上一页还没有生成的缩略图不再优先生成(新的一页中也有的文件除外)
+    const paths = [...fileThumbnailPolls.keys()].filter(path => !keep.has(path));
+    fileThumbnailPolls.forEach(pollInterval => clearInterval(pollInterval));
+    fileThumbnailPolls.clear();
+    if (paths.length === 0) return;
+    fetch('/api/file/thumbnail/cancel', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ paths })
+    }).catch(error => console.error('取消缩略图任务失败:', error));
 }
 
 function fileShowVideoThumbnail(container, videoPath) {
@@ -432,7 +400,7 @@ function fileShowVideoThumbnailError(container, errorType) {
 
 // 更新分页
 function fileUpdatePagination() {
-    const totalPages = Math.ceil(fileFilteredFiles.length / fileItemsPerPage);
+    const totalPages = Math.ceil(fileTotal / fileItemsPerPage);
     const pagination = document.getElementById('pagination');
     const currentPageInfo = document.getElementById('currentPageInfo');
     const totalPagesSpan = document.getElementById('totalPages');
@@ -443,7 +411,7 @@ function fileUpdatePagination() {
     }
     
     const startItem = (fileCurrentPage - 1) * fileItemsPerPage + 1;
-    const endItem = Math.min(fileCurrentPage * fileItemsPerPage, fileFilteredFiles.length);
+    const endItem = Math.min(fileCurrentPage * fileItemsPerPage, fileTotal);
     currentPageInfo.textContent = `${startItem}-${endItem}`;
     totalPagesSpan.textContent = totalPages;
     
@@ -504,11 +472,9 @@ function fileCreateEllipsisItem() {
 
 // 切换页面
 function fileChangePage(page) {
-    const totalPages = Math.ceil(fileFilteredFiles.length / fileItemsPerPage);
+    const totalPages = Math.ceil(fileTotal / fileItemsPerPage);
     if (page >= 1 && page <= totalPages) {
-        fileCurrentPage = page;
-        fileRenderFiles();
-        fileUpdatePagination();
+        fileLoadPage(page);
     }
 }
 